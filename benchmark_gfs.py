@@ -0,0 +1,249 @@
+"""
+GFS Weather Data Downloader - POMIARY WYDAJNOŚCI
+Porównuje warianty przetwarzania na jednym (reprezentatywnym) pliku GRIB.
+Każdy wariant uruchamiany jest w osobnym procesie, żeby szczytowe zużycie pamięci (RSS)
+nie mieszało się między wariantami.
+
+Użycie:
+    python benchmark_gfs.py konwersja gfs.t12z.pgrb2.0p25.f003
+    python benchmark_gfs.py konwersja gfs.t12z.pgrb2.0p25.f003 --caly-glob --powtorzenia 3
+    python benchmark_gfs.py obszary --liczba 5000 --zmienne 20
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+from datetime import datetime
+
+import builtins
+
+def _peak_rss_mb():
+    """Szczytowe RSS bieżącego procesu w MB (ru_maxrss: KB na Linuksie, bajty na macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _build_frame(grib_path, config_file, region):
+    """
+    Dekodowanie + wycięcie regionu + złożenie DataFrame (jak w gfs_downloader_filtered_fixed).
+    Zwraca (DataFrame, schemat tabeli gfs_forecast z konfiguracji).
+    """
+    # Import bez uruchamiania głównej pętli pobierania
+    builtins.__imported_by_daemon__ = True
+    import gfs_grib_decode
+    from gfs_downloader_filtered_fixed import load_parameters_config, _assemble_variables
+    from gfs_db_schema import ForecastSchema
+
+    params_config, cfgrib_to_config = load_parameters_config(config_file)
+    routing = gfs_grib_decode.build_routing_table(params_config, cfgrib_to_config)
+    decoded = gfs_grib_decode.decode_grib_messages(grib_path, routing, fh_str='bench')
+    geometry = None
+    if region is not None:
+        decoded = gfs_grib_decode.crop_region(decoded, *region)
+        geometry = decoded.get('region')
+
+    import xarray as xr
+    vars_region = {
+        column: xr.DataArray(
+            field['values'],
+            dims=('latitude', 'longitude'),
+            coords={'latitude': decoded['latitudes'], 'longitude': decoded['longitudes']}
+        )
+        for column, field in decoded['fields'].items()
+    }
+    df = _assemble_variables(vars_region, 'bench', geometry)
+    # Kolumny czasu i nazwy współrzędnych jak w zapisie do gfs_forecast (_finalize_frame)
+    now = datetime.now()
+    df['run_time'] = now
+    df['forecast_time'] = now
+    df['created_at'] = now
+    df.rename(columns={'latitude': 'lat', 'longitude': 'lon'}, inplace=True)
+    return df, ForecastSchema(params_config, derived_columns=[])
+
+def _convert(df, mode):
+    """Konwersja DataFrame do postaci przekazywanej do zapisu w bazie"""
+    if mode == 'records':
+        # Poprzednia ścieżka: lista słowników -> ponownie DataFrame (+ jawne gc)
+        import gc
+        import pandas as pd
+        records = df.to_dict('records')
+        del df
+        gc.collect()
+        batch = pd.DataFrame(records)
+        del records
+        gc.collect()
+        return batch
+    # Partia kolumnowa: DataFrame trafia do zapisu bez przebudowy
+    return df
+
+# SQLite w pamięci ogranicza liczbę parametrów zapytania (domyślnie 999) - INSERT wielowierszowy dzielony
+# na mniejsze porcje niż chunksize=1000 w write_forecast_batch (MySQL nie ma tego limitu)
+SQLITE_MAX_VARIABLES = 999
+
+def _write(batch, schema, engine):
+    """Ścieżka zapisu jak w write_forecast_batch: wybór kolumn schematu i INSERT przez to_sql"""
+    batch = schema.project(batch)
+    chunksize = max(1, min(1000, SQLITE_MAX_VARIABLES // max(1, len(batch.columns))))
+    batch.to_sql(schema.table, engine, if_exists='append', index=False, method='multi', chunksize=chunksize)
+
+def run_conversion(args):
+    """
+    Pojedynczy pomiar konwersji i zapisu (wywoływany w procesie potomnym). Zapis - do bazy SQLite
+    w pamięci (bez sieci i serwera MySQL), więc czas obejmuje przygotowanie INSERT po stronie Pythona.
+    """
+    from sqlalchemy import create_engine
+
+    region = None if args.caly_glob else (args.lat_min, args.lat_max, args.lon_min, args.lon_max)
+    df, schema = _build_frame(args.plik, args.config, region)
+    rows, cols = df.shape
+    rss_before = _peak_rss_mb()
+    times = []
+    write_times = []
+    for _ in range(args.powtorzenia):
+        source = df.copy() if args.powtorzenia > 1 else df
+        engine = create_engine('sqlite://')
+        start = time.perf_counter()
+        batch = _convert(source, args.tryb)
+        converted = time.perf_counter()
+        _write(batch, schema, engine)
+        times.append(converted - start)
+        write_times.append(time.perf_counter() - converted)
+        del batch, source
+        engine.dispose()
+    print(json.dumps({
+        'tryb': args.tryb,
+        'wiersze': rows,
+        'kolumny': cols,
+        'czas_s': min(times),
+        'zapis_s': min(write_times),
+        'razem_s': min(c + w for c, w in zip(times, write_times)),
+        'rss_przed_mb': rss_before,
+        'rss_szczyt_mb': _peak_rss_mb()
+    }))
+
+def benchmark_conversion(args):
+    """Porównanie: to_dict('records') -> DataFrame vs partia kolumnowa - konwersja i zapis (schema.project + to_sql)"""
+    results = []
+    for mode in ('records', 'columnar'):
+        cmd = [sys.executable, os.path.abspath(__file__), '_konwersja', args.plik,
+               '--config', args.config, '--tryb', mode, '--powtorzenia', str(args.powtorzenia),
+               '--lat-min', str(args.lat_min), '--lat-max', str(args.lat_max),
+               '--lon-min', str(args.lon_min), '--lon-max', str(args.lon_max)]
+        if args.caly_glob:
+            cmd.append('--caly-glob')
+        output = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"Plik: {args.plik}")
+    print(f"Rozmiar: {results[0]['wiersze']} wierszy x {results[0]['kolumny']} kolumn")
+    print(f"{'Tryb':<10} {'Konwersja [s]':>14} {'Zapis [s]':>10} {'Razem [s]':>10} {'RSS przed [MB]':>16} {'RSS szczyt [MB]':>16}")
+    for r in results:
+        print(f"{r['tryb']:<10} {r['czas_s']:>14.3f} {r['zapis_s']:>10.3f} {r['razem_s']:>10.3f} "
+              f"{r['rss_przed_mb']:>16.1f} {r['rss_szczyt_mb']:>16.1f}")
+
+def _synthetic_polygons(count, vertices, region, seed=0):
+    """Wielokąty testowe: nieregularne "koła" na siatce pokrywającej region (jak gminy/zlewnie)"""
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    lat_min, lat_max, lon_min, lon_max = region
+    per_row = int(np.ceil(np.sqrt(count * (lon_max - lon_min) / (lat_max - lat_min))))
+    rows = int(np.ceil(count / per_row))
+    step_lat = (lat_max - lat_min) / rows
+    step_lon = (lon_max - lon_min) / per_row
+    angles = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+    polygons = []
+    for number in range(count):
+        row, column = divmod(number, per_row)
+        lat = lat_min + (row + 0.5) * step_lat
+        lon = lon_min + (column + 0.5) * step_lon
+        radius = 0.5 + 0.2 * rng.random(vertices)
+        ring = np.column_stack((lon + radius * step_lon * np.cos(angles), lat + radius * step_lat * np.sin(angles)))
+        polygons.append((f"A{number}", [np.vstack((ring, ring[:1]))]))
+    return polygons
+
+def benchmark_areas(args):
+    """Statystyki obszarów: budowa wag (raz), odczyt z cache i agregacja jednej godziny prognozy"""
+    import tempfile
+    import numpy as np
+    import gfs_areas
+
+    region = (args.lat_min, args.lat_max, args.lon_min, args.lon_max)
+    latitudes = np.arange(args.lat_min, args.lat_max + 1e-9, args.krok)
+    longitudes = np.arange(args.lon_min, args.lon_max + 1e-9, args.krok)
+    polygons = _synthetic_polygons(args.liczba, args.wierzcholki, region)
+    rng = np.random.default_rng(1)
+    columns = {f"var{i}": rng.normal(size=(latitudes.size, longitudes.size)) for i in range(args.zmienne)}
+    grid = {'latitudes': latitudes, 'longitudes': longitudes, 'columns': columns}
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        source = os.path.join(cache_dir, 'polygons.geojson')
+        open(source, 'w').close()  # klucz cache (ścieżka, rozmiar, czas modyfikacji)
+        statistics = [s.strip() for s in args.statystyki.split(',')]
+
+        start = time.perf_counter()
+        areas = gfs_areas.AreaSet(polygons, source, statistics, args.supersample, cache_dir)
+        weights = areas.weights(latitudes, longitudes)
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        gfs_areas.AreaSet(polygons, source, statistics, args.supersample, cache_dir).weights(latitudes, longitudes)
+        load_time = time.perf_counter() - start
+
+        times = []
+        for _ in range(args.powtorzenia):
+            start = time.perf_counter()
+            areas.aggregate(grid)
+            times.append(time.perf_counter() - start)
+
+    print(f"Siatka: {latitudes.size} x {longitudes.size} punktów (krok {args.krok}°), {args.zmienne} zmiennych")
+    print(f"Obszary: {len(polygons)} wielokątów po {args.wierzcholki} wierzchołków, {weights.rows.size} par obszar-komórka")
+    print(f"Iloczyny: {'scipy.sparse (CSR)' if gfs_areas.sparse is not None else 'numpy (bincount)'}")
+    print(f"{'Etap':<42} {'Czas [s]':>10}")
+    print(f"{'Budowa wag (raz na siatkę)':<42} {build_time:>10.3f}")
+    print(f"{'Odczyt wag z cache':<42} {load_time:>10.3f}")
+    print(f"{'Godzina prognozy (' + ', '.join(statistics) + ')':<42} {min(times):>10.3f}")
+    print(f"RSS szczyt: {_peak_rss_mb():.1f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description='Pomiary wydajności przetwarzania GFS')
+    sub = parser.add_subparsers(dest='polecenie', required=True)
+
+    for name in ('konwersja', '_konwersja'):
+        p = sub.add_parser(name, help='Konwersja DataFrame i zapis do bazy (SQLite w pamięci)' if name == 'konwersja' else argparse.SUPPRESS)
+        p.add_argument('plik', help='Plik GRIB2 (jedna godzina prognozy)')
+        p.add_argument('--config', default='config.ini')
+        p.add_argument('--powtorzenia', type=int, default=1)
+        p.add_argument('--caly-glob', action='store_true', help='Bez wycinania regionu')
+        p.add_argument('--lat-min', type=float, default=49.0)
+        p.add_argument('--lat-max', type=float, default=55.0)
+        p.add_argument('--lon-min', type=float, default=14.0)
+        p.add_argument('--lon-max', type=float, default=24.0)
+        if name == '_konwersja':
+            p.add_argument('--tryb', choices=('records', 'columnar'), required=True)
+
+    p = sub.add_parser('obszary', help='Statystyki obszarów (wagi wielokątów, gfs_areas)')
+    p.add_argument('--liczba', type=int, default=5000, help='Liczba wielokątów')
+    p.add_argument('--wierzcholki', type=int, default=64, help='Wierzchołki wielokąta')
+    p.add_argument('--zmienne', type=int, default=20, help='Liczba zmiennych w godzinie prognozy')
+    p.add_argument('--statystyki', default='mean, min, max, sum')
+    p.add_argument('--supersample', type=int, default=4)
+    p.add_argument('--krok', type=float, default=0.25, help='Krok siatki (°)')
+    p.add_argument('--powtorzenia', type=int, default=3)
+    p.add_argument('--lat-min', type=float, default=49.0)
+    p.add_argument('--lat-max', type=float, default=55.0)
+    p.add_argument('--lon-min', type=float, default=14.0)
+    p.add_argument('--lon-max', type=float, default=24.0)
+
+    args = parser.parse_args()
+    if args.polecenie == 'konwersja':
+        benchmark_conversion(args)
+    elif args.polecenie == 'obszary':
+        benchmark_areas(args)
+    else:
+        run_conversion(args)
+
+if __name__ == '__main__':
+    main()
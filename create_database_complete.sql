@@ -8,6 +8,8 @@ USE dane_gfs;
 -- Usuń starą tabelę (UWAGA: To usunie wszystkie dane!)
 DROP TABLE IF EXISTS gfs_forecast;
 
+-- Kolumny wartości są DOUBLE (tryb [storage] mode = double). Dla zapisu zwartego (FLOAT albo
+-- SMALLINT/MEDIUMINT z krokiem i offsetem) typy zmienia: python gfs_storage.py migracja --table gfs_forecast
 -- Utwórz nową tabelę z wszystkimi potrzebnymi kolumnami
 CREATE TABLE gfs_forecast (
     -- Kolumny bazowe
@@ -17,6 +19,8 @@ CREATE TABLE gfs_forecast (
     forecast_time DATETIME NOT NULL COMMENT 'Czas prognozy (dla jakiej daty/godziny jest prognoza)',
     run_time DATETIME NOT NULL COMMENT 'Czas uruchomienia modelu GFS (00, 06, 12, 18 UTC)',
     created_at DATETIME NOT NULL COMMENT 'Czas dodania rekordu do bazy',
+    region_id VARCHAR(32) NULL COMMENT 'Identyfikator regionu ([region.<nazwa>] region_id) - NULL dla regionu domyślnego',
+    interpolated TINYINT(1) NOT NULL DEFAULT 0 COMMENT 'Wiersz interpolowany w czasie ([interpolation], gfs_interpolate.py) - 0 dla godzin z GRIB',
     
     -- Parametry podstawowe (2m)
     t2m DOUBLE COMMENT 'Temperatura na wysokości 2m (°C)',
@@ -40,6 +44,8 @@ CREATE TABLE gfs_forecast (
     -- Ciśnienie i opady
     mslp DOUBLE COMMENT 'Ciśnienie na poziomie morza (hPa)',
     tp DOUBLE COMMENT 'Opady całkowite skumulowane od początku prognozy (mm) - może być NULL lub 0 dla początkowych godzin',
+    tp_1h DOUBLE COMMENT 'Opad w ostatniej godzinie (mm) - z deakumulacji tp',
+    tp_3h DOUBLE COMMENT 'Opad w ostatnich 3 godzinach (mm) - z deakumulacji tp',
     prate DOUBLE COMMENT 'Intensywność opadów (kg/m²/s)',
     
     -- Zachmurzenie (wszystkie poziomy)
@@ -69,7 +75,137 @@ CREATE TABLE gfs_forecast (
     INDEX idx_forecast_time (forecast_time),
     INDEX idx_run_time (run_time),
     INDEX idx_location_time (lat, lon, forecast_time, run_time),
-    INDEX idx_forecast_run (forecast_time, run_time)
+    INDEX idx_forecast_run (forecast_time, run_time),
+    INDEX idx_region_run (region_id, run_time, forecast_time)
+    
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- ========================================
+-- Prognozy dla stacji ([points] w config.ini, gfs_points.py)
+-- Wartości interpolowane z siatki do współrzędnych stacji - zapytanie po station_id
+-- zamiast szukania najbliższego punktu siatki w gfs_forecast
+-- Kolumny parametrów jak w gfs_forecast (zapisywane są tylko kolumny istniejące w tabeli)
+-- ========================================
+CREATE TABLE IF NOT EXISTS gfs_point_forecast (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    station_id VARCHAR(32) NOT NULL COMMENT 'Identyfikator stacji (kolumna id w pliku stacji)',
+    forecast_time DATETIME NOT NULL COMMENT 'Czas prognozy',
+    run_time DATETIME NOT NULL COMMENT 'Czas uruchomienia modelu GFS (00, 06, 12, 18 UTC)',
+    created_at DATETIME NOT NULL COMMENT 'Czas dodania rekordu do bazy',
+    interpolated TINYINT(1) NOT NULL DEFAULT 0 COMMENT 'Wiersz interpolowany w czasie ([interpolation], gfs_interpolate.py) - 0 dla godzin z GRIB',
+    
+    t2m DOUBLE COMMENT 'Temperatura na wysokości 2m (°C)',
+    d2m DOUBLE COMMENT 'Punkt rosy na wysokości 2m (°C)',
+    rh DOUBLE COMMENT 'Wilgotność względna na wysokości 2m (%)',
+    u10 DOUBLE COMMENT 'Składowa U wiatru na wysokości 10m (m/s)',
+    v10 DOUBLE COMMENT 'Składowa V wiatru na wysokości 10m (m/s)',
+    gust DOUBLE COMMENT 'Porywy wiatru (m/s)',
+    wind_speed DOUBLE COMMENT 'Prędkość wiatru obliczona z u10, v10 (m/s)',
+    wind_dir DOUBLE COMMENT 'Kierunek wiatru w stopniach (0°=N, 90°=E, 180°=S, 270°=W)',
+    u_wind80 DOUBLE COMMENT 'Składowa U wiatru na wysokości 80m (m/s)',
+    v_wind80 DOUBLE COMMENT 'Składowa V wiatru na wysokości 80m (m/s)',
+    mslp DOUBLE COMMENT 'Ciśnienie na poziomie morza (hPa)',
+    tp DOUBLE COMMENT 'Opady całkowite skumulowane od początku prognozy (mm)',
+    tp_1h DOUBLE COMMENT 'Opad w ostatniej godzinie (mm) - z deakumulacji tp',
+    tp_3h DOUBLE COMMENT 'Opad w ostatnich 3 godzinach (mm) - z deakumulacji tp',
+    tcc DOUBLE COMMENT 'Zachmurzenie całkowite (0-100%)',
+    vis DOUBLE COMMENT 'Widzialność (m)',
+    cape DOUBLE COMMENT 'CAPE - Convective Available Potential Energy (J/kg)',
+    t_t850 DOUBLE COMMENT 'Temperatura na poziomie 850 hPa (°C)',
+    gh_gh500 DOUBLE COMMENT 'Geopotencjał na poziomie 500 hPa (m)',
+    
+    INDEX idx_station_time (station_id, forecast_time, run_time),
+    INDEX idx_point_run (run_time, forecast_time)
+    
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- ========================================
+-- Statystyki obszarów ([areas] w config.ini, gfs_areas.py)
+-- Wiersz na (obszar, statystyka): mean - średnia ważona powierzchnią, min, max,
+-- sum - suma wartości komórek ważona udziałem ich powierzchni w obszarze
+-- Kolumny parametrów jak w gfs_forecast (zapisywane są tylko kolumny istniejące w tabeli)
+-- ========================================
+CREATE TABLE IF NOT EXISTS gfs_area_forecast (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    area_id VARCHAR(64) NOT NULL COMMENT 'Identyfikator obszaru (id_property z pliku wielokątów, np. kod TERYT)',
+    stat VARCHAR(8) NOT NULL COMMENT 'Statystyka: mean, min, max, sum',
+    forecast_time DATETIME NOT NULL COMMENT 'Czas prognozy',
+    run_time DATETIME NOT NULL COMMENT 'Czas uruchomienia modelu GFS (00, 06, 12, 18 UTC)',
+    created_at DATETIME NOT NULL COMMENT 'Czas dodania rekordu do bazy',
+    interpolated TINYINT(1) NOT NULL DEFAULT 0 COMMENT 'Wiersz interpolowany w czasie ([interpolation], gfs_interpolate.py) - 0 dla godzin z GRIB',
+    
+    t2m DOUBLE COMMENT 'Temperatura na wysokości 2m (°C)',
+    d2m DOUBLE COMMENT 'Punkt rosy na wysokości 2m (°C)',
+    rh DOUBLE COMMENT 'Wilgotność względna na wysokości 2m (%)',
+    u10 DOUBLE COMMENT 'Składowa U wiatru na wysokości 10m (m/s)',
+    v10 DOUBLE COMMENT 'Składowa V wiatru na wysokości 10m (m/s)',
+    gust DOUBLE COMMENT 'Porywy wiatru (m/s)',
+    wind_speed DOUBLE COMMENT 'Prędkość wiatru - liczona na siatce przed agregacją (m/s)',
+    wind_dir DOUBLE COMMENT 'Kierunek wiatru w stopniach (statystyka kąta - tylko orientacyjnie)',
+    u_wind80 DOUBLE COMMENT 'Składowa U wiatru na wysokości 80m (m/s)',
+    v_wind80 DOUBLE COMMENT 'Składowa V wiatru na wysokości 80m (m/s)',
+    mslp DOUBLE COMMENT 'Ciśnienie na poziomie morza (hPa)',
+    tp DOUBLE COMMENT 'Opady całkowite skumulowane od początku prognozy (mm)',
+    tp_1h DOUBLE COMMENT 'Opad w ostatniej godzinie (mm) - tylko dla mean i sum',
+    tp_3h DOUBLE COMMENT 'Opad w ostatnich 3 godzinach (mm) - tylko dla mean i sum',
+    tcc DOUBLE COMMENT 'Zachmurzenie całkowite (0-100%)',
+    cape DOUBLE COMMENT 'CAPE - Convective Available Potential Energy (J/kg)',
+    t_t850 DOUBLE COMMENT 'Temperatura na poziomie 850 hPa (°C)',
+    gh_gh500 DOUBLE COMMENT 'Geopotencjał na poziomie 500 hPa (m)',
+    
+    INDEX idx_area_time (area_id, stat, forecast_time, run_time),
+    INDEX idx_area_run (run_time, forecast_time)
+    
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- ========================================
+-- Profile pionowe ([profiles] w config.ini, gfs_profiles.py)
+-- Wiersz na (punkt, czas, zmienna); profile - wartości wszystkich poziomów jako tablica float32
+-- little-endian (4 bajty na poziom, NaN = brak poziomu w pliku), kolejność poziomów w gfs_profile_levels.
+-- Skew-T dla punktu to jeden odczyt po indeksie:
+--   SELECT variable, profile FROM gfs_profile
+--   WHERE lat = 52.25 AND lon = 21.0 AND run_time = '2025-11-20 12:00:00' AND forecast_time = '2025-11-20 15:00:00';
+-- ========================================
+CREATE TABLE IF NOT EXISTS gfs_profile (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    lat DOUBLE NOT NULL COMMENT 'Szerokość geograficzna',
+    lon DOUBLE NOT NULL COMMENT 'Długość geograficzna',
+    variable VARCHAR(8) NOT NULL COMMENT 'Zmienna (nazwa cfgrib): t (°C), r (%), u, v (m/s), gh (m), ...',
+    forecast_time DATETIME NOT NULL COMMENT 'Czas prognozy',
+    run_time DATETIME NOT NULL COMMENT 'Czas uruchomienia modelu GFS (00, 06, 12, 18 UTC)',
+    profile VARBINARY(1024) NOT NULL COMMENT 'Wartości na poziomach - float32 little-endian',
+    created_at DATETIME NOT NULL COMMENT 'Czas dodania rekordu do bazy',
+    
+    INDEX idx_profile_point (lat, lon, run_time, forecast_time, variable),
+    INDEX idx_profile_run (run_time, forecast_time)
+    
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS gfs_profile_levels (
+    run_time DATETIME NOT NULL PRIMARY KEY COMMENT 'Czas uruchomienia modelu GFS',
+    levels VARCHAR(255) NOT NULL COMMENT 'Poziomy profili w hPa, po przecinku, w kolejności wartości w profile'
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- ========================================
+-- Kwarantanna kontroli jakości ([quality] w config.ini, gfs_quality.py)
+-- Wiersz na nieudaną kontrolę pola godziny prognozy: quarantined - godzina nie została zapisana
+-- (pobierana ponownie), accepted - zapisana mimo błędów po max_attempts próbach
+-- ========================================
+CREATE TABLE IF NOT EXISTS gfs_quality_quarantine (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    run_time DATETIME NOT NULL COMMENT 'Czas uruchomienia modelu GFS',
+    forecast_time DATETIME NOT NULL COMMENT 'Czas prognozy',
+    column_name VARCHAR(64) NOT NULL COMMENT 'Kolumna (pole) z błędem',
+    check_name VARCHAR(16) NOT NULL COMMENT 'Kontrola: nan, fill, range, spike, jump',
+    value DOUBLE COMMENT 'Udział komórek z błędem (0-1)',
+    limit_value DOUBLE COMMENT 'Dopuszczalny udział',
+    attempt INT NOT NULL COMMENT 'Numer próby dla godziny runu',
+    status VARCHAR(16) NOT NULL COMMENT 'quarantined albo accepted',
+    grib_file VARCHAR(255) COMMENT 'Kopia pliku GRIB (quarantine_dir)',
+    created_at DATETIME NOT NULL COMMENT 'Czas kontroli',
+    
+    INDEX idx_quarantine_run (run_time, forecast_time),
+    INDEX idx_quarantine_created (created_at)
     
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
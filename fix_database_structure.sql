@@ -59,6 +59,12 @@ ALTER TABLE gfs_forecast MODIFY COLUMN wind_dir DOUBLE COMMENT 'Kierunek wiatru
 -- Ciśnienie i opady (jeśli istnieją)
 ALTER TABLE gfs_forecast MODIFY COLUMN mslp DOUBLE COMMENT 'Ciśnienie na poziomie morza (hPa)';
 ALTER TABLE gfs_forecast MODIFY COLUMN tp DOUBLE COMMENT 'Opady całkowite skumulowane od początku prognozy (mm) - może być NULL lub 0 dla początkowych godzin';
+ALTER TABLE gfs_forecast ADD COLUMN IF NOT EXISTS region_id VARCHAR(32) NULL COMMENT 'Identyfikator regionu ([region.<nazwa>] region_id) - NULL dla regionu domyślnego' AFTER created_at;
+ALTER TABLE gfs_forecast ADD COLUMN IF NOT EXISTS tp_1h DOUBLE COMMENT 'Opad w ostatniej godzinie (mm) - z deakumulacji tp' AFTER tp;
+ALTER TABLE gfs_forecast ADD COLUMN IF NOT EXISTS tp_3h DOUBLE COMMENT 'Opad w ostatnich 3 godzinach (mm) - z deakumulacji tp' AFTER tp_1h;
+ALTER TABLE gfs_forecast ADD COLUMN IF NOT EXISTS interpolated TINYINT(1) NOT NULL DEFAULT 0 COMMENT 'Wiersz interpolowany w czasie ([interpolation], gfs_interpolate.py) - 0 dla godzin z GRIB' AFTER region_id;
+-- Tabela prognoz dla stacji ([points]) - CREATE TABLE IF NOT EXISTS gfs_point_forecast z create_database_complete.sql
+-- Tabela statystyk obszarów ([areas]) - CREATE TABLE IF NOT EXISTS gfs_area_forecast z create_database_complete.sql
 ALTER TABLE gfs_forecast MODIFY COLUMN prate DOUBLE COMMENT 'Intensywność opadów (kg/m²/s)';
 
 -- Zachmurzenie (jeśli istnieją)
@@ -105,6 +111,25 @@ ALTER TABLE gfs_forecast
     DROP COLUMN IF EXISTS gh500;  -- Używamy gh_gh500
 */
 
+-- Tabela kwarantanny kontroli jakości ([quality], gfs_quality.py)
+CREATE TABLE IF NOT EXISTS gfs_quality_quarantine (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    run_time DATETIME NOT NULL COMMENT 'Czas uruchomienia modelu GFS',
+    forecast_time DATETIME NOT NULL COMMENT 'Czas prognozy',
+    column_name VARCHAR(64) NOT NULL COMMENT 'Kolumna (pole) z błędem',
+    check_name VARCHAR(16) NOT NULL COMMENT 'Kontrola: nan, fill, range, spike, jump',
+    value DOUBLE COMMENT 'Udział komórek z błędem (0-1)',
+    limit_value DOUBLE COMMENT 'Dopuszczalny udział',
+    attempt INT NOT NULL COMMENT 'Numer próby dla godziny runu',
+    status VARCHAR(16) NOT NULL COMMENT 'quarantined albo accepted',
+    grib_file VARCHAR(255) COMMENT 'Kopia pliku GRIB (quarantine_dir)',
+    created_at DATETIME NOT NULL COMMENT 'Czas kontroli',
+    
+    INDEX idx_quarantine_run (run_time, forecast_time),
+    INDEX idx_quarantine_created (created_at)
+    
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 -- Dodaj indeksy (jeśli nie istnieją)
 CREATE INDEX IF NOT EXISTS idx_location_composite ON gfs_forecast(lat, lon);
 CREATE INDEX IF NOT EXISTS idx_location_time ON gfs_forecast(lat, lon, forecast_time, run_time);
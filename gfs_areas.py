@@ -0,0 +1,407 @@
+"""
+GFS Weather Data Downloader - STATYSTYKI DLA OBSZARÓW (WIELOKĄTY)
+Zamiast pobierania wszystkich punktów siatki z gfs_forecast i uśredniania po stronie odbiorcy
+(województwa, powiaty, gminy, zlewnie) statystyki obszarów są liczone przy pobieraniu:
+- udział powierzchni każdej komórki siatki w każdym wielokącie liczony RAZ dla definicji siatki
+  i zapisywany na dysku jako macierz rzadka (obszary x komórki),
+- każda godzina prognozy to kilka iloczynów macierz rzadka x wektor na zmienną (mean, sum)
+  i redukcja po komórkach obszaru (min, max),
+- wynik trafia do tabeli gfs_area_forecast - wiersz na (area_id, stat) z kolumnami zmiennych.
+
+    [areas]
+    # GeoJSON (FeatureCollection z Polygon/MultiPolygon) albo shapefile (.shp, wymaga pyshp)
+    polygons = gminy.geojson
+    # Właściwość (atrybut) z identyfikatorem obszaru
+    id_property = id
+    # Statystyki: mean (średnia ważona powierzchnią), min, max, sum (suma ważona udziałem komórek)
+    statistics = mean, min, max
+    # Podział komórki na supersample x supersample podpunktów przy liczeniu udziału powierzchni
+    supersample = 4
+    cache_dir = temp/area_weights
+    # yes = tylko obszary (bez zapisu siatki regionów)
+    only = no
+
+Wielokąty we współrzędnych geograficznych (°, długość -180..180 lub 0..360). Bez shapely -
+udział komórki to odsetek jej podpunktów wewnątrz wielokąta (reguła parzystości po wszystkich
+pierścieniach, więc dziury i MultiPolygon są obsługiwane). scipy (opcjonalnie) - macierze rzadkie
+CSR; bez scipy iloczyny są liczone przez np.bincount na tych samych trójkach (obszar, komórka, waga).
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+import configparser
+
+import numpy as np
+import pandas as pd
+
+try:
+    from scipy import sparse
+except ImportError:
+    sparse = None
+
+try:
+    import shapefile  # pyshp
+except ImportError:
+    shapefile = None
+
+import gfs_arrow
+import gfs_derived
+import gfs_interpolate
+import gfs_precip
+import gfs_storage
+from gfs_db_schema import ForecastSchema
+
+module_logger = logging.getLogger(__name__)
+
+AREAS_SECTION = 'areas'
+AREA_TABLE = 'gfs_area_forecast'
+AREA_REGION = 'areas'
+AREA_BASE_COLUMNS = ['area_id', 'stat', 'forecast_time', 'run_time', 'created_at']
+STATISTICS = ('mean', 'min', 'max', 'sum')
+DEFAULT_STATISTICS = ('mean', 'min', 'max')
+DEFAULT_SUPERSAMPLE = 4
+DEFAULT_CACHE_DIR = os.path.join('temp', 'area_weights')
+
+# Margines wycinka siatki wokół obszarów (stopnie) - pół oczka siatki 1p00, więc także 0p50 i 0p25: oczka
+# ze środkiem poza obrysem, ale częściowo w obszarze, muszą być w wycinku (jak BOUNDS_MARGIN w gfs_points)
+BOUNDS_MARGIN = 0.5
+
+# Okna opadów (tp_1h, tp_3h) są różnicami sum - poprawne tylko dla statystyk liniowych
+LINEAR_STATISTICS = ('mean', 'sum')
+
+# Limit elementów macierzy (podpunkty x krawędzie) w jednym teście punktów w wielokącie
+PIP_CHUNK = 2_000_000
+
+def _geojson_rings(geometry):
+    """Pierścienie (tablice N x 2: lon, lat) z geometrii GeoJSON Polygon/MultiPolygon"""
+    if not geometry:
+        return []
+    if geometry['type'] == 'Polygon':
+        polygons = [geometry['coordinates']]
+    elif geometry['type'] == 'MultiPolygon':
+        polygons = geometry['coordinates']
+    else:
+        return []
+    return [np.asarray(ring, dtype=np.float64)[:, :2] for polygon in polygons for ring in polygon if len(ring) >= 3]
+
+def _load_geojson(path, id_property):
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    features = data['features'] if data.get('type') == 'FeatureCollection' else [data]
+    for number, feature in enumerate(features):
+        properties = feature.get('properties') or {}
+        area_id = properties.get(id_property, feature.get('id', number))
+        yield str(area_id), _geojson_rings(feature.get('geometry'))
+
+def _load_shapefile(path, id_property):
+    if shapefile is None:
+        raise ImportError("Wczytanie shapefile wymaga pakietu pyshp (pip install pyshp) - albo zapisz wielokąty jako GeoJSON")
+    with shapefile.Reader(path) as reader:
+        fields = [field[0] for field in reader.fields[1:]]
+        for number, record in enumerate(reader.iterShapeRecords()):
+            attributes = dict(zip(fields, record.record))
+            points = np.asarray(record.shape.points, dtype=np.float64)
+            parts = list(record.shape.parts) + [len(points)]
+            rings = [points[a:b] for a, b in zip(parts[:-1], parts[1:]) if b - a >= 3]
+            yield str(attributes.get(id_property, number)), rings
+
+def load_polygons(path, id_property='id'):
+    """Wielokąty z GeoJSON lub shapefile: lista (area_id, [pierścienie]); obszary bez geometrii są pomijane"""
+    loader = _load_shapefile if path.lower().endswith('.shp') else _load_geojson
+    polygons = []
+    for area_id, rings in loader(path, id_property):
+        if rings:
+            polygons.append((area_id, rings))
+        else:
+            module_logger.warning(f"{path}: obszar {area_id} bez geometrii Polygon/MultiPolygon - pominięty")
+    return polygons
+
+def _points_in_rings(px, py, rings):
+    """Maska punktów wewnątrz wielokąta (reguła parzystości po wszystkich pierścieniach)"""
+    inside = np.zeros(px.size, dtype=bool)
+    for ring in rings:
+        x0, y0 = ring[:, 0], ring[:, 1]
+        x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+        step = max(1, PIP_CHUNK // max(len(ring), 1))
+        for start in range(0, px.size, step):
+            x = px[start:start + step, None]
+            y = py[start:start + step, None]
+            crosses = (y0 > y) != (y1 > y)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                x_cross = (x1 - x0) * (y - y0) / (y1 - y0) + x0
+            inside[start:start + step] ^= (np.count_nonzero(crosses & (x < x_cross), axis=1) % 2).astype(bool)
+    return inside
+
+def _polygon_lon(longitudes):
+    """Długości siatki w konwencji -180..180 (jak wielokąty)"""
+    return (np.asarray(longitudes, dtype=np.float64) + 180.0) % 360.0 - 180.0
+
+def build_overlap(latitudes, longitudes, polygons, supersample=DEFAULT_SUPERSAMPLE):
+    """
+    Udział powierzchni komórek regularnej siatki w wielokątach - trójki (obszar, komórka, udział)
+    posortowane po obszarze. Komórka = otoczenie punktu siatki (± pół kroku).
+    """
+    dlat = abs(float(latitudes[1] - latitudes[0])) if latitudes.size > 1 else 0.25
+    dlon = abs(float(longitudes[1] - longitudes[0])) if longitudes.size > 1 else 0.25
+    grid_lon = _polygon_lon(longitudes)
+    offsets = (np.arange(supersample) + 0.5) / supersample - 0.5
+    n_lon = longitudes.size
+
+    rows, cells, fractions = [], [], []
+    for area, (_, rings) in enumerate(polygons):
+        if any(ring[:, 0].max() > 180 for ring in rings):
+            rings = [np.column_stack((_polygon_lon(ring[:, 0]), ring[:, 1])) for ring in rings]
+        lon_min = min(ring[:, 0].min() for ring in rings)
+        lon_max = max(ring[:, 0].max() for ring in rings)
+        lat_min = min(ring[:, 1].min() for ring in rings)
+        lat_max = max(ring[:, 1].max() for ring in rings)
+        lat_idx = np.nonzero((latitudes >= lat_min - dlat / 2) & (latitudes <= lat_max + dlat / 2))[0]
+        lon_idx = np.nonzero((grid_lon >= lon_min - dlon / 2) & (grid_lon <= lon_max + dlon / 2))[0]
+        if lat_idx.size == 0 or lon_idx.size == 0:
+            continue
+        # Podpunkty komórek z prostokąta otaczającego wielokąt: (komórki, supersample²)
+        sub_lat = latitudes[lat_idx][:, None] + offsets[None, :] * dlat
+        sub_lon = grid_lon[lon_idx][:, None] + offsets[None, :] * dlon
+        py = np.broadcast_to(sub_lat[:, None, :, None], (lat_idx.size, lon_idx.size, supersample, supersample))
+        px = np.broadcast_to(sub_lon[None, :, None, :], (lat_idx.size, lon_idx.size, supersample, supersample))
+        inside = _points_in_rings(px.ravel(), py.ravel(), rings)
+        fraction = inside.reshape(lat_idx.size * lon_idx.size, -1).mean(axis=1)
+        hit = np.nonzero(fraction > 0)[0]
+        if hit.size == 0:
+            continue
+        cell = (lat_idx[:, None] * n_lon + lon_idx[None, :]).ravel()[hit]
+        rows.append(np.full(hit.size, area, dtype=np.int32))
+        cells.append(cell.astype(np.int64))
+        fractions.append(fraction[hit])
+
+    if not rows:
+        return np.zeros(0, np.int32), np.zeros(0, np.int64), np.zeros(0, np.float64)
+    return np.concatenate(rows), np.concatenate(cells), np.concatenate(fractions)
+
+class AreaWeights:
+    """Macierz udziałów obszary x komórki siatki z iloczynami dla statystyk"""
+
+    def __init__(self, rows, cells, fractions, areas, latitudes, longitudes):
+        self.rows = rows
+        self.cells = cells
+        self.fractions = fractions
+        self.areas = areas
+        points = latitudes.size * longitudes.size
+        # Waga powierzchni komórki ~ cos(szerokości) - średnia ważona powierzchnią, nie liczbą komórek
+        cell_area = np.cos(np.radians(np.repeat(latitudes, longitudes.size)))[cells]
+        self.area_weights = fractions * cell_area
+        counts = np.bincount(rows, minlength=areas)
+        self.covered = counts > 0
+        self.starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[self.covered]
+        self.totals = {
+            'area': np.bincount(rows, weights=self.area_weights, minlength=areas),
+            'fraction': np.bincount(rows, weights=fractions, minlength=areas),
+        }
+        self._matrices = None
+        if sparse is not None:
+            shape = (areas, points)
+            self._matrices = {
+                'area': sparse.csr_matrix((self.area_weights, (rows, cells)), shape=shape),
+                'fraction': sparse.csr_matrix((fractions, (rows, cells)), shape=shape),
+            }
+
+    def _product(self, kind, vector, cell_values):
+        """Iloczyn macierzy udziałów (area/fraction) przez wektor siatki"""
+        if self._matrices is not None:
+            return self._matrices[kind] @ vector
+        weights = self.area_weights if kind == 'area' else self.fractions
+        return np.bincount(self.rows, weights=weights * cell_values, minlength=self.areas)
+
+    def statistics(self, values, statistics):
+        """{stat: wektor obszarów} dla pola 2D siatki; komórki NaN są pomijane"""
+        vector = np.asarray(values, dtype=np.float64).reshape(-1)
+        finite = np.isfinite(vector)
+        all_valid = finite.all()
+        if not all_valid:
+            vector = np.where(finite, vector, 0.0)
+        cell_values = vector[self.cells]
+        valid = finite[self.cells]
+        result = {}
+        for stat, kind in (('mean', 'area'), ('sum', 'fraction')):
+            if stat not in statistics:
+                continue
+            total = self._product(kind, vector, cell_values)
+            if all_valid:
+                weight = self.totals[kind]
+            else:
+                weight = self._product(kind, finite.astype(np.float64), valid.astype(np.float64))
+            with np.errstate(invalid='ignore', divide='ignore'):
+                result[stat] = np.where(weight > 0, total / weight if stat == 'mean' else total, np.nan)
+        for stat, reduce in (('min', np.fmin), ('max', np.fmax)):
+            if stat in statistics:
+                reduced = np.full(self.areas, np.nan)
+                if self.starts.size:
+                    reduced[self.covered] = reduce.reduceat(np.where(valid, cell_values, np.nan), self.starts)
+                result[stat] = reduced
+        return result
+
+class AreaSet:
+    """
+    Zestaw obszarów zapisywany do gfs_area_forecast - cel zapisu obok regionów (gfs_regions),
+    z tym samym interfejsem (bounds, table, schema, derived, accumulator).
+    """
+
+    def __init__(self, polygons, source, statistics=DEFAULT_STATISTICS, supersample=DEFAULT_SUPERSAMPLE,
+                 cache_dir=DEFAULT_CACHE_DIR, table=AREA_TABLE, only=False):
+        unknown = [s for s in statistics if s not in STATISTICS]
+        if unknown:
+            raise ValueError(f"Nieznane statystyki {unknown} (dostępne: {', '.join(STATISTICS)})")
+        self.name = AREA_REGION
+        self.polygons = polygons
+        self.ids = np.array([area_id for area_id, _ in polygons], dtype=object)
+        self.source = source
+        self.statistics = list(statistics)
+        self.supersample = int(supersample)
+        self.cache_dir = cache_dir
+        self.table = table
+        self.region_id = None
+        self.only = only
+        self.derived = None
+        self.schema = None
+        self.accumulator = None
+        self.interpolator = None
+        self._weights = {}
+        self._lock = threading.Lock()
+
+    @property
+    def bounds(self):
+        lons = np.concatenate([ring[:, 0] for _, rings in self.polygons for ring in rings])
+        lats = np.concatenate([ring[:, 1] for _, rings in self.polygons for ring in rings])
+        lons = np.where(lons < 0, lons + 360, lons)
+        return (float(lats.min()) - BOUNDS_MARGIN, float(lats.max()) + BOUNDS_MARGIN,
+                float(lons.min()) - BOUNDS_MARGIN, float(lons.max()) + BOUNDS_MARGIN)
+
+    def __len__(self):
+        return len(self.polygons)
+
+    def prepare(self, params_config, engine=None, config_file='config.ini'):
+        """Pola pochodne ([derived_fields] i [derived_fields.areas]) i schemat tabeli obszarów"""
+        self.derived = gfs_derived.load_derived_fields(config_file, params_config, region=AREA_REGION)
+        derived_columns = self.derived.outputs + gfs_precip.output_columns(params_config) + gfs_interpolate.output_columns(config_file)
+        storage = gfs_storage.load_storage(config_file, params_config)
+        writer = gfs_arrow.load_batch_writer(config_file)
+        if engine is not None:
+            self.schema = ForecastSchema.from_database(engine, params_config, self.table, derived_columns, AREA_BASE_COLUMNS, storage, writer)
+        else:
+            self.schema = ForecastSchema(params_config, table=self.table, derived_columns=derived_columns, base_columns=AREA_BASE_COLUMNS,
+                                         storage=storage, writer=writer)
+        return self
+
+    def create_accumulator(self, run_time, params_config, forecast_hours):
+        """Opady w oknach dla wierszy (stat, obszar) - okna tylko dla statystyk liniowych (mean, sum)"""
+        self.accumulator = gfs_precip.create_accumulator(run_time, params_config, forecast_hours,
+                                                         gfs_precip.target_state_dir(AREA_REGION))
+        return self.accumulator
+
+    def _cache_path(self, latitudes, longitudes):
+        stat = os.stat(self.source)
+        key = json.dumps([
+            os.path.abspath(self.source), stat.st_size, stat.st_mtime_ns, self.supersample, len(self.polygons),
+            latitudes.size, float(latitudes[0]), float(latitudes[-1]),
+            longitudes.size, float(longitudes[0]), float(longitudes[-1]),
+        ])
+        return os.path.join(self.cache_dir, f"area_weights_{hashlib.sha1(key.encode()).hexdigest()[:16]}.npz")
+
+    def _load_or_build(self, latitudes, longitudes):
+        path = self._cache_path(latitudes, longitudes)
+        if os.path.exists(path):
+            try:
+                with np.load(path) as cached:
+                    return cached['rows'], cached['cells'], cached['fractions']
+            except (OSError, ValueError, KeyError) as e:
+                module_logger.warning(f"Uszkodzony cache wag obszarów {path} ({e}) - liczę ponownie")
+        rows, cells, fractions = build_overlap(latitudes, longitudes, self.polygons, self.supersample)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+        np.savez(temp_path, rows=rows, cells=cells, fractions=fractions)
+        os.replace(temp_path, path)  # atomowo - inne procesy/wątki czytają gotowy plik
+        module_logger.info(f"Wagi obszarów: {len(self)} obszarów, {rows.size} par obszar-komórka -> {path}")
+        return rows, cells, fractions
+
+    def weights(self, latitudes, longitudes):
+        """Wagi dla definicji siatki (pamięć procesu, a między uruchomieniami - plik w cache_dir)"""
+        key = (latitudes.size, float(latitudes[0]), float(latitudes[-1]),
+               longitudes.size, float(longitudes[0]), float(longitudes[-1]))
+        cached = self._weights.get(key)
+        if cached is None:
+            with self._lock:
+                cached = self._weights.get(key)
+                if cached is None:
+                    rows, cells, fractions = self._load_or_build(latitudes, longitudes)
+                    cached = AreaWeights(rows, cells, fractions, len(self), latitudes, longitudes)
+                    missing = self.ids[~cached.covered]
+                    if missing.size:
+                        module_logger.warning(f"Obszary poza siatką ({missing.size}) - pominięte: {', '.join(map(str, missing[:10]))}")
+                    self._weights[key] = cached
+        return cached
+
+    def aggregate(self, grid):
+        """
+        Statystyki obszarów ze wszystkich kolumn siatki (wynik _grid_arrays, po polach pochodnych).
+        Zwraca ({kolumna: wektor wierszy (stat, obszar)}, maska wierszy z danymi).
+        Wiersz k * len(self) + i = statystyka self.statistics[k] obszaru i.
+        """
+        weights = self.weights(grid['latitudes'], grid['longitudes'])
+        columns = {}
+        for column, values in grid['columns'].items():
+            stats = weights.statistics(values, self.statistics)
+            columns[column] = np.concatenate([stats[stat] for stat in self.statistics])
+        return columns, np.tile(weights.covered, len(self.statistics))
+
+    def accumulation(self, values):
+        """Wektor akumulacji opadów dla wierszy (stat, obszar) - NaN dla statystyk nieliniowych (min, max)"""
+        linear = np.repeat([stat in LINEAR_STATISTICS for stat in self.statistics], len(self))
+        return np.where(linear, values, np.nan)
+
+    def frame(self, columns, covered):
+        """DataFrame wierszy (stat, obszar) - indeks = pozycja wiersza (jak punkty siatki dla akumulatora opadów)"""
+        df = pd.DataFrame(columns)
+        df.insert(0, 'area_id', np.tile(self.ids, len(self.statistics)))
+        df.insert(1, 'stat', np.repeat(self.statistics, len(self)))
+        return df[covered]
+
+    def label(self, fh_str, regions_count=1):
+        return fh_str if regions_count <= 1 else f"{fh_str} {self.name}"
+
+    def describe(self):
+        return f"{self.name}: {len(self)} obszarów ({', '.join(self.statistics)}) -> {self.table}"
+
+    def __repr__(self):
+        return f"AreaSet({self.describe()})"
+
+def load_area_set(config_file='config.ini'):
+    """Zestaw obszarów z sekcji [areas]; None gdy sekcji nie ma lub nie ma poprawnych wielokątów"""
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    if AREAS_SECTION not in config:
+        return None
+    section = config[AREAS_SECTION]
+    path = section.get('polygons', '').strip()
+    if not path or not os.path.exists(path):
+        module_logger.warning(f"[areas] polygons: brak pliku wielokątów '{path}' - statystyki obszarów wyłączone")
+        return None
+    try:
+        polygons = load_polygons(path, section.get('id_property', 'id').strip())
+    except (ImportError, OSError, ValueError, KeyError) as e:
+        module_logger.warning(f"[areas] {path}: nie udało się wczytać wielokątów ({e}) - statystyki obszarów wyłączone")
+        return None
+    if not polygons:
+        module_logger.warning(f"[areas] {path}: brak wielokątów - statystyki obszarów wyłączone")
+        return None
+    statistics = [s.strip().lower() for s in section.get('statistics', ', '.join(DEFAULT_STATISTICS)).split(',') if s.strip()]
+    return AreaSet(
+        polygons, path,
+        statistics=statistics,
+        supersample=section.getint('supersample', fallback=DEFAULT_SUPERSAMPLE),
+        cache_dir=section.get('cache_dir', DEFAULT_CACHE_DIR).strip() or DEFAULT_CACHE_DIR,
+        table=section.get('table', AREA_TABLE).strip() or AREA_TABLE,
+        only=section.getboolean('only', fallback=False),
+    )
@@ -0,0 +1,195 @@
+"""
+GFS Weather Data Downloader - ZAPIS PARTII PRZEZ ARROW
+Partia prognoz (DataFrame po ForecastSchema.project) jest zamieniana na pyarrow.RecordBatch bez
+kopiowania kolumn (kolumny macierzy z assemble_wide_frame są ciągłe w pamięci) i z tej jednej
+partii korzystają wszystkie ujścia:
+- szybki zapis do MySQL: LOAD DATA LOCAL INFILE z pliku CSV zapisanego przez pyarrow (tmpfs),
+  zamiast INSERT ... VALUES po 1000 wierszy z to_sql (obiekty Pythona dla każdej wartości),
+- kopia zapasowa partii: Parquet albo CSV w katalogu kopii ([csv_backup] csv_backup_dir).
+Regiony, punkty i obszary zapisują przez ten sam BatchWriter (ForecastSchema.writer).
+
+    [arrow]
+    bulk_load = yes          # LOAD DATA LOCAL INFILE (wymaga local_infile=ON na serwerze MySQL)
+    backup = parquet         # none | csv | parquet
+    # backup_dir = temp/csv_backup
+
+pyarrow jest opcjonalny: bez niego zapis przez to_sql, a kopia CSV przez pandas (Parquet pominięty).
+"""
+
+import os
+import threading
+import tempfile
+import logging
+import configparser
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pa_parquet
+except ImportError:
+    pa = None
+    pa_csv = None
+    pa_parquet = None
+
+module_logger = logging.getLogger(__name__)
+
+ARROW_SECTION = 'arrow'
+BACKUP_FORMATS = ('none', 'csv', 'parquet')
+DEFAULT_BACKUP_DIR = 'temp/csv_backup'
+# Plik dla LOAD DATA żyje tylko na czas zapytania - w pamięci (tmpfs), gdy jest dostępna
+DEFAULT_SPOOL_DIR = '/dev/shm' if os.name == 'posix' and os.path.isdir('/dev/shm') else None
+
+def is_available():
+    """Czy pyarrow jest zainstalowany"""
+    return pa is not None
+
+def record_batch(df):
+    """
+    RecordBatch z DataFrame bez indeksu. Kolumny liczbowe bez kopii (bufor tablicy numpy),
+    czasy jako timestamp[s] - DATETIME w bazie nie przechowuje ułamków sekund.
+    """
+    batch = pa.RecordBatch.from_pandas(df, preserve_index=False)
+    columns = []
+    for column in batch.columns:
+        if pa.types.is_timestamp(column.type) and column.type.unit != 's':
+            column = column.cast(pa.timestamp('s', column.type.tz), safe=False)
+        columns.append(column)
+    return pa.RecordBatch.from_arrays(columns, names=batch.schema.names)
+
+def _quote_identifier(name):
+    return '`' + str(name).replace('`', '``') + '`'
+
+def _quote_path(path):
+    return "'" + path.replace('\\', '\\\\').replace("'", "\\'") + "'"
+
+def load_data_statement(path, table, columns):
+    """
+    LOAD DATA dla pliku CSV bez nagłówka z pyarrow: puste pole to brak wartości (NULL),
+    teksty w cudzysłowach.
+    """
+    variables = [f"@c{i}" for i in range(len(columns))]
+    assignments = ', '.join(f"{_quote_identifier(c)} = NULLIF({v}, '')" for c, v in zip(columns, variables))
+    return (f"LOAD DATA LOCAL INFILE {_quote_path(path)} INTO TABLE {_quote_identifier(table)} "
+            f"CHARACTER SET utf8mb4 FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' "
+            f"LINES TERMINATED BY '\\n' ({', '.join(variables)}) SET {assignments}")
+
+class BatchWriter:
+    """Ujścia partii prognoz: LOAD DATA do MySQL i kopia zapasowa (Parquet/CSV) z jednego RecordBatch"""
+
+    def __init__(self, bulk_load=False, backup='none', backup_dir=DEFAULT_BACKUP_DIR, spool_dir=DEFAULT_SPOOL_DIR):
+        if backup not in BACKUP_FORMATS:
+            raise ValueError(f"Nieznany format kopii '{backup}' (dostępne: {', '.join(BACKUP_FORMATS)})")
+        if pa is None and bulk_load:
+            module_logger.warning("⚠ [arrow] bulk_load wymaga pakietu pyarrow (pip install pyarrow) - zapis przez to_sql")
+            bulk_load = False
+        if pa is None and backup == 'parquet':
+            module_logger.warning("⚠ [arrow] kopia Parquet wymaga pakietu pyarrow (pip install pyarrow) - kopia jako CSV")
+            backup = 'csv'
+        self.bulk_load = bulk_load
+        self.backup = backup
+        self.backup_dir = backup_dir
+        self.spool_dir = spool_dir
+        self.bulk_rows = 0
+        self.backup_files = 0
+        # Numer partii w godzinie (regiony zapisywane pasami) - nazwy kopii się nie powtarzają
+        self._parts = {}
+        self._lock = threading.Lock()
+
+    def write(self, df, engine, table, fh_str='?'):
+        """
+        Kopia zapasowa partii i zapis do bazy przez LOAD DATA.
+        Zwraca liczbę wierszy zapisanych przez LOAD DATA albo None - wtedy zapis należy do wywołującego (to_sql).
+        Błąd LOAD DATA (np. local_infile wyłączone na serwerze) wyłącza go z jednym ostrzeżeniem.
+        """
+        batch = record_batch(df) if pa is not None and len(df) else None
+        if self.backup != 'none' and len(df):
+            self._write_backup(df, batch, table, fh_str)
+        if not self.bulk_load or batch is None or engine is None or engine.dialect.name != 'mysql':
+            return None
+        try:
+            return self._load_data(batch, engine, table)
+        except Exception as e:
+            self.bulk_load = False
+            module_logger.warning(f"LOAD DATA do {table} nieudane ({e}) - dalszy zapis przez to_sql")
+            return None
+
+    def _load_data(self, batch, engine, table):
+        handle, path = tempfile.mkstemp(prefix='gfs_load_', suffix='.csv', dir=self.spool_dir)
+        os.close(handle)
+        try:
+            pa_csv.write_csv(batch, path, pa_csv.WriteOptions(include_header=False))
+            with engine.begin() as conn:
+                result = conn.exec_driver_sql(load_data_statement(path, table, batch.schema.names))
+                rows = result.rowcount
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        with self._lock:
+            self.bulk_rows += rows
+        return rows
+
+    def backup_path(self, df, table, fh_str):
+        """Ścieżka kopii: gfs_YYYYMMDD_HH_fXXX_<tabela>_<nr>.<format> (run z kolumny run_time)"""
+        run = 'unknown_00'
+        if 'run_time' in df.columns and len(df):
+            run = df['run_time'].iloc[0].strftime('%Y%m%d_%H')
+        key = (run, fh_str, table)
+        with self._lock:
+            part = self._parts.get(key, 0)
+            self._parts[key] = part + 1
+        return os.path.join(self.backup_dir, f"gfs_{run}_{fh_str}_{table}_{part}.{self.backup}")
+
+    def _write_backup(self, df, batch, table, fh_str):
+        """Błąd kopii nie przerywa zapisu do bazy"""
+        try:
+            os.makedirs(self.backup_dir, exist_ok=True)
+            path = self.backup_path(df, table, fh_str)
+            if self.backup == 'parquet':
+                pa_parquet.write_table(pa.Table.from_batches([batch]), path)
+            elif batch is not None:
+                pa_csv.write_csv(batch, path)
+            else:
+                df.to_csv(path, index=False)
+        except Exception as e:
+            module_logger.warning(f"[{fh_str}] Kopia partii {table} nieudana: {e}")
+            return
+        with self._lock:
+            self.backup_files += 1
+
+    def __repr__(self):
+        return f"BatchWriter(bulk_load={self.bulk_load}, backup={self.backup}, backup_dir={self.backup_dir})"
+
+def _read_section(config_file):
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    section = config[ARROW_SECTION] if ARROW_SECTION in config else {}
+    return config, section
+
+def _bulk_load_enabled(section):
+    return str(section.get('bulk_load', 'no')).strip().lower() in ('yes', 'true', '1', 'on')
+
+def load_batch_writer(config_file='config.ini'):
+    """
+    BatchWriter z [arrow]; None, gdy ani LOAD DATA, ani kopia nie są włączone (zapis przez to_sql jak dotychczas).
+    Katalog kopii domyślnie z [csv_backup] csv_backup_dir.
+    """
+    config, section = _read_section(config_file)
+    bulk_load = _bulk_load_enabled(section)
+    backup = str(section.get('backup', 'none')).strip().lower() or 'none'
+    if not bulk_load and backup == 'none':
+        return None
+    backup_dir = section.get('backup_dir') or config.get('csv_backup', 'csv_backup_dir', fallback=DEFAULT_BACKUP_DIR)
+    try:
+        return BatchWriter(bulk_load, backup, backup_dir.strip())
+    except ValueError as e:
+        module_logger.warning(f"[{ARROW_SECTION}] {e} - bez kopii")
+        return BatchWriter(bulk_load, 'none', backup_dir.strip()) if bulk_load else None
+
+def engine_options(config_file='config.ini'):
+    """Argumenty create_engine dla LOAD DATA LOCAL INFILE (pymysql wymaga local_infile po stronie klienta)"""
+    _, section = _read_section(config_file)
+    if _bulk_load_enabled(section) and pa is not None:
+        return {'connect_args': {'local_infile': True}}
+    return {}
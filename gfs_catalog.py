@@ -0,0 +1,228 @@
+"""
+GFS Weather Data Downloader - KATALOG PARAMETRÓW
+Jedna tabela opisuje parametr GRIB: nazwa cfgrib (shortName/cfVarName), zmienna NOMADS, stepType
+i jednostki GRIB; konfiguracja ([gfs_parameters], [derived_inputs], [profiles]) dokłada kolumnę
+bazy, typ i wartość poziomu oraz transformację. Dodanie parametru to zmiana danych - wpis
+w PARAMETER_TABLE albo w sekcji [parameter_catalog]:
+
+    [parameter_catalog]
+    # nazwa = nazwa cfgrib, zmienna NOMADS[, stepType[, jednostki]]
+    hpbl = hpbl, HPBL, instant, m
+    sde = sde, SNOD
+
+    [gfs_parameters]
+    hpbl = hpbl, surface, 0, none
+
+Katalog jest wczytywany raz i zapamiętywany do zmiany pliku konfiguracji (mtime) - wraz z nim
+artefakty runu: plan pobierania (URL Filter API, zapytania Range) i tablica routingu dekodera.
+"""
+
+import os
+import threading
+import logging
+import configparser
+
+import gfs_grib_decode
+import gfs_profiles
+
+module_logger = logging.getLogger(__name__)
+
+CATALOG_SECTION = 'parameter_catalog'
+
+# nazwa w konfiguracji -> (nazwa cfgrib, zmienna NOMADS, stepType, jednostki GRIB)
+# stepType None = dowolny (przy kilku wiadomościach: instant > akumulacja od początku prognozy)
+PARAMETER_TABLE = {
+    't2m': ('t2m', 'TMP', None, 'K'),
+    'd2m': ('d2m', 'DPT', None, 'K'),
+    'r2': ('r2', 'RH', None, '%'),
+    'u10': ('u10', 'UGRD', None, 'm s**-1'),
+    'v10': ('v10', 'VGRD', None, 'm s**-1'),
+    'u80': ('u', 'UGRD', None, 'm s**-1'),
+    'v80': ('v', 'VGRD', None, 'm s**-1'),
+    't80': ('t', 'TMP', None, 'K'),
+    'gust': ('gust', 'GUST', None, 'm s**-1'),
+    'prmsl': ('prmsl', 'PRMSL', None, 'Pa'),
+    'tp': ('tp', 'APCP', 'accum', 'kg m**-2'),
+    'prate': ('prate', 'PRATE', None, 'kg m**-2 s**-1'),
+    'tcc': ('tcc', 'TCDC', None, '%'),
+    'lcc': ('lcc', 'LCDC', None, '%'),
+    'mcc': ('mcc', 'MCDC', None, '%'),
+    'hcc': ('hcc', 'HCDC', None, '%'),
+    'vis': ('vis', 'VIS', None, 'm'),
+    'dswrf': ('dswrf', 'DSWRF', None, 'W m**-2'),
+    'cape': ('cape', 'CAPE', None, 'J kg**-1'),
+    'cin': ('cin', 'CIN', None, 'J kg**-1'),
+    'pwat': ('pwat', 'PWAT', None, 'kg m**-2'),
+    't_850': ('t', 'TMP', None, 'K'),
+    'gh_850': ('gh', 'HGT', None, 'gpm'),
+    'gh_500': ('gh', 'HGT', None, 'gpm'),
+}
+
+# Typ poziomu -> klucz poziomu NOMADS ({level} - wartość poziomu)
+NOMADS_LEVELS = {
+    'isobaricInhPa': 'lev_{level}_mb',
+    'heightAboveGround': 'lev_{level}_m_above_ground',
+    'surface': 'lev_surface',
+    'meanSea': 'lev_mean_sea_level',
+    'entireAtmosphere': 'lev_entire_atmosphere',
+}
+LEVELLED_TYPES = ('isobaricInhPa', 'heightAboveGround')
+
+# Wczytane katalogi: ścieżka pliku -> ParameterCatalog (ważny do zmiany mtime/rozmiaru pliku)
+_CATALOGS = {}
+_CATALOGS_LOCK = threading.Lock()
+
+def _file_stamp(config_file):
+    try:
+        stat = os.stat(config_file)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def _read_table(config):
+    """PARAMETER_TABLE uzupełniona (lub nadpisana) wpisami z [parameter_catalog]"""
+    table = dict(PARAMETER_TABLE)
+    if CATALOG_SECTION not in config:
+        return table
+    for name, value in config[CATALOG_SECTION].items():
+        parts = [p.strip() for p in value.split(',')]
+        if len(parts) < 2 or not parts[0] or not parts[1]:
+            module_logger.warning(f"[{CATALOG_SECTION}] {name}: oczekiwano 'nazwa cfgrib, zmienna NOMADS[, stepType[, jednostki]]' - pominięty")
+            continue
+        parts += [''] * (4 - len(parts))
+        table[name] = (parts[0], parts[1].upper(), parts[2] or None, parts[3] or None)
+    return table
+
+def catalog_key(cfgrib_name, level_type, level_value):
+    """Klucz cfgrib_to_config: (nazwa cfgrib, typ poziomu, poziom) - poziom 0 dla typów bez wartości"""
+    if level_type in LEVELLED_TYPES and isinstance(level_value, int):
+        return (cfgrib_name, level_type, level_value)
+    return (cfgrib_name, level_type, 0)
+
+def nomads_level(level_type, level_value):
+    """Klucz poziomu w Filter API NOMADS lub None dla nieobsługiwanych typów poziomów"""
+    template = NOMADS_LEVELS.get(level_type)
+    if template is None or (level_type in LEVELLED_TYPES and not isinstance(level_value, int)):
+        return None
+    return template.format(level=level_value)
+
+def parse_parameters(config, table=None):
+    """
+    Parametry z [gfs_parameters] i [derived_inputs] (stored=False) oraz poziomy profili [profiles]:
+    (params, cfgrib_to_config) - params: config_name -> {db_column, level_type, level_value,
+    transformation, stored, precision, cfgrib_name, nomads, step_type, units}.
+    """
+    table = table if table is not None else _read_table(config)
+    params = {}
+    cfgrib_to_config = {}
+    unmapped = []
+    for section, stored in (('gfs_parameters', True), ('derived_inputs', False)):
+        if section not in config:
+            continue
+        for config_name, value in config[section].items():
+            if config_name in params:
+                continue  # Parametr z [gfs_parameters] ma pierwszeństwo
+            parts = [p.strip() for p in value.split(',')]
+            if not 4 <= len(parts) <= 6:
+                module_logger.warning(f"[{section}] {config_name}: oczekiwano 4-6 pól, jest {len(parts)} - pominięty")
+                continue
+            db_column, level_type, level_value, transformation = parts[:4]
+            precision = None
+            if len(parts) > 4:
+                precision = (float(parts[4]), float(parts[5]) if len(parts) > 5 else 0.0)
+            level_value = int(level_value) if level_value.isdigit() else level_value
+            # Parametr spoza katalogu: nazwa z konfiguracji jako nazwa cfgrib i zmienna NOMADS
+            entry = table.get(config_name)
+            if entry is None:
+                unmapped.append(config_name)
+                entry = (config_name, config_name.upper(), None, None)
+            cfgrib_name, nomads, step_type, units = entry
+            params[config_name] = {
+                'db_column': db_column,
+                'level_type': level_type,
+                'level_value': level_value,
+                'transformation': transformation,
+                'stored': stored,
+                'precision': precision,
+                'cfgrib_name': cfgrib_name,
+                'nomads': nomads,
+                'step_type': step_type,
+                'units': units,
+            }
+            cfgrib_to_config[catalog_key(cfgrib_name, level_type, level_value)] = config_name
+    if unmapped:
+        module_logger.warning(f"Parametry spoza katalogu (nazwa cfgrib = nazwa z konfiguracji): {', '.join(unmapped)}")
+
+    # Profile pionowe [profiles] - poziomy, których nie ma w sekcjach powyżej (te są brane z ich kolumn)
+    for key, config_name, info in gfs_profiles.profile_parameters(config):
+        if key not in cfgrib_to_config:
+            params[config_name] = {'step_type': None, 'units': None, **info}
+            cfgrib_to_config[key] = config_name
+    return params, cfgrib_to_config
+
+def build_download_plan(params):
+    """Plan pobierania: zbiór par (zmienna NOMADS, klucz poziomu NOMADS), np. ('TMP', 'lev_2_m_above_ground')"""
+    plan = set()
+    for config_name, info in params.items():
+        level_key = nomads_level(info['level_type'], info['level_value'])
+        if level_key is None:
+            continue  # Pomiń nieznane typy poziomów
+        plan.add((info.get('nomads') or PARAMETER_TABLE.get(config_name, (None, config_name.upper()))[1], level_key))
+    return plan
+
+class ParameterCatalog:
+    """Parametry z konfiguracji i artefakty wyliczane raz na wczytanie: plan pobierania i routing dekodera"""
+
+    def __init__(self, config_file, params, cfgrib_to_config, stamp=None):
+        self.config_file = config_file
+        self.params = params
+        self.cfgrib_to_config = cfgrib_to_config
+        self.stamp = stamp
+        self.download_plan = frozenset(build_download_plan(params))
+        self.routing = gfs_grib_decode.build_routing_table(params, cfgrib_to_config)
+
+    def describe(self):
+        stored = sum(1 for info in self.params.values() if info['stored'])
+        return (f"{len(self.params)} parametrów ({stored} zapisywanych), {len(self.cfgrib_to_config)} kluczy cfgrib, "
+                f"{len(self.download_plan)} par zmienna/poziom NOMADS")
+
+    def __repr__(self):
+        return f"ParameterCatalog({self.config_file}: {self.describe()})"
+
+def load_parameter_catalog(config_file='config.ini'):
+    """
+    Katalog parametrów dla pliku konfiguracji - wczytany raz i zwracany z pamięci, dopóki plik
+    się nie zmieni (mtime i rozmiar). Zwracane słowniki są współdzielone - tylko do odczytu.
+    """
+    path = os.path.abspath(config_file)
+    stamp = _file_stamp(path)
+    catalog = _CATALOGS.get(path)
+    if catalog is not None and catalog.stamp == stamp:
+        return catalog
+    config = configparser.ConfigParser()
+    config.read(path, encoding='utf-8')
+    params, cfgrib_to_config = parse_parameters(config)
+    catalog = ParameterCatalog(config_file, params, cfgrib_to_config, stamp)
+    with _CATALOGS_LOCK:
+        _CATALOGS[path] = catalog
+    module_logger.info(f"Katalog parametrów {config_file}: {catalog.describe()}")
+    for key, config_name in cfgrib_to_config.items():
+        module_logger.debug(f"  {key} -> {config_name} (db_column={params[config_name]['db_column']})")
+    return catalog
+
+def routing_table(params_config, cfgrib_to_config):
+    """Tablica routingu dekodera - z wczytanego katalogu, gdy to jego parametry (bez przeliczania na godzinę)"""
+    for catalog in list(_CATALOGS.values()):
+        if catalog.params is params_config and catalog.cfgrib_to_config is cfgrib_to_config:
+            return catalog.routing
+    return gfs_grib_decode.build_routing_table(params_config, cfgrib_to_config)
+
+def download_plan(params_config=None, config_file='config.ini'):
+    """Plan pobierania - z katalogu (params_config None albo parametry katalogu) lub wyliczony dla podanych parametrów"""
+    catalog = load_parameter_catalog(config_file) if params_config is None else None
+    if catalog is not None:
+        return catalog.download_plan
+    for catalog in list(_CATALOGS.values()):
+        if catalog.params is params_config:
+            return catalog.download_plan
+    return frozenset(build_download_plan(params_config))
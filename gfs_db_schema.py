@@ -0,0 +1,128 @@
+"""
+GFS Weather Data Downloader - SCHEMAT TABELI PROGNOZ
+Lista kolumn zapisywanych do gfs_forecast, ustalana RAZ przy starcie (a nie dla każdej godziny prognozy):
+- kolumny oczekiwane: bazowe + db_column z [gfs_parameters] + pola pochodne (gfs_derived),
+- kolumny istniejące w bazie: INFORMATION_SCHEMA.COLUMNS.
+
+Zapis wybiera z DataFrame tylko kolumny z tej listy (gotowy wybór kolumn, bez dopasowywania nazw);
+kolumny oczekiwane, których brakuje w bazie, są zgłaszane raz przy starcie.
+"""
+
+import threading
+import logging
+
+from sqlalchemy import text
+
+module_logger = logging.getLogger(__name__)
+
+FORECAST_TABLE = 'gfs_forecast'
+
+# Kolumny dodawane przez downloader (nie pochodzą z [gfs_parameters])
+BASE_COLUMNS = ['lat', 'lon', 'forecast_time', 'run_time', 'created_at']
+DERIVED_COLUMNS = ['wind_speed', 'wind_dir']
+
+def load_table_columns(engine, table=FORECAST_TABLE):
+    """
+    Kolumny tabeli z INFORMATION_SCHEMA (w kolejności z bazy).
+    Zwraca None, gdy nie da się ich odczytać (brak połączenia, baza bez INFORMATION_SCHEMA).
+    """
+    if engine is None:
+        return None
+    try:
+        with engine.connect() as conn:
+            rows = conn.execute(text(
+                "SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table "
+                "ORDER BY ORDINAL_POSITION"
+            ), {'table': table}).fetchall()
+    except Exception as e:
+        module_logger.warning(f"Nie udało się odczytać kolumn {table} z INFORMATION_SCHEMA: {e}")
+        return None
+    if not rows:
+        module_logger.warning(f"Tabela {table} nie istnieje w bazie (INFORMATION_SCHEMA)")
+        return None
+    return [row[0] for row in rows]
+
+class ForecastSchema:
+    """Kolumny zapisywane do tabeli prognoz - przycina DataFrame przed to_sql"""
+
+    def __init__(self, params_config, table_columns=None, table=FORECAST_TABLE, derived_columns=None, base_columns=None, storage=None,
+                 writer=None):
+        """
+        params_config - wynik load_parameters_config() (config_name -> {'db_column', ...}).
+        table_columns - kolumny tabeli w bazie (load_table_columns) lub None = bez sprawdzania bazy.
+        derived_columns - kolumny pól pochodnych (gfs_derived.DerivedFields.outputs); None = wiatr z u10/v10.
+        base_columns - kolumny dodawane przez downloader; None = BASE_COLUMNS (region: także region_id).
+        storage - gfs_storage.StorageFormat (zaokrąglenie/kwantyzacja przed zapisem); None = DOUBLE jak dotychczas.
+        writer - gfs_arrow.BatchWriter (LOAD DATA, kopia partii); None = zapis przez to_sql.
+        """
+        self.table = table
+        self.storage = storage
+        self.writer = writer
+        expected = list(BASE_COLUMNS if base_columns is None else base_columns)
+        for param_info in (params_config or {}).values():
+            db_column = param_info.get('db_column')
+            # Parametry z [derived_inputs] są tylko wejściem pól pochodnych - nie trafiają do bazy
+            if db_column and param_info.get('stored', True) and db_column not in expected:
+                expected.append(db_column)
+        derived_columns = DERIVED_COLUMNS if derived_columns is None else derived_columns
+        expected.extend(c for c in derived_columns if c not in expected)
+        self.expected = expected
+
+        if table_columns is None:
+            self.columns = frozenset(expected)
+            self.missing_in_db = []
+        else:
+            in_db = set(table_columns)
+            self.columns = frozenset(c for c in expected if c in in_db)
+            self.missing_in_db = [c for c in expected if c not in in_db]
+        self.checked_db = table_columns is not None
+
+        # Wybór kolumn zależy tylko od układu kolumn DataFrame - liczony raz dla danego układu
+        self._selections = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_database(cls, engine, params_config, table=FORECAST_TABLE, derived_columns=None, base_columns=None, storage=None,
+                      writer=None):
+        """Schemat z konfiguracji parametrów i kolumn tabeli w bazie; braki zgłaszane od razu"""
+        schema = cls(params_config, load_table_columns(engine, table), table=table,
+                     derived_columns=derived_columns, base_columns=base_columns, storage=storage, writer=writer)
+        schema.report()
+        return schema
+
+    def report(self):
+        """Jednorazowe zgłoszenie rozbieżności konfiguracji z tabelą w bazie"""
+        if not self.checked_db:
+            module_logger.warning(f"Kolumny {self.table} nie zostały sprawdzone w bazie - zapis tylko wg [gfs_parameters]")
+        elif self.missing_in_db:
+            module_logger.warning(
+                f"Kolumny z konfiguracji nie istnieją w {self.table} i nie będą zapisywane "
+                f"({len(self.missing_in_db)}): {', '.join(self.missing_in_db)}"
+            )
+
+    def selection(self, df_columns):
+        """Lista kolumn do zapisu dla danego układu kolumn DataFrame (pozostałe są pomijane)"""
+        key = tuple(df_columns)
+        selected = self._selections.get(key)
+        if selected is None:
+            selected = [c for c in key if c in self.columns]
+            dropped = [c for c in key if c not in self.columns]
+            with self._lock:
+                if key not in self._selections:
+                    self._selections[key] = selected
+                    if dropped:
+                        module_logger.info(f"Kolumny spoza schematu {self.table} pomijane przy zapisie: {', '.join(map(str, dropped))}")
+        return selected
+
+    def project(self, df):
+        """DataFrame tylko z kolumnami zapisywanymi do bazy (w trybie zwartym - zakodowany wg storage)"""
+        selected = self.selection(df.columns)
+        if len(selected) != len(df.columns):
+            df = df[selected]
+        if self.storage is not None:
+            df = self.storage.encode(df)
+        return df
+
+    def __repr__(self):
+        return f"ForecastSchema(table={self.table}, columns={len(self.columns)}, missing_in_db={len(self.missing_in_db)})"
@@ -0,0 +1,234 @@
+"""
+GFS Weather Data Downloader - PULA PROCESÓW DO DEKODOWANIA GRIB
+Dekodowanie GRIB jest CPU-bound i trzyma GIL, więc kolejne wątki pobierające nie zwiększają
+przepustowości parsowania. Dekodowanie (i wycięcie regionu) odbywa się w osobnych procesach:
+- liczba procesów ustawiana niezależnie od liczby wątków pobierających ([threading] decode_processes),
+- procesy są uruchamiane od razu przy tworzeniu puli, z zaimportowanym ecCodes/xarray,
+- wynik wraca jako małe tablice numpy (tylko region), a nie DataFrame,
+- tablice wyniku nie są serializowane (pickle: kopia w procesie puli, przesył rurą i kopia przy
+  odczycie) - proces puli zapisuje je raz do pliku w pamięci współdzielonej (tmpfs, domyślnie /dev/shm),
+  a wątek pobierający mapuje ten plik (mmap copy-on-write, bez kopii) i od razu go usuwa
+  ([threading] decode_transfer_dir; puste - pickle jak dotychczas).
+
+Wątki pobierające tylko czekają na wynik (future.result() zwalnia GIL).
+W procesie puli wiadomości jednego pliku mogą być dekodowane równolegle przez wątki
+([threading] decode_message_threads - liczba wątków na proces, gfs_grib_decode.message_pool).
+"""
+
+import os
+import sys
+import glob
+import time
+import itertools
+import logging
+import threading
+import configparser
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import gfs_grib_decode
+
+module_logger = logging.getLogger(__name__)
+
+DEFAULT_DECODE_PROCESSES = os.cpu_count() or 1
+
+# Przekazywanie tablic wyniku przez pamięć współdzieloną: plik usuwany po zmapowaniu
+# (Windows nie pozwala usunąć zmapowanego pliku - tam pickle)
+DEFAULT_TRANSFER_DIR = '/dev/shm' if os.name == 'posix' and os.path.isdir('/dev/shm') else ''
+TRANSFER_PREFIX = 'gfs_decode_'
+TRANSFER_ALIGN = 64
+# Pliki przekazania żyją milisekundy - starsze zostały po procesie, który padł
+TRANSFER_ORPHAN_AGE = 3600
+
+_TRANSFER_COUNTER = itertools.count()
+
+def _worker_init():
+    """Inicjalizacja procesu: ciężkie importy raz na proces, a nie przy pierwszym pliku"""
+    os.environ['ECCODES_LOG_VERBOSITY'] = '0'
+    os.environ['ECCODES_DEBUG'] = '0'
+    import numpy  # noqa: F401
+    import xarray  # noqa: F401
+    try:
+        import eccodes  # noqa: F401
+        import cfgrib  # noqa: F401
+    except ImportError:
+        pass
+
+def _warmup():
+    return os.getpid()
+
+def _shared_arrays(decoded):
+    """Duże tablice wyniku: ((rodzaj, nazwa), tablica) - wartości pól i kolumny współrzędnych regionu"""
+    arrays = [(('fields', column), field['values']) for column, field in decoded['fields'].items()]
+    region = decoded.get('region')
+    if region is not None:
+        arrays += [(('region', key), region[key]) for key in ('lat_column', 'lon_column')]
+    return arrays
+
+def export_arrays(decoded, directory):
+    """
+    Proces puli: tablice wyniku zapisane jednym plikiem w directory (tmpfs), w wyniku zostaje opis
+    'transfer' (ścieżka, [(klucz, przesunięcie, dtype, kształt)]). Jedyna kopia tablic na drodze do wątku.
+    """
+    arrays = _shared_arrays(decoded)
+    if not arrays:
+        return decoded
+    layout = []
+    size = 0
+    for key, values in arrays:
+        size = -(-size // TRANSFER_ALIGN) * TRANSFER_ALIGN
+        layout.append((key, size, values.dtype.str, values.shape))
+        size += values.nbytes
+    path = os.path.join(directory, f"{TRANSFER_PREFIX}{os.getpid()}_{next(_TRANSFER_COUNTER)}.bin")
+    try:
+        mapped = np.memmap(path, dtype=np.uint8, mode='w+', shape=(max(size, 1),))
+        for (_, offset, dtype, shape), (_, values) in zip(layout, arrays):
+            np.ndarray(shape, dtype, buffer=mapped, offset=offset)[...] = values
+        del mapped
+    except (OSError, ValueError) as e:
+        # Brak miejsca w tmpfs itp. - wynik wraca przez pickle
+        module_logger.warning(f"Przekazanie przez {directory} nieudane ({e}) - pickle")
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return decoded
+    exported = dict(decoded)
+    exported['fields'] = {column: {**field, 'values': None} for column, field in decoded['fields'].items()}
+    if decoded.get('region') is not None:
+        # Słownik regionu to wpis cache geometrii procesu - kopia, nie zmiana w miejscu
+        exported['region'] = {**decoded['region'], 'lat_column': None, 'lon_column': None}
+    exported['transfer'] = (path, layout)
+    return exported
+
+def import_arrays(decoded):
+    """
+    Wątek pobierający: tablice z pliku przekazania jako widoki mmap (copy-on-write - transformacje
+    w miejscu nie zmieniają pliku); plik jest usuwany od razu - mapowanie zostaje do zwolnienia tablic.
+    """
+    transfer = decoded.pop('transfer', None)
+    if transfer is None:
+        return decoded
+    path, layout = transfer
+    try:
+        mapped = np.memmap(path, dtype=np.uint8, mode='c')
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    region = decoded.get('region')
+    for (kind, name), offset, dtype, shape in layout:
+        values = np.ndarray(shape, dtype, buffer=mapped, offset=offset)
+        if kind == 'fields':
+            decoded['fields'][name]['values'] = values
+        else:
+            values.flags.writeable = False  # Współrzędne z cache geometrii są tylko do odczytu
+            region[name] = values
+    return decoded
+
+def sweep_transfers(directory):
+    """Usuwa pliki przekazania, które zostały po procesach, które padły; zwraca ich liczbę"""
+    removed = 0
+    now = time.time()
+    for path in glob.glob(os.path.join(glob.escape(directory), f"{TRANSFER_PREFIX}*.bin")):
+        try:
+            if now - os.path.getmtime(path) > TRANSFER_ORPHAN_AGE:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass
+    if removed:
+        module_logger.info(f"Pula dekodowania: usunięto {removed} osieroconych plików przekazania z {directory}")
+    return removed
+
+def decode_region(grib_path, routing, region=None, fh_str='?', threads=None, transfer_dir=None):
+    """
+    Zadanie wykonywane w procesie puli: jeden przebieg ecCodes + wycięcie regionu.
+    region - (lat_min, lat_max, lon_min, lon_max) lub None (cały glob).
+    threads - wątki dekodujące wiadomości pliku w procesie puli.
+    transfer_dir - katalog tmpfs dla tablic wyniku (export_arrays); None = pickle.
+    Zwraca wynik decode_grib_messages (z polem 'decode_time').
+    """
+    start = time.time()
+    decoded = gfs_grib_decode.decode_grib_messages(grib_path, routing, fh_str=fh_str, threads=threads)
+    if region is not None:
+        decoded = gfs_grib_decode.crop_region(decoded, *region)
+    if transfer_dir:
+        decoded = export_arrays(decoded, transfer_dir)
+    decoded['decode_time'] = time.time() - start
+    return decoded
+
+class DecodePool:
+    """Pula procesów dekodujących - współdzielona przez wszystkie wątki pobierające"""
+
+    def __init__(self, processes=None, message_threads=None, transfer_dir=DEFAULT_TRANSFER_DIR):
+        self.processes = max(1, int(processes or DEFAULT_DECODE_PROCESSES))
+        self.message_threads = max(1, int(message_threads or gfs_grib_decode.DEFAULT_MESSAGE_THREADS))
+        self.transfer_dir = transfer_dir if transfer_dir and os.path.isdir(transfer_dir) else None
+        if transfer_dir and self.transfer_dir is None:
+            module_logger.warning(f"Pula dekodowania: brak katalogu {transfer_dir} - wyniki przez pickle")
+        if self.transfer_dir:
+            sweep_transfers(self.transfer_dir)
+        # fork: procesy startują od razu (przed wątkami pobierającymi) i dziedziczą zaimportowane moduły
+        context = multiprocessing.get_context('fork') if sys.platform.startswith('linux') else None
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=context,
+            initializer=_worker_init
+        )
+        self._lock = threading.Lock()
+        self.tasks = 0
+        self.decode_time = 0.0
+        # Uruchom wszystkie procesy teraz, a nie przy pierwszych plikach
+        pids = set(f.result() for f in [self._executor.submit(_warmup) for _ in range(self.processes)])
+        module_logger.info(f"Pula dekodowania: {self.processes} procesów (uruchomiono {len(pids)}), "
+                           f"{self.message_threads} wątków dekodujących wiadomości na proces, "
+                           f"wyniki przez {self.transfer_dir or 'pickle'}")
+
+    def decode(self, grib_path, routing, region=None, fh_str='?'):
+        """Dekoduje plik w procesie puli (blokuje wywołujący wątek do czasu wyniku)"""
+        decoded = self._executor.submit(decode_region, grib_path, routing, region, fh_str, self.message_threads,
+                                        self.transfer_dir).result()
+        decoded = import_arrays(decoded)
+        with self._lock:
+            self.tasks += 1
+            self.decode_time += decoded['decode_time']
+        return decoded
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
+
+    def __repr__(self):
+        return f"DecodePool(processes={self.processes}, message_threads={self.message_threads})"
+
+def load_transfer_dir(config_file='config.ini'):
+    """Katalog przekazywania wyników z [threading] decode_transfer_dir (domyślnie /dev/shm; puste = pickle)"""
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    return config.get('threading', 'decode_transfer_dir', fallback=DEFAULT_TRANSFER_DIR).strip()
+
+def load_decode_processes(config_file='config.ini'):
+    """Liczba procesów dekodujących z [threading] decode_processes (domyślnie liczba rdzeni)"""
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    return config.getint('threading', 'decode_processes', fallback=DEFAULT_DECODE_PROCESSES)
+
+def create_decode_pool(config_file='config.ini'):
+    """Tworzy pulę wg config.ini; None gdy ecCodes nie jest dostępny lub decode_processes = 0"""
+    if not gfs_grib_decode.is_available():
+        module_logger.warning("Brak ecCodes - dekodowanie bez puli procesów (cfgrib w wątkach)")
+        return None
+    processes = load_decode_processes(config_file)
+    if processes <= 0:
+        return None
+    return DecodePool(processes, message_threads=gfs_grib_decode.load_message_threads(config_file),
+                      transfer_dir=load_transfer_dir(config_file))
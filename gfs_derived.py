@@ -0,0 +1,206 @@
+"""
+GFS Weather Data Downloader - POLA POCHODNE
+Pola liczone z pobranych zmiennych (np. prędkość wiatru z u10/v10) deklarowane w config.ini:
+
+    [derived_fields]
+    # kolumna = wyrażenie numpy na kolumnach ([gfs_parameters], [derived_inputs] lub innych polach pochodnych)
+    wind_speed80 = speed(u_wind80, v_wind80)
+    dewpoint_depression = t2m - d2m
+
+    [derived_inputs]
+    # Parametry pobierane tylko jako wejście pól pochodnych (nie są zapisywane do bazy)
+    # format jak w [gfs_parameters]: nazwa = kolumna, typ poziomu, poziom, transformacja
+    u100 = u_wind100, heightAboveGround, 100, none
+
+Wejścia wyrażeń są odczytywane z samego wyrażenia, kolejność liczenia wynika z zależności
+między polami. Wszystkie pola liczone są raz na godzinę prognozy, na tablicach wyciętego regionu
+(po transformacjach jednostek - temperatury w °C, ciśnienie w hPa), przed złożeniem DataFrame.
+"""
+
+import ast
+import logging
+import configparser
+
+import numpy as np
+
+module_logger = logging.getLogger(__name__)
+
+# Wbudowane pola pochodne (sekcja [derived_fields] może je nadpisać lub wyłączyć pustą wartością)
+DEFAULT_DERIVED_FIELDS = {
+    'wind_speed': 'speed(u10, v10)',
+    'wind_dir': 'direction(u10, v10)',
+}
+
+def speed(u, v):
+    """Prędkość wiatru ze składowych u/v"""
+    return np.sqrt(u * u + v * v)
+
+def direction(u, v):
+    """Kierunek, z którego wieje wiatr, w stopniach (0°=N, 90°=E)"""
+    return (270 - np.degrees(np.arctan2(v, u))) % 360
+
+def relative_humidity(t, td):
+    """Wilgotność względna (%) z temperatury i punktu rosy w °C (wzór Magnusa)"""
+    return 100 * np.exp(17.625 * td / (243.04 + td) - 17.625 * t / (243.04 + t))
+
+def wind_chill(t, v):
+    """Temperatura odczuwalna (°C) z temperatury w °C i wiatru w m/s; poza zakresem wzoru - t"""
+    v_kmh = np.maximum(v * 3.6, 0)
+    v16 = v_kmh ** 0.16
+    chill = 13.12 + 0.6215 * t - 11.37 * v16 + 0.3965 * t * v16
+    return np.where((t <= 10) & (v_kmh > 4.8), chill, t)
+
+def heat_index(t, rh):
+    """Indeks ciepła (°C) z temperatury w °C i wilgotności w % (Rothfusz); poniżej 27°C - t"""
+    tf = t * 1.8 + 32
+    hi = (-42.379 + 2.04901523 * tf + 10.14333127 * rh - 0.22475541 * tf * rh
+          - 6.83783e-3 * tf * tf - 5.481717e-2 * rh * rh + 1.22874e-3 * tf * tf * rh
+          + 8.5282e-4 * tf * rh * rh - 1.99e-6 * tf * tf * rh * rh)
+    return np.where(t >= 27, (hi - 32) / 1.8, t)
+
+def snow_fraction(t, snow_below=0.0, rain_above=2.0):
+    """Udział śniegu w opadzie (1 = śnieg, 0 = deszcz) - liniowo między progami temperatury w °C"""
+    return np.clip((rain_above - t) / (rain_above - snow_below), 0, 1)
+
+def wind_power_law(v_low, v_high, z_low, z_high, z):
+    """Prędkość wiatru na wysokości z z profilu potęgowego dopasowanego do dwóch poziomów"""
+    alpha = np.log(v_high / v_low) / np.log(z_high / z_low)
+    alpha = np.where(np.isfinite(alpha), alpha, 1 / 7)
+    return v_high * (z / z_high) ** alpha
+
+# Funkcje dostępne w wyrażeniach
+FUNCTIONS = {
+    'sqrt': np.sqrt, 'exp': np.exp, 'log': np.log, 'abs': np.abs,
+    'sin': np.sin, 'cos': np.cos, 'arctan2': np.arctan2,
+    'degrees': np.degrees, 'radians': np.radians,
+    'minimum': np.minimum, 'maximum': np.maximum, 'clip': np.clip, 'where': np.where,
+    'speed': speed, 'direction': direction,
+    'relative_humidity': relative_humidity, 'wind_chill': wind_chill, 'heat_index': heat_index,
+    'snow_fraction': snow_fraction, 'wind_power_law': wind_power_law,
+}
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare, ast.Call, ast.Name, ast.Load, ast.Constant,
+    ast.operator, ast.unaryop, ast.cmpop,
+)
+
+class DerivedField:
+    """Jedno pole pochodne: kolumna wynikowa, skompilowane wyrażenie i kolumny wejściowe"""
+
+    def __init__(self, column, expression):
+        self.column = column
+        self.expression = expression
+        try:
+            tree = ast.parse(expression, mode='eval')
+        except SyntaxError as e:
+            raise ValueError(f"Pole {column}: błąd składni wyrażenia '{expression}': {e.msg}")
+        inputs = []
+        for node in ast.walk(tree):
+            if not isinstance(node, _ALLOWED_NODES):
+                raise ValueError(f"Pole {column}: niedozwolona konstrukcja {type(node).__name__} w '{expression}'")
+            if isinstance(node, ast.Call) and not (isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS):
+                raise ValueError(f"Pole {column}: nieznana funkcja w '{expression}'")
+            if isinstance(node, ast.Name) and node.id not in FUNCTIONS and node.id not in inputs:
+                inputs.append(node.id)
+        self.inputs = inputs
+        self._code = compile(tree, f'<derived {column}>', 'eval')
+
+    def evaluate(self, arrays):
+        return eval(self._code, {'__builtins__': {}, **FUNCTIONS}, arrays)
+
+    def __repr__(self):
+        return f"DerivedField({self.column} = {self.expression})"
+
+class DerivedFields:
+    """Pola pochodne w kolejności zależności; compute() dopisuje je do słownika kolumn"""
+
+    def __init__(self, specs=None, available=None, input_only=()):
+        """
+        specs - {kolumna: wyrażenie}; None = tylko pola wbudowane.
+        available - kolumny dostarczane przez pobierane parametry (None = bez sprawdzania przy starcie).
+        input_only - kolumny pobierane tylko dla pól pochodnych (usuwane po obliczeniu).
+        """
+        fields = {}
+        for column, expression in {**DEFAULT_DERIVED_FIELDS, **(specs or {})}.items():
+            if not expression or not expression.strip():
+                continue
+            try:
+                fields[column] = DerivedField(column, expression.strip())
+            except ValueError as e:
+                module_logger.warning(f"{e} - pole pominięte")
+        self.fields = self._order(fields, available)
+        self.input_only = [c for c in input_only if c not in self.outputs]
+
+    @staticmethod
+    def _order(fields, available):
+        """Sortowanie topologiczne; pola z brakującymi wejściami lub cyklem są pomijane"""
+        ordered = []
+        resolved = set(available) if available is not None else None
+        pending = dict(fields)
+        while pending:
+            ready = [
+                field for field in pending.values()
+                if all(i not in pending for i in field.inputs)
+                and (resolved is None or all(i in resolved for i in field.inputs))
+            ]
+            if not ready:
+                break
+            for field in ready:
+                ordered.append(field)
+                del pending[field.column]
+                if resolved is not None:
+                    resolved.add(field.column)
+        for field in pending.values():
+            missing = [i for i in field.inputs if i in pending or (resolved is not None and i not in resolved)]
+            module_logger.warning(f"Pole pochodne {field.column} pominięte (brak wejść lub zależność cykliczna: {', '.join(missing)})")
+        return ordered
+
+    @property
+    def outputs(self):
+        return [field.column for field in self.fields]
+
+    def compute(self, columns):
+        """
+        Liczy pola na tablicach {kolumna: ndarray} (wyniki dopisywane do słownika).
+        Pole, którego wejść brakuje w danej godzinie prognozy, jest pomijane.
+        Zwraca listę obliczonych kolumn.
+        """
+        computed = []
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            for field in self.fields:
+                if not all(i in columns for i in field.inputs):
+                    continue
+                # float64 jak w macierzy DataFrame (cfgrib zwraca float32)
+                arrays = {i: np.asarray(columns[i], dtype=np.float64) for i in field.inputs}
+                shape = next(iter(arrays.values())).shape if arrays else None
+                result = np.asarray(field.evaluate(arrays), dtype=np.float64)
+                if shape is not None and result.shape != shape:
+                    result = np.broadcast_to(result, shape)
+                columns[field.column] = result
+                computed.append(field.column)
+        for column in self.input_only:
+            columns.pop(column, None)
+        return computed
+
+    def __repr__(self):
+        return f"DerivedFields({', '.join(self.outputs)})"
+
+def load_derived_fields(config_file='config.ini', params_config=None, region=None):
+    """
+    Pola pochodne z sekcji [derived_fields].
+    params_config (load_parameters_config) - sprawdzenie przy starcie, czy wejścia są pobierane;
+    parametry z [derived_inputs] (stored=False) są usuwane po obliczeniu pól.
+    region - nazwa regionu (gfs_regions): sekcja [derived_fields.<region>] uzupełnia [derived_fields].
+    """
+    # Bez interpolacji - '%' (modulo) jest zwykłym operatorem w wyrażeniach
+    config = configparser.ConfigParser(interpolation=None)
+    config.read(config_file, encoding='utf-8')
+    specs = dict(config['derived_fields']) if 'derived_fields' in config else {}
+    region_section = f'derived_fields.{region}' if region else None
+    if region_section and region_section in config:
+        specs.update(config[region_section])
+    available = input_only = None
+    if params_config is not None:
+        available = [p['db_column'] for p in params_config.values()]
+        input_only = [p['db_column'] for p in params_config.values() if not p.get('stored', True)]
+    return DerivedFields(specs, available, input_only or ())
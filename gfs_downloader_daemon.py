@@ -42,6 +42,10 @@ except Exception as e:
     traceback.print_exc()
     sys.exit(1)
 
+import gfs_grib_decode
+import gfs_staging
+from gfs_decode_pool import DEFAULT_DECODE_PROCESSES, DecodePool
+
 # === KONFIGURACJA LOGOWANIA ===
 LOG_DIR = "logs"
 if not os.path.exists(LOG_DIR):
@@ -203,7 +207,8 @@ def load_config():
             'lat_max': float(config["region"]["lat_max"]),
             'lon_min': float(config["region"]["lon_min"]),
             'lon_max': float(config["region"]["lon_max"]),
-            'num_threads': 6
+            'num_threads': 6,
+            'decode_processes': config.getint("threading", "decode_processes", fallback=DEFAULT_DECODE_PROCESSES),
         }
     except Exception as e:
         logger.error(f"Błąd wczytywania konfiguracji: {e}")
@@ -386,10 +391,11 @@ def check_for_new_run(engine, last_run_in_db=None):
     
     return None, None, None, last_run_in_db
 
-def download_forecasts(run_time, RUN_DATE, RUN_HOUR, config, engine):
+def download_forecasts(run_time, RUN_DATE, RUN_HOUR, config, engine, decode_pool=None):
     """
     Pobiera wszystkie prognozy dla danego run.
     Używa tej samej logiki co professional version z automatycznym ponawianiem.
+    decode_pool - pula procesów dekodujących (wspólna dla wszystkich wątków).
     """
     logger.info(f"Rozpoczynam pobieranie prognoz dla run {run_time.strftime('%Y-%m-%d %H:00')} UTC")
     detailed_logger.info(f"Rozpoczynam pobieranie prognoz dla run {run_time.strftime('%Y-%m-%d %H:00')} UTC")
@@ -401,16 +407,15 @@ def download_forecasts(run_time, RUN_DATE, RUN_HOUR, config, engine):
         logger.info(f"Przygotowanie katalogu dla CSV backup...")
         detailed_logger.info(f"Przygotowanie katalogu dla CSV backup: {csv_backup_dir}")
     
-    temp_dir = 'temp'
-    if not os.path.exists(temp_dir):
-        os.makedirs(temp_dir)
-        logger.info(f"Przygotowanie katalogu dla plików tymczasowych...")
-        detailed_logger.info(f"Przygotowanie katalogu dla plików tymczasowych: {temp_dir}")
+    # Pliki tymczasowe GRIB: [staging] (tmpfs z limitem, przepełnienie na dysk 'temp'); sprząta po procesach, które padły
+    staging = gfs_staging.load_staging_store(disk_dir='temp')
+    detailed_logger.info(f"Pliki tymczasowe: {staging.describe()}")
     
     try:
         logger.debug("Tworzenie ForecastDownloader...")
         downloader = gfs_professional.ForecastDownloader(RUN_DATE, RUN_HOUR, config['lat_min'], config['lat_max'], 
-                                        config['lon_min'], config['lon_max'], engine)
+                                        config['lon_min'], config['lon_max'], engine,
+                                        decode_pool=decode_pool, staging=staging)
         logger.debug("ForecastDownloader utworzony")
     except Exception as e:
         logger.error(f"Błąd tworzenia ForecastDownloader: {e}", exc_info=True)
@@ -828,6 +833,12 @@ def main_daemon_loop():
     last_network_check = None
     last_keep_alive = [None]  # Ostatni czas zapisu keep-alive (lista żeby można było modyfikować w funkcji)
     
+    # Pula procesów dekodujących - uruchamiana raz, przed wątkami pobierającymi
+    decode_pool = None
+    if config['decode_processes'] > 0 and gfs_grib_decode.is_available():
+        decode_pool = DecodePool(config['decode_processes'], message_threads=gfs_grib_decode.load_message_threads())
+        logger.info(f"Pula dekodowania: {decode_pool.processes} procesów (wątki pobierające: {config['num_threads']})")
+    
     logger.info("\n🚀 Daemon uruchomiony. Działa w tle...")
     logger.info("   (Naciśnij Ctrl+C aby zatrzymać)\n")
     
@@ -928,7 +939,7 @@ def main_daemon_loop():
                         
                         # Pobierz wszystkie prognozy
                         try:
-                            success, failed, records, files, bytes_downloaded = download_forecasts(run_time, RUN_DATE, RUN_HOUR, config, engine)
+                            success, failed, records, files, bytes_downloaded = download_forecasts(run_time, RUN_DATE, RUN_HOUR, config, engine, decode_pool=decode_pool)
                             
                             # Zaktualizuj last_run_in_db
                             last_run_in_db = run_time
@@ -1004,6 +1015,8 @@ def main_daemon_loop():
         # Użyj zwykłego sleep bo to jest w finally
         time.sleep(60)  # Poczekaj przed ponowną próbą
     finally:
+        if decode_pool is not None:
+            decode_pool.shutdown()
         logger.info("Daemon zakończony")
         detailed_logger.info("Daemon zakończony")
 
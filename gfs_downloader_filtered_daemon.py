@@ -8,7 +8,6 @@ import os
 import time
 import configparser
 import threading
-import queue
 import glob
 from datetime import datetime, timedelta
 from sqlalchemy import create_engine, text
@@ -20,11 +19,19 @@ except ImportError:
 
 # Import funkcji z filtered version
 from gfs_downloader_filtered_fixed import (
-    get_timestamp, build_grib_filter_url, download_grib_filtered,
+    download_grib_filtered,
     process_grib_to_db_filtered, get_required_forecast_hours,
     get_existing_forecast_hours, check_gfs_availability,
-    wait_for_rate_limit
+    flush_precipitation
 )
+from gfs_sources import load_source_chain
+import gfs_grib_decode
+import gfs_staging
+from gfs_decode_pool import DEFAULT_DECODE_PROCESSES, DecodePool
+import gfs_transforms
+import gfs_regions
+import gfs_quality
+import gfs_arrow
 
 # === KONFIGURACJA LOGOWANIA ===
 LOG_DIR = 'logs'
@@ -77,11 +84,8 @@ def load_config():
             'mysql_password': config["database"]["password"],
             'mysql_host': config["database"]["host"],
             'mysql_database': config["database"]["database"],
-            'lat_min': float(config["region"]["lat_min"]),
-            'lat_max': float(config["region"]["lat_max"]),
-            'lon_min': float(config["region"]["lon_min"]),
-            'lon_max': float(config["region"]["lon_max"]),
             'num_threads': int(config.get("threading", "num_threads", fallback=6)),
+            'decode_processes': int(config.get("threading", "decode_processes", fallback=DEFAULT_DECODE_PROCESSES)),
         }
         
         # Wczytaj harmonogram
@@ -138,13 +142,14 @@ def get_local_time_str(utc_time):
 def clean_old_csv_files(csv_backup_dir, keep_runs=8):
     """
     Czyści stare pliki CSV, zostawiając tylko ostatnie N runów (domyślnie 8 = 2 dni).
+    Obejmuje też kopie partii z gfs_arrow (gfs_YYYYMMDD_HH_fXXX_<tabela>_<nr>.csv/.parquet).
     """
     try:
         if not os.path.exists(csv_backup_dir):
             return
         
         # Znajdź wszystkie pliki CSV
-        csv_files = glob.glob(os.path.join(csv_backup_dir, 'gfs_*.csv'))
+        csv_files = glob.glob(os.path.join(csv_backup_dir, 'gfs_*.csv')) + glob.glob(os.path.join(csv_backup_dir, 'gfs_*.parquet'))
         
         if len(csv_files) <= keep_runs * 209:  # 209 prognoz na run
             return  # Nie ma co czyścić
@@ -154,7 +159,7 @@ def clean_old_csv_files(csv_backup_dir, keep_runs=8):
         for csv_file in csv_files:
             basename = os.path.basename(csv_file)
             # Format: gfs_YYYYMMDD_HH_fXXX.csv
-            parts = basename.replace('gfs_', '').replace('.csv', '').split('_')
+            parts = os.path.splitext(basename)[0].replace('gfs_', '', 1).split('_')
             if len(parts) >= 3:
                 date_str = parts[0]  # YYYYMMDD
                 hour_str = parts[1]   # HH
@@ -296,7 +301,7 @@ def find_latest_gfs_run_with_retry(engine):
         
         # ZAWSZE sprawdź które prognozy są już w bazie dla tego runu
         try:
-            existing_hours = get_existing_forecast_hours(check_time, engine)
+            existing_hours = get_existing_forecast_hours(check_time, engine, gfs_regions.load_regions())
             required_hours = get_required_forecast_hours()
             missing_hours = sorted(list(required_hours - existing_hours))
             
@@ -328,18 +333,32 @@ def find_latest_gfs_run_with_retry(engine):
     
     return None, None, None
 
-def download_forecast_with_retry(forecast_hour, RUN_DATE, RUN_HOUR, run_time, lat_min, lat_max, lon_min, lon_max, engine, temp_dir, params_config=None, cfgrib_to_config=None, csv_backup_dir=None, max_retries=10):
+def download_forecast_with_retry(forecast_hour, RUN_DATE, RUN_HOUR, run_time, lat_min, lat_max, lon_min, lon_max, engine, staging, params_config=None, cfgrib_to_config=None, csv_backup_dir=None, max_retries=10, sources=None, decode_pool=None, schema=None, transforms=None, derived=None, accumulator=None, chunk_points=None, regions=None, message_threads=None, quality=None):
     """
     Pobiera jedną prognozę z automatycznym ponawianiem do skutku.
+    regions (gfs_regions.Region) - wszystkie regiony zasilane z jednego pobrania i dekodowania.
+    staging (gfs_staging.StagingStore) - pliki tymczasowe (RAM z przepełnieniem na dysk).
+    quality (gfs_quality.QualityGate) - kontrola jakości runu; godzina w kwarantannie jest pobierana ponownie.
     Zwraca (success, records, file_size_bytes).
     """
-    url = build_grib_filter_url(RUN_DATE, RUN_HOUR, forecast_hour, params_config=params_config)
-    temp_file = os.path.join(temp_dir, f"gfs_f{forecast_hour:03d}_filtered.grb2")
-    
     for attempt in range(max_retries):
         try:
-            # Pobierz plik (przekaż date_str i hour_str dla fallback)
-            success, file_size = download_grib_filtered(url, temp_file, forecast_hour=forecast_hour, hour_str=RUN_HOUR, resolution='0p25', params_config=params_config)
+            # Plik tymczasowy w staging - nazwa z runem, usuwany przy wyjściu z bloku (także przy wyjątku)
+            with staging.stage(f"{RUN_DATE}{RUN_HOUR}", forecast_hour) as staged:
+                # Pobierz plik przez łańcuch źródeł (przełączanie awaryjne między źródłami)
+                success, file_size = download_grib_filtered(RUN_DATE, staged.path, forecast_hour=forecast_hour, hour_str=RUN_HOUR, resolution='0p25', params_config=params_config, sources=sources)
+                
+                # Przetwórz i zapisz (plik ponad limit RAM przechodzi na dysk)
+                num_records = 0
+                if success:
+                    num_records = process_grib_to_db_filtered(
+                        staged.settle(), run_time, forecast_hour,
+                        lat_min, lat_max, lon_min, lon_max, engine,
+                        params_config, cfgrib_to_config, csv_backup_dir,
+                        decode_pool=decode_pool, schema=schema, transforms=transforms, derived=derived,
+                        accumulator=accumulator, chunk_points=chunk_points, regions=regions,
+                        message_threads=message_threads, quality=quality
+                    )
             
             if not success:
                 if attempt < max_retries - 1:
@@ -348,20 +367,6 @@ def download_forecast_with_retry(forecast_hour, RUN_DATE, RUN_HOUR, run_time, la
                     continue
                 return False, 0, 0
             
-            # Przetwórz i zapisz
-            num_records = process_grib_to_db_filtered(
-                temp_file, run_time, forecast_hour,
-                lat_min, lat_max, lon_min, lon_max, engine,
-                params_config, cfgrib_to_config, csv_backup_dir
-            )
-            
-            # Usuń plik tymczasowy
-            try:
-                if os.path.exists(temp_file):
-                    os.remove(temp_file)
-            except:
-                pass
-            
             if num_records > 0:
                 return True, num_records, file_size
             else:
@@ -381,20 +386,39 @@ def download_forecast_with_retry(forecast_hour, RUN_DATE, RUN_HOUR, run_time, la
     
     return False, 0, 0
 
-def download_all_forecasts(run_time, RUN_DATE, RUN_HOUR, config, engine):
+def download_all_forecasts(run_time, RUN_DATE, RUN_HOUR, config, engine, decode_pool=None):
     """
     Pobiera wszystkie prognozy dla danego run z automatycznym ponawianiem błędnych.
+    decode_pool - pula procesów dekodujących (wspólna dla wszystkich wątków pobierających).
     """
     logger.info(f"Rozpoczynam pobieranie prognoz dla run {run_time.strftime('%Y-%m-%d %H:00')} UTC")
     
     # Wczytaj konfigurację parametrów
     from gfs_downloader_filtered_fixed import load_parameters_config
     params_config, cfgrib_to_config = load_parameters_config()
+    # Regiony z jednego pobrania; kolumny tabel sprawdzane raz na run (INFORMATION_SCHEMA), a nie przy każdym zapisie
+    regions = gfs_regions.load_regions(params_config=params_config, engine=engine)
+    transforms = gfs_transforms.load_registry()
+    chunk_points = gfs_grib_decode.load_chunk_points()
+    # Wątki dekodujące wiadomości jednego pliku (bez puli procesów; z pulą - ustawienie puli)
+    message_threads = gfs_grib_decode.load_message_threads()
+    for region in regions:
+        logger.info(f"Region {region.describe()}: {len(region.schema.columns)} kolumn do zapisu")
+    # Kontrola jakości przed zapisem - liczniki i próby kwarantanny wspólne dla runu
+    quality = gfs_quality.load_quality_gate(params_config=params_config)
+    logger.info(f"Kontrola jakości: {quality.describe() if quality else 'wyłączona'}")
+    
+    # Źródła danych wybierane na każdy run (config.ini może się zmienić między runami)
+    sources = load_source_chain(subregion=gfs_regions.union_bounds(regions))
+    logger.info(f"Źródła danych: {' -> '.join(src.name for src in sources.sources)}")
     
-    temp_dir = "temp_grib_filtered"
-    os.makedirs(temp_dir, exist_ok=True)
+    # Pliki tymczasowe: [staging] (tmpfs z limitem, przepełnienie na dysk); sprząta po procesach, które padły
+    staging = gfs_staging.load_staging_store(disk_dir="temp_grib_filtered")
+    logger.info(f"Staging: {staging.describe()}")
     
     required_hours = get_required_forecast_hours()
+    # Opady w oknach 1 h / 3 h i interpolacja czasowa - stan runu na dysku (przetrwa restart daemona)
+    gfs_regions.create_accumulators(regions, run_time, params_config, required_hours)
     total_success = 0
     total_failed = 0
     total_records = 0
@@ -402,7 +426,7 @@ def download_all_forecasts(run_time, RUN_DATE, RUN_HOUR, config, engine):
     
     while True:
         # Sprawdź które prognozy jeszcze brakują
-        existing_hours = get_existing_forecast_hours(run_time, engine)
+        existing_hours = get_existing_forecast_hours(run_time, engine, regions)
         missing_hours = sorted(list(required_hours - existing_hours))
         
         if len(missing_hours) == 0:
@@ -431,10 +455,12 @@ def download_all_forecasts(run_time, RUN_DATE, RUN_HOUR, config, engine):
                     
                     success, records, file_size = download_forecast_with_retry(
                         forecast_hour, RUN_DATE, RUN_HOUR, run_time,
-                        config['lat_min'], config['lat_max'],
-                        config['lon_min'], config['lon_max'],
-                        engine, temp_dir, params_config, cfgrib_to_config,
-                        config.get('csv_backup_dir', 'temp/csv_backup')
+                        *gfs_regions.union_bounds(regions),
+                        engine, staging, params_config, cfgrib_to_config,
+                        config.get('csv_backup_dir', 'temp/csv_backup'),
+                        sources=sources, decode_pool=decode_pool, transforms=transforms,
+                        chunk_points=chunk_points, regions=regions, message_threads=message_threads,
+                        quality=quality
                     )
                     
                     progress_queue.put({
@@ -492,6 +518,12 @@ def download_all_forecasts(run_time, RUN_DATE, RUN_HOUR, config, engine):
         for t in threads:
             t.join(timeout=5)
         
+        # Bez błędów w tym przebiegu żaden poprzednik już nie dotrze - zapisz godziny wstrzymane
+        # (przy błędach czekają: brakujące godziny są pobierane ponownie w następnym przebiegu)
+        if stats['failed'] == 0:
+            for region in regions:
+                flush_precipitation(region.accumulator, engine, region.schema, region)
+        
         total_success = stats['success']
         total_failed = stats['failed']
         total_records = stats['records']
@@ -505,6 +537,9 @@ def download_all_forecasts(run_time, RUN_DATE, RUN_HOUR, config, engine):
     
     total_mb = total_bytes / (1024 * 1024)
     logger.info(f"📊 STATYSTYKI: Pobrano {total_success} plików, łącznie {total_mb:.2f} MB danych, {total_records} rekordów w bazie")
+    logger.info(f"📊 {staging.summary()}")
+    if quality is not None:
+        logger.info(f"📊 {quality.summary()}")
     
     return total_success, total_failed, total_records, total_bytes
 
@@ -519,7 +554,7 @@ def main_daemon_loop():
     
     try:
         MYSQL_URL = f"mysql+pymysql://{config['mysql_user']}:{config['mysql_password']}@{config['mysql_host']}/{config['mysql_database']}?charset=utf8mb4"
-        engine = create_engine(MYSQL_URL, echo=False, pool_pre_ping=True)
+        engine = create_engine(MYSQL_URL, echo=False, pool_pre_ping=True, **gfs_arrow.engine_options())
         
         with engine.connect() as conn:
             conn.execute(text("SELECT 1"))
@@ -533,6 +568,12 @@ def main_daemon_loop():
         logger.error(f"Błąd konfiguracji: {e}")
         sys.exit(1)
     
+    # Pula procesów dekodujących - uruchamiana raz, przed wątkami pobierającymi (ecCodes/xarray już zaimportowane)
+    decode_pool = None
+    if config['decode_processes'] > 0 and gfs_grib_decode.is_available():
+        decode_pool = DecodePool(config['decode_processes'], message_threads=gfs_grib_decode.load_message_threads())
+        logger.info(f"✓ Pula dekodowania: {decode_pool.processes} procesów (wątki pobierające: {config['num_threads']})")
+    
     logger.info("\n🚀 Daemon uruchomiony. Działa w tle...")
     logger.info("   (Naciśnij Ctrl+C aby zatrzymać)\n")
     
@@ -561,7 +602,7 @@ def main_daemon_loop():
                     
                     # Pobierz wszystkie prognozy (z automatycznym ponawianiem do skutku)
                     success, failed, records, bytes_downloaded = download_all_forecasts(
-                        run_time, RUN_DATE, RUN_HOUR, config, engine
+                        run_time, RUN_DATE, RUN_HOUR, config, engine, decode_pool=decode_pool
                     )
                     
                     mb_downloaded = bytes_downloaded / (1024 * 1024)
@@ -592,6 +633,8 @@ def main_daemon_loop():
         logger.error(f"Błąd w głównej pętli: {e}", exc_info=True)
         error_logger.error(f"Błąd w głównej pętli daemona: {e}", exc_info=True)
     finally:
+        if decode_pool is not None:
+            decode_pool.shutdown()
         logger.info("Daemon zakończony")
 
 if __name__ == "__main__":
@@ -10,9 +10,7 @@ POPRAWKI:
 """
 
 import xarray as xr
-import pandas as pd
 import numpy as np
-import requests
 import os
 import configparser
 from datetime import datetime, timedelta
@@ -24,9 +22,24 @@ import time
 from tqdm import tqdm
 import warnings
 import logging
-from collections import deque
-from urllib.parse import urlencode, urlparse, parse_qs, unquote
-from datetime import datetime
+from gfs_sources import (
+    NOMADS_RATE_LIMITER, NomadsFilterSource, NomadsRawSource, load_source_chain, parse_run_from_url, parse_idx
+)
+from gfs_grib_verify import verify_grib_file
+import gfs_grib_decode
+from gfs_decode_pool import create_decode_pool
+from gfs_db_schema import ForecastSchema
+import gfs_transforms
+import gfs_derived
+import gfs_regions
+import gfs_points
+import gfs_areas
+import gfs_profiles
+import gfs_storage
+import gfs_arrow
+import gfs_catalog
+import gfs_quality
+import gfs_staging
 warnings.filterwarnings('ignore')
 
 # Stłum błędy ECCODES (są tylko ostrzeżeniami)
@@ -103,259 +116,76 @@ GRIB_FILTER_CONFIG = {
 }
 
 # === RATE LIMITING - 120 zapytań/minutę ===
-_rate_limit_lock = threading.Lock()
-_rate_limit_timestamps = deque(maxlen=120)
+# Jeden wspólny limiter dla NOMADS (gfs_sources) - używany też przez źródła danych
 
 def wait_for_rate_limit():
     """
     Czeka jeśli potrzeba, żeby nie przekroczyć limitu 120 zapytań/minutę.
     Thread-safe.
     """
-    global _rate_limit_timestamps
-    
-    with _rate_limit_lock:
-        now = time.time()
-        
-        # Usuń stare timestampy (starsze niż 60 sekund)
-        while _rate_limit_timestamps and (now - _rate_limit_timestamps[0]) > 60:
-            _rate_limit_timestamps.popleft()
-        
-        # Jeśli mamy już 120 zapytań w ostatniej minucie, poczekaj
-        if len(_rate_limit_timestamps) >= 120:
-            oldest_timestamp = _rate_limit_timestamps[0]
-            wait_time = 60 - (now - oldest_timestamp) + 0.1
-            if wait_time > 0:
-                module_logger.debug(f"Rate limit: czekam {wait_time:.2f}s (120 zapytań/min)")
-                time.sleep(wait_time)
-                now = time.time()
-                while _rate_limit_timestamps and (now - _rate_limit_timestamps[0]) > 60:
-                    _rate_limit_timestamps.popleft()
-        
-        # Dodaj aktualny timestamp
-        _rate_limit_timestamps.append(time.time())
-        
-        # Minimalne opóźnienie między zapytaniami (0.5s = 120/min)
-        time.sleep(0.5)
+    NOMADS_RATE_LIMITER.wait()
+
+# === ŹRÓDŁA DANYCH ===
+_default_sources = None
+_default_sources_lock = threading.Lock()
+
+def get_default_sources():
+    """Zwraca łańcuch źródeł z sekcji [source] w config.ini (wczytywany raz)"""
+    global _default_sources
+    with _default_sources_lock:
+        if _default_sources is None:
+            _default_sources = load_source_chain()
+        return _default_sources
 
 def load_parameters_config(config_file='config.ini'):
     """
-    Wczytuje konfigurację parametrów z config.ini.
-    Zwraca słownik mapujący: config_name -> {db_column, level_type, level_value, transformation}
-    oraz mapowanie cfgrib_name -> config_name
+    Wczytuje konfigurację parametrów z config.ini (gfs_catalog - raz, do zmiany pliku).
+    Zwraca słownik mapujący: config_name -> {db_column, level_type, level_value, transformation, stored, precision,
+    cfgrib_name, nomads, step_type, units} oraz mapowanie (cfgrib_name, level_type, poziom) -> config_name.
+    Parametry z [derived_inputs] są pobierane tylko jako wejście pól pochodnych (stored=False).
+    Opcjonalne piąte i szóste pole to krok i offset zapisu zwartego (gfs_storage) - precision = (krok, offset) lub None.
+    Poziomy profili pionowych z [profiles] dochodzą jako parametry stored=False z kluczem 'profile' (gfs_profiles).
+    Słowniki są współdzielone między wywołaniami - tylko do odczytu.
     """
     try:
-        config = configparser.ConfigParser()
-        config.read(config_file, encoding='utf-8')
-        
-        params_map = {}
-        cfgrib_to_config = {}  # Mapowanie nazw cfgrib na nazwy z konfiguracji
-        
-        if 'gfs_parameters' in config:
-            print(f"DEBUG load_parameters_config: Znaleziono sekcję [gfs_parameters] z {len(config['gfs_parameters'])} parametrami", flush=True)
-            for config_name, value in config['gfs_parameters'].items():
-                parts = [p.strip() for p in value.split(',')]
-                if len(parts) == 4:
-                    db_column, level_type, level_value, transformation = parts
-                    params_map[config_name] = {
-                        'db_column': db_column,
-                        'level_type': level_type,
-                        'level_value': int(level_value) if level_value.isdigit() else level_value,
-                        'transformation': transformation
-                    }
-                    
-                    # Mapowanie nazw cfgrib na nazwy z konfiguracji
-                    # cfgrib używa małych liter i innych nazw niż NOMADS
-                    cfgrib_name = None
-                    if config_name == 't2m':
-                        cfgrib_name = 't2m'
-                    elif config_name == 'd2m':
-                        cfgrib_name = 'd2m'
-                    elif config_name == 'r2':
-                        cfgrib_name = 'r2'
-                    elif config_name == 'u10':
-                        cfgrib_name = 'u10'
-                    elif config_name == 'v10':
-                        cfgrib_name = 'v10'
-                    elif config_name == 'u80':
-                        cfgrib_name = 'u'
-                    elif config_name == 'v80':
-                        cfgrib_name = 'v'
-                    elif config_name == 't80':
-                        cfgrib_name = 't'
-                    elif config_name == 'gust':
-                        cfgrib_name = 'gust'
-                    elif config_name == 'prmsl':
-                        cfgrib_name = 'prmsl'
-                    elif config_name == 'tp':
-                        cfgrib_name = 'tp'
-                    elif config_name == 'prate':
-                        cfgrib_name = 'prate'
-                    elif config_name == 'tcc':
-                        cfgrib_name = 'tcc'
-                    elif config_name == 'lcc':
-                        cfgrib_name = 'lcc'
-                    elif config_name == 'mcc':
-                        cfgrib_name = 'mcc'
-                    elif config_name == 'hcc':
-                        cfgrib_name = 'hcc'
-                    elif config_name == 'vis':
-                        cfgrib_name = 'vis'
-                    elif config_name == 'dswrf':
-                        cfgrib_name = 'dswrf'
-                    elif config_name == 'cape':
-                        cfgrib_name = 'cape'
-                    elif config_name == 'cin':
-                        cfgrib_name = 'cin'
-                    elif config_name == 'pwat':
-                        cfgrib_name = 'pwat'
-                    elif config_name == 't_850':
-                        cfgrib_name = 't'
-                    elif config_name == 'gh_850':
-                        cfgrib_name = 'gh'
-                    elif config_name == 'gh_500':
-                        cfgrib_name = 'gh'
-                    else:
-                        # Jeśli parametr nie jest w mapowaniu, użyj nazwy z config jako cfgrib_name
-                        print(f"DEBUG load_parameters_config: ⚠ Parametr '{config_name}' nie ma mapowania cfgrib_name - używam '{config_name}' jako cfgrib_name", flush=True)
-                        cfgrib_name = config_name
-                    
-                    if cfgrib_name:
-                        # Dla zmiennych z poziomami, dodaj poziom do klucza
-                        if level_type == 'isobaricInhPa' and isinstance(params_map[config_name]['level_value'], int):
-                            key = (cfgrib_name, level_type, params_map[config_name]['level_value'])
-                        elif level_type == 'heightAboveGround' and isinstance(params_map[config_name]['level_value'], int):
-                            key = (cfgrib_name, level_type, params_map[config_name]['level_value'])
-                        else:
-                            key = (cfgrib_name, level_type, 0)
-                        
-                        cfgrib_to_config[key] = config_name
-                        print(f"DEBUG load_parameters_config: Dodano mapowanie {key} -> {config_name} (db_column={params_map[config_name]['db_column']})", flush=True)
-        
-        print(f"DEBUG load_parameters_config: Utworzono {len(cfgrib_to_config)} mapowań cfgrib_to_config", flush=True)
-        return params_map, cfgrib_to_config
+        catalog = gfs_catalog.load_parameter_catalog(config_file)
+        return catalog.params, catalog.cfgrib_to_config
     except Exception as e:
         module_logger.warning(f"Nie udało się wczytać konfiguracji parametrów z {config_file}: {e}")
         return {}, {}
 
-def apply_transformation(data, transformation):
+def build_download_plan(params_config=None):
     """
-    Stosuje transformację do danych.
-    transformation: none, kelvin_to_celsius, pa_to_hpa, fraction_to_percent
+    Buduje plan pobierania: zbiór par (zmienna NOMADS, klucz poziomu NOMADS),
+    np. {('TMP', 'lev_2_m_above_ground'), ('PRMSL', 'lev_mean_sea_level')}.
+    Ten sam plan służy do budowy URL Filter API i do wyboru wiadomości z .idx (zapytania Range).
+    Bez params_config - plan z katalogu parametrów config.ini (wyliczony raz, gfs_catalog).
     """
-    if transformation == 'none':
-        return data
-    elif transformation == 'kelvin_to_celsius':
-        return data - 273.15
-    elif transformation == 'pa_to_hpa':
-        return data / 100.0
-    elif transformation == 'fraction_to_percent':
-        # Sprawdź czy wartości są w zakresie 0-1
-        try:
-            max_val = float(data.max().values)
-            if max_val <= 1.0:
-                return data * 100.0
-        except:
-            pass
-        return data
-    else:
-        return data
+    try:
+        plan = gfs_catalog.download_plan(params_config) if params_config is None or params_config else None
+    except Exception as e:
+        module_logger.warning(f"Nie udało się wczytać katalogu parametrów: {e}")
+        plan = None
+    if plan:
+        return set(plan)
+    
+    # Fallback: użyj starej konfiguracji GRIB_FILTER_CONFIG (wszystkie zmienne na wszystkich poziomach)
+    plan = set()
+    all_levels = GRIB_FILTER_CONFIG['levels'] + GRIB_FILTER_CONFIG['surface_levels']
+    all_vars = GRIB_FILTER_CONFIG['variables'] + GRIB_FILTER_CONFIG['surface_variables']
+    for var in all_vars:
+        for level in all_levels:
+            plan.add((var, f'lev_{level}'))
+    
+    return plan
 
 def build_grib_filter_url(date_str, hour_str, forecast_hour, resolution='0p25', params_config=None):
     """
     Buduje URL dla GRIB Filter API z wybranymi parametrami z konfiguracji.
     Format zgodny z dokumentacją NOMADS: https://nomads.ncep.noaa.gov/cgi-bin/filter_gfs.pl
     """
-    # Base URL - używa filter_gfs.pl (nie filter_gfs_0p25.pl)
-    base_url = f"https://nomads.ncep.noaa.gov/cgi-bin/filter_gfs.pl"
-    
-    # Wczytaj konfigurację parametrów jeśli nie podano
-    if params_config is None:
-        params_config, _ = load_parameters_config()
-    
-    # Parametry URL
-    params = {
-        'file': f'gfs.t{hour_str}z.pgrb2.{resolution}.f{forecast_hour:03d}',
-        'dir': f'/gfs.{date_str}/{hour_str}/atmos',
-    }
-    
-    # Jeśli mamy konfigurację parametrów, użyj jej
-    if params_config:
-        # Mapowanie nazw GRIB na nazwy w API NOMADS
-        grib_to_nomads = {
-            't2m': 'TMP',
-            'd2m': 'DPT',
-            'r2': 'RH',
-            'u10': 'UGRD',
-            'v10': 'VGRD',
-            'u80': 'UGRD',
-            'v80': 'VGRD',
-            't80': 'TMP',
-            'gust': 'GUST',
-            'prmsl': 'PRMSL',
-            'tp': 'APCP',
-            'prate': 'PRATE',
-            'tcc': 'TCDC',
-            'lcc': 'LCDC',
-            'mcc': 'MCDC',
-            'hcc': 'HCDC',
-            'vis': 'VIS',
-            'dswrf': 'DSWRF',
-            'cape': 'CAPE',
-            'cin': 'CIN',
-            'pwat': 'PWAT',
-            't_850': 'TMP',
-            'gh_850': 'HGT',
-            'gh_500': 'HGT',
-        }
-        
-        # Zbierz unikalne kombinacje var+level
-        var_level_combos = set()
-        
-        for grib_name, config_data in params_config.items():
-            level_type = config_data['level_type']
-            level_value = config_data['level_value']
-            nomads_var = grib_to_nomads.get(grib_name, grib_name.upper())
-            
-            # Buduj klucz dla poziomu (format NOMADS)
-            if level_type == 'isobaricInhPa' and isinstance(level_value, int):
-                level_key = f'lev_{level_value}_mb'
-            elif level_type == 'heightAboveGround' and isinstance(level_value, int):
-                level_key = f'lev_{level_value}_m'
-            elif level_type == 'surface':
-                level_key = 'lev_surface'
-            elif level_type == 'meanSea':
-                level_key = 'lev_mean_sea_level'
-            elif level_type == 'entireAtmosphere':
-                level_key = 'lev_entire_atmosphere'
-            else:
-                continue  # Pomiń nieznane typy poziomów
-            
-            var_level_combos.add((nomads_var, level_key))
-        
-        # Dodaj parametry do URL (NOMADS wymaga var_ i lev_ osobno)
-        for nomads_var, level_key in var_level_combos:
-            params[f'var_{nomads_var}'] = 'on'
-            params[level_key] = 'on'
-    else:
-        # Fallback: użyj starej konfiguracji GRIB_FILTER_CONFIG
-        # Dodaj poziomy izobaryczne (uproszczone nazwy)
-        for level in GRIB_FILTER_CONFIG['levels']:
-            params[f'lev_{level}'] = 'on'
-        
-        # Dodaj poziomy powierzchniowe
-        for level in GRIB_FILTER_CONFIG['surface_levels']:
-            params[f'lev_{level}'] = 'on'
-        
-        # Dodaj zmienne atmosferyczne (dla poziomów izobarycznych)
-        for var in GRIB_FILTER_CONFIG['variables']:
-            params[f'var_{var}'] = 'on'
-        
-        # Dodaj zmienne powierzchniowe
-        for var in GRIB_FILTER_CONFIG['surface_variables']:
-            params[f'var_{var}'] = 'on'
-    
-    # Buduj URL
-    url = f"{base_url}?{urlencode(params)}"
+    plan = build_download_plan(params_config)
+    url = NomadsFilterSource(resolution=resolution).build_url(date_str, hour_str, forecast_hour, plan)
     
     # Loguj URL dla debugowania (tylko pierwsze 500 znaków)
     if forecast_hour is not None and forecast_hour <= 1:
@@ -372,118 +202,54 @@ def get_timestamp():
     """Zwraca timestamp w formacie YYYY-MM-DD HH:MM:SS"""
     return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
-def download_grib_filtered(url_or_date_str, output_path, max_retries=3, forecast_hour=None, hour_str=None, resolution='0p25', params_config=None):
+def download_grib_filtered(url_or_date_str, output_path, max_retries=3, forecast_hour=None, hour_str=None, resolution='0p25', params_config=None, sources=None):
     """
-    Pobiera plik GRIB używając GRIB Filter API (z filtrowaniem na serwerze).
-    Może przyjąć URL (string) lub date_str (wtedy buduje URL).
+    Pobiera plik GRIB (tylko wybrane parametry).
+    Może przyjąć URL (string) lub date_str - wtedy pobiera przez łańcuch źródeł
+    (sources, domyślnie sekcja [source] z config.ini) z przełączaniem awaryjnym.
     Zwraca (success, file_size_bytes).
     """
+    fh_str = f"f{forecast_hour:03d}" if forecast_hour is not None else "?"
+    
     # Jeśli pierwszy parametr to URL (zawiera 'http'), użyj go bezpośrednio
-    date_str = None
+    url = None
     if isinstance(url_or_date_str, str) and url_or_date_str.startswith('http'):
         url = url_or_date_str
         # Spróbuj wyciągnąć date_str i hour_str z URL dla fallback
-        # URL format Filter API: ...?dir=%2Fgfs.20251120%2F12%2Fatmos&file=...
-        # Lub bezpośredni URL: .../gfs.{date_str}/{hour_str}/atmos/...
-        import re
-        
-        # Najpierw spróbuj z query string (Filter API)
-        parsed = urlparse(url_or_date_str)
-        query_params = parse_qs(parsed.query)
-        if 'dir' in query_params:
-            dir_param = unquote(query_params['dir'][0])
-            match = re.search(r'/gfs\.(\d{8})/(\d{2})/atmos', dir_param)
-            if match:
-                date_str = match.group(1)
-                if hour_str is None:
-                    hour_str = match.group(2)
-        
-        # Jeśli nie znaleziono w query string, spróbuj z path
-        if not date_str:
-            match = re.search(r'/gfs\.(\d{8})/(\d{2})/atmos/', url_or_date_str)
-            if match:
-                date_str = match.group(1)
-                if hour_str is None:
-                    hour_str = match.group(2)
+        date_str, url_hour_str = parse_run_from_url(url)
+        if hour_str is None:
+            hour_str = url_hour_str
     else:
-        # W przeciwnym razie, zbuduj URL z parametrów
         date_str = url_or_date_str
         if hour_str is None:
             raise ValueError("hour_str jest wymagany gdy podano date_str")
-        url = build_grib_filter_url(date_str, hour_str, forecast_hour, resolution, params_config)
-    
-    fh_str = f"f{forecast_hour:03d}" if forecast_hour is not None else "?"
+        if sources is None:
+            sources = get_default_sources()
+        plan = build_download_plan(params_config)
+        if params_config is None:
+            params_config, _ = load_parameters_config()
     
     for attempt in range(max_retries):
         try:
             print(f"{get_timestamp()} - [{fh_str}] Próba {attempt+1}/{max_retries}: Pobieranie...", flush=True)
             
-            # Rate limiting
-            wait_for_rate_limit()
-            
-            # Pobierz plik (zwiększony timeout dla dużych plików)
-            print(f"{get_timestamp()} - [{fh_str}] Wysyłanie zapytania HTTP...", flush=True)
-            response = requests.get(url, timeout=300, stream=True)  # 5 minut timeout
-            
-            print(f"{get_timestamp()} - [{fh_str}] Status: {response.status_code}", flush=True)
-            
-            # Obsługa HTTP 429 (Too Many Requests)
-            if response.status_code == 429:
-                retry_after = int(response.headers.get('Retry-After', 60))
-                print(f"{get_timestamp()} - [{fh_str}] ⚠️ HTTP 429 - czekam {retry_after}s", flush=True)
-                time.sleep(retry_after)
-                continue
-            
-            if response.status_code != 200:
-                print(f"{get_timestamp()} - [{fh_str}] ✗ HTTP {response.status_code} z GRIB Filter API", flush=True)
+            if url is not None:
+                # Pobierz podany URL (Filter API)
+                success, file_size = NomadsFilterSource(resolution=resolution).download_url(url, output_path, fh_str)
                 
-                # FALLBACK: Jeśli Filter API zwraca 404, spróbuj bezpośredniego pobierania
-                if response.status_code == 404 and forecast_hour is not None:
-                    # Jeśli nie mamy date_str i hour_str, spróbuj wyciągnąć z URL jeszcze raz
-                    if not date_str or not hour_str:
-                        import re
-                        parsed = urlparse(url)
-                        query_params = parse_qs(parsed.query)
-                        if 'dir' in query_params:
-                            dir_param = unquote(query_params['dir'][0])
-                            match = re.search(r'/gfs\.(\d{8})/(\d{2})/atmos', dir_param)
-                            if match:
-                                date_str = match.group(1)
-                                hour_str = match.group(2)
-                    
-                    if date_str and hour_str:
-                        # Pobierz bezpośrednio plik GRIB (bez filtrowania)
-                        direct_url = f"https://nomads.ncep.noaa.gov/pub/data/nccf/com/gfs/prod/gfs.{date_str}/{hour_str}/atmos/gfs.t{hour_str}z.pgrb2.{resolution}.f{forecast_hour:03d}"
-                        print(f"{get_timestamp()} - [{fh_str}] ⚠️ Filter API zwraca 404, próbuję bezpośredniego pobierania z {direct_url}...", flush=True)
-                    wait_for_rate_limit()
-                    response = requests.get(direct_url, timeout=300, stream=True)
-                    if response.status_code == 200:
-                        print(f"{get_timestamp()} - [{fh_str}] ✓ Bezpośrednie pobieranie działa, kontynuuję...", flush=True)
-                        # Kontynuuj z bezpośrednim pobieraniem (plik będzie większy, ale działa)
-                    else:
-                        print(f"{get_timestamp()} - [{fh_str}] ✗ Bezpośrednie pobieranie też zwraca {response.status_code}", flush=True)
-                        if attempt < max_retries - 1:
-                            time.sleep(2 ** attempt)
-                            continue
-                        return False, 0
-                else:
-                    if attempt < max_retries - 1:
-                        time.sleep(2 ** attempt)
-                        continue
-                    return False, 0
+                # FALLBACK: Jeśli Filter API nie działa, spróbuj bezpośredniego pobierania (plik będzie większy, ale działa)
+                if not success and date_str and hour_str and forecast_hour is not None:
+                    print(f"{get_timestamp()} - [{fh_str}] ⚠️ Filter API nie działa, próbuję bezpośredniego pobierania...", flush=True)
+                    success, file_size = NomadsRawSource(resolution=resolution).fetch(date_str, hour_str, forecast_hour, output_path, fh_str=fh_str)
+            else:
+                success, file_size = sources.fetch(date_str, hour_str, forecast_hour, output_path, plan, fh_str)
             
-            # Zapisz plik
-            print(f"{get_timestamp()} - [{fh_str}] Zapisuję plik...", flush=True)
-            file_size = 0
-            chunk_count = 0
-            with open(output_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-                        file_size += len(chunk)
-                        chunk_count += 1
-                        if chunk_count % 1000 == 0:
-                            print(f"{get_timestamp()} - [{fh_str}] Pobrano {file_size / (1024*1024):.1f} MB...", flush=True)
+            if not success:
+                print(f"{get_timestamp()} - [{fh_str}] ✗ Żadne źródło nie zwróciło pliku", flush=True)
+                if attempt < max_retries - 1:
+                    time.sleep(2 ** attempt)
+                    continue
+                return False, 0
             
             print(f"{get_timestamp()} - [{fh_str}] ✓ Pobrano {file_size / (1024*1024):.1f} MB", flush=True)
             
@@ -497,13 +263,28 @@ def download_grib_filtered(url_or_date_str, output_path, max_retries=3, forecast
                     continue
                 return False, 0
             
+            # Weryfikacja ramek GRIB i zawartości (tylko nagłówki, bez dekodowania) - zły plik pobieramy ponownie.
+            # Liczba wiadomości wg .idx tylko z pliku już pobranego (Range w buckecie, katalog lokalny) -
+            # po Filter API bez dodatkowego zapytania do NOMADS, sprawdzane są same nagłówki
+            if url is None:
+                idx_text = sources.cached_index(date_str, hour_str, forecast_hour)
+                # Zawartość sprawdzamy tylko dla planu z [gfs_parameters] (fallback GRIB_FILTER_CONFIG to iloczyn kartezjański)
+                verification = verify_grib_file(output_path, plan if params_config else None,
+                                                 parse_idx(idx_text) if idx_text else None)
+            else:
+                verification = verify_grib_file(output_path)
+            if not verification['ok']:
+                print(f"{get_timestamp()} - [{fh_str}] ✗ Weryfikacja GRIB nieudana ({verification['messages']} wiadomości): {'; '.join(verification['errors'])}", flush=True)
+                if os.path.exists(output_path):
+                    os.remove(output_path)
+                if attempt < max_retries - 1:
+                    time.sleep(2 ** attempt)
+                    continue
+                return False, 0
+            print(f"{get_timestamp()} - [{fh_str}] ✓ Weryfikacja GRIB OK ({verification['messages']} wiadomości)", flush=True)
+            
             return True, file_size
             
-        except requests.exceptions.Timeout:
-            print(f"{get_timestamp()} - [{fh_str}] ✗ Timeout (attempt {attempt+1}/{max_retries})", flush=True)
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)
-            continue
         except Exception as e:
             print(f"{get_timestamp()} - [{fh_str}] ✗ Błąd: {e}", flush=True)
             import traceback
@@ -514,53 +295,19 @@ def download_grib_filtered(url_or_date_str, output_path, max_retries=3, forecast
     
     return False, 0
 
-def check_gfs_availability(date_str, hour_str, forecast_hour, verbose=False):
+def check_gfs_availability(date_str, hour_str, forecast_hour, verbose=False, sources=None):
     """
-    Sprawdza czy dana prognoza GFS jest dostępna.
-    Używa bezpośredniego URL do pliku .idx (index file) zamiast GRIB Filter API,
+    Sprawdza czy dana prognoza GFS jest dostępna w którymkolwiek źródle.
+    Źródła HTTP sprawdzają najpierw plik .idx (index file), potem sam plik GRIB,
     bo Filter API może zwracać 404 nawet jeśli plik istnieje.
     """
-    # Sprawdź dostępność pliku .idx (index file) - jest zawsze dostępny jeśli plik GRIB istnieje
-    base_path = f"/pub/data/nccf/com/gfs/prod/gfs.{date_str}/{hour_str}/atmos/gfs.t{hour_str}z.pgrb2.0p25.f{forecast_hour:03d}"
-    idx_url = f"https://nomads.ncep.noaa.gov{base_path}.idx"
-    
-    # Alternatywnie sprawdź bezpośredni URL do pliku GRIB
-    grib_url = f"https://nomads.ncep.noaa.gov{base_path}"
-    
+    if sources is None:
+        sources = get_default_sources()
     try:
-        wait_for_rate_limit()
-        # Najpierw sprawdź plik .idx (szybszy i bardziej niezawodny)
-        response = requests.head(idx_url, timeout=10, allow_redirects=True)
-        
-        if response.status_code == 429:
-            retry_after = int(response.headers.get('Retry-After', 60))
-            if verbose:
-                module_logger.debug(f"HTTP 429 - czekam {retry_after}s")
-            time.sleep(retry_after)
-            wait_for_rate_limit()
-            response = requests.head(idx_url, timeout=10, allow_redirects=True)
-        
-        if response.status_code == 200:
-            if verbose:
-                module_logger.debug(f"✓ Dane dostępne (f{forecast_hour:03d}) - plik .idx istnieje")
-            return True
-        
-        # Jeśli .idx nie istnieje, sprawdź bezpośrednio plik GRIB
-        if response.status_code == 404:
-            wait_for_rate_limit()
-            response = requests.head(grib_url, timeout=10, allow_redirects=True)
-            if response.status_code == 200:
-                if verbose:
-                    module_logger.debug(f"✓ Dane dostępne (f{forecast_hour:03d}) - plik GRIB istnieje")
-                return True
-            
-    except requests.exceptions.Timeout:
-        if verbose:
-            module_logger.debug(f"Timeout sprawdzania dostępności")
+        return sources.is_available(date_str, hour_str, forecast_hour, verbose)
     except Exception as e:
         if verbose:
             module_logger.debug(f"Błąd sprawdzania: {e}")
-    
     return False
 
 def get_required_forecast_hours():
@@ -582,9 +329,50 @@ def get_required_forecast_hours():
     
     return required_hours
 
-def get_existing_forecast_hours(run_time, engine=None):
+def _query_forecast_hours(conn, run_time, table='gfs_forecast', region_id=None):
+    """forecast_hour zapisane w tabeli dla run_time (opcjonalnie tylko dla region_id)"""
+    run_time_str = run_time.strftime('%Y-%m-%d %H:%M:%S')
+    condition = ""
+    params = {"run_time": run_time_str}
+    if region_id:
+        condition = f" AND {gfs_regions.REGION_ID_COLUMN} = :region_id"
+        params['region_id'] = region_id
+    
+    result = conn.execute(text(f"""
+        SELECT DISTINCT forecast_time
+        FROM {table}
+        WHERE DATE_FORMAT(run_time, '%Y-%m-%d %H:%i:%s') = :run_time{condition}
+        ORDER BY forecast_time
+    """), params)
+    
+    existing_hours = set()
+    rows = result.fetchall()
+    
+    for row in rows:
+        forecast_time = row[0]
+        
+        if isinstance(forecast_time, str):
+            try:
+                for fmt in ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d %H:%M']:
+                    try:
+                        forecast_time = datetime.strptime(forecast_time, fmt)
+                        break
+                    except:
+                        continue
+            except:
+                continue
+        
+        if isinstance(forecast_time, datetime):
+            time_diff = forecast_time - run_time
+            forecast_hour = int(time_diff.total_seconds() / 3600)
+            existing_hours.add(forecast_hour)
+    
+    return existing_hours
+
+def get_existing_forecast_hours(run_time, engine=None, regions=None):
     """
     Zwraca set forecast_hour które są już w bazie dla danego run_time.
+    regions (gfs_regions.Region) - godzina jest pobrana, gdy jest w bazie dla KAŻDEGO regionu.
     """
     if engine is None:
         try:
@@ -596,44 +384,20 @@ def get_existing_forecast_hours(run_time, engine=None):
     
     try:
         with engine.connect() as conn:
-            run_time_str = run_time.strftime('%Y-%m-%d %H:%M:%S')
-            
-            result = conn.execute(text("""
-                SELECT DISTINCT forecast_time
-                FROM gfs_forecast
-                WHERE DATE_FORMAT(run_time, '%Y-%m-%d %H:%i:%s') = :run_time
-                ORDER BY forecast_time
-            """), {"run_time": run_time_str})
-            
-            existing_hours = set()
-            rows = result.fetchall()
-            
-            for row in rows:
-                forecast_time = row[0]
-                
-                if isinstance(forecast_time, str):
-                    try:
-                        for fmt in ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d %H:%M']:
-                            try:
-                                forecast_time = datetime.strptime(forecast_time, fmt)
-                                break
-                            except:
-                                continue
-                    except:
-                        continue
-                
-                if isinstance(forecast_time, datetime):
-                    time_diff = forecast_time - run_time
-                    forecast_hour = int(time_diff.total_seconds() / 3600)
-                    existing_hours.add(forecast_hour)
+            if not regions:
+                return _query_forecast_hours(conn, run_time)
             
+            existing_hours = None
+            for target in sorted({(region.table, region.region_id or '') for region in regions}):
+                hours = _query_forecast_hours(conn, run_time, *target)
+                existing_hours = hours if existing_hours is None else existing_hours & hours
             return existing_hours
             
     except Exception as e:
         print(f"⚠ Błąd sprawdzania forecast_hour w bazie: {e}")
         return set()
 
-def find_latest_gfs_run(engine=None):
+def find_latest_gfs_run(engine=None, sources=None):
     """Znajduje najnowszy dostępny run GFS (szuka nowszego niż w bazie)"""
     if engine is None:
         try:
@@ -679,7 +443,7 @@ def find_latest_gfs_run(engine=None):
             continue
         
         # Sprawdź dostępność pierwszej prognozy (f000)
-        if check_gfs_availability(date_str, hour_str, 0):
+        if check_gfs_availability(date_str, hour_str, 0, sources=sources):
             found_run = check_time
             break
     
@@ -690,28 +454,864 @@ def find_latest_gfs_run(engine=None):
     
     return None, None, None
 
-def process_grib_to_db_filtered(grib_path, run_time, forecast_hour, lat_min, lat_max, lon_min, lon_max, engine, params_config=None, cfgrib_to_config=None, csv_backup_dir=None):
+def _open_grib_variables_cfgrib(grib_path, fh_str, params_config, cfgrib_to_config):
+    """
+    Fallback: otwiera plik przez cfgrib osobno dla KAŻDEGO typeOfLevel (i poziomu heightAboveGround/isobaricInhPa),
+    ponieważ xarray/cfgrib nie może otworzyć wszystkich poziomów naraz. Każde otwarcie skanuje cały plik.
+    Indeks cfgrib jest budowany raz i współdzielony przez wszystkie otwarcia (CfgribIndexCache).
+    Zwraca (all_data_vars, coords_dict).
+    """
+    all_data_vars = {}
+    coords_dict = None
+    index_cache = gfs_grib_decode.CfgribIndexCache(grib_path)
+    
+    # Lista poziomów do otwarcia - dla heightAboveGround otwieramy każdy poziom osobno
+    # Najpierw sprawdź jakie poziomy heightAboveGround są w konfiguracji
+    height_levels = []
+    isobaric_levels = []
+    if params_config:
+        for config_name, param_info in params_config.items():
+            level_type = param_info.get('level_type')
+            level_value = param_info.get('level_value')
+            if level_type == 'heightAboveGround' and isinstance(level_value, int):
+                if level_value not in height_levels:
+                    height_levels.append(level_value)
+            elif level_type == 'isobaricInhPa' and isinstance(level_value, int):
+                if level_value not in isobaric_levels:
+                    isobaric_levels.append(level_value)
+    
+    # Lista typów poziomów, które mogą być w pliku
+    type_of_levels = [
+        ('isobaricInhPa', None),        # Poziomy izobaryczne (będą filtrowane po konkretnych poziomach)
+        ('surface', None),              # Powierzchnia
+        ('meanSea', None),              # Poziom morza
+        ('tropopause', None),           # Tropopauza
+        ('maxWind', None),              # Maksymalny poziom wiatru
+        ('entireAtmosphere', None),     # Cała atmosfera
+    ]
+    
+    # Dodaj heightAboveGround dla każdego poziomu osobno
+    for height in height_levels:
+        type_of_levels.append(('heightAboveGround', height))
+    
+    # Otwórz plik dla każdego typeOfLevel osobno
+    for level_type, level_value in type_of_levels:
+        try:
+            if level_type == 'heightAboveGround' and level_value is not None:
+                print(f"{get_timestamp()} - [{fh_str}] Próbuję otworzyć level: {level_type} (height={level_value}m)...", flush=True)
+                filter_keys = {'typeOfLevel': level_type, 'level': level_value, 'stepType': 'instant'}
+            elif level_type == 'isobaricInhPa' and isobaric_levels:
+                # Dla isobaricInhPa, otwieramy każdy poziom osobno
+                # Przetwarzamy je w pętli poniżej
+                continue
+            else:
+                print(f"{get_timestamp()} - [{fh_str}] Próbuję otworzyć level: {level_type}...", flush=True)
+                filter_keys = {'typeOfLevel': level_type}
+                if level_type == 'surface':
+                    filter_keys['stepType'] = 'instant'
+            
+            try:
+                ds = index_cache.open_dataset(filter_keys)
+            except Exception as e:
+                # Jeśli nie udało się z stepType='instant', spróbuj bez stepType
+                if level_type == 'surface':
+                    print(f"{get_timestamp()} - [{fh_str}] ⚠ Nie udało się z stepType='instant', próbuję bez stepType...", flush=True)
+                    filter_keys_no_step = {'typeOfLevel': level_type}
+                    ds = index_cache.open_dataset(filter_keys_no_step)
+                elif level_type == 'heightAboveGround' and level_value is not None:
+                    # Spróbuj bez stepType
+                    print(f"{get_timestamp()} - [{fh_str}] ⚠ Nie udało się z stepType='instant', próbuję bez stepType...", flush=True)
+                    filter_keys_no_step = {'typeOfLevel': level_type, 'level': level_value}
+                    ds = index_cache.open_dataset(filter_keys_no_step)
+                else:
+                    raise
+            
+            # Otwórz isobaricInhPa dla każdego poziomu osobno
+            if level_type == 'isobaricInhPa' and isobaric_levels:
+                for isobaric_level in isobaric_levels:
+                    try:
+                        print(f"{get_timestamp()} - [{fh_str}] Próbuję otworzyć level: {level_type} ({isobaric_level} mb)...", flush=True)
+                        filter_keys_iso = {'typeOfLevel': 'isobaricInhPa', 'level': isobaric_level}
+                        ds_iso = index_cache.open_dataset(filter_keys_iso)
+                        print(f"{get_timestamp()} - [{fh_str}] ✓ Otworzono {level_type} {isobaric_level} mb, zmienne: {list(ds_iso.data_vars.keys())}", flush=True)
+                        
+                        # Zapisz współrzędne (latitude, longitude) z pierwszego datasetu
+                        if coords_dict is None:
+                            coords_dict = {
+                                'latitude': ds_iso.latitude.values,
+                                'longitude': ds_iso.longitude.values
+                            }
+                        
+                        # Przetwarzaj zmienne dla tego poziomu izobarycznego
+                        print(f"{get_timestamp()} - [{fh_str}] DEBUG: Zmienne w {level_type} {isobaric_level} mb: {list(ds_iso.data_vars.keys())}", flush=True)
+                        for var_name in ds_iso.data_vars:
+                            var_data = ds_iso[var_name]
+                            var_level_type = 'isobaricInhPa'
+                            level_val = isobaric_level  # Użyj poziomu z filtra
+                            
+                            # Przetwarzaj zmienną (użyj tego samego kodu co poniżej)
+                            # Sprawdź czy ta zmienna jest w konfiguracji
+                            config_name = None
+                            db_column = None
+                            transformation = None
+                            
+                            key = (var_name, var_level_type, level_val)
+                            print(f"{get_timestamp()} - [{fh_str}] DEBUG: Sprawdzam klucz dla isobaric: {key}", flush=True)
+                            if key in cfgrib_to_config:
+                                config_name = cfgrib_to_config[key]
+                                print(f"{get_timestamp()} - [{fh_str}] DEBUG: ✓ Znaleziono mapowanie: {key} -> {config_name}", flush=True)
+                                if config_name in params_config:
+                                    db_column = params_config[config_name]['db_column']
+                                    transformation = params_config[config_name]['transformation']
+                            
+                            if params_config and (not config_name or not db_column):
+                                print(f"{get_timestamp()} - [{fh_str}] DEBUG: Pomijam {var_name} (key: {key}) - nie znaleziono w cfgrib_to_config", flush=True)
+                                continue
+                            
+                            # Zapisz zmienną
+                            all_data_vars[db_column] = {
+                                'data': var_data,
+                                'transformation': transformation,
+                                'config_name': config_name
+                            }
+                        
+                        ds_iso.close()
+                    except Exception as e:
+                        print(f"{get_timestamp()} - [{fh_str}] ⚠ {level_type} {isobaric_level} mb nie znaleziony: {e}", flush=True)
+                        continue
+                continue  # Przejdź do następnego poziomu
+            
+            print(f"{get_timestamp()} - [{fh_str}] ✓ Otworzono {level_type}, zmienne: {list(ds.data_vars.keys())}", flush=True)
+            
+            # Zapisz współrzędne (latitude, longitude) z pierwszego datasetu
+            if coords_dict is None:
+                coords_dict = {
+                    'latitude': ds.latitude.values,
+                    'longitude': ds.longitude.values
+                }
+            
+            # Zbierz wszystkie zmienne z tego poziomu - TYLKO TE Z KONFIGURACJI!
+            print(f"{get_timestamp()} - [{fh_str}] DEBUG: Zmienne w {level_type}: {list(ds.data_vars.keys())}", flush=True)
+            for var_name in ds.data_vars:
+                var_data = ds[var_name]
+                
+                # Określ poziom zmiennej
+                var_level_type = level_type
+                # Dla heightAboveGround z konkretnym poziomem, użyj tego poziomu (nie nadpisuj!)
+                if level_type == 'heightAboveGround' and level_value is not None:
+                    level_val = level_value
+                else:
+                    # Wyznacz level_val z danych
+                    if 'isobaricInhPa' in var_data.dims:
+                        level_vals = var_data.coords['isobaricInhPa'].values
+                        if isinstance(level_vals, np.ndarray) and level_vals.size > 0:
+                            if level_vals.size == 1:
+                                level_val = int(level_vals.item())
+                            else:
+                                # Jeśli jest wiele poziomów, sprawdź każdy
+                                level_vals = [int(v) for v in level_vals]
+                                level_val = level_vals  # Lista poziomów
+                                print(f"{get_timestamp()} - [{fh_str}] DEBUG: {var_name} ma wiele poziomów isobaricInhPa: {level_vals}", flush=True)
+                    elif 'heightAboveGround' in var_data.dims:
+                        height_vals = var_data.coords['heightAboveGround'].values
+                        if isinstance(height_vals, np.ndarray) and height_vals.size > 0:
+                            if height_vals.size == 1:
+                                level_val = int(height_vals.item())
+                            else:
+                                height_vals = [int(v) for v in height_vals]
+                                level_val = height_vals  # Lista poziomów
+                                print(f"{get_timestamp()} - [{fh_str}] DEBUG: {var_name} ma wiele poziomów heightAboveGround: {height_vals}", flush=True)
+                    else:
+                        level_val = 0  # surface, meanSea, etc.
+                
+                # DEBUG: Pokaż szczegóły zmiennej
+                print(f"{get_timestamp()} - [{fh_str}] DEBUG: Przetwarzam {var_name}, level_type={var_level_type}, level_val={level_val}", flush=True)
+                
+                # Sprawdź czy ta zmienna jest w konfiguracji
+                # Szukaj w cfgrib_to_config: (cfgrib_name, level_type, level_value) -> config_name
+                config_name = None
+                db_column = None
+                transformation = None
+                
+                if isinstance(level_val, list):
+                    # Wiele poziomów - sprawdź każdy
+                    for lv in level_val:
+                        key = (var_name, var_level_type, lv)
+                        print(f"{get_timestamp()} - [{fh_str}] DEBUG: Sprawdzam klucz dla wielu poziomów: {key}", flush=True)
+                        if key in cfgrib_to_config:
+                            config_name = cfgrib_to_config[key]
+                            print(f"{get_timestamp()} - [{fh_str}] DEBUG: ✓ Znaleziono mapowanie: {key} -> {config_name}", flush=True)
+                            if config_name in params_config:
+                                db_column = params_config[config_name]['db_column']
+                                transformation = params_config[config_name]['transformation']
+                                level_val = lv  # Użyj tego poziomu
+                                break
+                else:
+                    # Jeden poziom
+                    key = (var_name, var_level_type, level_val if level_val is not None else 0)
+                    print(f"{get_timestamp()} - [{fh_str}] DEBUG: Sprawdzam klucz dla jednego poziomu: {key}", flush=True)
+                    if key in cfgrib_to_config:
+                        config_name = cfgrib_to_config[key]
+                        print(f"{get_timestamp()} - [{fh_str}] DEBUG: ✓ Znaleziono mapowanie: {key} -> {config_name}", flush=True)
+                        if config_name in params_config:
+                            db_column = params_config[config_name]['db_column']
+                            transformation = params_config[config_name]['transformation']
+                
+                # Jeśli zmienna nie jest w konfiguracji, pomiń ją (chyba że brak konfiguracji - wtedy użyj domyślnych)
+                if params_config and (not config_name or not db_column):
+                    # DEBUG: Sprawdź dlaczego nie znaleziono mapowania
+                    if isinstance(level_val, list):
+                        debug_key = (var_name, var_level_type, level_val[0] if level_val else 0)
+                    else:
+                        debug_key = (var_name, var_level_type, level_val if level_val is not None else 0)
+                    # Sprawdź czy może być problem z typem level_val
+                    if level_val is None:
+                        debug_key_alt = (var_name, var_level_type, 0)
+                        if debug_key_alt in cfgrib_to_config:
+                            print(f"{get_timestamp()} - [{fh_str}] DEBUG: Znaleziono alternatywny klucz {debug_key_alt} dla {var_name}", flush=True)
+                            config_name = cfgrib_to_config[debug_key_alt]
+                            if config_name in params_config:
+                                db_column = params_config[config_name]['db_column']
+                                transformation = params_config[config_name]['transformation']
+                                level_val = 0
+                    if not config_name or not db_column:
+                        print(f"{get_timestamp()} - [{fh_str}] DEBUG: Pomijam {var_name} (key: {debug_key}) - nie znaleziono w cfgrib_to_config", flush=True)
+                        # DEBUG: Pokaż podobne klucze w cfgrib_to_config
+                        similar_keys = [k for k in cfgrib_to_config.keys() if k[0] == var_name or k[1] == var_level_type]
+                        if similar_keys:
+                            print(f"{get_timestamp()} - [{fh_str}] DEBUG: Podobne klucze w cfgrib_to_config: {similar_keys[:5]}", flush=True)
+                        continue
+                
+                # Jeśli jest wiele poziomów, wybierz tylko ten z konfiguracji
+                if isinstance(level_val, list):
+                    # Wybierz tylko poziom z konfiguracji
+                    if var_level_type == 'isobaricInhPa':
+                        var_data = var_data.sel(isobaricInhPa=level_val)
+                    elif var_level_type == 'heightAboveGround':
+                        var_data = var_data.sel(heightAboveGround=level_val)
+                
+                # Walidacja poziomu
+                if level_val is not None:
+                    if var_level_type == 'isobaricInhPa':
+                        if level_val in [999, 995, 996, 997, 998] or level_val == 0:
+                            continue
+                    elif var_level_type == 'heightAboveGround':
+                        if level_val in [0, 999, 995, 996, 997, 998]:
+                            continue
+                
+                # Jeśli brak konfiguracji, użyj domyślnej nazwy z sufiksem
+                if not params_config or not db_column:
+                    # Fallback: dodaj sufiks z poziomem do nazwy zmiennej
+                    if 'isobaricInhPa' in var_data.dims:
+                        level_val_float = float(level_val) if level_val is not None else 0
+                        full_var_name = f"{var_name}_{int(level_val_float)}_mb"
+                    elif 'heightAboveGround' in var_data.dims:
+                        level_val_float = float(level_val) if level_val is not None else 0
+                        full_var_name = f"{var_name}_{int(level_val_float)}m"
+                    else:
+                        full_var_name = var_name
+                    db_column = full_var_name
+                    transformation = 'none'
+                
+                # Zapisz zmienną z nazwą kolumny bazy jako klucz
+                all_data_vars[db_column] = {
+                    'data': var_data,
+                    'transformation': transformation,
+                    'config_name': config_name
+                }
+            
+            ds.close()
+            
+        except Exception as e:
+            # Jeśli dany typeOfLevel nie istnieje w pliku, po prostu pomiń
+            print(f"{get_timestamp()} - [{fh_str}] ⚠ {level_type} nie znaleziony: {e}", flush=True)
+            continue
+    
+    print(f"{get_timestamp()} - [{fh_str}] {index_cache.summary()}", flush=True)
+    return all_data_vars, coords_dict
+
+def _open_grib_variables_eccodes(grib_path, fh_str, params_config, cfgrib_to_config, decode_pool=None, region=None, message_threads=None):
+    """
+    Jeden przebieg ecCodes po wiadomościach pliku (gfs_grib_decode) - dekodowane są tylko
+    wiadomości z konfiguracji. Zwraca (all_data_vars, coords_dict) w tym samym formacie co
+    _open_grib_variables_cfgrib, więc dalsze przetwarzanie się nie zmienia.
+    Z decode_pool dekodowanie i wycięcie regionu (region) odbywa się w procesie puli.
+    message_threads - wątki dekodujące wiadomości pliku (bez puli procesów; z pulą - ustawienie puli).
+    Region jest wycinany indeksami z cache geometrii siatki; coords_dict['region'] zawiera gotowe
+    kolumny współrzędnych regionu (gfs_grib_decode.region_geometry).
+    """
+    routing = gfs_catalog.routing_table(params_config, cfgrib_to_config) if params_config else None
+    
+    start = time.time()
+    if decode_pool is not None:
+        decoded = decode_pool.decode(grib_path, routing, region, fh_str=fh_str)
+    else:
+        decoded = gfs_grib_decode.decode_grib_messages(grib_path, routing, fh_str=fh_str, threads=message_threads)
+        if region is not None:
+            decoded = gfs_grib_decode.crop_region(decoded, *region)
+    print(f"{get_timestamp()} - [{fh_str}] ✓ ecCodes: {decoded['decoded']}/{decoded['messages']} wiadomości zdekodowanych w {time.time() - start:.2f}s", flush=True)
+    
+    if decoded['grid'] is None:
+        return {}, None
+    
+    coords_dict = {
+        'latitude': decoded['latitudes'],
+        'longitude': decoded['longitudes'],
+        'region': decoded.get('region')
+    }
+    
+    all_data_vars = {}
+    for db_column, field in decoded['fields'].items():
+        all_data_vars[db_column] = {
+            'data': xr.DataArray(
+                field['values'],
+                dims=('latitude', 'longitude'),
+                coords={'latitude': coords_dict['latitude'], 'longitude': coords_dict['longitude']},
+                name=field['var_name'],
+                attrs={'units': field['units']}
+            ),
+            'transformation': field['transformation'],
+            'config_name': field['config_name'],
+            'cropped': coords_dict['region'] is not None,
+            'start_step': field['start_step'],
+            'end_step': field['end_step']
+        }
+    
+    if routing:
+        missing = sorted({route['column'] for route in routing.values()} - set(all_data_vars))
+        if missing:
+            print(f"{get_timestamp()} - [{fh_str}] ⚠ Brak w pliku: {missing}", flush=True)
+    
+    return all_data_vars, coords_dict
+
+def _grid_arrays(vars_region, fh_str, region_geometry=None):
+    """
+    Tablice 2D {db_column: ndarray} wyciętych zmiennych na wspólnej siatce regionu.
+    Pomija zmienne bez wartości lub na innej siatce niż pierwsza zmienna.
+    region_geometry - gotowe współrzędne regionu z cache siatki (ścieżka ecCodes).
+    Zwraca {'latitudes', 'longitudes', 'lat_column', 'lon_column', 'columns'} lub None.
+    """
+    latitudes = longitudes = None
+    columns = {}
+    for db_column, var_data in vars_region.items():
+        try:
+            values = gfs_grib_decode.grid_values(var_data)
+        except Exception as e:
+            print(f"{get_timestamp()} - [{fh_str}] ⚠ Błąd konwersji {db_column}: {str(e)[:200]}", flush=True)
+            continue
+        
+        if latitudes is None:
+            if region_geometry is not None:
+                latitudes, longitudes = region_geometry['latitudes'], region_geometry['longitudes']
+            else:
+                latitudes, longitudes = var_data['latitude'].values, var_data['longitude'].values
+        if values.shape != (latitudes.size, longitudes.size):
+            print(f"{get_timestamp()} - [{fh_str}] ⚠ Pomijam {db_column} - inna siatka ({values.shape} zamiast {(latitudes.size, longitudes.size)})", flush=True)
+            continue
+        
+        # Transformacje jednostek nie zmieniają NaN - liczymy na surowych wartościach całego regionu
+        non_null_count = int(np.count_nonzero(~np.isnan(values)))
+        if non_null_count == 0:
+            print(f"{get_timestamp()} - [{fh_str}] ⚠ Pomijam {db_column} - brak wartości (wszystkie NaN)", flush=True)
+            continue
+        print(f"{get_timestamp()} - [{fh_str}] ✓ {db_column}: {non_null_count}/{values.size} wartości nie-NaN", flush=True)
+        columns[db_column] = values
+    
+    if not columns:
+        return None
+    return {
+        'latitudes': latitudes,
+        'longitudes': longitudes,
+        'lat_column': region_geometry['lat_column'] if region_geometry is not None else None,
+        'lon_column': region_geometry['lon_column'] if region_geometry is not None else None,
+        'columns': columns
+    }
+
+def _assemble_band(grid, rows, fh_str, transforms=None, derived=None, verbose=True, dtype=np.float64, decimals=None):
+    """
+    DataFrame pasa wierszy szerokości (rows - slice z gfs_grib_decode.latitude_bands) siatki z _grid_arrays().
+    transforms - {db_column: gfs_transforms.Transformation} wykonywane w miejscu na tablicy pasa.
+    derived (gfs_derived.DerivedFields) - pola pochodne liczone na tablicach pasa przed złożeniem macierzy.
+    dtype - typ macierzy DataFrame (float32 w trybie zwartym gfs_storage).
+    decimals - zaokrąglenie macierzy w miejscu przy złożeniu (wtedy _finalize_frame(rounded=True)).
+    Indeks DataFrame to pozycje punktów w całym regionie.
+    """
+    latitudes = grid['latitudes'][rows]
+    longitudes = grid['longitudes']
+    first_point = rows.start * longitudes.size
+    points = latitudes.size * longitudes.size
+    
+    columns = {}
+    for db_column, values in grid['columns'].items():
+        values = values[rows]
+        if transforms and db_column in transforms:
+            values = transforms[db_column].apply(values)
+        columns[db_column] = values
+    
+    if derived is not None:
+        computed = derived.compute(columns)
+        if computed and verbose:
+            print(f"{get_timestamp()} - [{fh_str}] ✓ Pola pochodne: {', '.join(computed)}", flush=True)
+    
+    lat_column = lon_column = None
+    if grid['lat_column'] is not None:
+        lat_column = grid['lat_column'][first_point:first_point + points]
+        lon_column = grid['lon_column'][first_point:first_point + points]
+    return gfs_grib_decode.assemble_wide_frame(
+        latitudes, longitudes, columns,
+        lat_column=lat_column, lon_column=lon_column, dtype=dtype, index_start=first_point, decimals=decimals
+    )
+
+def _assemble_variables(vars_region, fh_str, region_geometry=None, transforms=None, derived=None):
+    """
+    Składa wycięte zmienne {db_column: DataArray} w jeden DataFrame (cały region jednym pasem).
+    Parametry jak w _grid_arrays() i _assemble_band().
+    """
+    grid = _grid_arrays(vars_region, fh_str, region_geometry)
+    if grid is None:
+        return None
+    return _assemble_band(grid, slice(0, grid['latitudes'].size), fh_str, transforms, derived)
+
+def _finalize_frame(df, run_time, forecast_time, fh_str, debug=True, storage=None, rounded=False):
+    """
+    Metadane czasu, zaokrąglenie i usunięcie wierszy bez danych - DataFrame gotowy do zapisu.
+    debug - wypisywanie statystyk kolumn (przy przetwarzaniu pasami tylko dla jednego pasa).
+    storage (gfs_storage.StorageFormat) - w trybie zwartym zaokrąglenie wg dokładności kolumn przy zapisie.
+    rounded - macierz zaokrąglona już przy złożeniu (_assemble_band z decimals) - bez kopii bloku w round().
+    """
+    # Dodaj metadane
+    df['run_time'] = run_time
+    df['forecast_time'] = forecast_time
+    df['created_at'] = datetime.utcnow()
+    df.rename(columns={'latitude': 'lat', 'longitude': 'lon'}, inplace=True)
+    
+    # Zaokrąglij kolumny numeryczne do 2 miejsc po przecinku - jednym przebiegiem na bloku kolumn
+    # (tryb zwarty: zaokrąglenie/kwantyzacja wg dokładności kolumn w ForecastSchema.project)
+    if rounded:
+        pass
+    elif storage is None:
+        gfs_storage.round_frame(df)
+    else:
+        storage.round(df)
+    
+    # DEBUG: Sprawdź kolumny i wartości przed usunięciem NaN
+    data_cols = [c for c in df.columns if c not in ['lat', 'lon', 'run_time', 'forecast_time']]
+    if debug:
+        print(f"{get_timestamp()} - [{fh_str}] DEBUG: Kolumny w DataFrame: {list(df.columns)}", flush=True)
+        for col in data_cols[:5]:  # Sprawdź pierwsze 5 kolumn
+            non_null = df[col].notna().sum()
+            print(f"{get_timestamp()} - [{fh_str}] DEBUG: {col}: {non_null}/{len(df)} wartości nie-NaN", flush=True)
+    
+    # Usuń wiersze z samymi NaN (poza lat/lon/run_time/forecast_time)
+    if data_cols:
+        df = df.dropna(subset=data_cols, how='all')
+    
+    # DEBUG: Sprawdź po usunięciu NaN
+    if debug:
+        print(f"{get_timestamp()} - [{fh_str}] DEBUG: Po usunięciu NaN: {len(df)} wierszy", flush=True)
+        if len(df) > 0:
+            for col in data_cols[:5]:
+                non_null = df[col].notna().sum()
+                print(f"{get_timestamp()} - [{fh_str}] DEBUG: {col}: {non_null}/{len(df)} wartości nie-NaN", flush=True)
+    
+    return df
+
+def write_forecast_batch(batch, engine, fh_str, schema):
+    """
+    Zapisuje partię prognoz (DataFrame w układzie kolumnowym) do bazy.
+    Partia nie jest zamieniana na listę słowników - to_sql dostaje ją bezpośrednio.
+    schema (gfs_db_schema.ForecastSchema) - zapisywane są tylko kolumny ze schematu tabeli;
+    z schema.writer (gfs_arrow.BatchWriter) partia idzie przez LOAD DATA i do kopii zapasowej.
+    Zwraca liczbę zapisanych rekordów (0 przy błędzie).
+    """
+    print(f"{get_timestamp()} - [{fh_str}] Zapisuję {len(batch)} rekordów do bazy...", flush=True)
+    try:
+        df_final = schema.project(batch)
+        loaded = schema.writer.write(df_final, engine, schema.table, fh_str) if schema.writer is not None else None
+        if loaded is None:
+            df_final.to_sql(schema.table, engine, if_exists='append', index=False, method='multi', chunksize=1000)
+        print(f"{get_timestamp()} - [{fh_str}] ✓ Zapisano {len(df_final)} rekordów", flush=True)
+        return len(df_final)
+    except MemoryError as e:
+        print(f"{get_timestamp()} - [{fh_str}] ✗ BŁĄD PAMIĘCI przy zapisie: {e}", flush=True)
+        return 0
+    except Exception as e:
+        print(f"{get_timestamp()} - [{fh_str}] ✗ BŁĄD przy zapisie: {e}", flush=True)
+        import traceback
+        print(f"{get_timestamp()} - [{fh_str}] Traceback:\n{traceback.format_exc()}", flush=True)
+        return 0
+
+def write_released(released, engine, schema, interpolator=None):
+    """
+    Zapisuje pasy oddane przez akumulator opadów [(forecast_hour, batch)]; zwraca liczbę rekordów.
+    interpolator (gfs_interpolate.TemporalInterpolator) - zapisane pasy trafiają też do interpolacji czasowej.
+    """
+    records = 0
+    for forecast_hour, batch in released:
+        written = write_forecast_batch(batch, engine, f"f{forecast_hour:03d}", schema)
+        if written and interpolator is not None:
+            interpolator.record(forecast_hour, batch)
+        records += written
+    return records
+
+def write_forecast_band(batch, forecast_hour, engine, schema, accumulator=None, interpolator=None):
+    """
+    Zapis pasa godziny prognozy z opadami w oknach (gfs_precip.PrecipAccumulator, po begin()).
+    Pas godziny, której poprzednik jeszcze nie dotarł, czeka w akumulatorze (zapis po finish() poprzednika).
+    Zwraca (rekordy zapisane lub wstrzymane, czy zapis się powiódł).
+    """
+    if accumulator is None:
+        written = write_released([(forecast_hour, batch)], engine, schema, interpolator)
+        return written, written > 0
+    
+    ready = accumulator.place(forecast_hour, batch)
+    if not ready:
+        return len(batch), True
+    written = write_released(ready, engine, schema, interpolator)
+    return written, written > 0
+
+def write_interpolated(target, hours, engine):
+    """
+    Interpolacja czasowa (gfs_interpolate) po zapisaniu całych godzin celu (region, stacje, obszary):
+    luki, których obie godziny są już w bazie, są uzupełniane wierszami z flagą interpolated.
+    Luka zapisana częściowo jest usuwana i uzupełniana ponownie przy kolejnej godzinie.
+    Zwraca liczbę zapisanych rekordów.
+    """
+    interpolator = target.interpolator
+    if interpolator is None:
+        return 0
+    records = 0
+    for h0, h1 in interpolator.complete(hours):
+        run_time = interpolator.run_time
+        written_hours = []
+        ok = True
+        try:
+            for forecast_hour, frame in interpolator.build(h0, h1):
+                fh_str = f"f{forecast_hour:03d}"
+                forecast_time = run_time + timedelta(hours=forecast_hour)
+                batch = _finalize_frame(frame, run_time, forecast_time, fh_str, debug=False, storage=target.schema.storage)
+                if target.region_id:
+                    batch[gfs_regions.REGION_ID_COLUMN] = target.region_id
+                written = write_forecast_batch(batch, engine, fh_str, target.schema)
+                if written == 0 and len(batch) > 0:
+                    ok = False
+                    break
+                written_hours.append(forecast_hour)
+                records += written
+        except Exception as e:
+            print(f"{get_timestamp()} - [f{h0:03d}-f{h1:03d}] ✗ Błąd interpolacji czasowej ({target.name}): {e}", flush=True)
+            ok = False
+        if not ok and engine is not None:
+            for forecast_hour in written_hours:
+                delete_forecast_hour(engine, target, run_time, run_time + timedelta(hours=forecast_hour), f"f{forecast_hour:03d}")
+        interpolator.settle((h0, h1), ok)
+        if ok and not written_hours:
+            print(f"{get_timestamp()} - [f{h0:03d}-f{h1:03d}] ⚠ Interpolacja czasowa ({target.name}): brak wierszy godzin krańcowych", flush=True)
+        elif ok:
+            print(f"{get_timestamp()} - [f{h0:03d}-f{h1:03d}] ✓ Interpolacja czasowa ({target.name}): godziny pośrednie {', '.join('f%03d' % h for h in written_hours)}", flush=True)
+    return records
+
+def delete_forecast_hour(engine, region, run_time, forecast_time, fh_str):
+    """Usuwa częściowo zapisaną godzinę prognozy regionu (błąd zapisu) - godzina zostanie pobrana ponownie"""
+    condition = "run_time = :run_time AND forecast_time = :forecast_time"
+    params = {'run_time': run_time, 'forecast_time': forecast_time}
+    if region.region_id:
+        condition += f" AND {gfs_regions.REGION_ID_COLUMN} = :region_id"
+        params['region_id'] = region.region_id
+    try:
+        with engine.begin() as conn:
+            deleted = conn.execute(text(f"DELETE FROM {region.table} WHERE {condition}"), params).rowcount
+        print(f"{get_timestamp()} - [{fh_str}] Usunięto {deleted} rekordów częściowo zapisanej godziny", flush=True)
+    except Exception as e:
+        print(f"{get_timestamp()} - [{fh_str}] ⚠ Nie udało się usunąć częściowo zapisanej godziny: {e}", flush=True)
+
+def flush_precipitation(accumulator, engine, schema, target=None):
+    """
+    Zapisuje godziny wstrzymane w akumulatorze (koniec runu/przebiegu - okna bez poprzednika puste).
+    target - cel zapisu z interpolacją czasową: zapisane godziny uzupełniają też luki.
+    """
+    if accumulator is None:
+        return 0
+    released = accumulator.flush()
+    interpolator = target.interpolator if target is not None else None
+    records = write_released(released, engine, schema, interpolator)
+    if interpolator is not None:
+        records += write_interpolated(target, {forecast_hour for forecast_hour, _ in released}, engine)
+    return records
+
+def _begin_hour(target, forecast_hour, engine, precip_steps, accumulation=None, resample=None):
+    """
+    Początek zapisu godziny celu (region, stacje, obszary): begin() akumulatora opadów - zapis godzin,
+    które dzięki tej akumulacji są gotowe - i interpolatora czasowego.
+    Zwraca zbiór godzin zapisanych w całości (dla write_interpolated).
+    """
+    accumulator, interpolator = target.accumulator, target.interpolator
+    completed = set()
+    if interpolator is not None:
+        interpolator.begin(forecast_hour, precip_steps.get(accumulator.column) if accumulator is not None else None)
+    if accumulator is not None:
+        released = accumulator.begin(forecast_hour, accumulation, resample)
+        write_released(released, engine, target.schema, interpolator)
+        completed.update(fh for fh, _ in released)
+    return completed
+
+def _finish_hour(target, forecast_hour, engine, label, completed):
+    """Koniec zapisu godziny celu: finish() akumulatora opadów i interpolacja godzin zapisanych w całości"""
+    accumulator = target.accumulator
+    if accumulator is not None:
+        if accumulator.is_held(forecast_hour):
+            print(f"{get_timestamp()} - [{label}] ⏸ Zapis wstrzymany - opady czekają na: {['f%03d' % h for h in accumulator.missing(forecast_hour)]}", flush=True)
+        released = accumulator.finish(forecast_hour)
+        write_released(released, engine, target.schema, target.interpolator)
+        completed.update(fh for fh, _ in released)
+    if accumulator is None or not accumulator.is_held(forecast_hour):
+        completed.add(forecast_hour)
+    write_interpolated(target, completed, engine)
+
+def _write_region(grid, region, forecast_hour, run_time, forecast_time, engine, precip_steps, chunk_points, label):
+    """
+    Składa i zapisuje jeden region (gfs_regions.Region) z tablic prostokąta wszystkich regionów.
+    Region jest przetwarzany pasami szerokości; pola pochodne, schemat i opady - regionu.
+    Zwraca (rekordy zapisane lub wstrzymane, czy coś zostało zapisane, czy bez błędu).
+    """
+    region_grid = gfs_regions.crop_grid(grid, region.bounds)
+    accumulator = region.accumulator
+    schema = region.schema
+    storage = schema.storage if schema is not None else None
+    decimals = storage.decimals if storage is not None else gfs_storage.DEFAULT_DECIMALS
+    if region_grid['latitudes'].size == 0 or region_grid['longitudes'].size == 0:
+        print(f"{get_timestamp()} - [{label}] ⚠ Region poza siatką pliku - pomijam", flush=True)
+        return 0, False, True
+    
+    # Akumulacja opadów (cała siatka regionu, przed usunięciem wierszy) dla okien 1 h / 3 h
+    accumulation = None
+    if accumulator is not None and accumulator.column in region_grid['columns'] and accumulator.column in precip_steps:
+        precip = region_grid['columns'][accumulator.column].astype(np.float64)  # kopia - tablice prostokąta są współdzielone
+        accumulation = (precip.reshape(-1), *precip_steps[accumulator.column])
+    
+    # Mniejsza rozdzielczość dla tej godziny (sumy opadów zostają w pełnej - zmniejszane są okna)
+    resample = region.resample_for(forecast_hour)
+    resample_vector = None
+    if resample is not None:
+        plan = resample.plan(region_grid['latitudes'], region_grid['longitudes'])
+        source_shape = (region_grid['latitudes'].size, region_grid['longitudes'].size)
+        resample_vector = lambda values: plan.apply_vector(values, source_shape)
+        region_grid = plan.apply_grid(region_grid)
+        print(f"{get_timestamp()} - [{label}] Rozdzielczość: {resample} -> {region_grid['latitudes'].size}x{region_grid['longitudes'].size} punktów ({source_shape[0] * source_shape[1]} w pełnej)", flush=True)
+    
+    bands = gfs_grib_decode.latitude_bands(region_grid['latitudes'].size, region_grid['longitudes'].size, chunk_points)
+    
+    # ZŁOŻENIE I ZAPIS PASAMI: każdy pas (najwyżej chunk_points punktów) przechodzi pola pochodne,
+    # złożenie macierzy i zapis, zanim powstanie następny - pamięć nie zależy od regionu
+    if len(bands) > 1:
+        print(f"{get_timestamp()} - [{label}] Składanie {len(region_grid['columns'])} zmiennych pasami: {len(bands)} pasów po ≤{chunk_points} punktów", flush=True)
+    else:
+        print(f"{get_timestamp()} - [{label}] Składanie {len(region_grid['columns'])} zmiennych w tabelę...", flush=True)
+    
+    completed = _begin_hour(region, forecast_hour, engine, precip_steps, accumulation, resample_vector)
+    
+    records = 0
+    written_any = False
+    try:
+        for band in bands:
+            df = _assemble_band(region_grid, band, label, derived=region.derived, verbose=band.start == 0,
+                                dtype=storage.dtype if storage is not None else np.float64, decimals=decimals)
+            batch = _finalize_frame(df, run_time, forecast_time, label, debug=len(bands) == 1, storage=storage,
+                                    rounded=True)
+            del df
+            if len(batch) == 0:
+                continue
+            if region.region_id:
+                batch[gfs_regions.REGION_ID_COLUMN] = region.region_id
+            # Zapisz do bazy - kolumnowa partia (DataFrame) trafia bezpośrednio do zapisu
+            band_records, ok = write_forecast_band(batch, forecast_hour, engine, schema, accumulator, region.interpolator)
+            del batch
+            if not ok:
+                return records, written_any, False
+            records += band_records
+            written_any = written_any or accumulator is None or not accumulator.is_held(forecast_hour)
+    except MemoryError as e:
+        print(f"{get_timestamp()} - [{label}] ✗ BŁĄD PAMIĘCI: {e}", flush=True)
+        return records, written_any, False
+    except Exception as e:
+        print(f"{get_timestamp()} - [{label}] ✗ Błąd łączenia datasetu: {e}", flush=True)
+        import traceback
+        print(f"{get_timestamp()} - [{label}] Traceback:\n{traceback.format_exc()}", flush=True)
+        return records, written_any, False
+    
+    _finish_hour(region, forecast_hour, engine, label, completed)
+    
+    if records == 0:
+        print(f"{get_timestamp()} - [{label}] ✗ Brak rekordów do zapisania", flush=True)
+    elif len(bands) > 1:
+        print(f"{get_timestamp()} - [{label}] ✓ Zapisano {records} rekordów ({len(bands)} pasów)", flush=True)
+    return records, written_any, True
+
+def _write_points(grid, points, forecast_hour, run_time, forecast_time, engine, precip_steps, label):
+    """
+    Interpoluje tablice prostokąta do stacji (gfs_points.PointSet) i zapisuje je do tabeli punktów.
+    Wagi interpolacji są liczone raz dla siatki; pola pochodne są liczone na wartościach w stacjach.
+    Zwraca (rekordy zapisane lub wstrzymane, czy coś zostało zapisane, czy bez błędu).
+    """
+    accumulator = points.accumulator
+    try:
+        columns, inside = points.interpolate(grid)
+        if not inside.any():
+            print(f"{get_timestamp()} - [{label}] ⚠ Żadna stacja nie leży w siatce pliku - pomijam", flush=True)
+            return 0, False, True
+        print(f"{get_timestamp()} - [{label}] Interpolacja {len(columns)} zmiennych do {int(inside.sum())} stacji ({points.method})", flush=True)
+
+        if points.derived is not None:
+            computed = points.derived.compute(columns)
+            if computed:
+                print(f"{get_timestamp()} - [{label}] ✓ Pola pochodne: {', '.join(computed)}", flush=True)
+
+        # Opady w oknach - akumulacja w stacjach (indeks partii = pozycja stacji na liście)
+        accumulation = None
+        if accumulator is not None and accumulator.column in columns and accumulator.column in precip_steps:
+            accumulation = (np.array(columns[accumulator.column], dtype=np.float64), *precip_steps[accumulator.column])
+        completed = _begin_hour(points, forecast_hour, engine, precip_steps, accumulation)
+
+        batch = _finalize_frame(points.frame(columns, inside), run_time, forecast_time, label, debug=False, storage=points.schema.storage)
+        records, ok = write_forecast_band(batch, forecast_hour, engine, points.schema, accumulator, points.interpolator)
+        if not ok:
+            return 0, False, False
+    except MemoryError as e:
+        print(f"{get_timestamp()} - [{label}] ✗ BŁĄD PAMIĘCI: {e}", flush=True)
+        return 0, False, False
+    except Exception as e:
+        print(f"{get_timestamp()} - [{label}] ✗ Błąd interpolacji do stacji: {e}", flush=True)
+        import traceback
+        print(f"{get_timestamp()} - [{label}] Traceback:\n{traceback.format_exc()}", flush=True)
+        return 0, False, False
+
+    written_any = accumulator is None or not accumulator.is_held(forecast_hour)
+    _finish_hour(points, forecast_hour, engine, label, completed)
+    return records, written_any, True
+
+def _write_areas(grid, areas, forecast_hour, run_time, forecast_time, engine, precip_steps, label):
+    """
+    Statystyki obszarów (gfs_areas.AreaSet) z tablic prostokąta i zapis do tabeli obszarów.
+    Pola pochodne są liczone na siatce przed agregacją (średnia prędkości, nie prędkość średnich składowych).
+    Zwraca (rekordy zapisane lub wstrzymane, czy coś zostało zapisane, czy bez błędu).
+    """
+    accumulator = areas.accumulator
+    try:
+        columns = dict(grid['columns'])  # pola pochodne dopisywane do kopii słownika - tablice są współdzielone
+        if areas.derived is not None:
+            computed = areas.derived.compute(columns)
+            if computed:
+                print(f"{get_timestamp()} - [{label}] ✓ Pola pochodne: {', '.join(computed)}", flush=True)
+        aggregated, covered = areas.aggregate({**grid, 'columns': columns})
+        del columns
+        if not covered.any():
+            print(f"{get_timestamp()} - [{label}] ⚠ Żaden obszar nie leży w siatce pliku - pomijam", flush=True)
+            return 0, False, True
+        print(f"{get_timestamp()} - [{label}] Statystyki {', '.join(areas.statistics)} dla {len(aggregated)} zmiennych i {int(covered.sum()) // len(areas.statistics)} obszarów", flush=True)
+
+        # Opady w oknach - akumulacja w wierszach (stat, obszar)
+        accumulation = None
+        if accumulator is not None and accumulator.column in aggregated and accumulator.column in precip_steps:
+            accumulation = (areas.accumulation(aggregated[accumulator.column]), *precip_steps[accumulator.column])
+        completed = _begin_hour(areas, forecast_hour, engine, precip_steps, accumulation)
+
+        batch = _finalize_frame(areas.frame(aggregated, covered), run_time, forecast_time, label, debug=False, storage=areas.schema.storage)
+        records, ok = write_forecast_band(batch, forecast_hour, engine, areas.schema, accumulator, areas.interpolator)
+        if not ok:
+            return 0, False, False
+    except MemoryError as e:
+        print(f"{get_timestamp()} - [{label}] ✗ BŁĄD PAMIĘCI: {e}", flush=True)
+        return 0, False, False
+    except Exception as e:
+        print(f"{get_timestamp()} - [{label}] ✗ Błąd statystyk obszarów: {e}", flush=True)
+        import traceback
+        print(f"{get_timestamp()} - [{label}] Traceback:\n{traceback.format_exc()}", flush=True)
+        return 0, False, False
+
+    written_any = accumulator is None or not accumulator.is_held(forecast_hour)
+    _finish_hour(areas, forecast_hour, engine, label, completed)
+    return records, written_any, True
+
+def _write_profiles(profiles, profile_set, forecast_hour, run_time, forecast_time, engine, label):
+    """
+    Profile pionowe (gfs_profiles.ProfileSet) z tablic poziomów i zapis do tabeli profili.
+    Zwraca (rekordy zapisane, czy coś zostało zapisane, czy bez błędu).
+    """
+    try:
+        profiles = profile_set.apply_resample(profiles, forecast_hour)
+        batch = profile_set.frame(profiles)
+        if batch.empty:
+            print(f"{get_timestamp()} - [{label}] ⚠ Brak wartości profili w prostokącie - pomijam", flush=True)
+            return 0, False, True
+        print(f"{get_timestamp()} - [{label}] Profile: {len(profiles['stacks'])} zmiennych x {len(profile_set.levels)} poziomów, {len(batch)} wierszy", flush=True)
+        if engine is not None:
+            profile_set.write_levels(engine, run_time)
+        batch = _finalize_frame(batch, run_time, forecast_time, label, debug=False)
+        records = write_forecast_batch(batch, engine, label, profile_set.schema)
+        if records == 0:
+            return 0, False, False
+    except MemoryError as e:
+        print(f"{get_timestamp()} - [{label}] ✗ BŁĄD PAMIĘCI: {e}", flush=True)
+        return 0, False, False
+    except Exception as e:
+        print(f"{get_timestamp()} - [{label}] ✗ Błąd profili pionowych: {e}", flush=True)
+        import traceback
+        print(f"{get_timestamp()} - [{label}] Traceback:\n{traceback.format_exc()}", flush=True)
+        return 0, False, False
+    return records, True, True
+
+def process_grib_to_db_filtered(grib_path, run_time, forecast_hour, lat_min, lat_max, lon_min, lon_max, engine, params_config=None, cfgrib_to_config=None, csv_backup_dir=None, decode_pool=None, schema=None, transforms=None, derived=None, accumulator=None, chunk_points=None, regions=None, message_threads=None, quality=None):
     """
     Przetwarza plik GRIB (pofiltrowany) i zapisuje do bazy danych.
     Używa konfiguracji parametrów z config.ini - tylko parametry zdefiniowane w konfiguracji są przetwarzane!
     
-    POPRAWKA: Otwiera plik dla KAŻDEGO typeOfLevel osobno,
-    ponieważ xarray/cfgrib nie może otworzyć wszystkich poziomów naraz.
+    Plik jest dekodowany jednym przebiegiem ecCodes (gfs_grib_decode); gdy ecCodes nie jest
+    dostępny lub dekodowanie się nie powiedzie - fallback na cfgrib (osobno dla każdego typeOfLevel).
+    decode_pool (gfs_decode_pool.DecodePool) - dekodowanie w osobnym procesie zamiast w wątku wywołującym.
+    schema (gfs_db_schema.ForecastSchema) - kolumny tabeli ustalone przy starcie; None = tylko wg konfiguracji.
+    transforms (gfs_transforms.TransformRegistry) - transformacje jednostek; None = wczytaj z config.ini.
+    derived (gfs_derived.DerivedFields) - pola pochodne ([derived_fields]); None = wczytaj z config.ini.
+    accumulator (gfs_precip.PrecipAccumulator) - opady w oknach 1 h / 3 h z akumulacji tp (wspólny dla runu).
+    chunk_points - limit punktów pasa szerokości (pola pochodne, złożenie i zapis pasami);
+    None = [processing] chunk_points z config.ini, 0 = cały region naraz.
+    regions - lista gfs_regions.Region (przygotowanych, z akumulatorami) zasilanych z jednego dekodowania;
+    wtedy lat_min..lon_max, schema, derived i accumulator są pomijane. None = jeden region z lat_min..lon_max.
+    message_threads - wątki dekodujące wiadomości tego pliku równolegle (niezależnie od liczby godzin
+    przetwarzanych naraz); None = [threading] decode_message_threads z config.ini, 1 = kolejno.
+    quality (gfs_quality.QualityGate) - kontrola jakości przed zapisem (wspólna dla runu - liczniki i próby);
+    None = wczytaj z config.ini. Godzina w kwarantannie nie jest zapisywana (0 rekordów - pobranie ponownie).
+    Zwraca liczbę rekordów (0 przy błędzie - godzina jest wtedy usuwana ze wszystkich regionów).
     """
     fh_str = f"f{forecast_hour:03d}"
     
     # Wczytaj konfigurację jeśli nie podano
     if params_config is None or cfgrib_to_config is None:
         params_config, cfgrib_to_config = load_parameters_config()
+    if regions is None:
+        region = gfs_regions.Region(gfs_regions.DEFAULT_REGION, (lat_min, lat_max, lon_min, lon_max))
+        region.derived = derived if derived is not None else gfs_derived.load_derived_fields(params_config=params_config)
+        if schema is None:
+            precip_columns = list(accumulator.windows) if accumulator is not None else []
+            schema = ForecastSchema(params_config, derived_columns=region.derived.outputs + precip_columns,
+                                    storage=gfs_storage.load_storage(params_config=params_config),
+                                    writer=gfs_arrow.load_batch_writer())
+        region.schema = schema
+        region.accumulator = accumulator
+        regions = [region]
+    if transforms is None:
+        transforms = gfs_transforms.load_registry()
+    if chunk_points is None:
+        chunk_points = gfs_grib_decode.load_chunk_points()
+    if message_threads is None and decode_pool is None:
+        message_threads = gfs_grib_decode.load_message_threads()
+    if quality is None:
+        quality = gfs_quality.load_quality_gate(params_config=params_config)
+    
+    # Dekodowanie i wycięcie raz - prostokąt obejmujący wszystkie regiony
+    lat_min, lat_max, lon_min, lon_max = gfs_regions.union_bounds(regions)
     
-    # DEBUG: Pokaż mapowanie
-    print(f"{get_timestamp()} - [{fh_str}] DEBUG: Załadowano {len(params_config)} parametrów z konfiguracji", flush=True)
-    print(f"{get_timestamp()} - [{fh_str}] DEBUG: Mapowanie cfgrib_to_config ma {len(cfgrib_to_config)} kluczy", flush=True)
-    if cfgrib_to_config:
-        print(f"{get_timestamp()} - [{fh_str}] DEBUG: Wszystkie klucze w cfgrib_to_config:", flush=True)
-        for key, config_name in cfgrib_to_config.items():
-            db_col = params_config.get(config_name, {}).get('db_column', '?')
-            print(f"{get_timestamp()} - [{fh_str}]   {key} -> {config_name} (db_column={db_col})", flush=True)
+    # DEBUG: Pokaż mapowanie (pełna lista kluczy - gfs_catalog przy wczytaniu konfiguracji)
+    print(f"{get_timestamp()} - [{fh_str}] DEBUG: {len(params_config)} parametrów z konfiguracji, {len(cfgrib_to_config)} kluczy cfgrib_to_config", flush=True)
     
     if not params_config:
         print(f"{get_timestamp()} - [{fh_str}] ⚠ Brak konfiguracji parametrów - używam domyślnych", flush=True)
@@ -729,302 +1329,20 @@ def process_grib_to_db_filtered(grib_path, run_time, forecast_hour, lat_min, lat
         
         print(f"{get_timestamp()} - [{fh_str}] Otwieranie pliku GRIB ({file_size / (1024*1024):.1f} MB)...", flush=True)
         
-        all_data_vars = {}
-        coords_dict = None
-        
-        # Lista poziomów do otwarcia - dla heightAboveGround otwieramy każdy poziom osobno
-        # Najpierw sprawdź jakie poziomy heightAboveGround są w konfiguracji
-        height_levels = []
-        isobaric_levels = []
-        if params_config:
-            for config_name, param_info in params_config.items():
-                level_type = param_info.get('level_type')
-                level_value = param_info.get('level_value')
-                if level_type == 'heightAboveGround' and isinstance(level_value, int):
-                    if level_value not in height_levels:
-                        height_levels.append(level_value)
-                elif level_type == 'isobaricInhPa' and isinstance(level_value, int):
-                    if level_value not in isobaric_levels:
-                        isobaric_levels.append(level_value)
-        
-        # Lista typów poziomów, które mogą być w pliku
-        type_of_levels = [
-            ('isobaricInhPa', None),        # Poziomy izobaryczne (będą filtrowane po konkretnych poziomach)
-            ('surface', None),              # Powierzchnia
-            ('meanSea', None),              # Poziom morza
-            ('tropopause', None),           # Tropopauza
-            ('maxWind', None),              # Maksymalny poziom wiatru
-            ('entireAtmosphere', None),     # Cała atmosfera
-        ]
-        
-        # Dodaj heightAboveGround dla każdego poziomu osobno
-        for height in height_levels:
-            type_of_levels.append(('heightAboveGround', height))
-        
-        # Otwórz plik dla każdego typeOfLevel osobno
-        for level_type, level_value in type_of_levels:
+        all_data_vars, coords_dict = None, None
+        if gfs_grib_decode.is_available():
             try:
-                if level_type == 'heightAboveGround' and level_value is not None:
-                    print(f"{get_timestamp()} - [{fh_str}] Próbuję otworzyć level: {level_type} (height={level_value}m)...", flush=True)
-                    filter_keys = {'typeOfLevel': level_type, 'level': level_value, 'stepType': 'instant'}
-                elif level_type == 'isobaricInhPa' and isobaric_levels:
-                    # Dla isobaricInhPa, otwieramy każdy poziom osobno
-                    # Przetwarzamy je w pętli poniżej
-                    continue
-                else:
-                    print(f"{get_timestamp()} - [{fh_str}] Próbuję otworzyć level: {level_type}...", flush=True)
-                    filter_keys = {'typeOfLevel': level_type}
-                    if level_type == 'surface':
-                        filter_keys['stepType'] = 'instant'
-                
-                try:
-                    ds = xr.open_dataset(
-                        grib_path,
-                        engine='cfgrib',
-                        backend_kwargs={
-                            'filter_by_keys': filter_keys,
-                            'indexpath': '',
-                            'errors': 'ignore'
-                        }
-                    )
-                except Exception as e:
-                    # Jeśli nie udało się z stepType='instant', spróbuj bez stepType
-                    if level_type == 'surface':
-                        print(f"{get_timestamp()} - [{fh_str}] ⚠ Nie udało się z stepType='instant', próbuję bez stepType...", flush=True)
-                        filter_keys_no_step = {'typeOfLevel': level_type}
-                        ds = xr.open_dataset(
-                            grib_path,
-                            engine='cfgrib',
-                            backend_kwargs={
-                                'filter_by_keys': filter_keys_no_step,
-                                'indexpath': '',
-                                'errors': 'ignore'
-                            }
-                        )
-                    elif level_type == 'heightAboveGround' and level_value is not None:
-                        # Spróbuj bez stepType
-                        print(f"{get_timestamp()} - [{fh_str}] ⚠ Nie udało się z stepType='instant', próbuję bez stepType...", flush=True)
-                        filter_keys_no_step = {'typeOfLevel': level_type, 'level': level_value}
-                        ds = xr.open_dataset(
-                            grib_path,
-                            engine='cfgrib',
-                            backend_kwargs={
-                                'filter_by_keys': filter_keys_no_step,
-                                'indexpath': '',
-                                'errors': 'ignore'
-                            }
-                        )
-                    else:
-                        raise
-                
-                # Otwórz isobaricInhPa dla każdego poziomu osobno
-                if level_type == 'isobaricInhPa' and isobaric_levels:
-                    for isobaric_level in isobaric_levels:
-                        try:
-                            print(f"{get_timestamp()} - [{fh_str}] Próbuję otworzyć level: {level_type} ({isobaric_level} mb)...", flush=True)
-                            filter_keys_iso = {'typeOfLevel': 'isobaricInhPa', 'level': isobaric_level}
-                            ds_iso = xr.open_dataset(
-                                grib_path,
-                                engine='cfgrib',
-                                backend_kwargs={
-                                    'filter_by_keys': filter_keys_iso,
-                                    'indexpath': '',
-                                    'errors': 'ignore'
-                                }
-                            )
-                            print(f"{get_timestamp()} - [{fh_str}] ✓ Otworzono {level_type} {isobaric_level} mb, zmienne: {list(ds_iso.data_vars.keys())}", flush=True)
-                            
-                            # Zapisz współrzędne (latitude, longitude) z pierwszego datasetu
-                            if coords_dict is None:
-                                coords_dict = {
-                                    'latitude': ds_iso.latitude.values,
-                                    'longitude': ds_iso.longitude.values
-                                }
-                            
-                            # Przetwarzaj zmienne dla tego poziomu izobarycznego
-                            print(f"{get_timestamp()} - [{fh_str}] DEBUG: Zmienne w {level_type} {isobaric_level} mb: {list(ds_iso.data_vars.keys())}", flush=True)
-                            for var_name in ds_iso.data_vars:
-                                var_data = ds_iso[var_name]
-                                var_level_type = 'isobaricInhPa'
-                                level_val = isobaric_level  # Użyj poziomu z filtra
-                                
-                                # Przetwarzaj zmienną (użyj tego samego kodu co poniżej)
-                                # Sprawdź czy ta zmienna jest w konfiguracji
-                                config_name = None
-                                db_column = None
-                                transformation = None
-                                
-                                key = (var_name, var_level_type, level_val)
-                                print(f"{get_timestamp()} - [{fh_str}] DEBUG: Sprawdzam klucz dla isobaric: {key}", flush=True)
-                                if key in cfgrib_to_config:
-                                    config_name = cfgrib_to_config[key]
-                                    print(f"{get_timestamp()} - [{fh_str}] DEBUG: ✓ Znaleziono mapowanie: {key} -> {config_name}", flush=True)
-                                    if config_name in params_config:
-                                        db_column = params_config[config_name]['db_column']
-                                        transformation = params_config[config_name]['transformation']
-                                
-                                if params_config and (not config_name or not db_column):
-                                    print(f"{get_timestamp()} - [{fh_str}] DEBUG: Pomijam {var_name} (key: {key}) - nie znaleziono w cfgrib_to_config", flush=True)
-                                    continue
-                                
-                                # Zapisz zmienną
-                                all_data_vars[db_column] = {
-                                    'data': var_data,
-                                    'transformation': transformation,
-                                    'config_name': config_name
-                                }
-                            
-                            ds_iso.close()
-                        except Exception as e:
-                            print(f"{get_timestamp()} - [{fh_str}] ⚠ {level_type} {isobaric_level} mb nie znaleziony: {e}", flush=True)
-                            continue
-                    continue  # Przejdź do następnego poziomu
-                
-                print(f"{get_timestamp()} - [{fh_str}] ✓ Otworzono {level_type}, zmienne: {list(ds.data_vars.keys())}", flush=True)
-                
-                # Zapisz współrzędne (latitude, longitude) z pierwszego datasetu
-                if coords_dict is None:
-                    coords_dict = {
-                        'latitude': ds.latitude.values,
-                        'longitude': ds.longitude.values
-                    }
-                
-                # Zbierz wszystkie zmienne z tego poziomu - TYLKO TE Z KONFIGURACJI!
-                print(f"{get_timestamp()} - [{fh_str}] DEBUG: Zmienne w {level_type}: {list(ds.data_vars.keys())}", flush=True)
-                for var_name in ds.data_vars:
-                    var_data = ds[var_name]
-                    
-                    # Określ poziom zmiennej
-                    var_level_type = level_type
-                    # Dla heightAboveGround z konkretnym poziomem, użyj tego poziomu (nie nadpisuj!)
-                    if level_type == 'heightAboveGround' and level_value is not None:
-                        level_val = level_value
-                    else:
-                        # Wyznacz level_val z danych
-                        if 'isobaricInhPa' in var_data.dims:
-                            level_vals = var_data.coords['isobaricInhPa'].values
-                            if isinstance(level_vals, np.ndarray) and level_vals.size > 0:
-                                if level_vals.size == 1:
-                                    level_val = int(level_vals.item())
-                                else:
-                                    # Jeśli jest wiele poziomów, sprawdź każdy
-                                    level_vals = [int(v) for v in level_vals]
-                                    level_val = level_vals  # Lista poziomów
-                                    print(f"{get_timestamp()} - [{fh_str}] DEBUG: {var_name} ma wiele poziomów isobaricInhPa: {level_vals}", flush=True)
-                        elif 'heightAboveGround' in var_data.dims:
-                            height_vals = var_data.coords['heightAboveGround'].values
-                            if isinstance(height_vals, np.ndarray) and height_vals.size > 0:
-                                if height_vals.size == 1:
-                                    level_val = int(height_vals.item())
-                                else:
-                                    height_vals = [int(v) for v in height_vals]
-                                    level_val = height_vals  # Lista poziomów
-                                    print(f"{get_timestamp()} - [{fh_str}] DEBUG: {var_name} ma wiele poziomów heightAboveGround: {height_vals}", flush=True)
-                        else:
-                            level_val = 0  # surface, meanSea, etc.
-                    
-                    # DEBUG: Pokaż szczegóły zmiennej
-                    print(f"{get_timestamp()} - [{fh_str}] DEBUG: Przetwarzam {var_name}, level_type={var_level_type}, level_val={level_val}", flush=True)
-                    
-                    # Sprawdź czy ta zmienna jest w konfiguracji
-                    # Szukaj w cfgrib_to_config: (cfgrib_name, level_type, level_value) -> config_name
-                    config_name = None
-                    db_column = None
-                    transformation = None
-                    
-                    if isinstance(level_val, list):
-                        # Wiele poziomów - sprawdź każdy
-                        for lv in level_val:
-                            key = (var_name, var_level_type, lv)
-                            print(f"{get_timestamp()} - [{fh_str}] DEBUG: Sprawdzam klucz dla wielu poziomów: {key}", flush=True)
-                            if key in cfgrib_to_config:
-                                config_name = cfgrib_to_config[key]
-                                print(f"{get_timestamp()} - [{fh_str}] DEBUG: ✓ Znaleziono mapowanie: {key} -> {config_name}", flush=True)
-                                if config_name in params_config:
-                                    db_column = params_config[config_name]['db_column']
-                                    transformation = params_config[config_name]['transformation']
-                                    level_val = lv  # Użyj tego poziomu
-                                    break
-                    else:
-                        # Jeden poziom
-                        key = (var_name, var_level_type, level_val if level_val is not None else 0)
-                        print(f"{get_timestamp()} - [{fh_str}] DEBUG: Sprawdzam klucz dla jednego poziomu: {key}", flush=True)
-                        if key in cfgrib_to_config:
-                            config_name = cfgrib_to_config[key]
-                            print(f"{get_timestamp()} - [{fh_str}] DEBUG: ✓ Znaleziono mapowanie: {key} -> {config_name}", flush=True)
-                            if config_name in params_config:
-                                db_column = params_config[config_name]['db_column']
-                                transformation = params_config[config_name]['transformation']
-                    
-                    # Jeśli zmienna nie jest w konfiguracji, pomiń ją (chyba że brak konfiguracji - wtedy użyj domyślnych)
-                    if params_config and (not config_name or not db_column):
-                        # DEBUG: Sprawdź dlaczego nie znaleziono mapowania
-                        if isinstance(level_val, list):
-                            debug_key = (var_name, var_level_type, level_val[0] if level_val else 0)
-                        else:
-                            debug_key = (var_name, var_level_type, level_val if level_val is not None else 0)
-                        # Sprawdź czy może być problem z typem level_val
-                        if level_val is None:
-                            debug_key_alt = (var_name, var_level_type, 0)
-                            if debug_key_alt in cfgrib_to_config:
-                                print(f"{get_timestamp()} - [{fh_str}] DEBUG: Znaleziono alternatywny klucz {debug_key_alt} dla {var_name}", flush=True)
-                                config_name = cfgrib_to_config[debug_key_alt]
-                                if config_name in params_config:
-                                    db_column = params_config[config_name]['db_column']
-                                    transformation = params_config[config_name]['transformation']
-                                    level_val = 0
-                        if not config_name or not db_column:
-                            print(f"{get_timestamp()} - [{fh_str}] DEBUG: Pomijam {var_name} (key: {debug_key}) - nie znaleziono w cfgrib_to_config", flush=True)
-                            # DEBUG: Pokaż podobne klucze w cfgrib_to_config
-                            similar_keys = [k for k in cfgrib_to_config.keys() if k[0] == var_name or k[1] == var_level_type]
-                            if similar_keys:
-                                print(f"{get_timestamp()} - [{fh_str}] DEBUG: Podobne klucze w cfgrib_to_config: {similar_keys[:5]}", flush=True)
-                            continue
-                    
-                    # Jeśli jest wiele poziomów, wybierz tylko ten z konfiguracji
-                    if isinstance(level_val, list):
-                        # Wybierz tylko poziom z konfiguracji
-                        if var_level_type == 'isobaricInhPa':
-                            var_data = var_data.sel(isobaricInhPa=level_val)
-                        elif var_level_type == 'heightAboveGround':
-                            var_data = var_data.sel(heightAboveGround=level_val)
-                    
-                    # Walidacja poziomu
-                    if level_val is not None:
-                        if var_level_type == 'isobaricInhPa':
-                            if level_val in [999, 995, 996, 997, 998] or level_val == 0:
-                                continue
-                        elif var_level_type == 'heightAboveGround':
-                            if level_val in [0, 999, 995, 996, 997, 998]:
-                                continue
-                    
-                    # Jeśli brak konfiguracji, użyj domyślnej nazwy z sufiksem
-                    if not params_config or not db_column:
-                        # Fallback: dodaj sufiks z poziomem do nazwy zmiennej
-                        if 'isobaricInhPa' in var_data.dims:
-                            level_val_float = float(level_val) if level_val is not None else 0
-                            full_var_name = f"{var_name}_{int(level_val_float)}_mb"
-                        elif 'heightAboveGround' in var_data.dims:
-                            level_val_float = float(level_val) if level_val is not None else 0
-                            full_var_name = f"{var_name}_{int(level_val_float)}m"
-                        else:
-                            full_var_name = var_name
-                        db_column = full_var_name
-                        transformation = 'none'
-                    
-                    # Zapisz zmienną z nazwą kolumny bazy jako klucz
-                    all_data_vars[db_column] = {
-                        'data': var_data,
-                        'transformation': transformation,
-                        'config_name': config_name
-                    }
-                
-                ds.close()
-                
+                all_data_vars, coords_dict = _open_grib_variables_eccodes(
+                    grib_path, fh_str, params_config, cfgrib_to_config,
+                    decode_pool=decode_pool, region=(lat_min, lat_max, lon_min, lon_max),
+                    message_threads=message_threads
+                )
             except Exception as e:
-                # Jeśli dany typeOfLevel nie istnieje w pliku, po prostu pomiń
-                print(f"{get_timestamp()} - [{fh_str}] ⚠ {level_type} nie znaleziony: {e}", flush=True)
-                continue
+                print(f"{get_timestamp()} - [{fh_str}] ⚠ Dekodowanie ecCodes nie powiodło się ({e}) - używam cfgrib", flush=True)
+                all_data_vars, coords_dict = None, None
+        
+        if not all_data_vars:
+            all_data_vars, coords_dict = _open_grib_variables_cfgrib(grib_path, fh_str, params_config, cfgrib_to_config)
         
         # Jeśli nie udało się załadować żadnych danych
         if not all_data_vars or coords_dict is None:
@@ -1046,6 +1364,7 @@ def process_grib_to_db_filtered(grib_path, run_time, forecast_hour, lat_min, lat
             print(f"{get_timestamp()} - [{fh_str}] Wycinanie regionu geograficznego...", flush=True)
             
             vars_region = {}
+            transforms_region = {}
             for db_column, var_info in all_data_vars.items():
                 try:
                     var_data = var_info['data']
@@ -1055,15 +1374,20 @@ def process_grib_to_db_filtered(grib_path, run_time, forecast_hour, lat_min, lat
                     if 'latitude' not in var_data.dims or 'longitude' not in var_data.dims:
                         continue
                     
-                    # Wycinz region geograficzny
-                    var_region = var_data.sel(
-                        latitude=slice(lat_max, lat_min),  # Uwaga: slice(max, min) bo latitude maleje
-                        longitude=slice(lon_min, lon_max)
-                    )
+                    # Wycinz region geograficzny (dane z ecCodes są już wycięte indeksami z cache siatki)
+                    if var_info.get('cropped'):
+                        var_region = var_data
+                    else:
+                        var_region = var_data.sel(
+                            latitude=slice(lat_max, lat_min),  # Uwaga: slice(max, min) bo latitude maleje
+                            longitude=slice(lon_min, lon_max)
+                        )
                     
-                    # TRANSFORMACJE DANYCH - używamy transformacji z konfiguracji!
-                    var_region = apply_transformation(var_region, transformation)
-                    if transformation != 'none':
+                    # TRANSFORMACJE DANYCH - z konfiguracji, rozstrzygane wg jednostek GRIB (wykonywane raz na tablicach prostokąta)
+                    units = gfs_transforms.data_units(var_data) or params_config.get(config_name, {}).get('units')
+                    transform = transforms.resolve(transformation, units)
+                    if not transform.is_identity:
+                        transforms_region[db_column] = transform
                         print(f"{get_timestamp()} - [{fh_str}] Transformacja: {config_name} -> {db_column} ({transformation})", flush=True)
                     
                     # Zapisz z nazwą kolumny bazy jako klucz
@@ -1077,229 +1401,46 @@ def process_grib_to_db_filtered(grib_path, run_time, forecast_hour, lat_min, lat
                 print(f"{get_timestamp()} - [{fh_str}] ✗ Brak zmiennych po wycięciu regionu", flush=True)
                 return 0
             
-            # KONWERSJA: Konwertuj każdą zmienną osobno i łącz przez merge (jak w professional version)
-            # To unika problemów z MultiIndex i sufiksami _m0, _m1, etc.
-            print(f"{get_timestamp()} - [{fh_str}] Konwertowanie {len(vars_region)} zmiennych do DataFrame...", flush=True)
+            # Tablice prostokąta na wspólnej siatce (bez kopii); regiony są ich widokami
+            grid = _grid_arrays(vars_region, fh_str, coords_dict.get('region'))
             
-            df = None
-            coords = ['latitude', 'longitude']  # Wspólne współrzędne
+            # Profile pionowe (gfs_profiles) - z surowych tablic, przed transformacjami wykonywanymi w miejscu;
+            # kolumny dekodowane tylko dla profili nie trafiają do regionów
+            profile_stacks = {}
+            profile_sets = [r for r in regions if isinstance(r, gfs_profiles.ProfileSet)]
+            if grid is not None and profile_sets:
+                units = {db_column: gfs_transforms.data_units(var_info['data']) for db_column, var_info in all_data_vars.items()}
+                for profile_set in profile_sets:
+                    profile_stacks[profile_set.name] = profile_set.extract(grid, transforms, units)
+                for column in gfs_profiles.profile_only_columns(params_config):
+                    grid['columns'].pop(column, None)
             
-            for db_column, var_data in vars_region.items():
-                try:
-                    # Sprawdź wymiary zmiennej - jeśli ma więcej niż 2 wymiary (lat, lon), może być problem
-                    dims = var_data.dims
-                    dim_sizes = {dim: var_data.sizes[dim] for dim in dims}
-                    
-                    # Sprawdź czy zmienna nie ma zbyt wielu wymiarów (może mieć wszystkie poziomy)
-                    total_size = 1
-                    for size in dim_sizes.values():
-                        total_size *= size
-                    
-                    # Jeśli zmienna jest zbyt duża (> 100M elementów), pomiń lub wybierz tylko jeden poziom
-                    if total_size > 100_000_000:
-                        print(f"{get_timestamp()} - [{fh_str}] ⚠ Pomijam {db_column} - zbyt duża ({total_size:,} elementów, wymiary: {dim_sizes})", flush=True)
-                        continue
-                    
-                    # Jeśli zmienna ma wymiar isobaricInhPa lub heightAboveGround z wieloma wartościami,
-                    # wybierz tylko pierwszą wartość (powinna być już wyfiltrowana, ale sprawdźmy)
-                    # UWAGA: Po wyfiltrowaniu przez filter_by_keys, wymiar może już nie istnieć, więc sprawdź czy istnieje
-                    if 'isobaricInhPa' in dims and dim_sizes.get('isobaricInhPa', 0) > 1:
-                        print(f"{get_timestamp()} - [{fh_str}] ⚠ {db_column} ma {dim_sizes['isobaricInhPa']} poziomów izobarycznych - wybieram pierwszy", flush=True)
-                        try:
-                            var_data = var_data.isel(isobaricInhPa=0)
-                            # Po isel, zaktualizuj dims
-                            dims = var_data.dims
-                            dim_sizes = {dim: var_data.sizes[dim] for dim in dims}
-                        except Exception as e:
-                            print(f"{get_timestamp()} - [{fh_str}] ⚠ Błąd przy isel(isobaricInhPa=0): {e}", flush=True)
-                    elif 'heightAboveGround' in dims and dim_sizes.get('heightAboveGround', 0) > 1:
-                        print(f"{get_timestamp()} - [{fh_str}] ⚠ {db_column} ma {dim_sizes['heightAboveGround']} poziomów wysokości - wybieram pierwszy", flush=True)
-                        try:
-                            var_data = var_data.isel(heightAboveGround=0)
-                            # Po isel, zaktualizuj dims
-                            dims = var_data.dims
-                            dim_sizes = {dim: var_data.sizes[dim] for dim in dims}
-                        except Exception as e:
-                            print(f"{get_timestamp()} - [{fh_str}] ⚠ Błąd przy isel(heightAboveGround=0): {e}", flush=True)
-                    
-                    # Konwertuj pojedynczą zmienną do DataFrame
-                    # Użyj stack() tylko dla wymiarów które nie są lat/lon
-                    non_coord_dims = [d for d in dims if d not in ['latitude', 'longitude']]
-                    
-                    if non_coord_dims:
-                        # Jeśli są dodatkowe wymiary, usuń je przez wybranie pierwszej wartości
-                        for dim in non_coord_dims:
-                            if dim_sizes.get(dim, 0) > 1:
-                                var_data = var_data.isel({dim: 0})
-                    
-                    tmp = var_data.to_dataframe().reset_index()
-                    
-                    # Sprawdź które współrzędne są dostępne
-                    available_coords = [c for c in coords if c in tmp.columns]
-                    
-                    # Jeśli nie ma współrzędnych, pomiń
-                    if not available_coords:
-                        print(f"{get_timestamp()} - [{fh_str}] ⚠ Pomijam {db_column} - brak współrzędnych", flush=True)
-                        continue
-                    
-                    # Wybierz tylko potrzebne kolumny (współrzędne + wartość)
-                    # Nazwa kolumny z wartością to nazwa zmiennej cfgrib (np. 't', 'gh', 'u10')
-                    value_col = None
-                    for col in tmp.columns:
-                        if col not in available_coords and col not in ['time', 'valid_time', 'step', 'isobaricInhPa', 'heightAboveGround', 'stepType']:
-                            value_col = col
-                            break
-                    
-                    if value_col is None:
-                        print(f"{get_timestamp()} - [{fh_str}] ⚠ Pomijam {db_column} - brak kolumny wartości. Kolumny: {list(tmp.columns)}", flush=True)
-                        continue
-                    
-                    # DEBUG: Sprawdź czy value_col ma wartości
-                    if tmp[value_col].isna().all():
-                        print(f"{get_timestamp()} - [{fh_str}] ⚠ Pomijam {db_column} - kolumna {value_col} ma same NaN", flush=True)
-                        continue
-                    
-                    # Wybierz tylko potrzebne kolumny
-                    cols_to_keep = available_coords + [value_col]
-                    tmp = tmp[cols_to_keep]
-                    
-                    # Sprawdź rozmiar przed merge
-                    if len(tmp) > 10_000_000:
-                        print(f"{get_timestamp()} - [{fh_str}] ⚠ Pomijam {db_column} - zbyt dużo wierszy ({len(tmp):,})", flush=True)
-                        continue
-                    
-                    # Zmień nazwę kolumny wartości na nazwę kolumny bazy
-                    if value_col != db_column:
-                        tmp.rename(columns={value_col: db_column}, inplace=True)
-                    
-                    # DEBUG: Sprawdź czy są wartości w kolumnie
-                    non_null_count = tmp[db_column].notna().sum()
-                    if non_null_count == 0:
-                        print(f"{get_timestamp()} - [{fh_str}] ⚠ Pomijam {db_column} - brak wartości (wszystkie NaN)", flush=True)
-                        continue
-                    
-                    print(f"{get_timestamp()} - [{fh_str}] ✓ {db_column}: {non_null_count}/{len(tmp)} wartości nie-NaN", flush=True)
-                    
-                    # Połącz z głównym DataFrame
-                    if df is None:
-                        df = tmp
-                    else:
-                        # Sprawdź rozmiar przed merge
-                        if len(df) > 1_000_000 or len(tmp) > 1_000_000:
-                            print(f"{get_timestamp()} - [{fh_str}] ⚠ Duże DataFrames przed merge: df={len(df):,}, tmp={len(tmp):,}", flush=True)
-                        
-                        # Merge na podstawie współrzędnych - sprawdź czy nie ma konfliktów nazw
-                        common_cols = set(df.columns) & set(tmp.columns)
-                        common_cols.discard('latitude')
-                        common_cols.discard('longitude')
-                        
-                        if common_cols:
-                            # Są wspólne kolumny (poza współrzędnymi) - użyj suffixes
-                            df = df.merge(tmp, on=available_coords, how='outer', suffixes=('', '_dup'))
-                            # Usuń kolumny z _dup
-                            dup_cols = [c for c in df.columns if c.endswith('_dup')]
-                            if dup_cols:
-                                df = df.drop(columns=dup_cols)
-                        else:
-                            # Brak konfliktów - normalny merge
-                            df = df.merge(tmp, on=available_coords, how='outer')
-                    
-                except MemoryError as e:
-                    print(f"{get_timestamp()} - [{fh_str}] ⚠ BŁĄD PAMIĘCI przy konwersji {db_column}: {e}", flush=True)
-                    continue
-                except Exception as e:
-                    error_msg = str(e)
-                    if 'Unable to allocate' in error_msg or 'MemoryError' in error_msg:
-                        print(f"{get_timestamp()} - [{fh_str}] ⚠ BŁĄD PAMIĘCI przy konwersji {db_column}: {error_msg[:200]}", flush=True)
-                    else:
-                        print(f"{get_timestamp()} - [{fh_str}] ⚠ Błąd konwersji {db_column}: {error_msg[:200]}", flush=True)
-                    continue
+            # Zapis zwarty (gfs_storage) we wszystkich regionach: float32 od wycięcia - transformacje,
+            # pola pochodne i złożenie tabeli na połowie pamięci
+            grid_regions = [r for r in regions if not isinstance(r, gfs_profiles.ProfileSet)]
+            if grid is not None and grid_regions and all(r.schema is not None and r.schema.storage is not None and r.schema.storage.compact for r in grid_regions):
+                grid['columns'] = {column: values.astype(np.float32, copy=False) for column, values in grid['columns'].items()}
+            
+            # Transformacje jednostek raz, w miejscu - komórki wspólne dla kilku regionów liczone raz
+            if grid is not None:
+                for db_column, transform in transforms_region.items():
+                    if db_column in grid['columns']:
+                        grid['columns'][db_column] = transform.apply(grid['columns'][db_column])
+            
+            # Kroki akumulacji (startStep, endStep) - tylko ścieżka ecCodes
+            precip_steps = {
+                db_column: (var_info['start_step'], var_info['end_step'])
+                for db_column, var_info in all_data_vars.items()
+                if var_info.get('start_step') is not None
+            }
             
             # Zwolnij pamięć
             del vars_region, all_data_vars
-            import gc
-            gc.collect()
             
-            if df is None or len(df) == 0:
+            if grid is None:
                 print(f"{get_timestamp()} - [{fh_str}] ✗ Brak danych po konwersji", flush=True)
                 return 0
             
-            # Sprawdź czy są kolumny z nieprawidłowymi sufiksami
-            suspicious_cols = [c for c in df.columns if any(c.lower().endswith(f'_m{i}') for i in range(1000))]
-            if suspicious_cols:
-                print(f"{get_timestamp()} - [{fh_str}] ⚠ UWAGA: Znaleziono podejrzane kolumny z sufiksami _m*: {suspicious_cols[:10]}...", flush=True)
-                print(f"{get_timestamp()} - [{fh_str}] ⚠ To może być problem z MultiIndex lub duplikatami podczas merge!", flush=True)
-            
-            # Dodaj metadane
-            df['run_time'] = run_time
-            df['forecast_time'] = forecast_time
-            df['created_at'] = datetime.utcnow()
-            df.rename(columns={'latitude': 'lat', 'longitude': 'lon'}, inplace=True)
-            
-            # Oblicz wind_speed i wind_dir z u10 i v10
-            if 'u10' in df.columns and 'v10' in df.columns:
-                df['wind_speed'] = np.sqrt(df['u10']**2 + df['v10']**2)
-                df['wind_dir'] = (270 - np.arctan2(df['v10'], df['u10']) * 180 / np.pi) % 360
-                print(f"{get_timestamp()} - [{fh_str}] ✓ Obliczono wind_speed i wind_dir z u10 i v10", flush=True)
-            
-            # Zaokrąglij wszystkie kolumny numeryczne do 2 miejsc po przecinku (oprócz id jeśli istnieje)
-            numeric_cols = df.select_dtypes(include=[np.number]).columns
-            for col in numeric_cols:
-                if col not in ['id']:  # Nie zaokrąglaj ID jeśli istnieje
-                    df[col] = df[col].round(2)
-            
-            # Usuń kolumny które nie powinny być w bazie (np. isobaricInhPa, heightAboveGround jako kolumny)
-            cols_to_drop = [c for c in df.columns if c in ['isobaricInhPa', 'heightAboveGround', 'time', 'valid_time']]
-            if cols_to_drop:
-                df = df.drop(columns=cols_to_drop)
-            
-            # Usuń kolumny z nieprawidłowymi poziomami (np. m999, m0, 999, etc.)
-            # WAŻNE: Usuń wszystkie kolumny z sufiksami _m0, _m1, _m2, ..., _m999 (to są indeksy z MultiIndex)
-            import re
-            invalid_patterns = ['_m999', '_m0_', '_999_', '_999m', '_999mb', 'm999', 'm0', '_0m', '_0_mb']
-            invalid_cols = [c for c in df.columns if any(pattern in c.lower() for pattern in invalid_patterns)]
-            # Usuń wszystkie kolumny które kończą się na _m + liczba (np. _m0, _m1, _m999)
-            invalid_cols.extend([c for c in df.columns if re.search(r'_m\d+$', str(c))])
-            # Dodatkowo usuń kolumny z poziomem 999 (nieprawidłowy poziom)
-            invalid_cols.extend([c for c in df.columns if '_999' in c.lower() and c not in invalid_cols])
-            # Usuń duplikaty
-            invalid_cols = list(set(invalid_cols))
-            if invalid_cols:
-                print(f"{get_timestamp()} - [{fh_str}] ⚠ Usuwam nieprawidłowe kolumny ({len(invalid_cols)}): {invalid_cols[:20]}...", flush=True)
-                df = df.drop(columns=invalid_cols)
-            
-            # Zaokrąglij wartości numeryczne do 2 miejsc po przecinku
-            numeric_cols = df.select_dtypes(include=[np.number]).columns
-            for col in numeric_cols:
-                if col not in ['lat', 'lon']:  # Nie zaokrąglaj współrzędnych
-                    df[col] = df[col].round(2)
-            
-            # DEBUG: Sprawdź kolumny i wartości przed usunięciem NaN
-            print(f"{get_timestamp()} - [{fh_str}] DEBUG: Kolumny w DataFrame: {list(df.columns)}", flush=True)
-            data_cols = [c for c in df.columns if c not in ['lat', 'lon', 'run_time', 'forecast_time']]
-            if data_cols:
-                for col in data_cols[:5]:  # Sprawdź pierwsze 5 kolumn
-                    non_null = df[col].notna().sum()
-                    print(f"{get_timestamp()} - [{fh_str}] DEBUG: {col}: {non_null}/{len(df)} wartości nie-NaN", flush=True)
-            
-            # Usuń wiersze z samymi NaN (poza lat/lon/run_time/forecast_time)
-            if data_cols:
-                df = df.dropna(subset=data_cols, how='all')
-            
-            # DEBUG: Sprawdź po usunięciu NaN
-            print(f"{get_timestamp()} - [{fh_str}] DEBUG: Po usunięciu NaN: {len(df)} wierszy", flush=True)
-            if len(df) > 0 and data_cols:
-                for col in data_cols[:5]:
-                    non_null = df[col].notna().sum()
-                    print(f"{get_timestamp()} - [{fh_str}] DEBUG: {col}: {non_null}/{len(df)} wartości nie-NaN", flush=True)
-            
-            records = df.to_dict('records')
-            
-            # Zwolnij pamięć
-            del df
-            import gc
-            gc.collect()
-            
         except MemoryError as e:
             print(f"{get_timestamp()} - [{fh_str}] ✗ BŁĄD PAMIĘCI: {e}", flush=True)
             return 0
@@ -1309,67 +1450,54 @@ def process_grib_to_db_filtered(grib_path, run_time, forecast_hour, lat_min, lat
             print(f"{get_timestamp()} - [{fh_str}] Traceback:\n{traceback.format_exc()}", flush=True)
             return 0
         
-        # Zapisz do bazy
-        if records:
-            print(f"{get_timestamp()} - [{fh_str}] Zapisuję {len(records)} rekordów do bazy...", flush=True)
-            try:
-                df_final = pd.DataFrame(records)
-                
-                # Ostateczna walidacja kolumn przed zapisem - usuń wszystkie nieprawidłowe
-                import re
-                invalid_patterns = ['_m999', '_m0_', '_999_', '_999m', '_999mb', 'm999', 'm0', '_0m', '_0_mb']
-                invalid_cols = [c for c in df_final.columns if any(pattern in str(c).lower() for pattern in invalid_patterns)]
-                # Usuń wszystkie kolumny które kończą się na _m + liczba (np. _m0, _m1, _m999)
-                invalid_cols.extend([c for c in df_final.columns if re.search(r'_m\d+$', str(c))])
-                invalid_cols.extend([c for c in df_final.columns if '_999' in str(c).lower() and c not in invalid_cols])
-                # Usuń duplikaty
-                invalid_cols = list(set(invalid_cols))
-                if invalid_cols:
-                    print(f"{get_timestamp()} - [{fh_str}] ⚠ Ostateczne usuwanie nieprawidłowych kolumn przed zapisem ({len(invalid_cols)}): {invalid_cols[:20]}...", flush=True)
-                    df_final = df_final.drop(columns=invalid_cols)
-                
-                # Usuń również kolumny techniczne jeśli jeszcze są
-                tech_cols = [c for c in df_final.columns if c in ['isobaricInhPa', 'heightAboveGround', 'time', 'valid_time']]
-                if tech_cols:
-                    df_final = df_final.drop(columns=tech_cols)
-                
-                df_final.to_sql('gfs_forecast', engine, if_exists='append', index=False, method='multi', chunksize=1000)
-                print(f"{get_timestamp()} - [{fh_str}] ✓ Zapisano {len(records)} rekordów", flush=True)
-                del df_final
-                import gc
-                gc.collect()
-                return len(records)
-            except KeyError as e:
-                print(f"{get_timestamp()} - [{fh_str}] ✗ BŁĄD KOLUMNY: {e}", flush=True)
-                import traceback
-                print(f"{get_timestamp()} - [{fh_str}] Traceback:\n{traceback.format_exc()}", flush=True)
-                # Spróbuj ponownie z filtrowaniem kolumn
-                try:
-                    df_final = pd.DataFrame(records)
-                    # Usuń wszystkie kolumny które mogą powodować problemy
-                    import re
-                    all_invalid = [c for c in df_final.columns if any(x in str(c).lower() for x in ['_m999', '_999', 'm999', '_m0', 'm0'])]
-                    # Usuń wszystkie kolumny które kończą się na _m + liczba
-                    all_invalid.extend([c for c in df_final.columns if re.search(r'_m\d+$', str(c))])
-                    all_invalid = list(set(all_invalid))
-                    if all_invalid:
-                        df_final = df_final.drop(columns=all_invalid)
-                    df_final.to_sql('gfs_forecast', engine, if_exists='append', index=False, method='multi', chunksize=1000)
-                    print(f"{get_timestamp()} - [{fh_str}] ✓ Zapisano po naprawie kolumn: {len(df_final)} rekordów", flush=True)
-                    return len(df_final)
-                except:
+        # Kontrola jakości (gfs_quality) - raz na tablicach prostokąta, w jednostkach bazy
+        if quality is not None:
+            report = quality.check(grid, run_time, forecast_hour)
+            if report['failures']:
+                quality.quarantine(report, engine, grib_path)
+                if not report['accepted']:
+                    print(f"{get_timestamp()} - [{fh_str}] ✗ Kontrola jakości nieudana (próba {report['attempt']}/{quality.max_attempts}) - godzina w kwarantannie: {gfs_quality.format_report(report)}", flush=True)
                     return 0
-            except MemoryError as e:
-                print(f"{get_timestamp()} - [{fh_str}] ✗ BŁĄD PAMIĘCI przy zapisie: {e}", flush=True)
-                return 0
-            except Exception as e:
-                print(f"{get_timestamp()} - [{fh_str}] ✗ BŁĄD przy zapisie: {e}", flush=True)
-                import traceback
-                print(f"{get_timestamp()} - [{fh_str}] Traceback:\n{traceback.format_exc()}", flush=True)
+                print(f"{get_timestamp()} - [{fh_str}] ⚠ Kontrola jakości nieudana {report['attempt']} razy - zapisuję mimo błędów: {gfs_quality.format_report(report)}", flush=True)
+            else:
+                print(f"{get_timestamp()} - [{fh_str}] ✓ Kontrola jakości OK ({len(report['stats'])} pól, {report['seconds'] * 1000:.0f} ms)", flush=True)
+        
+        total_records = 0
+        written_regions = []
+        for region in regions:
+            label = region.label(fh_str, len(regions))
+            if isinstance(region, gfs_points.PointSet):
+                records, written_any, ok = _write_points(
+                    grid, region, forecast_hour, run_time, forecast_time, engine, precip_steps, label
+                )
+            elif isinstance(region, gfs_areas.AreaSet):
+                records, written_any, ok = _write_areas(
+                    grid, region, forecast_hour, run_time, forecast_time, engine, precip_steps, label
+                )
+            elif isinstance(region, gfs_profiles.ProfileSet):
+                records, written_any, ok = _write_profiles(
+                    profile_stacks[region.name], region, forecast_hour, run_time, forecast_time, engine, label
+                )
+            else:
+                records, written_any, ok = _write_region(
+                    grid, region, forecast_hour, run_time, forecast_time, engine, precip_steps, chunk_points, label
+                )
+            if written_any:
+                written_regions.append(region)
+            if not ok:
+                # Godzina jest pobierana ponownie dla wszystkich regionów - żaden nie może jej mieć w bazie
+                # (częściowo zapisana godzina byłaby uznana za pobraną)
+                for failed_region in regions:
+                    if failed_region.accumulator is not None:
+                        failed_region.accumulator.discard(forecast_hour)
+                    if failed_region.interpolator is not None:
+                        failed_region.interpolator.discard(forecast_hour)
+                if engine is not None:
+                    for written_region in written_regions:
+                        delete_forecast_hour(engine, written_region, run_time, forecast_time, written_region.label(fh_str, len(regions)))
                 return 0
-        else:
-            print(f"{get_timestamp()} - [{fh_str}] ✗ Brak rekordów do zapisania", flush=True)
-            return 0
+            total_records += records
+        return total_records
             
     except Exception as e:
         print(f"{get_timestamp()} - [{fh_str}] ✗ BŁĄD przetwarzania GRIB: {e}", flush=True)
@@ -1409,16 +1537,24 @@ if _is_main_module:
         MYSQL_HOST = config["database"]["host"]
         MYSQL_DATABASE = config["database"]["database"]
         
-        lat_min = float(config["region"]["lat_min"])
-        lat_max = float(config["region"]["lat_max"])
-        lon_min = float(config["region"]["lon_min"])
-        lon_max = float(config["region"]["lon_max"])
+        # Regiony ([region] albo [region.<nazwa>]) - jedno pobranie i dekodowanie dla wszystkich
+        regions = gfs_regions.load_regions()
         
         NUM_THREADS = 6
         
+        # Źródła danych (sekcja [source], np. order = bucket, nomads_filter, nomads_raw);
+        # wycinek po stronie serwera (subregion = yes) obejmuje wszystkie regiony
+        sources = load_source_chain(subregion=gfs_regions.union_bounds(regions))
+        
+        # Pula procesów dekodujących (sekcja [threading] decode_processes) - uruchamiana przed wątkami
+        decode_pool = create_decode_pool()
+        
         print(f"\n✓ Konfiguracja OK")
-        print(f"  Region: {lat_min}°-{lat_max}°N, {lon_min}°-{lon_max}°E")
+        for region in regions:
+            print(f"  Region {region.describe()}")
         print(f"  Wątki: {NUM_THREADS}")
+        print(f"  Procesy dekodujące: {decode_pool.processes if decode_pool else 'brak (dekodowanie w wątkach)'}")
+        print(f"  Źródła: {' -> '.join(src.name for src in sources.sources)}")
         
     except Exception as e:
         print(f"✗ BŁĄD konfiguracji: {e}")
@@ -1430,7 +1566,7 @@ if _is_main_module:
         print(f"\n⏳ Łączenie z MySQL...")
         
         MYSQL_URL = f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}/{MYSQL_DATABASE}?charset=utf8mb4"
-        engine = create_engine(MYSQL_URL, echo=False, pool_pre_ping=True)
+        engine = create_engine(MYSQL_URL, echo=False, pool_pre_ping=True, **gfs_arrow.engine_options())
         
         with engine.connect() as conn:
             conn.execute(text("SELECT 1"))
@@ -1442,10 +1578,30 @@ if _is_main_module:
         input("\nEnter...")
         exit(1)
     
+    # Parametry i schemat tabeli - raz przy starcie, wspólne dla wszystkich godzin prognozy
+    params_config, cfgrib_to_config = load_parameters_config()
+    for region in regions:
+        region.prepare(params_config, engine)
+    transforms = gfs_transforms.load_registry()
+    chunk_points = gfs_grib_decode.load_chunk_points()
+    message_threads = gfs_grib_decode.load_message_threads()
+    # Kontrola jakości przed zapisem - liczniki i próby kwarantanny wspólne dla runu
+    quality = gfs_quality.load_quality_gate(params_config=params_config)
+    print(f"✓ Kontrola jakości: {quality.describe() if quality else 'wyłączona'}")
+    for region in regions:
+        print(f"✓ [{region.name}] Schemat {region.table}: {len(region.schema.columns)} kolumn do zapisu")
+        if region.derived is not None:
+            print(f"✓ [{region.name}] Pola pochodne: {', '.join(region.derived.outputs) or 'brak'}")
+        if region.schema.missing_in_db:
+            print(f"⚠ [{region.name}] Brak w bazie kolumn z konfiguracji (nie będą zapisywane): {', '.join(region.schema.missing_in_db)}")
+    print(f"✓ Przetwarzanie pasami: {f'≤{chunk_points} punktów' if chunk_points > 0 else 'wyłączone (cały region naraz)'}")
+    if decode_pool is None:
+        print(f"✓ Wątki dekodujące wiadomości pliku: {message_threads if message_threads > 1 else 'brak (kolejno)'}")
+    
     # === 3. ZNAJDŹ NAJNOWSZY RUN ===
     print(f"\n⏳ Szukam najnowszego run GFS...")
     
-    run_time, RUN_DATE, RUN_HOUR = find_latest_gfs_run(engine)
+    run_time, RUN_DATE, RUN_HOUR = find_latest_gfs_run(engine, sources)
     
     if run_time is None:
         print(f"✗ Nie znaleziono nowych danych GFS do pobrania")
@@ -1461,11 +1617,11 @@ if _is_main_module:
     print(f"\n⏳ Sprawdzam które prognozy są już w bazie...")
     
     required_hours = get_required_forecast_hours()
-    existing_hours = get_existing_forecast_hours(run_time, engine)
+    existing_hours = get_existing_forecast_hours(run_time, engine, regions)
     missing_hours = sorted(list(required_hours - existing_hours))
     
     print(f"  Wymagane: {len(required_hours)} prognoz (f000-f384)")
-    print(f"  W bazie: {len(existing_hours)} prognoz")
+    print(f"  W bazie: {len(existing_hours & required_hours)} prognoz")
     print(f"  Do pobrania: {len(missing_hours)} prognoz")
     
     if len(missing_hours) == 0:
@@ -1473,14 +1629,18 @@ if _is_main_module:
         input("\nNaciśnij Enter...")
         exit(0)
     
+    # Opady w oknach 1 h / 3 h - stan akumulacji wspólny dla wszystkich wątków (zapisywany na dysk dla runu);
+    # interpolacja czasowa ([interpolation]) - godziny pośrednie horyzontu co 3 h
+    gfs_regions.create_accumulators(regions, run_time, params_config, required_hours)
+    
     # === 5. POBIERANIE Z MULTI-THREADING ===
     print(f"\n{'='*70}")
     print(f"🚀 ROZPOCZYNAM POBIERANIE (FILTERED VERSION - POPRAWIONA)")
     print(f"{'='*70}")
     
-    # Utwórz katalog tymczasowy
-    temp_dir = "temp_grib_filtered"
-    os.makedirs(temp_dir, exist_ok=True)
+    # Pliki tymczasowe: [staging] (tmpfs z limitem, przepełnienie na dysk); sprząta po procesach, które padły
+    staging = gfs_staging.load_staging_store(disk_dir="temp_grib_filtered")
+    print(f"✓ Staging: {staging.describe()}")
     
     # Statystyki
     total_success = 0
@@ -1507,46 +1667,54 @@ if _is_main_module:
                 if forecast_hour is None:
                     break
                 
-                # Buduj URL dla GRIB Filter
-                print(f"{get_timestamp()} - [f{forecast_hour:03d}] Budowanie URL...", flush=True)
-                url = build_grib_filter_url(RUN_DATE, RUN_HOUR, forecast_hour)
-                
-                # Ścieżka do pliku tymczasowego
-                temp_file = os.path.join(temp_dir, f"gfs_f{forecast_hour:03d}_filtered.grb2")
-                
-                # Pobierz plik (FILTERED!)
-                success, file_size = download_grib_filtered(url, temp_file, forecast_hour=forecast_hour)
-                
-                if success:
-                    # Przetwórz i zapisz do bazy
-                    try:
-                        print(f"{get_timestamp()} - [f{forecast_hour:03d}] Parsowanie GRIB...", flush=True)
-                        num_records = process_grib_to_db_filtered(
-                            temp_file, run_time, forecast_hour,
-                            lat_min, lat_max, lon_min, lon_max, engine
-                        )
-                        print(f"{get_timestamp()} - [f{forecast_hour:03d}] ✓ Zapisano {num_records} rekordów", flush=True)
-                        
-                        # Szacuj rozmiar pełnego pliku (dla statystyk)
-                        estimated_full_size = file_size * 10  # Około 10x większy
-                        
-                        # Wyślij wynik
-                        progress_queue.put({
-                            'success': True,
-                            'forecast_hour': forecast_hour,
-                            'records': num_records,
-                            'bytes_filtered': file_size,
-                            'bytes_full_estimate': estimated_full_size
-                        })
-                        
-                        # Usuń plik tymczasowy
+                # Plik tymczasowy w staging (RAM lub dysk) - nazwa z runem, usuwany przy wyjściu z bloku
+                # także gdy przetwarzanie rzuci wyjątek
+                with staging.stage(f"{RUN_DATE}{RUN_HOUR}", forecast_hour) as staged:
+                    # Pobierz plik (FILTERED!) - przez łańcuch źródeł
+                    success, file_size = download_grib_filtered(RUN_DATE, staged.path, forecast_hour=forecast_hour, hour_str=RUN_HOUR, sources=sources)
+                    
+                    if success:
+                        # Przetwórz i zapisz do bazy
                         try:
-                            os.remove(temp_file)
-                        except:
-                            pass
+                            print(f"{get_timestamp()} - [f{forecast_hour:03d}] Parsowanie GRIB...", flush=True)
+                            num_records = process_grib_to_db_filtered(
+                                staged.settle(), run_time, forecast_hour,
+                                *gfs_regions.union_bounds(regions), engine,
+                                params_config, cfgrib_to_config,
+                                decode_pool=decode_pool, transforms=transforms, chunk_points=chunk_points,
+                                regions=regions, message_threads=message_threads, quality=quality
+                            )
+                            # Godzina w kwarantannie (gfs_quality) - z powrotem do kolejki, aż przejdzie kontrolę
+                            # albo wyczerpie max_attempts (wtedy zapis mimo błędów)
+                            if num_records == 0 and quality is not None and quality.is_quarantined(run_time, forecast_hour):
+                                print(f"{get_timestamp()} - [f{forecast_hour:03d}] ↻ Godzina w kwarantannie - ponowne pobranie", flush=True)
+                                download_queue.put(forecast_hour)
+                                download_queue.task_done()
+                                continue
+                            print(f"{get_timestamp()} - [f{forecast_hour:03d}] ✓ Zapisano {num_records} rekordów", flush=True)
                             
-                    except Exception as e:
-                        module_logger.error(f"Błąd przetwarzania f{forecast_hour:03d}: {e}")
+                            # Szacuj rozmiar pełnego pliku (dla statystyk)
+                            estimated_full_size = file_size * 10  # Około 10x większy
+                            
+                            # Wyślij wynik
+                            progress_queue.put({
+                                'success': True,
+                                'forecast_hour': forecast_hour,
+                                'records': num_records,
+                                'bytes_filtered': file_size,
+                                'bytes_full_estimate': estimated_full_size
+                            })
+                                
+                        except Exception as e:
+                            module_logger.error(f"Błąd przetwarzania f{forecast_hour:03d}: {e}")
+                            progress_queue.put({
+                                'success': False,
+                                'forecast_hour': forecast_hour,
+                                'records': 0,
+                                'bytes_filtered': 0,
+                                'bytes_full_estimate': 0
+                            })
+                    else:
                         progress_queue.put({
                             'success': False,
                             'forecast_hour': forecast_hour,
@@ -1554,14 +1722,6 @@ if _is_main_module:
                             'bytes_filtered': 0,
                             'bytes_full_estimate': 0
                         })
-                else:
-                    progress_queue.put({
-                        'success': False,
-                        'forecast_hour': forecast_hour,
-                        'records': 0,
-                        'bytes_filtered': 0,
-                        'bytes_full_estimate': 0
-                    })
                 
                 download_queue.task_done()
                 
@@ -1613,6 +1773,13 @@ if _is_main_module:
     for t in threads:
         t.join(timeout=5)
     
+    # Godziny wstrzymane w oczekiwaniu na poprzednika (np. nieudane pobranie) - zapis bez okien opadów
+    for region in regions:
+        flush_precipitation(region.accumulator, engine, region.schema, region)
+    
+    if decode_pool is not None:
+        decode_pool.shutdown()
+    
     # === 6. PODSUMOWANIE ===
     end_time = time.time()
     elapsed_time = end_time - start_time
@@ -1634,6 +1801,9 @@ if _is_main_module:
     print(f"  Pobrano (filtered):      {mb_filtered:.1f} MB")
     print(f"  Pełne pliki (szacunek):  {mb_full_estimate:.1f} MB")
     print(f"  💾 OSZCZĘDNOŚĆ:          {mb_saved:.1f} MB ({percent_saved:.1f}%)")
+    print(f"  {staging.summary()}")
+    if quality is not None:
+        print(f"  {quality.summary()}")
     print("=" * 70)
     
     print(f"\n💡 Wszystkie dane są już zapisane w bazie!")
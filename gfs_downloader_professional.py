@@ -7,7 +7,6 @@ Z multi-threading, resume, progress bar i priorytetyzacją
 import xarray as xr
 import pandas as pd
 import numpy as np
-import requests
 import os
 import configparser
 from datetime import datetime, timedelta
@@ -20,7 +19,13 @@ from tqdm import tqdm
 import warnings
 import os
 import logging
-from collections import deque
+from gfs_sources import NOMADS_RATE_LIMITER, load_source_chain
+from gfs_grib_verify import verify_grib_file
+import gfs_grib_decode
+import gfs_staging
+from gfs_decode_pool import create_decode_pool
+import gfs_transforms
+import gfs_derived
 warnings.filterwarnings('ignore')
 
 # Stłum błędy ECCODES (są tylko ostrzeżeniami)
@@ -39,42 +44,26 @@ logging.getLogger('requests').setLevel(logging.WARNING)
 module_logger = logging.getLogger(__name__)
 
 # === RATE LIMITING - 120 zapytań/minutę (1 zapytanie co 0.5 sekundy) ===
-# Globalny licznik zapytań z timestampami (thread-safe)
-_rate_limit_lock = threading.Lock()
-_rate_limit_timestamps = deque(maxlen=120)  # Przechowuje ostatnie 120 timestampów
+# Wspólny limiter NOMADS z gfs_sources (thread-safe)
 
 def wait_for_rate_limit():
     """
     Czeka jeśli potrzeba, żeby nie przekroczyć limitu 120 zapytań/minutę.
     Thread-safe.
     """
-    global _rate_limit_timestamps
-    
-    with _rate_limit_lock:
-        now = time.time()
-        
-        # Usuń stare timestampy (starsze niż 60 sekund)
-        while _rate_limit_timestamps and (now - _rate_limit_timestamps[0]) > 60:
-            _rate_limit_timestamps.popleft()
-        
-        # Jeśli mamy już 120 zapytań w ostatniej minucie, poczekaj
-        if len(_rate_limit_timestamps) >= 120:
-            # Oblicz ile sekund trzeba poczekać
-            oldest_timestamp = _rate_limit_timestamps[0]
-            wait_time = 60 - (now - oldest_timestamp) + 0.1  # +0.1 dla bezpieczeństwa
-            if wait_time > 0:
-                module_logger.debug(f"Rate limit: czekam {wait_time:.2f}s (120 zapytań/min)")
-                time.sleep(wait_time)
-                # Usuń stare timestampy ponownie po czekaniu
-                now = time.time()
-                while _rate_limit_timestamps and (now - _rate_limit_timestamps[0]) > 60:
-                    _rate_limit_timestamps.popleft()
-        
-        # Dodaj aktualny timestamp
-        _rate_limit_timestamps.append(time.time())
-        
-        # Minimalne opóźnienie między zapytaniami (0.5s = 120/min)
-        time.sleep(0.5)
+    NOMADS_RATE_LIMITER.wait()
+
+# === ŹRÓDŁA DANYCH ===
+# Domyślnie pełne pliki z nomads.ncep.noaa.gov, a potem z ftp.ncep.noaa.gov (kolejność priorytetu).
+# Sekcja [source] w config.ini (order = bucket, nomads_raw, ...) nadpisuje tę kolejność.
+PROFESSIONAL_SOURCE_ORDER = ['nomads_raw', 'ncep_ftp']
+
+def get_sources(config_file='config.ini'):
+    """Zwraca łańcuch źródeł dla wersji professional"""
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    order = config.get('source', 'order', fallback=None) or PROFESSIONAL_SOURCE_ORDER
+    return load_source_chain(config_file, order=order)
 
 # === GŁÓWNY KOD - WYKONUJE SIĘ TYLKO GDY URUCHOMIONY BEZPOŚREDNIO ===
 # Sprawdź czy moduł jest uruchamiany bezpośrednio (nie importowany)
@@ -108,9 +97,13 @@ if _is_main_module:
         # Konfiguracja wątków (można dostosować)
         NUM_THREADS = 6  # 4-8 wątków równolegle
         
+        # Pula procesów dekodujących ([threading] decode_processes) - niezależna od liczby wątków
+        decode_pool = create_decode_pool()
+        
         print(f"✓ Konfiguracja OK")
         print(f"  Region: {lat_min}°-{lat_max}°N, {lon_min}°-{lon_max}°E")
         print(f"  Wątki: {NUM_THREADS}")
+        print(f"  Procesy dekodujące: {decode_pool.processes if decode_pool else 'brak (dekodowanie w wątkach)'}")
         
     except Exception as e:
         print(f"✗ BŁĄD konfiguracji: {e}")
@@ -136,96 +129,20 @@ if _is_main_module:
 
 # === 3. FUNKCJE POMOCNICZE ===
 
-def check_gfs_availability(date_str, hour_str, forecast_hour, verbose=False):
+def check_gfs_availability(date_str, hour_str, forecast_hour, verbose=False, sources=None):
     """
     Sprawdza czy dana prognoza GFS jest dostępna.
-    Sprawdza oba serwery: nomads.ncep.noaa.gov i ftp.ncep.noaa.gov
-    Zwraca True jeśli którykolwiek serwer ma dane dostępne.
+    Sprawdza kolejne źródła (domyślnie nomads.ncep.noaa.gov i ftp.ncep.noaa.gov).
+    Zwraca True jeśli którekolwiek źródło ma dane dostępne.
     """
-    # Lista serwerów do sprawdzenia (w kolejności priorytetu)
-    servers = [
-        "nomads.ncep.noaa.gov",
-        "ftp.ncep.noaa.gov"
-    ]
-    
-    base_path = f"/pub/data/nccf/com/gfs/prod/gfs.{date_str}/{hour_str}/atmos/gfs.t{hour_str}z.pgrb2.0p25.f{forecast_hour:03d}"
-    
-    for server in servers:
-        url = f"https://{server}{base_path}"
-        
-        try:
-            # Rate limiting przed sprawdzeniem
-            wait_for_rate_limit()
-            
-            # Używamy HEAD zamiast GET dla szybszego sprawdzenia
-            response = requests.head(url, timeout=10, allow_redirects=True)
-            
-            # Obsługa HTTP 429
-            if response.status_code == 429:
-                retry_after = int(response.headers.get('Retry-After', 60))
-                if verbose:
-                    module_logger.debug(f"  ⚠️ HTTP 429 z {server} - czekam {retry_after}s")
-                time.sleep(retry_after)
-                wait_for_rate_limit()
-                response = requests.head(url, timeout=10, allow_redirects=True)
-            
-            if response.status_code == 200:
-                content_type = response.headers.get('content-type', '').lower()
-                # Sprawdź czy to nie jest strona HTML (błąd 404 jako HTML)
-                if 'text/html' in content_type:
-                    continue  # Spróbuj następny serwer
-                
-                if verbose:
-                    module_logger.debug(f"  ✓ Dane dostępne na {server}")
-                return True
-                
-        except requests.exceptions.Timeout:
-            if verbose:
-                module_logger.debug(f"  ⏱ Timeout na {server}")
-            continue  # Spróbuj następny serwer
-        except requests.exceptions.RequestException as e:
-            if verbose:
-                module_logger.debug(f"  ✗ Błąd na {server}: {e}")
-            continue  # Spróbuj następny serwer
-        except Exception as e:
-            if verbose:
-                module_logger.debug(f"  ✗ Nieoczekiwany błąd na {server}: {e}")
-            continue  # Spróbuj następny serwer
-    
-    # Jeśli żaden serwer nie zwrócił 200, sprawdź jeszcze raz przez GET (dla pewności)
-    # Niektóre serwery mogą nie obsługiwać HEAD poprawnie
-    for server in servers:
-        url = f"https://{server}{base_path}"
-        
-        try:
-            wait_for_rate_limit()
-            response = requests.get(url, stream=True, timeout=10)
-            
-            # Obsługa HTTP 429
-            if response.status_code == 429:
-                retry_after = int(response.headers.get('Retry-After', 60))
-                if verbose:
-                    module_logger.debug(f"  ⚠️ HTTP 429 z {server} (GET) - czekam {retry_after}s")
-                response.close()
-                time.sleep(retry_after)
-                wait_for_rate_limit()
-                response = requests.get(url, stream=True, timeout=10)
-            
-            response.close()
-            
-            if response.status_code == 200:
-                content_type = response.headers.get('content-type', '').lower()
-                if 'text/html' in content_type:
-                    continue
-                
-                if verbose:
-                    module_logger.debug(f"  ✓ Dane dostępne na {server} (GET)")
-                return True
-                
-        except:
-            continue
-    
-    return False
+    if sources is None:
+        sources = get_sources()
+    try:
+        return sources.is_available(date_str, hour_str, forecast_hour, verbose)
+    except Exception as e:
+        if verbose:
+            module_logger.debug(f"  ✗ Nieoczekiwany błąd sprawdzania: {e}")
+        return False
 
 def get_required_forecast_hours():
     """
@@ -667,8 +584,21 @@ def generate_forecast_list(run_time):
 
     # === 7. KLASY I FUNKCJE DO MULTI-THREADING ===
 
+# Transformacje jednostek dla zmiennych cfgrib (nazwy z rejestru gfs_transforms / [transformations])
+VAR_TRANSFORMATIONS = {
+    't2m': 'kelvin_to_celsius',
+    'd2m': 'kelvin_to_celsius',
+    't': 'kelvin_to_celsius',
+    'prmsl': 'pa_to_hpa',
+    'tcc': 'fraction_to_percent',
+    'lcc': 'fraction_to_percent',
+    'mcc': 'fraction_to_percent',
+    'hcc': 'fraction_to_percent',
+    'r2': 'fraction_to_percent',
+}
+
 class ForecastDownloader:
-    def __init__(self, run_date, run_hour, lat_min, lat_max, lon_min, lon_max, engine):
+    def __init__(self, run_date, run_hour, lat_min, lat_max, lon_min, lon_max, engine, sources=None, decode_pool=None, transforms=None, derived=None, staging=None):
         self.run_date = run_date
         self.run_hour = run_hour
         self.lat_min = lat_min
@@ -676,6 +606,18 @@ class ForecastDownloader:
         self.lon_min = lon_min
         self.lon_max = lon_max
         self.engine = engine
+        # Źródła danych (z przełączaniem awaryjnym) - wybierane na cały run
+        self.sources = sources if sources is not None else get_sources()
+        # Pula procesów dekodujących (gfs_decode_pool) - None = dekodowanie w wątku pobierającym
+        self.decode_pool = decode_pool
+        # Wątki dekodujące wiadomości jednego pliku bez puli procesów ([threading] decode_message_threads)
+        self.message_threads = gfs_grib_decode.load_message_threads()
+        # Pliki tymczasowe ([staging] - tmpfs z limitem, przepełnienie na dysk 'temp')
+        self.staging = staging if staging is not None else gfs_staging.load_staging_store(disk_dir='temp')
+        # Transformacje jednostek - decyzja (wg jednostek GRIB) raz na zmienną w danym runie
+        self.transforms = transforms if transforms is not None else gfs_transforms.load_registry()
+        # Pola pochodne z [derived_fields] (domyślnie wiatr z u10/v10)
+        self.derived = derived if derived is not None else gfs_derived.load_derived_fields()
         self.filters_config = [
             # Ciśnienie
             {'name': 'mslp', 'filter': {'typeOfLevel': 'meanSea', 'stepType': 'instant'}, 'vars': ['prmsl']},
@@ -710,6 +652,46 @@ class ForecastDownloader:
             {'name': 'surface_other', 'filter': {'typeOfLevel': 'surface', 'stepType': 'instant'}, 'vars': ['vis', 'dswrf']},
         ]
     
+    def decode_datasets(self, grib_path, run_time, thread_id=None, forecast_hour=0):
+        """
+        Dekoduje plik jednym przebiegiem ecCodes (zamiast osobnego xr.open_dataset dla każdego filtra).
+        Zwraca listę {'name', 'dataset', 'vars'} w tym samym formacie co parsowanie cfgrib.
+        Z pulą procesów dekodowanie i wycięcie regionu odbywa się w procesie puli.
+        """
+        routing = gfs_grib_decode.build_routing_from_filters(
+            self.filters_config,
+            column_name=lambda var, filter_name: (filter_name, var)
+        )
+        start = time.time()
+        region = (self.lat_min, self.lat_max, self.lon_min, self.lon_max)
+        if self.decode_pool is not None:
+            decoded = self.decode_pool.decode(grib_path, routing, region, fh_str=f"f{forecast_hour:03d}")
+        else:
+            decoded = gfs_grib_decode.decode_grib_messages(grib_path, routing, fh_str=f"f{forecast_hour:03d}", threads=self.message_threads)
+            decoded = gfs_grib_decode.crop_region(decoded, *region)
+        module_logger.debug(f"thr: {thread_id} - ecCodes: {decoded['decoded']}/{decoded['messages']} wiadomości zdekodowanych w {time.time() - start:.2f}s dla f{forecast_hour:03d}")
+        if decoded['grid'] is None:
+            return []
+        
+        coords = {'latitude': decoded['latitudes'], 'longitude': decoded['longitudes']}
+        all_datasets = []
+        for flt_cfg in self.filters_config:
+            data_vars = {}
+            for var in flt_cfg['vars']:
+                field = decoded['fields'].get((flt_cfg['name'], var))
+                if field is not None:
+                    data_vars[var] = (('latitude', 'longitude'), field['values'], {'units': field['units']})
+            if not data_vars:
+                continue
+            # 'time' jako współrzędna skalarna - jak w datasetach cfgrib (nadpisywana później forecast_time)
+            # Region jest już wycięty indeksami z cache geometrii siatki - bez sel() dla każdego filtra
+            all_datasets.append({
+                'name': flt_cfg['name'],
+                'dataset': xr.Dataset(data_vars, coords={**coords, 'time': run_time}),
+                'vars': flt_cfg['vars']
+            })
+        return all_datasets
+    
     def download_and_process(self, forecast_info, progress_queue, thread_id=None, attempt_count=0):
         """
         Pobiera i przetwarza jedną prognozę
@@ -719,135 +701,42 @@ class ForecastDownloader:
         forecast_time = forecast_info['forecast_time']
         run_time = datetime.strptime(f"{self.run_date} {self.run_hour}", "%Y%m%d %H")
         
-        # Lista serwerów do sprawdzenia (w kolejności priorytetu)
-        servers = [
-            "nomads.ncep.noaa.gov",
-            "ftp.ncep.noaa.gov"
-        ]
-        
-        base_path = f"/pub/data/nccf/com/gfs/prod/gfs.{self.run_date}/{self.run_hour}/atmos/gfs.t{self.run_hour}z.pgrb2.0p25.f{forecast_hour:03d}"
-        idx_path = f"{base_path}.idx"
-        
-        temp_file = None
-        response = None
-        used_server = None
+        staged = None
         
         # NAJPIERW sprawdź czy plik .idx istnieje (weryfikacja dostępności)
-        idx_available = False
-        for server in servers:
-            idx_url = f"https://{server}{idx_path}"
-            try:
-                # Rate limiting przed sprawdzeniem .idx
-                wait_for_rate_limit()
-                idx_response = requests.head(idx_url, timeout=10, allow_redirects=True)
-                
-                # Obsługa HTTP 429
-                if idx_response.status_code == 429:
-                    retry_after = int(idx_response.headers.get('Retry-After', 60))
-                    module_logger.warning(f"thr: {thread_id} - HTTP 429 (Too Many Requests) dla .idx - czekam {retry_after}s")
-                    time.sleep(retry_after)
-                    # Spróbuj ponownie
-                    wait_for_rate_limit()
-                    idx_response = requests.head(idx_url, timeout=10, allow_redirects=True)
-                
-                if idx_response.status_code == 200:
-                    idx_available = True
-                    module_logger.debug(f"thr: {thread_id} - Plik .idx dostępny na {server} dla f{forecast_hour:03d}")
-                    break
-            except:
-                continue
-        
-        if not idx_available:
+        if not self.sources.is_available(self.run_date, self.run_hour, forecast_hour):
             module_logger.warning(f"thr: {thread_id} - Plik .idx niedostępny dla f{forecast_hour:03d} (licznikProbPobrania = {attempt_count})")
         
-        # Spróbuj pobrać z każdego serwera po kolei
-        for server in servers:
-            url = f"https://{server}{base_path}"
-            
-            try:
-                module_logger.info(f"thr: {thread_id} - Pobieranie (licznikProbPobrania = {attempt_count}): f{forecast_hour:03d}")
-                
-                # Rate limiting przed pobraniem
-                wait_for_rate_limit()
-                
-                # Pobierz plik
-                response = requests.get(url, stream=True, timeout=300)
-                status_code = response.status_code
-                module_logger.info(f"thr: {thread_id} - Status pobrania pliku: {status_code}")
-                
-                # Obsługa HTTP 429 (Too Many Requests)
-                if status_code == 429:
-                    retry_after = int(response.headers.get('Retry-After', 60))
-                    module_logger.warning(f"thr: {thread_id} - ⚠️ HTTP 429 (Too Many Requests) z {server} - czekam {retry_after}s")
-                    response.close()
-                    response = None
-                    
-                    # Czekaj zgodnie z Retry-After
-                    time.sleep(retry_after)
-                    
-                    # Spróbuj ponownie (z rate limiting)
-                    wait_for_rate_limit()
-                    response = requests.get(url, stream=True, timeout=300)
-                    status_code = response.status_code
-                    module_logger.info(f"thr: {thread_id} - Status po retry: {status_code}")
-                
-                if status_code == 200:
-                    used_server = server
-                    # Jeśli udało się, przerwij pętlę
-                    break
-                elif status_code == 404:
-                    module_logger.warning(f"thr: {thread_id} - Plik f{forecast_hour:03d} niedostępny na {server} (404)")
-                    if response:
-                        response.close()
-                    response = None
-                    continue
-                elif status_code == 429:
-                    # Jeśli nadal 429 po retry, spróbuj następny serwer
-                    module_logger.warning(f"thr: {thread_id} - Nadal HTTP 429 z {server} - próbuję następny serwer")
-                    if response:
-                        response.close()
-                    response = None
-                    continue
-                else:
-                    module_logger.warning(f"thr: {thread_id} - Nieoczekiwany status {status_code} z {server}")
-                    if response:
-                        response.close()
-                    response = None
-                    continue
-            except requests.exceptions.Timeout:
-                module_logger.warning(f"thr: {thread_id} - Timeout pobierania z {server} dla f{forecast_hour:03d}")
-                if response:
-                    response.close()
-                response = None
-                continue
-            except requests.exceptions.RequestException as e:
-                # Jeśli błąd, spróbuj następny serwer
-                module_logger.warning(f"thr: {thread_id} - Błąd pobierania z {server} dla f{forecast_hour:03d}: {e}")
-                if response:
-                    response.close()
-                response = None
-                continue
+        # Zapisz tymczasowo (staging: RAM lub dysk, nazwa z runem i procesem)
+        staged = self.staging.stage(f"{self.run_date}{self.run_hour}", forecast_hour, kind='full')
+        temp_file = staged.path
+        
+        # Spróbuj pobrać z każdego źródła po kolei
+        module_logger.info(f"thr: {thread_id} - Pobieranie (licznikProbPobrania = {attempt_count}): f{forecast_hour:03d}")
+        try:
+            success, file_size_bytes = self.sources.fetch(self.run_date, self.run_hour, forecast_hour, temp_file,
+                                                          fh_str=f"f{forecast_hour:03d}")
+        except BaseException:
+            staged.release()
+            raise
         
-        # Jeśli żaden serwer nie zadziałał, zwróć błąd
-        if response is None or response.status_code != 200:
+        # Jeśli żadne źródło nie zadziałało, zwróć błąd
+        if not success:
+            staged.release()
             if attempt_count > 0:
                 module_logger.warning(f"thr: {thread_id} - Pobieranie ponowne (licznikProbPobrania = {attempt_count}): f{forecast_hour:03d}")
-            raise Exception(f"Nie udało się pobrać f{forecast_hour:03d} z żadnego serwera")
+            raise Exception(f"Nie udało się pobrać f{forecast_hour:03d} z żadnego źródła")
+        # Rzeczywisty rozmiar w limicie RAM - plik, który się nie mieści, przechodzi na dysk
+        temp_file = staged.settle()
         
-        # Zapisz tymczasowo
-        if not os.path.exists('temp'):
-            os.makedirs('temp')
-        
-        temp_file = os.path.join('temp', f'gfs_{self.run_date}_{self.run_hour}_f{forecast_hour:03d}.grib2')
-        file_size_bytes = 0
+        # Szybka weryfikacja ramek GRIB (bez dekodowania) - ucięty plik pobieramy ponownie zamiast go parsować
+        verification = verify_grib_file(temp_file)
+        if not verification['ok']:
+            staged.release()
+            raise Exception(f"Plik f{forecast_hour:03d} nie przeszedł weryfikacji GRIB: {'; '.join(verification['errors'])}")
+        module_logger.debug(f"thr: {thread_id} - Weryfikacja GRIB OK dla f{forecast_hour:03d} ({verification['messages']} wiadomości)")
         
         try:
-            with open(temp_file, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=1024 * 1024):
-                    if chunk:
-                        f.write(chunk)
-                        file_size_bytes += len(chunk)
-            
             # Parsuj GRIB2
             all_datasets = []
             
@@ -870,23 +759,24 @@ class ForecastDownloader:
                     # Nie zmieniamy poziomu handlera, tylko loggerów
                     pass
             
+            index_cache = gfs_grib_decode.CfgribIndexCache(temp_file)
             try:
                 module_logger.info(f"thr: {thread_id} - Rozpoczynam parsowanie GRIB2 dla f{forecast_hour:03d}")
-                for idx, flt_cfg in enumerate(self.filters_config, 1):
+                if gfs_grib_decode.is_available():
+                    try:
+                        all_datasets = self.decode_datasets(temp_file, run_time, thread_id, forecast_hour)
+                    except Exception as e:
+                        module_logger.warning(f"thr: {thread_id} - Dekodowanie ecCodes nie powiodło się dla f{forecast_hour:03d} ({e}) - używam cfgrib")
+                        all_datasets = []
+                
+                # Fallback: osobne otwarcie cfgrib dla każdego filtra (ze wspólnym indeksem cfgrib)
+                for idx, flt_cfg in enumerate(self.filters_config if not all_datasets else [], 1):
                     try:
                         # Stłum błędy ECCODES podczas parsowania
                         with warnings.catch_warnings():
                             warnings.simplefilter("ignore")
                             module_logger.debug(f"thr: {thread_id} - Parsowanie {flt_cfg['name']} ({idx}/{len(self.filters_config)}) dla f{forecast_hour:03d}")
-                            ds = xr.open_dataset(
-                                temp_file, 
-                                engine='cfgrib',
-                                backend_kwargs={
-                                    'filter_by_keys': flt_cfg['filter'], 
-                                    'indexpath': '',
-                                    'errors': 'ignore'  # Ignoruj błędy parsowania
-                                }
-                            )
+                            ds = index_cache.open_dataset(flt_cfg['filter'])  # errors='ignore' - ignoruj błędy parsowania
                             
                             module_logger.debug(f"thr: {thread_id} - Wycinanie regionu dla {flt_cfg['name']} f{forecast_hour:03d}")
                             ds_region = ds.sel(
@@ -911,6 +801,8 @@ class ForecastDownloader:
                 eccodes_logger.setLevel(original_eccodes_level)
                 ecmwf_logger.setLevel(original_ecmwf_level)
                 module_logger.info(f"thr: {thread_id} - Zakończono parsowanie GRIB2 dla f{forecast_hour:03d} - znaleziono {len(all_datasets)} datasetów")
+                if index_cache.opens:
+                    module_logger.debug(f"thr: {thread_id} - f{forecast_hour:03d}: {index_cache.summary()}")
             
             # Konwertuj do DataFrame
             if len(all_datasets) == 0:
@@ -918,7 +810,10 @@ class ForecastDownloader:
                 return (False, forecast_info, None, 0)
             
             module_logger.info(f"thr: {thread_id} - Konwertuję {len(all_datasets)} datasetów do DataFrame dla f{forecast_hour:03d}")
-            df = None
+            # Wszystkie zmienne mają tę samą wyciętą siatkę - zbieramy tablice 2D i składamy je
+            # w jedną prealokowaną macierz (bez łańcucha merge po lat/lon/time)
+            columns = {}
+            latitudes = longitudes = None
             
             for ds_info in all_datasets:
                 ds = ds_info['dataset']
@@ -931,34 +826,6 @@ class ForecastDownloader:
                     try:
                         data = ds[var]
                         
-                        # Transformacje dla różnych parametrów
-                        if var in ['t2m', 'd2m', 't']:
-                            data = data - 273.15  # Konwersja z Kelvin na °C
-                        elif var == 'prmsl':
-                            data = data / 100  # Konwersja z Pa na hPa
-                        elif var in ['tcc', 'lcc', 'mcc', 'hcc']:
-                            data = data * 100  # Zachmurzenie z 0-1 na procenty 0-100
-                        elif var == 'r2':
-                            # r2 to wilgotność względna - zazwyczaj jest już w procentach w GRIB2
-                            # Sprawdź czy trzeba przeliczyć (jeśli wartości są w zakresie 0-1)
-                            try:
-                                max_val = float(data.max().values)
-                                if max_val <= 1.0:
-                                    data = data * 100  # Konwersja z 0-1 na procenty
-                            except:
-                                # Jeśli nie można sprawdzić, zakładamy że już w procentach
-                                pass
-                        elif var == 'prate':
-                            # Intensywność opadów - może potrzebować transformacji
-                            # Prate jest w kg/m²/s, można pozostawić lub przeliczyć
-                            pass
-                        elif var in ['vis', 'dswrf']:
-                            # Widzialność i promieniowanie - pozostawiamy jak są
-                            pass
-                        
-                        tmp = data.to_dataframe().reset_index()
-                        coords = [c for c in ['latitude', 'longitude', 'time'] if c in tmp.columns]
-                        
                         new_name = var
                         # Dodaj prefix dla kolizji nazw
                         if var in ['t', 'gh', 'u', 'v'] and level_name not in ['t2m', 'wind10']:
@@ -970,16 +837,17 @@ class ForecastDownloader:
                         elif var == 'r2':
                             new_name = 'rh'  # r2 -> rh (wilgotność względna)
                         
-                        if var in tmp.columns:
-                            tmp.rename(columns={var: new_name}, inplace=True)
-                        
-                        cols = coords + [new_name]
-                        tmp = tmp[cols]
+                        if new_name in columns:
+                            continue
                         
-                        if df is None:
-                            df = tmp
-                        else:
-                            df = df.merge(tmp, on=coords, how='outer')
+                        values = gfs_grib_decode.grid_values(data)
+                        if latitudes is None:
+                            latitudes, longitudes = data['latitude'].values, data['longitude'].values
+                        if values.shape != (latitudes.size, longitudes.size):
+                            continue
+                        # Transformacja w miejscu na tablicy regionu (np. K -> °C, Pa -> hPa)
+                        transform = self.transforms.resolve(VAR_TRANSFORMATIONS.get(var, 'none'), gfs_transforms.data_units(data))
+                        columns[new_name] = transform.apply(values)
                     
                     except:
                         continue
@@ -989,29 +857,26 @@ class ForecastDownloader:
                 ds_info['dataset'].close()
             
             # Przygotuj DataFrame
-            if df is None or len(df) == 0:
+            if not columns:
+                return (False, forecast_info, None, 0)
+            
+            # Pola pochodne liczone na tablicach regionu - trafiają do tej samej macierzy co zmienne
+            self.derived.compute(columns)
+            df = gfs_grib_decode.assemble_wide_frame(latitudes, longitudes, columns)
+            del columns
+            if len(df) == 0:
                 return (False, forecast_info, None, 0)
             
+            # WAŻNE: forecast_time = run_time + forecast_hour (czas 'time' z GRIB2 to czas analizy)
+            df['forecast_time'] = forecast_time
             df['run_time'] = run_time
             df['created_at'] = datetime.utcnow()
             
-            # WAŻNE: Nadpisz 'time' prawidłowym forecast_time (run_time + forecast_hour)
-            # Kolumna 'time' z GRIB2 może mieć nieprawidłowe wartości
-            if 'time' in df.columns:
-                # Zastąp wszystkie wartości 'time' prawidłowym forecast_time
-                df['time'] = forecast_time
-            
             df.rename(columns={
                 'latitude': 'lat',
-                'longitude': 'lon',
-                'time': 'forecast_time'
+                'longitude': 'lon'
             }, inplace=True)
             
-            # Oblicz wiatr
-            if 'u10' in df.columns and 'v10' in df.columns:
-                df['wind_speed'] = np.sqrt(df['u10']**2 + df['v10']**2)
-                df['wind_dir'] = (270 - np.arctan2(df['v10'], df['u10']) * 180 / np.pi) % 360
-            
             # Zaokrąglij wszystkie kolumny numeryczne do 2 miejsc po przecinku
             # (oprócz id - jeśli istnieje)
             numeric_cols = df.select_dtypes(include=[np.number]).columns
@@ -1058,12 +923,9 @@ class ForecastDownloader:
             return (False, forecast_info, None, 0)
         
         finally:
-            # Usuń plik tymczasowy
-            if temp_file and os.path.exists(temp_file):
-                try:
-                    os.remove(temp_file)
-                except:
-                    pass
+            # Usuń plik tymczasowy (razem z indeksem cfgrib)
+            if staged is not None:
+                staged.release()
 
 def worker_thread(queue, downloader, progress_queue, stats, thread_id=None):
     """Wątek roboczy - pobiera prognozy z kolejki"""
@@ -1154,7 +1016,8 @@ def worker_thread(queue, downloader, progress_queue, stats, thread_id=None):
         start_time = time.time()
 
         # Stwórz downloader
-        downloader = ForecastDownloader(RUN_DATE, RUN_HOUR, lat_min, lat_max, lon_min, lon_max, engine)
+        downloader = ForecastDownloader(RUN_DATE, RUN_HOUR, lat_min, lat_max, lon_min, lon_max, engine,
+                                        decode_pool=decode_pool)
 
         # Pętla automatycznego ponawiania
         attempt = 1
@@ -1350,6 +1213,9 @@ def worker_thread(queue, downloader, progress_queue, stats, thread_id=None):
         else:
             time_str = f"{seconds}s"
 
+        if decode_pool is not None:
+            decode_pool.shutdown()
+
         # === 9. PODSUMOWANIE ===
         print("\n" + "=" * 70)
         print("✓✓✓ POBRANIE ZAKOŃCZONE!")
@@ -3,7 +3,6 @@ GFS Weather Data Downloader - SMART V2 FIXED
 Poprawione sprawdzanie dostępności
 """
 
-import xarray as xr
 import pandas as pd
 import numpy as np
 import requests
@@ -13,6 +12,8 @@ from datetime import datetime, timedelta
 from sqlalchemy import create_engine, text
 import warnings
 import time
+from gfs_sources import NomadsRawSource
+import gfs_grib_decode
 warnings.filterwarnings('ignore')
 
 print("=" * 60)
@@ -84,12 +85,14 @@ except Exception as e:
     last_run_in_db = None
 
 # === 3. POPRAWIONA FUNKCJA SPRAWDZANIA ===
+gfs_source = NomadsRawSource()
+
 def check_gfs_availability(date_str, hour_str, verbose=False):
     """
     Sprawdza czy dany run GFS jest dostępny
     Używa GET zamiast HEAD (bardziej niezawodne)
     """
-    url = f"https://nomads.ncep.noaa.gov/pub/data/nccf/com/gfs/prod/gfs.{date_str}/{hour_str}/atmos/gfs.t{hour_str}z.pgrb2.0p25.f003"
+    url = gfs_source.url_for(date_str, hour_str, 3)
     
     try:
         # Użyj GET z stream=True (pobiera tylko nagłówki + trochę danych)
@@ -198,7 +201,7 @@ try:
         input("\nNaciśnij Enter...")
         exit(0)
     
-    FILE_URL = f"https://nomads.ncep.noaa.gov/pub/data/nccf/com/gfs/prod/gfs.{RUN_DATE}/{RUN_HOUR}/atmos/gfs.t{RUN_HOUR}z.pgrb2.0p25.f003"
+    FILE_URL = gfs_source.url_for(RUN_DATE, RUN_HOUR, 3)
     
     print(f"\n✓ NOWY RUN ZNALEZIONY!")
     print(f"  Run: {run_time.strftime('%Y-%m-%d %H:00')} UTC")
@@ -266,6 +269,7 @@ except Exception as e:
 print(f"\n⏳ Parsowanie GRIB2...")
 
 all_datasets = []
+index_cache = gfs_grib_decode.CfgribIndexCache(grib_file)  # Jeden indeks cfgrib dla wszystkich filtrów
 
 filters_config = [
     {'name': 'mslp', 'filter': {'typeOfLevel': 'meanSea', 'stepType': 'instant'}, 'vars': ['prmsl']},
@@ -285,8 +289,7 @@ try:
         print(f"  → {name}...", end=' ')
         
         try:
-            ds = xr.open_dataset(grib_file, engine='cfgrib',
-                backend_kwargs={'filter_by_keys': flt_cfg['filter'], 'indexpath': ''})
+            ds = index_cache.open_dataset(flt_cfg['filter'], errors='warn')
             
             ds_region = ds.sel(latitude=slice(lat_max, lat_min), longitude=slice(lon_min, lon_max))
             
@@ -300,6 +303,7 @@ try:
             continue
     
     print(f"\n✓ Otworto {len(all_datasets)} dataset(ów)")
+    print(f"  ({index_cache.summary()})")
     
 except Exception as e:
     print(f"✗ BŁĄD: {e}")
@@ -310,7 +314,10 @@ except Exception as e:
 print(f"\n⏳ Konwersja do DataFrame...")
 
 try:
-    df = None
+    # Wszystkie zmienne mają tę samą wyciętą siatkę - składamy tablice 2D w jedną macierz (bez merge)
+    columns = {}
+    latitudes = longitudes = None
+    forecast_time = None
     
     for ds_info in all_datasets:
         ds = ds_info['dataset']
@@ -330,31 +337,31 @@ try:
                 elif var == 'tcc':
                     data = data * 100
                 
-                tmp = data.to_dataframe().reset_index()
-                coords = [c for c in ['latitude', 'longitude', 'time'] if c in tmp.columns]
-                
                 new_name = var
                 if var in ['t', 'gh', 'u', 'v'] and level_name not in ['t2m', 'wind10']:
                     new_name = f"{var}_{level_name}"
                 
-                if var in tmp.columns:
-                    tmp.rename(columns={var: new_name}, inplace=True)
-                
-                cols = coords + [new_name]
-                tmp = tmp[cols]
+                if new_name in columns:
+                    continue
                 
-                if df is None:
-                    df = tmp
-                else:
-                    df = df.merge(tmp, on=coords, how='outer')
+                values = gfs_grib_decode.grid_values(data)
+                if latitudes is None:
+                    latitudes, longitudes = data['latitude'].values, data['longitude'].values
+                    if 'time' in data.coords:
+                        forecast_time = pd.Timestamp(data['time'].values)
+                if values.shape != (latitudes.size, longitudes.size):
+                    continue
+                columns[new_name] = values
                 
             except Exception as e:
                 pass
     
+    df = gfs_grib_decode.assemble_wide_frame(latitudes, longitudes, columns)
+    df['forecast_time'] = forecast_time
     df['run_time'] = run_time
     df['created_at'] = datetime.utcnow()
     
-    df.rename(columns={'latitude': 'lat', 'longitude': 'lon', 'time': 'forecast_time'}, inplace=True)
+    df.rename(columns={'latitude': 'lat', 'longitude': 'lon'}, inplace=True)
     
     if 'u10' in df.columns and 'v10' in df.columns:
         df['wind_speed'] = np.sqrt(df['u10']**2 + df['v10']**2)
@@ -375,7 +382,7 @@ try:
         ds_info['dataset'].close()
     
     if os.path.exists(grib_file):
-        os.remove(grib_file)
+        gfs_grib_decode.remove_grib_file(grib_file)
         print(f"✓ Plik tymczasowy usunięty")
     
 except:
@@ -0,0 +1,532 @@
+"""
+GFS Weather Data Downloader - JEDNOPRZEBIEGOWE DEKODOWANIE GRIB (ecCodes)
+Zamiast otwierać plik przez xr.open_dataset osobno dla każdego typeOfLevel/poziomu
+(każde otwarcie skanuje cały plik), iterujemy po wiadomościach RAZ:
+- dla każdej wiadomości czytamy tylko klucze (cfVarName, typeOfLevel, level, stepType),
+- dekodujemy wartości tylko wiadomości, które trafiają do skonfigurowanych kolumn,
+- tablice wartości trafiają od razu do słownika kolumna -> tablica 2D (lat x lon).
+
+Czas parsowania zależy od ilości potrzebnych danych, a nie od (liczba filtrów x rozmiar pliku).
+Plik jest czytany przez mmap (gfs_staging.map_file) - ecCodes dostaje wiadomości prosto z mapowania.
+
+Wartości wiadomości mogą być dekodowane równolegle w obrębie jednego pliku ([threading]
+decode_message_threads): przebieg po pliku czyta tylko nagłówki, a kopie wybranych wiadomości
+trafiają do wspólnej puli wątków procesu (ecCodes zwalnia GIL w trakcie dekodowania). Każda
+wiadomość ma swój slot wyniku, więc kolejność ukończenia nie ma znaczenia. Pula jest wspólna dla
+wszystkich godzin prognozy - jedna godzina (f000) dostaje wszystkie wątki, gdy reszta kolejki stoi.
+
+Duże regiony (Europa, cały glob) są przetwarzane pasami szerokości geograficznej (latitude_bands):
+transformacje, pola pochodne i zapis działają na jednym pasie naraz, ze stałym limitem punktów
+([processing] chunk_points), więc pamięć nie rośnie z rozmiarem regionu.
+
+Dla ścieżki awaryjnej cfgrib (wiele xr.open_dataset na tym samym pliku) jest CfgribIndexCache:
+indeks cfgrib budowany raz na plik, zapisywany obok pliku GRIB i usuwany razem z nim.
+"""
+
+import os
+import glob
+import time
+import logging
+import threading
+import configparser
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+import gfs_staging
+
+try:
+    import eccodes
+except ImportError:
+    eccodes = None
+
+module_logger = logging.getLogger(__name__)
+
+# ecCodes i cfgrib różnie nazywają poziom "cała atmosfera" - sprowadzamy do nazwy z config.ini
+TYPE_OF_LEVEL_ALIASES = {
+    'atmosphere': 'entireAtmosphere',
+    'atmosphereSingleLayer': 'entireAtmosphere',
+}
+
+# Poziomy, dla których wartość poziomu jest częścią klucza (dla pozostałych klucz ma poziom 0)
+LEVELLED_TYPES = ('isobaricInhPa', 'heightAboveGround')
+
+# Nieprawidłowe poziomy (artefakty MultiIndex w starym kodzie) - nigdy ich nie zapisujemy
+INVALID_LEVELS = (0, 995, 996, 997, 998, 999)
+
+# Cache geometrii siatek: definicja siatki -> współrzędne i indeksy regionów
+_GRID_CACHE = {}
+_GRID_CACHE_LOCK = threading.Lock()
+
+# Pule wątków dekodujących wiadomości: (pid, liczba wątków) -> ThreadPoolExecutor
+# (pid w kluczu - proces potomny po fork nie może używać wątków rodzica)
+_MESSAGE_POOLS = {}
+_MESSAGE_POOLS_LOCK = threading.Lock()
+
+# Domyślnie wiadomości dekodowane kolejno w wątku wywołującym (jak dotychczas)
+DEFAULT_MESSAGE_THREADS = 1
+
+# Limit punktów siatki w jednym pasie przetwarzania (~0.2 siatki globalnej 0.25°)
+DEFAULT_CHUNK_POINTS = 250000
+
+# Szablon ścieżki indeksu cfgrib - obok pliku GRIB (short_hash zależy od zestawu kluczy indeksu)
+CFGRIB_INDEXPATH = '{path}.{short_hash}.cfgrib.idx'
+
+def is_available():
+    """Czy biblioteka ecCodes jest dostępna"""
+    return eccodes is not None
+
+def routing_key(var_name, level_type, level_value):
+    """Klucz tablicy routingu: (nazwa cfgrib, typ poziomu, poziom) - jak w cfgrib_to_config"""
+    level_type = TYPE_OF_LEVEL_ALIASES.get(level_type, level_type)
+    if level_type in LEVELLED_TYPES and isinstance(level_value, int):
+        return (var_name, level_type, level_value)
+    return (var_name, level_type, 0)
+
+def build_routing_table(params_config, cfgrib_to_config):
+    """
+    Buduje tablicę routingu z konfiguracji [gfs_parameters]:
+    (cfVarName, typeOfLevel, poziom) -> {'column', 'transformation', 'config_name', 'step_type'}
+    """
+    routing = {}
+    for key, config_name in cfgrib_to_config.items():
+        param = params_config.get(config_name)
+        if not param:
+            continue
+        routing[key] = {
+            'column': param['db_column'],
+            'transformation': param['transformation'],
+            'config_name': config_name,
+            'step_type': param.get('step_type'),
+        }
+    return routing
+
+def build_routing_from_filters(filters_config, column_name=None, transformation=None):
+    """
+    Buduje tablicę routingu z listy filtrów cfgrib (format ForecastDownloader.filters_config).
+    column_name(var, filter_name) i transformation(var) pozwalają zachować dotychczasowe nazwy kolumn.
+    """
+    routing = {}
+    for flt_cfg in filters_config:
+        flt = flt_cfg['filter']
+        level_type = flt.get('typeOfLevel')
+        level_value = flt.get('level', 0)
+        for var in flt_cfg['vars']:
+            if 'shortName' in flt and flt['shortName'] != var:
+                continue
+            key = routing_key(var, level_type, level_value)
+            if key in routing:
+                continue  # Ta sama zmienna w kilku filtrach - wystarczy raz
+            routing[key] = {
+                'column': column_name(var, flt_cfg['name']) if column_name else var,
+                'transformation': transformation(var) if transformation else 'none',
+                'config_name': var,
+                'step_type': flt.get('stepType'),
+            }
+    return routing
+
+def _default_column(var_name, level_type, level_value):
+    """Nazwa kolumny gdy brak konfiguracji parametrów (jak w starym kodzie)"""
+    if level_type == 'isobaricInhPa':
+        return f"{var_name}_{int(level_value)}_mb"
+    if level_type == 'heightAboveGround':
+        return f"{var_name}_{int(level_value)}m"
+    return var_name
+
+def _step_priority(step_type, start_step):
+    """
+    Priorytet wiadomości przy kilku stepType dla tej samej zmiennej:
+    instant > akumulacja od początku prognozy > pozostałe (np. okna 6h, średnie)
+    """
+    if step_type == 'instant':
+        return 2
+    if step_type == 'accum' and start_step == 0:
+        return 1
+    return 0
+
+def grid_definition(handle):
+    """Definicja siatki regular_ll z nagłówka wiadomości (klucz cache siatki)"""
+    get = eccodes.codes_get
+    return (
+        get(handle, 'gridType'),
+        get(handle, 'Ni'),
+        get(handle, 'Nj'),
+        get(handle, 'latitudeOfFirstGridPointInDegrees'),
+        get(handle, 'longitudeOfFirstGridPointInDegrees'),
+        get(handle, 'latitudeOfLastGridPointInDegrees'),
+        get(handle, 'longitudeOfLastGridPointInDegrees'),
+        get(handle, 'iDirectionIncrementInDegrees'),
+        get(handle, 'jDirectionIncrementInDegrees'),
+    )
+
+def grid_coordinates(handle):
+    """Zwraca (latitudes, longitudes) jako tablice 1D dla siatki regular_ll - te same wartości co w cfgrib"""
+    return (eccodes.codes_get_array(handle, 'distinctLatitudes'),
+            eccodes.codes_get_array(handle, 'distinctLongitudes'))
+
+def region_slices(latitudes, longitudes, lat_min, lat_max, lon_min, lon_max):
+    """
+    Indeksy (wiersze, kolumny) regionu - odpowiednik sel(latitude=slice(lat_max, lat_min),
+    longitude=slice(lon_min, lon_max)) z końcami włącznie.
+    """
+    rows = np.nonzero((latitudes >= lat_min) & (latitudes <= lat_max))[0]
+    cols = np.nonzero((longitudes >= lon_min) & (longitudes <= lon_max))[0]
+    if rows.size == 0 or cols.size == 0:
+        return slice(0, 0), slice(0, 0)
+    return slice(int(rows[0]), int(rows[-1]) + 1), slice(int(cols[0]), int(cols[-1]) + 1)
+
+def _read_only(array):
+    array.setflags(write=False)
+    return array
+
+def grid_geometry(grid, handle=None):
+    """
+    Geometria siatki z cache (klucz: definicja siatki z grid_definition()).
+    Siatka GFS jest ta sama dla wszystkich 209 godzin prognozy, więc współrzędne czytamy raz na proces.
+    Zwraca {'grid', 'latitudes', 'longitudes', 'regions': {...}} - tablice tylko do odczytu (współdzielone).
+    """
+    with _GRID_CACHE_LOCK:
+        geometry = _GRID_CACHE.get(grid)
+    if geometry is None:
+        latitudes, longitudes = grid_coordinates(handle)
+        geometry = {
+            'grid': grid,
+            'latitudes': _read_only(latitudes),
+            'longitudes': _read_only(longitudes),
+            'regions': {},
+        }
+        with _GRID_CACHE_LOCK:
+            geometry = _GRID_CACHE.setdefault(grid, geometry)
+    return geometry
+
+def region_geometry(geometry, lat_min, lat_max, lon_min, lon_max):
+    """
+    Region siatki z cache geometrii: indeksy wycięcia ('rows', 'cols'), współrzędne 1D regionu
+    oraz gotowe kolumny wyjściowe 'lat_column'/'lon_column' (kolejność wierszy jak w to_dataframe()).
+    """
+    key = (lat_min, lat_max, lon_min, lon_max)
+    with _GRID_CACHE_LOCK:
+        region = geometry['regions'].get(key)
+    if region is None:
+        rows, cols = region_slices(geometry['latitudes'], geometry['longitudes'], lat_min, lat_max, lon_min, lon_max)
+        latitudes = geometry['latitudes'][rows]
+        longitudes = geometry['longitudes'][cols]
+        region = {
+            'rows': rows,
+            'cols': cols,
+            'shape': (latitudes.size, longitudes.size),
+            'latitudes': latitudes,
+            'longitudes': longitudes,
+            'lat_column': _read_only(np.repeat(latitudes, longitudes.size)),
+            'lon_column': _read_only(np.tile(longitudes, latitudes.size)),
+        }
+        with _GRID_CACHE_LOCK:
+            region = geometry['regions'].setdefault(key, region)
+    return region
+
+def crop_region(decoded, lat_min, lat_max, lon_min, lon_max):
+    """
+    Wycina region ze zdekodowanych pól (wynik decode_grib_messages) - wartości to widoki numpy
+    (przy przekazaniu do innego procesu pickle i tak kopiuje tylko region).
+    """
+    if decoded['grid'] is None:
+        return decoded
+    region = region_geometry(decoded['geometry'], lat_min, lat_max, lon_min, lon_max)
+    rows, cols = region['rows'], region['cols']
+    cropped = dict(decoded)
+    del cropped['geometry']  # Pełna geometria zostaje w cache procesu - nie przesyłamy jej dalej
+    cropped['region'] = region
+    cropped['latitudes'] = region['latitudes']
+    cropped['longitudes'] = region['longitudes']
+    cropped['fields'] = {
+        column: {**field, 'values': field['values'][rows, cols]}
+        for column, field in decoded['fields'].items()
+    }
+    return cropped
+
+def load_message_threads(config_file='config.ini'):
+    """Liczba wątków dekodujących wiadomości jednego pliku z [threading] decode_message_threads"""
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    return config.getint('threading', 'decode_message_threads', fallback=DEFAULT_MESSAGE_THREADS)
+
+def message_pool(threads):
+    """Wspólna pula wątków procesu dla dekodowania wiadomości; None gdy threads <= 1 (dekodowanie kolejne)"""
+    if not threads or threads <= 1:
+        return None
+    key = (os.getpid(), int(threads))
+    with _MESSAGE_POOLS_LOCK:
+        pool = _MESSAGE_POOLS.get(key)
+        if pool is None:
+            pool = ThreadPoolExecutor(max_workers=int(threads), thread_name_prefix='grib-decode')
+            _MESSAGE_POOLS[key] = pool
+    return pool
+
+def _message_values(handle, grid):
+    """Wartości wiadomości jako tablica 2D (Nj x Ni); punkty z bitmapy brakujących -> NaN"""
+    values = eccodes.codes_get_values(handle)
+    if eccodes.codes_get(handle, 'bitmapPresent'):
+        values = np.where(values == eccodes.codes_get(handle, 'missingValue'), np.nan, values)
+    return values.reshape(grid[2], grid[1])
+
+def _decode_message(message, grid):
+    """Zadanie puli wątków: dekodowanie kopii jednej wiadomości na osobnym uchwycie ecCodes"""
+    handle = eccodes.codes_new_from_message(message)
+    try:
+        return _message_values(handle, grid)
+    finally:
+        eccodes.codes_release(handle)
+
+def grib_message_frames(buffer):
+    """
+    (offset, długość) kolejnych wiadomości GRIB w buforze (mmap / bytes). Dane między wiadomościami
+    i fałszywe znaczniki 'GRIB' są pomijane (jak przy czytaniu pliku przez ecCodes).
+    """
+    size = len(buffer)
+    offset = buffer.find(b'GRIB')
+    while 0 <= offset and offset + 16 <= size:
+        edition = buffer[offset + 7]
+        if edition == 2:
+            length = int.from_bytes(buffer[offset + 8:offset + 16], 'big')
+        elif edition == 1:
+            length = int.from_bytes(buffer[offset + 4:offset + 7], 'big')
+        else:
+            length = 0
+        if length < 16 or offset + length > size or buffer[offset + length - 4:offset + length] != b'7777':
+            offset = buffer.find(b'GRIB', offset + 4)
+            continue
+        yield offset, length
+        offset = buffer.find(b'GRIB', offset + length)
+
+def decode_grib_messages(grib_path, routing=None, fh_str='?', threads=None):
+    """
+    Jeden przebieg po wiadomościach pliku GRIB.
+    routing - tablica z build_routing_table(); None = wszystkie zmienne z domyślnymi nazwami kolumn.
+    threads - wątki dekodujące wartości wiadomości (message_pool); None/1 = kolejno w wątku wywołującym.
+    Zwraca {'grid', 'geometry', 'latitudes', 'longitudes', 'fields': {kolumna: {'values' (Nj x Ni),
+    'transformation', 'config_name', 'var_name', 'units', 'step_type', 'start_step', 'end_step'}},
+    'messages', 'decoded'}.
+    """
+    if eccodes is None:
+        raise ImportError("Biblioteka eccodes nie jest zainstalowana")
+
+    fields = {}
+    priorities = {}
+    # Slot wyniku na każdą dekodowaną wiadomość: tablica wartości albo Future z puli wątków
+    slots = []
+    pool = message_pool(threads)
+    grid = None
+    geometry = None
+    messages = 0
+    decoded = 0
+
+    with gfs_staging.map_file(grib_path) as buffer, memoryview(buffer) as view:
+        for offset, length in grib_message_frames(buffer):
+            # Uchwyt z widoku na mapowanie - bez kopii wiadomości po stronie Pythona
+            handle = eccodes.codes_new_from_message(view[offset:offset + length])
+            messages += 1
+            try:
+                var_name = eccodes.codes_get(handle, 'cfVarName')
+                level_type = eccodes.codes_get(handle, 'typeOfLevel')
+                level_type = TYPE_OF_LEVEL_ALIASES.get(level_type, level_type)
+                level_value = int(eccodes.codes_get(handle, 'level'))
+                step_type = eccodes.codes_get(handle, 'stepType')
+
+                if level_type in LEVELLED_TYPES and level_value in INVALID_LEVELS:
+                    continue
+
+                key = routing_key(var_name, level_type, level_value)
+                if routing is None:
+                    route = {'column': _default_column(var_name, level_type, level_value),
+                             'transformation': 'none', 'config_name': None, 'step_type': None}
+                else:
+                    route = routing.get(key)
+                    if route is None:
+                        continue
+
+                if route.get('step_type') and route['step_type'] != step_type:
+                    continue
+
+                column = route['column']
+                start_step = eccodes.codes_get(handle, 'startStep') if step_type != 'instant' else 0
+                priority = _step_priority(step_type, start_step)
+                if column in priorities and priorities[column] >= priority:
+                    continue
+
+                msg_grid = grid_definition(handle)
+                if msg_grid[0] != 'regular_ll':
+                    module_logger.warning(f"[{fh_str}] Pomijam {var_name} - nieobsługiwana siatka {msg_grid[0]}")
+                    continue
+                if grid is None:
+                    grid = msg_grid
+                    geometry = grid_geometry(grid, handle)
+                elif msg_grid != grid:
+                    module_logger.warning(f"[{fh_str}] Pomijam {var_name} - inna siatka niż pozostałe zmienne")
+                    continue
+
+                # Dopiero teraz dekodujemy dane (tylko potrzebne wiadomości) - w puli wątków na kopii
+                # wiadomości, a przebieg po nagłówkach kolejnych wiadomości idzie dalej
+                if pool is not None:
+                    slots.append(pool.submit(_decode_message, buffer[offset:offset + length], msg_grid))
+                else:
+                    slots.append(_message_values(handle, msg_grid))
+                decoded += 1
+                end_step = eccodes.codes_get(handle, 'endStep')
+
+                fields[column] = {
+                    'slot': len(slots) - 1,
+                    'transformation': route['transformation'],
+                    'config_name': route['config_name'],
+                    'var_name': var_name,
+                    'units': eccodes.codes_get(handle, 'units'),
+                    'step_type': step_type,
+                    # Okno akumulacji w godzinach (dla 'instant' start = end = krok prognozy)
+                    'start_step': start_step if step_type != 'instant' else end_step,
+                    'end_step': end_step,
+                }
+                priorities[column] = priority
+            finally:
+                eccodes.codes_release(handle)
+
+    # Wiadomości zastąpione przez wiadomość o wyższym priorytecie nie są potrzebne
+    used = {field['slot'] for field in fields.values()}
+    if pool is not None:
+        for slot, future in enumerate(slots):
+            if slot not in used:
+                future.cancel()
+    for field in fields.values():
+        slot = slots[field.pop('slot')]
+        field['values'] = slot.result() if pool is not None else slot
+
+    return {
+        'grid': grid,
+        'geometry': geometry,
+        'latitudes': geometry['latitudes'] if geometry else None,
+        'longitudes': geometry['longitudes'] if geometry else None,
+        'fields': fields,
+        'messages': messages,
+        'decoded': decoded,
+    }
+
+def grid_values(data):
+    """
+    Tablica 2D (latitude x longitude) ze zmiennej xarray - dodatkowe wymiary (poziom, czas)
+    są redukowane do pierwszej wartości, jak w dotychczasowej konwersji.
+    """
+    extra_dims = {dim: 0 for dim in data.dims if dim not in ('latitude', 'longitude')}
+    if extra_dims:
+        data = data.isel(extra_dims)
+    return np.asarray(data.transpose('latitude', 'longitude').values)
+
+def load_chunk_points(config_file='config.ini'):
+    """Limit punktów w pasie z [processing] chunk_points (0 = cały region naraz)"""
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    return config.getint('processing', 'chunk_points', fallback=DEFAULT_CHUNK_POINTS)
+
+def latitude_bands(n_latitudes, n_longitudes, chunk_points=DEFAULT_CHUNK_POINTS):
+    """
+    Podział siatki (n_latitudes x n_longitudes) na pasy kolejnych wierszy szerokości - lista slice.
+    Pas ma najwyżej chunk_points punktów (ale co najmniej jeden wiersz); chunk_points <= 0 - jeden pas.
+    """
+    if n_latitudes == 0:
+        return []
+    if not chunk_points or chunk_points <= 0:
+        return [slice(0, n_latitudes)]
+    rows = max(1, chunk_points // max(n_longitudes, 1))
+    return [slice(start, min(start + rows, n_latitudes)) for start in range(0, n_latitudes, rows)]
+
+def assemble_wide_frame(latitudes, longitudes, columns, lat_column=None, lon_column=None, dtype=np.float64, index_start=0,
+                        decimals=None):
+    """
+    Składa zmienne ze wspólnej siatki w jeden DataFrame bez łączenia (merge) tabel.
+    columns - {nazwa kolumny: tablica 2D (len(latitudes) x len(longitudes))}.
+    Każda zmienna jest kopiowana raz do prealokowanej macierzy (punkty x kolumny);
+    wiersze w kolejności to_dataframe() (szerokość, potem długość), kolumny 'latitude', 'longitude', ...
+    lat_column/lon_column - gotowe kolumny współrzędnych (np. z region_geometry()).
+    index_start - pozycja pierwszego punktu w siatce regionu (pas z latitude_bands); indeks DataFrame
+    to pozycje punktów w całym regionie.
+    decimals - zaokrąglenie całej macierzy w miejscu (zamiast round() na gotowym DataFrame, które kopiuje blok).
+    """
+    points = latitudes.size * longitudes.size
+    names = ['latitude', 'longitude'] + list(columns)
+    # Kolejność 'F': każda kolumna ciągła w pamięci, pandas przejmuje macierz jako jeden blok bez kopii
+    matrix = np.empty((points, len(names)), dtype=dtype, order='F')
+    matrix[:, 0] = lat_column if lat_column is not None else np.repeat(latitudes, longitudes.size)
+    matrix[:, 1] = lon_column if lon_column is not None else np.tile(longitudes, latitudes.size)
+    for i, values in enumerate(columns.values(), 2):
+        matrix[:, i] = values.reshape(points)
+    if decimals is not None:
+        np.round(matrix, decimals, out=matrix)
+    index = pd.RangeIndex(index_start, index_start + points)
+    return pd.DataFrame(matrix, columns=names, index=index, copy=False)
+
+def cfgrib_index_files(grib_path):
+    """Pliki indeksu cfgrib utworzone dla danego pliku GRIB"""
+    return glob.glob(glob.escape(grib_path) + '.*.cfgrib.idx')
+
+def remove_grib_file(grib_path):
+    """Usuwa plik GRIB razem z jego indeksami cfgrib (błędy usuwania są ignorowane)"""
+    for path in [grib_path] + cfgrib_index_files(grib_path):
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except OSError:
+            pass
+
+class CfgribIndexCache:
+    """
+    Wspólny indeks cfgrib dla wielu xr.open_dataset na tym samym pliku.
+    Zamiast 'indexpath': '' (indeks budowany od zera przy każdym otwarciu) indeks jest
+    zapisywany obok pliku GRIB i używany ponownie przez kolejne filtry.
+    Filtry z innym zestawem kluczy (np. z 'level') mają osobny indeks - też budowany tylko raz.
+    Nie jest thread-safe - jedna instancja na plik w jednym wątku.
+    """
+
+    def __init__(self, grib_path):
+        self.grib_path = grib_path
+        self.opens = 0
+        self.builds = 0
+        self.build_time = 0.0
+        self.hit_time = 0.0
+
+    def open_dataset(self, filter_by_keys, errors='ignore'):
+        """xr.open_dataset(engine='cfgrib') z indeksem z cache"""
+        before = set(cfgrib_index_files(self.grib_path))
+        start = time.time()
+        ds = xr.open_dataset(
+            self.grib_path,
+            engine='cfgrib',
+            backend_kwargs={
+                'filter_by_keys': filter_by_keys,
+                'indexpath': CFGRIB_INDEXPATH,
+                'errors': errors
+            }
+        )
+        elapsed = time.time() - start
+        self.opens += 1
+        if set(cfgrib_index_files(self.grib_path)) - before:
+            self.builds += 1
+            self.build_time += elapsed
+        else:
+            self.hit_time += elapsed
+        return ds
+
+    @property
+    def hits(self):
+        return self.opens - self.builds
+
+    def summary(self):
+        """Krótki opis statystyk cache do logów"""
+        return (f"indeks cfgrib: {self.opens} otwarć, {self.builds} zbudowanych ({self.build_time:.2f}s), "
+                f"{self.hits} trafień ({self.hit_time:.2f}s)")
+
+    def remove(self):
+        """Usuwa pliki indeksu (sam plik GRIB zostaje)"""
+        for path in cfgrib_index_files(self.grib_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,223 @@
+"""
+GFS Weather Data Downloader - WERYFIKACJA PLIKÓW GRIB
+Szybkie sprawdzenie pobranego pliku PRZED parsowaniem (bez dekodowania danych):
+- ramki wiadomości GRIB ... 7777 (wykrywa ucięte pliki i strony błędów HTML)
+- liczba wiadomości (porównanie z .idx)
+- czy są wszystkie oczekiwane pary (zmienna, poziom) z planu pobierania
+
+Czytane są tylko nagłówki sekcji (seek po pliku), więc sprawdzenie trwa milisekundy
+zamiast pełnego parsowania cfgrib, które i tak trzeba by powtórzyć po ponownym pobraniu.
+"""
+
+import os
+import struct
+import logging
+
+from gfs_sources import idx_entry_matches, idx_level_from_key
+from gfs_staging import map_file
+
+module_logger = logging.getLogger(__name__)
+
+# (discipline, parameterCategory, parameterNumber) -> nazwa zmiennej NOMADS
+GRIB2_PARAMETERS = {
+    (0, 0, 0): 'TMP',
+    (0, 0, 6): 'DPT',
+    (0, 1, 1): 'RH',
+    (0, 1, 3): 'PWAT',
+    (0, 1, 7): 'PRATE',
+    (0, 1, 8): 'APCP',
+    (0, 1, 11): 'SNOD',
+    (0, 1, 13): 'WEASD',
+    (0, 1, 22): 'CLWMR',
+    (0, 1, 23): 'ICMR',
+    (0, 2, 2): 'UGRD',
+    (0, 2, 3): 'VGRD',
+    (0, 2, 8): 'VVEL',
+    (0, 2, 22): 'GUST',
+    (0, 3, 0): 'PRES',
+    (0, 3, 1): 'PRMSL',
+    (0, 3, 5): 'HGT',
+    (0, 4, 192): 'DSWRF',
+    (0, 6, 1): 'TCDC',
+    (0, 6, 3): 'LCDC',
+    (0, 6, 4): 'MCDC',
+    (0, 6, 5): 'HCDC',
+    (0, 7, 6): 'CAPE',
+    (0, 7, 7): 'CIN',
+    (0, 19, 0): 'VIS',
+    (2, 0, 192): 'SOILW',
+    (2, 3, 18): 'TSOIL',
+}
+
+def grib2_level_name(level_type, level_value):
+    """Zamienia typ i wartość poziomu GRIB2 na opis poziomu jak w .idx (np. '2 m above ground')"""
+    if level_type == 1:
+        return 'surface'
+    if level_type == 101:
+        return 'mean sea level'
+    if level_type == 103:
+        return f'{level_value:g} m above ground'
+    if level_type == 100:
+        return f'{level_value / 100:g} mb'  # Poziom izobaryczny zapisany w Pa
+    if level_type in (10, 200):
+        return 'entire atmosphere'
+    if level_type == 7:
+        return 'tropopause'
+    if level_type == 6:
+        return 'max wind'
+    return f'level type {level_type}'
+
+def _read_exact(f, n):
+    data = f.read(n)
+    if len(data) != n:
+        raise EOFError
+    return data
+
+def scan_grib_messages(grib_path):
+    """
+    Przechodzi przez plik GRIB czytając tylko nagłówki.
+    Zwraca (messages, errors):
+      messages - lista {'offset', 'length', 'edition', 'fields': [(zmienna NOMADS lub None, opis poziomu), ...]}
+      errors   - lista opisów problemów z ramkami (pusta = plik poprawny)
+    """
+    messages = []
+    errors = []
+    file_size = os.path.getsize(grib_path)
+
+    # mmap tylko do odczytu - seek/read na nagłówkach bez wywołań systemowych dla każdej sekcji
+    with map_file(grib_path) as f:
+        offset = 0
+        while offset < file_size:
+            f.seek(offset)
+            try:
+                header = _read_exact(f, 16)
+            except EOFError:
+                errors.append(f"Ucięty nagłówek wiadomości na offsecie {offset}")
+                break
+
+            if header[:4] != b'GRIB':
+                errors.append(f"Brak znacznika GRIB na offsecie {offset} (bajty: {header[:8]!r})")
+                break
+
+            edition = header[7]
+            if edition == 2:
+                length = struct.unpack('>Q', header[8:16])[0]
+            elif edition == 1:
+                length = int.from_bytes(header[4:7], 'big')
+            else:
+                errors.append(f"Nieznana edycja GRIB ({edition}) na offsecie {offset}")
+                break
+
+            if length < 16 or offset + length > file_size:
+                errors.append(f"Wiadomość na offsecie {offset} jest ucięta ({length} B, w pliku zostało {file_size - offset} B)")
+                break
+
+            f.seek(offset + length - 4)
+            if f.read(4) != b'7777':
+                errors.append(f"Brak znacznika końca 7777 dla wiadomości na offsecie {offset}")
+                break
+
+            fields = []
+            if edition == 2:
+                try:
+                    fields = _scan_grib2_sections(f, offset, length, discipline=header[6])
+                except (EOFError, ValueError) as e:
+                    errors.append(f"Uszkodzone sekcje wiadomości na offsecie {offset}: {e}")
+                    break
+
+            messages.append({'offset': offset, 'length': length, 'edition': edition, 'fields': fields})
+            offset += length
+
+    return messages, errors
+
+def _scan_grib2_sections(f, msg_offset, msg_length, discipline):
+    """Czyta nagłówki sekcji GRIB2 i wyciąga (zmienna, poziom) z każdej sekcji 4"""
+    fields = []
+    pos = msg_offset + 16
+    end = msg_offset + msg_length - 4
+    while pos < end:
+        f.seek(pos)
+        section_length, section_number = struct.unpack('>IB', _read_exact(f, 5))
+        if section_length < 5 or pos + section_length > end:
+            raise ValueError(f"sekcja {section_number} o długości {section_length} wychodzi poza wiadomość")
+        if section_number == 4:
+            # Szablony 4.0/4.8 (i pochodne) mają te same pola na początku:
+            # 10: kategoria, 11: numer parametru, 23: typ poziomu, 24: skala, 25-28: wartość
+            body = _read_exact(f, min(section_length, 28) - 5)
+            if len(body) >= 23:
+                category, number = body[4], body[5]
+                level_type, scale = body[17], body[18]
+                scaled_value = struct.unpack('>I', body[19:23])[0]
+                if scale == 255:  # Brak skali
+                    scale = 0
+                elif scale >= 128:  # Skala zapisana ze znakiem (bit 8)
+                    scale = -(scale - 128)
+                level_value = scaled_value / (10 ** scale) if scaled_value != 0xFFFFFFFF else 0
+                fields.append((GRIB2_PARAMETERS.get((discipline, category, number)),
+                               grib2_level_name(level_type, level_value)))
+        pos += section_length
+    return fields
+
+def expected_from_plan(plan, idx_entries=None):
+    """
+    Oczekiwany zbiór (zmienna NOMADS, opis poziomu) dla planu pobierania.
+    Jeśli znamy .idx, oczekujemy tylko tego co faktycznie jest na serwerze.
+    Zmienne bez mapowania w GRIB2_PARAMETERS są pomijane (nie da się ich sprawdzić bez dekodowania).
+    """
+    known_vars = set(GRIB2_PARAMETERS.values())
+    expected = set()
+    if idx_entries is not None:
+        for entry in idx_entries:
+            if entry['var'] in known_vars and idx_entry_matches(entry, plan):
+                expected.add((entry['var'], entry['level']))
+    else:
+        for nomads_var, level_key in plan:
+            if nomads_var in known_vars:
+                expected.add((nomads_var, idx_level_from_key(level_key)))
+    return expected
+
+def _level_matches(found_level, expected_level):
+    # "entire atmosphere (considered as a single layer)" z .idx vs "entire atmosphere" z nagłówka
+    return found_level == expected_level or expected_level.startswith(found_level) or found_level.startswith(expected_level)
+
+def verify_grib_file(grib_path, plan=None, idx_entries=None, min_size=1024):
+    """
+    Weryfikuje plik GRIB bez dekodowania danych.
+    plan        - zbiór (zmienna NOMADS, klucz poziomu) z planu pobierania (None = bez sprawdzania zawartości)
+    idx_entries - sparsowany .idx (gfs_sources.parse_idx) - pozwala sprawdzić też liczbę wiadomości
+    Zwraca słownik {'ok', 'messages', 'errors', 'missing'}.
+    """
+    result = {'ok': False, 'messages': 0, 'errors': [], 'missing': []}
+
+    if not os.path.exists(grib_path):
+        result['errors'].append("Plik nie istnieje")
+        return result
+    if os.path.getsize(grib_path) < min_size:
+        result['errors'].append(f"Plik za mały ({os.path.getsize(grib_path)} bytes)")
+        return result
+
+    messages, errors = scan_grib_messages(grib_path)
+    result['messages'] = len(messages)
+    result['errors'].extend(errors)
+
+    if not messages and not errors:
+        result['errors'].append("Brak wiadomości GRIB w pliku")
+
+    if plan:
+        expected = expected_from_plan(plan, idx_entries)
+        found = {field for msg in messages for field in msg['fields'] if field[0] is not None}
+        missing = sorted(
+            (var, level) for var, level in expected
+            if not any(f_var == var and _level_matches(f_level, level) for f_var, f_level in found)
+        )
+        result['missing'] = missing
+        if missing:
+            result['errors'].append(f"Brakuje {len(missing)} pól: {missing[:10]}")
+
+        if idx_entries is not None:
+            expected_count = len({e['start'] for e in idx_entries if idx_entry_matches(e, plan)})
+            if expected_count and len(messages) < expected_count:
+                result['errors'].append(f"Za mało wiadomości: {len(messages)} (wg .idx: {expected_count})")
+
+    result['ok'] = not result['errors']
+    return result
@@ -0,0 +1,376 @@
+"""
+GFS Weather Data Downloader - INTERPOLACJA CZASOWA HORYZONTU CO 3 H
+get_required_forecast_hours() pobiera f000-f120 co 1 h i f123-f384 co 3 h. Zamiast odtwarzać
+brakujące godziny w SQL albo po stronie klienta, luki są uzupełniane przy pobieraniu:
+- gdy obie godziny wokół luki (np. f123 i f126) są w całości zapisane w bazie dla danego celu
+  (region, stacje, obszary), powstają wiersze godzin pośrednich (f124, f125) z flagą interpolated = 1,
+- wartości - interpolacja liniowa całych kolumn naraz (wiersze dopasowane po lat/lon, station_id,
+  area_id/stat, region_id); kierunki (pola pochodne z direction() i kolumny z circular) - po okręgu,
+  przez składowe sin/cos (350° i 10° dają 0°, nie 180°),
+- opady: tp (akumulacja od startStep) - liniowo w obrębie jednego kubełka, a w nowym kubełku
+  (startStep = godzina początku luki) jako część akumulacji końca luki; okna tp_1h/tp_3h - ze stałej
+  intensywności w każdej luce (tp_3h końca luki / 3), więc tp_1h godzin pośrednich sumuje się do tp_3h,
+- godziny przychodzą w dowolnej kolejności: wiersze godziny na krawędzi luki są zapisywane na dysk
+  dla runu (restart nie gubi par), luka jest uzupełniana przy zakończeniu drugiej z jej godzin,
+- końce luki w różnej rozdzielczości (reguły gfs_resample, np. f120 coarsen 2 i f123 regrid 1.0):
+  gęstszy koniec jest interpolowany dwuliniowo na punkty rzadszego - godziny pośrednie mają jego siatkę.
+
+Wiersze rzeczywiste nie są zmieniane (tp_1h godziny f126 zostaje puste - brak f125 w danych GFS).
+
+    [interpolation]
+    enabled = yes
+    # Dodatkowe kolumny kątowe (stopnie) - interpolacja po okręgu
+    circular = wind_dir80
+"""
+
+import os
+import re
+import glob
+import shutil
+import pickle
+import logging
+import threading
+import configparser
+
+import numpy as np
+import pandas as pd
+
+import gfs_resample
+
+module_logger = logging.getLogger(__name__)
+
+INTERPOLATION_SECTION = 'interpolation'
+FLAG_COLUMN = 'interpolated'
+
+# Kolumny identyfikujące wiersz (obok kolumn tekstowych: station_id, area_id, stat, region_id)
+KEY_COLUMNS = ('lat', 'lon')
+TIME_COLUMNS = ('run_time', 'forecast_time', 'created_at')
+
+DEFAULT_STATE_DIR = os.path.join('temp', 'interp_state')
+
+_DIRECTION_CALL = re.compile(r'\bdirection\s*\(')
+
+def gaps(forecast_hours):
+    """Luki w godzinach prognozy: pary kolejnych godzin (h0, h1) z h1 - h0 > 1"""
+    hours = sorted(set(forecast_hours))
+    return [(h0, h1) for h0, h1 in zip(hours, hours[1:]) if h1 - h0 > 1]
+
+def circular_columns(derived, extra=()):
+    """Kolumny kątowe: pola pochodne liczone funkcją direction() oraz kolumny podane w konfiguracji"""
+    columns = list(extra)
+    for field in getattr(derived, 'fields', ()):
+        if _DIRECTION_CALL.search(field.expression) and field.column not in columns:
+            columns.append(field.column)
+    return columns
+
+def _row_keys(frame):
+    """Kolumny identyfikujące wiersz: współrzędne i kolumny tekstowe (bez kolumn czasu)"""
+    return [c for c in frame.columns if c in KEY_COLUMNS or (c not in TIME_COLUMNS and frame[c].dtype.kind not in 'biufcmM')]
+
+def _value_columns(frame, keys):
+    return [c for c in frame.columns if c not in keys and c != FLAG_COLUMN and frame[c].dtype.kind == 'f']
+
+def _grid_axes(frame):
+    return np.unique(frame['lat'].to_numpy(dtype=np.float64)), np.unique(frame['lon'].to_numpy(dtype=np.float64))
+
+def _same_grid(frame0, frame1):
+    """Czy wiersze obu godzin leżą na tej samej siatce (te same osie szerokości i długości)"""
+    if not all(c in frame.columns for frame in (frame0, frame1) for c in KEY_COLUMNS):
+        return True  # Wiersze bez współrzędnych - dopasowanie tylko po kluczach
+    (lat0, lon0), (lat1, lon1) = _grid_axes(frame0), _grid_axes(frame1)
+    return np.array_equal(lat0, lat1) and np.array_equal(lon0, lon1)
+
+def _align(source, target, keys, columns, circular):
+    """
+    Wiersze source przeniesione na punkty target - interpolacja dwuliniowa z siatki source
+    (kierunki przez składowe sin/cos). Klucze inne niż współrzędne - z target.
+    """
+    lat_axis, rows = np.unique(source['lat'].to_numpy(dtype=np.float64), return_inverse=True)
+    lon_axis, cols = np.unique(source['lon'].to_numpy(dtype=np.float64), return_inverse=True)
+    sample = gfs_resample.point_sampler(lat_axis, lon_axis, target['lat'].to_numpy(), target['lon'].to_numpy())
+    grid = np.full((lat_axis.size, lon_axis.size), np.nan)
+
+    def sampled(values):
+        grid[rows, cols] = values
+        return sample(grid)
+
+    aligned = target[keys].copy()
+    for column in columns:
+        values = source[column].to_numpy(dtype=np.float64)
+        if column in circular:
+            radians = np.radians(values)
+            aligned[column] = np.degrees(np.arctan2(sampled(np.sin(radians)), sampled(np.cos(radians)))) % 360.0
+        else:
+            aligned[column] = sampled(values)
+    return aligned
+
+class TemporalInterpolator:
+    """
+    Interpolacja czasowa jednego celu zapisu dla runu (wspólna dla wszystkich wątków).
+    begin() / record() / complete() przy zapisie godzin; complete() zwraca luki gotowe do uzupełnienia,
+    build() - wiersze ich godzin, settle() - potwierdzenie zapisu (luka uzupełniana raz).
+    """
+
+    def __init__(self, run_time, forecast_hours, circular=(), accumulation=None, windows=None,
+                 state_dir=DEFAULT_STATE_DIR, decimals=2):
+        """
+        circular - kolumny kątowe (stopnie); accumulation - kolumna akumulacji (tp) lub None;
+        windows - {kolumna: długość okna w godzinach} opadów w oknach (gfs_precip.AMOUNT_WINDOWS).
+        """
+        self.run_time = run_time
+        self.gaps = gaps(forecast_hours)
+        self.circular = list(circular)
+        self.accumulation = accumulation
+        self.windows = dict(windows or {})
+        self.decimals = decimals
+        self._edges = {h for gap in self.gaps for h in gap}
+        self._parts = {}        # forecast_hour -> lista zapisanych pasów (tylko kolumny interpolowane)
+        self._starts = {}       # forecast_hour -> startStep akumulacji w pliku godziny
+        self._complete = set()  # godziny zapisane w całości (stan na dysku)
+        self._claimed = set()   # luki w trakcie zapisu
+        self._done = set()      # luki uzupełnione
+        self._memory = {}       # stan godzin bez katalogu stanu (state_dir=None)
+        self._lock = threading.Lock()
+        self.state_dir = None
+        if state_dir:
+            self.state_dir = os.path.join(state_dir, run_time.strftime('%Y%m%d%H'))
+            self._prepare_state(state_dir)
+
+    def _prepare_state(self, state_root):
+        """Katalog stanu bieżącego runu (godziny i luki z poprzedniego uruchomienia); inne runy są usuwane"""
+        os.makedirs(self.state_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(glob.escape(state_root), '*')):
+            if os.path.abspath(path) != os.path.abspath(self.state_dir):
+                shutil.rmtree(path, ignore_errors=True)
+        for gap in self.gaps:
+            if os.path.exists(self._done_path(gap)):
+                self._done.add(gap)
+        self._complete = {h for h in self._edges if os.path.exists(self._state_path(h))}
+
+    def _state_path(self, forecast_hour):
+        return os.path.join(self.state_dir, f'f{forecast_hour:03d}.pkl')
+
+    def _done_path(self, gap):
+        return os.path.join(self.state_dir, f'f{gap[0]:03d}-f{gap[1]:03d}.done')
+
+    def begin(self, forecast_hour, steps=None):
+        """Początek zapisu godziny; steps - (startStep, endStep) akumulacji w pliku godziny lub None"""
+        if forecast_hour not in self._edges:
+            return
+        with self._lock:
+            self._parts[forecast_hour] = []
+            self._starts[forecast_hour] = int(steps[0]) if steps is not None else None
+
+    def record(self, forecast_hour, batch):
+        """Zapisany pas godziny (DataFrame jak do to_sql) - zapamiętywane są tylko godziny na krawędziach luk"""
+        if forecast_hour not in self._edges or len(batch) == 0:
+            return
+        keys = _row_keys(batch)
+        part = batch[keys + _value_columns(batch, keys)]
+        with self._lock:
+            self._parts.setdefault(forecast_hour, []).append(part)
+
+    def complete(self, hours):
+        """
+        Godziny zapisane w całości (stan na dysk). Zwraca luki, których obie godziny są już zapisane
+        i które nie były uzupełnione - wywołujący zapisuje wiersze z build() i potwierdza settle().
+        """
+        hours = [h for h in hours if h in self._edges]
+        if not hours:
+            return []
+        with self._lock:
+            states = {h: (self._starts.get(h), self._parts.pop(h, [])) for h in hours}
+        for forecast_hour, (start, parts) in states.items():
+            frame = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+            self._store(forecast_hour, start, frame)
+        with self._lock:
+            self._complete.update(hours)
+            ready = [
+                gap for gap in self.gaps
+                if (gap[0] in hours or gap[1] in hours) and gap[0] in self._complete and gap[1] in self._complete
+                and gap not in self._done and gap not in self._claimed
+            ]
+            self._claimed.update(ready)
+        return ready
+
+    def _store(self, forecast_hour, start, frame):
+        if not self.state_dir:
+            self._memory[forecast_hour] = (start, frame)
+            return
+        tmp_path = self._state_path(forecast_hour) + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((start, frame), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self._state_path(forecast_hour))
+
+    def _load(self, forecast_hour):
+        if not self.state_dir:
+            return self._memory.get(forecast_hour, (None, pd.DataFrame()))
+        with open(self._state_path(forecast_hour), 'rb') as f:
+            return pickle.load(f)
+
+    def build(self, h0, h1):
+        """
+        Wiersze godzin pośrednich luki (h0, h1): lista (forecast_hour, DataFrame z flagą interpolated = 1).
+        ValueError, gdy wiersze obu godzin nie dają się dopasować (luka nie jest oznaczana jako uzupełniona).
+        """
+        start0, frame0 = self._load(h0)
+        start1, frame1 = self._load(h1)
+        if frame0.empty or frame1.empty:
+            return []
+        keys = _row_keys(frame0)
+        if keys != _row_keys(frame1):
+            module_logger.warning(f"Interpolacja f{h0:03d}-f{h1:03d}: różne kolumny identyfikujące wiersze - luka pominięta")
+            return []
+        columns = [c for c in _value_columns(frame0, keys) if c in frame1.columns]
+        if not _same_grid(frame0, frame1):
+            # Różne reguły zmiany rozdzielczości na końcach luki - wspólna siatka rzadszego końca
+            if len(frame0) > len(frame1):
+                frame0 = _align(frame0, frame1, keys, columns, self.circular)
+            else:
+                frame1 = _align(frame1, frame0, keys, columns, self.circular)
+            module_logger.info(f"Interpolacja f{h0:03d}-f{h1:03d}: końce luki w różnej rozdzielczości - siatka {min(len(frame0), len(frame1))} punktów")
+        merged = frame0[keys + columns].merge(frame1[keys + columns], on=keys, how='inner', suffixes=('', '__next'))
+        if merged.empty:
+            raise ValueError(f"brak wspólnych wierszy godzin f{h0:03d} ({len(frame0)}) i f{h1:03d} ({len(frame1)})")
+        before = merged[columns].to_numpy(dtype=np.float64)
+        after = merged[[c + '__next' for c in columns]].to_numpy(dtype=np.float64)
+        index = {column: i for i, column in enumerate(columns)}
+        span = h1 - h0
+
+        # Kierunki po okręgu - składowe wektora jednostkowego obu godzin
+        circular = [index[c] for c in self.circular if c in index]
+        if circular:
+            angle0, angle1 = np.radians(before[:, circular]), np.radians(after[:, circular])
+            sin0, cos0, sin1, cos1 = np.sin(angle0), np.cos(angle0), np.sin(angle1), np.cos(angle1)
+
+        rate = self._gap_rate(index, before, after, span)
+        frames = []
+        for step in range(1, span):
+            weight = step / span
+            values = before + (after - before) * weight
+            if circular:
+                values[:, circular] = np.degrees(np.arctan2(sin0 + (sin1 - sin0) * weight,
+                                                            cos0 + (cos1 - cos0) * weight)) % 360.0
+            if self.accumulation in index:
+                values[:, index[self.accumulation]] = self._accumulated(
+                    before[:, index[self.accumulation]], after[:, index[self.accumulation]], start0, start1, h0, h1, h0 + step)
+            for column, window in self.windows.items():
+                if column in index:
+                    values[:, index[column]] = self._window(rate, window, step, span)
+            frame = merged[keys].copy()
+            for column, i in index.items():
+                frame[column] = np.round(values[:, i], self.decimals)
+            frame[FLAG_COLUMN] = np.int8(1)
+            frames.append((h0 + step, frame))
+        return frames
+
+    def _gap_rate(self, index, before, after, span):
+        """
+        Intensywność opadu (na godzinę) w luce i w przedziale o tej samej długości przed nią: z okna
+        równego długości luki (tp_3h) na jej końcu i na początku; None gdy takiego okna nie ma.
+        """
+        column = next((c for c, window in self.windows.items() if window == span and c in index), None)
+        if column is None:
+            return None
+        return before[:, index[column]] / span, after[:, index[column]] / span
+
+    @staticmethod
+    def _window(rate, window, step, span):
+        """Opad w oknie kończącym się w godzinie pośredniej - część w luce i (gdy okno sięga dalej) przed nią"""
+        if rate is None or window - step > span:
+            return np.nan
+        rate_before, rate_gap = rate
+        inside = min(window, step)
+        amount = rate_gap * inside
+        if window > inside:
+            amount = amount + rate_before * (window - inside)
+        return amount
+
+    @staticmethod
+    def _accumulated(before, after, start0, start1, h0, h1, forecast_hour):
+        """
+        Akumulacja tp w godzinie pośredniej. Ten sam kubełek na obu końcach luki - liniowo między
+        wartościami; kubełek zaczęty w luce (startStep >= h0) - część akumulacji końca luki.
+        """
+        if start0 is None or start1 is None:
+            return np.nan
+        if start1 == start0:
+            return before + (after - before) * ((forecast_hour - h0) / (h1 - h0))
+        if h0 <= start1 < forecast_hour:
+            return after * ((forecast_hour - start1) / (h1 - start1))
+        return np.nan
+
+    def settle(self, gap, ok=True):
+        """Luka zapisana (znacznik na dysku - nie jest uzupełniana ponownie) albo do ponowienia (ok=False)"""
+        with self._lock:
+            self._claimed.discard(gap)
+            if not ok:
+                return
+            self._done.add(gap)
+            # Stan godziny nie jest już potrzebny, gdy obie jej luki są uzupełnione
+            unused = [h for h in gap if all(g in self._done for g in self.gaps if h in g)]
+        if self.state_dir:
+            with open(self._done_path(gap), 'w'):
+                pass
+            for forecast_hour in unused:
+                try:
+                    os.remove(self._state_path(forecast_hour))
+                except OSError:
+                    pass
+
+    def discard(self, forecast_hour):
+        """Porzuca godzinę przerwaną błędem - godzina zostanie pobrana ponownie"""
+        if forecast_hour not in self._edges:
+            return
+        with self._lock:
+            self._parts.pop(forecast_hour, None)
+            self._starts.pop(forecast_hour, None)
+
+    @property
+    def pending(self):
+        """Luki czekające na godziny (bez uzupełnionych)"""
+        with self._lock:
+            return [gap for gap in self.gaps if gap not in self._done]
+
+    def __repr__(self):
+        return f"TemporalInterpolator(run={self.run_time:%Y-%m-%d %H}, gaps={len(self.gaps)}, done={len(self._done)})"
+
+def load_interpolation(config_file='config.ini'):
+    """Ustawienia z sekcji [interpolation] ({'circular': [...]}); None gdy interpolacja jest wyłączona"""
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    if INTERPOLATION_SECTION not in config or not config.getboolean(INTERPOLATION_SECTION, 'enabled', fallback=False):
+        return None
+    section = config[INTERPOLATION_SECTION]
+    return {
+        'circular': [c.strip() for c in section.get('circular', '').split(',') if c.strip()],
+        'state_dir': section.get('state_dir', DEFAULT_STATE_DIR).strip() or DEFAULT_STATE_DIR,
+    }
+
+def output_columns(config_file='config.ini'):
+    """Kolumna flagi wierszy interpolowanych (pusta lista, gdy interpolacja jest wyłączona)"""
+    return [FLAG_COLUMN] if load_interpolation(config_file) is not None else []
+
+def create_interpolator(target, run_time, forecast_hours, config_file='config.ini'):
+    """
+    Interpolator celu zapisu (gfs_regions.Region, gfs_points.PointSet, gfs_areas.AreaSet) dla runu;
+    None gdy interpolacja jest wyłączona, w godzinach prognozy nie ma luk albo tabela celu nie ma kolumny
+    flagi - wiersze interpolowane bez flagi byłyby nie do odróżnienia od godzin z GRIB.
+    """
+    settings = load_interpolation(config_file)
+    if settings is None or not gaps(forecast_hours):
+        return None
+    schema = getattr(target, 'schema', None)
+    if schema is not None and FLAG_COLUMN not in schema.columns:
+        module_logger.warning(f"Interpolacja czasowa ({target.name}) wyłączona: brak kolumny {FLAG_COLUMN} w {schema.table} "
+                              f"(fix_database_structure.sql)")
+        return None
+    accumulator = target.accumulator
+    return TemporalInterpolator(
+        run_time, forecast_hours,
+        circular=circular_columns(target.derived, settings['circular']),
+        accumulation=accumulator.column if accumulator is not None else None,
+        windows=accumulator.windows if accumulator is not None else None,
+        state_dir=os.path.join(settings['state_dir'], target.name),
+        decimals=accumulator.decimals if accumulator is not None else 2,
+    )
@@ -0,0 +1,317 @@
+"""
+GFS Weather Data Downloader - PROGNOZY DLA PUNKTÓW (STACJI)
+Zamiast całej siatki (i szukania najbliższego punktu po stronie odbiorcy przez
+SQRT(POW(lat - ?, 2) + POW(lon - ?, 2)) na całej tabeli) zapisywane są wartości dla listy stacji:
+- wagi interpolacji (dwuliniowa albo odwrotnych odległości) liczone RAZ dla definicji siatki,
+- każda godzina prognozy to jedno mnożenie macierz rzadka x wektor na zmienną (stacje x punkty siatki),
+- wynik trafia do zwartej tabeli gfs_point_forecast (station_id, czasy, zmienne).
+
+    [points]
+    # CSV z nagłówkiem: id,lat,lon[,elevation][,name]
+    stations = stations.csv
+    # bilinear (domyślnie) albo idw
+    method = bilinear
+    # idw: liczba sąsiadów (bez scipy - 4 narożniki oczka siatki) i wykładnik odległości
+    neighbours = 4
+    power = 2
+    # yes = tylko punkty (bez zapisu siatki regionów)
+    only = no
+    # Korekta temperatury do wysokości stacji (°C/km) - wymaga kolumny z wysokością terenu siatki
+    # lapse_rate = 6.5
+    # orography_column = orog
+    # temperature_columns = t2m, d2m
+
+scipy (opcjonalnie): cKDTree dla dowolnej liczby sąsiadów idw i scipy.sparse dla mnożenia;
+bez scipy wagi są trzymane w postaci (stacje x sąsiedzi) i mnożenie to gather + suma w numpy.
+"""
+
+import os
+import csv
+import logging
+import threading
+import configparser
+
+import numpy as np
+import pandas as pd
+
+try:
+    from scipy.spatial import cKDTree
+    from scipy import sparse
+except ImportError:
+    cKDTree = None
+    sparse = None
+
+import gfs_arrow
+import gfs_derived
+import gfs_interpolate
+import gfs_precip
+import gfs_storage
+from gfs_db_schema import ForecastSchema
+
+module_logger = logging.getLogger(__name__)
+
+POINTS_SECTION = 'points'
+POINT_TABLE = 'gfs_point_forecast'
+POINT_REGION = 'points'
+POINT_BASE_COLUMNS = ['station_id', 'forecast_time', 'run_time', 'created_at']
+METHODS = ('bilinear', 'idw')
+
+# Margines wycinka siatki wokół stacji (stopnie) - sąsiednie oczka muszą być w wycinku
+BOUNDS_MARGIN = 0.5
+
+EARTH_RADIUS_KM = 6371.0
+
+def load_stations(path):
+    """Stacje z CSV (id, lat, lon, opcjonalnie elevation i name); wiersze z błędami są pomijane"""
+    ids, lats, lons, elevations = [], [], [], []
+    with open(path, newline='', encoding='utf-8') as f:
+        for line, row in enumerate(csv.DictReader(f), 2):
+            row = {(k or '').strip().lower(): (v or '').strip() for k, v in row.items()}
+            try:
+                station_id = row['id']
+                lat, lon = float(row['lat']), float(row['lon'])
+            except (KeyError, ValueError):
+                module_logger.warning(f"{path}:{line}: niepoprawny wiersz stacji - pominięty")
+                continue
+            if not station_id or not -90 <= lat <= 90:
+                module_logger.warning(f"{path}:{line}: niepoprawny identyfikator lub szerokość - pominięty")
+                continue
+            ids.append(station_id)
+            lats.append(lat)
+            lons.append(lon)
+            elevations.append(float(row['elevation']) if row.get('elevation') else np.nan)
+    return {
+        'ids': np.array(ids, dtype=object),
+        'lat': np.array(lats, dtype=np.float64),
+        'lon': np.array(lons, dtype=np.float64),
+        'elevation': np.array(elevations, dtype=np.float64),
+    }
+
+def _grid_lon(lon, longitudes):
+    """Długość stacji w konwencji siatki (GFS: 0..360)"""
+    lon = np.asarray(lon, dtype=np.float64)
+    if longitudes.min() >= 0:
+        return np.where(lon < 0, lon + 360, lon)
+    return np.where(lon > 180, lon - 360, lon)
+
+def _unit_vectors(lat, lon):
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+def _cell_corners(latitudes, longitudes, lat, lon):
+    """
+    Narożniki oczka regularnej siatki zawierającego punkt: (indeksy 4 narożników, ułamki dy, dx).
+    Zwraca też maskę punktów wewnątrz siatki.
+    """
+    fi = (lat - latitudes[0]) / (latitudes[1] - latitudes[0]) if latitudes.size > 1 else np.zeros_like(lat)
+    fj = (lon - longitudes[0]) / (longitudes[1] - longitudes[0]) if longitudes.size > 1 else np.zeros_like(lon)
+    inside = (fi >= 0) & (fi <= latitudes.size - 1) & (fj >= 0) & (fj <= longitudes.size - 1)
+    i0 = np.clip(np.floor(fi), 0, max(latitudes.size - 2, 0)).astype(np.int64)
+    j0 = np.clip(np.floor(fj), 0, max(longitudes.size - 2, 0)).astype(np.int64)
+    i1 = np.minimum(i0 + 1, latitudes.size - 1)
+    j1 = np.minimum(j0 + 1, longitudes.size - 1)
+    dy = np.clip(fi - i0, 0, 1)
+    dx = np.clip(fj - j0, 0, 1)
+    n = longitudes.size
+    corners = np.column_stack((i0 * n + j0, i0 * n + j1, i1 * n + j0, i1 * n + j1))
+    return corners, dy, dx, inside
+
+class PointWeights:
+    """Wagi interpolacji stacje x punkty siatki (indeksy sąsiadów + wagi; macierz rzadka gdy jest scipy)"""
+
+    def __init__(self, indices, weights, points):
+        self.indices = indices
+        self.weights = weights
+        self.points = points
+        self.matrix = None
+        if sparse is not None:
+            rows = np.repeat(np.arange(indices.shape[0]), indices.shape[1])
+            self.matrix = sparse.csr_matrix((weights.ravel(), (rows, indices.ravel())), shape=(indices.shape[0], points))
+        self._presence = None
+
+    def _product(self, vector):
+        if self.matrix is not None:
+            return self.matrix @ vector
+        return np.einsum('ij,ij->i', vector[self.indices], self.weights)
+
+    def apply(self, values):
+        """Wartości w stacjach z pola 2D siatki; sąsiedzi NaN są pomijani (wagi normalizowane)"""
+        vector = np.asarray(values, dtype=np.float64).reshape(-1)
+        valid = np.isfinite(vector)
+        if valid.all():
+            return self._product(vector)
+        numerator = self._product(np.where(valid, vector, 0.0))
+        denominator = self._product(valid.astype(np.float64))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(denominator > 0, numerator / denominator, np.nan)
+
+def build_weights(latitudes, longitudes, station_lat, station_lon, method='bilinear', neighbours=4, power=2.0):
+    """
+    Wagi dla stacji na regularnej siatce (latitudes x longitudes, kolejność wierszy jak w assemble_wide_frame).
+    Zwraca (PointWeights, maska stacji wewnątrz siatki).
+    """
+    lon = _grid_lon(station_lon, longitudes)
+    corners, dy, dx, inside = _cell_corners(latitudes, longitudes, station_lat, lon)
+    points = latitudes.size * longitudes.size
+
+    if method == 'bilinear':
+        weights = np.column_stack(((1 - dy) * (1 - dx), (1 - dy) * dx, dy * (1 - dx), dy * dx))
+        return PointWeights(corners, weights, points), inside
+
+    if cKDTree is not None and neighbours != 4:
+        # Dowolna liczba sąsiadów - drzewo na wektorach jednostkowych (odległości cięciwowe ~ łukowe)
+        grid_lat = np.repeat(latitudes, longitudes.size)
+        grid_lon = np.tile(longitudes, latitudes.size)
+        tree = cKDTree(_unit_vectors(grid_lat, grid_lon))
+        distances, indices = tree.query(_unit_vectors(station_lat, lon), k=neighbours)
+        distances = np.atleast_2d(distances) * EARTH_RADIUS_KM
+        indices = np.atleast_2d(indices)
+    else:
+        # Bez scipy (lub 4 sąsiadów) - narożniki oczka zawierającego stację
+        indices = corners
+        n = longitudes.size
+        grid_lat = latitudes[indices // n]
+        grid_lon = longitudes[indices % n]
+        a = _unit_vectors(grid_lat.ravel(), grid_lon.ravel()).reshape(indices.shape + (3,))
+        b = _unit_vectors(station_lat, lon)[:, None, :]
+        distances = np.linalg.norm(a - b, axis=2) * EARTH_RADIUS_KM
+    with np.errstate(divide='ignore'):
+        weights = 1.0 / np.power(distances, power)
+    exact = distances < 1e-6
+    weights = np.where(exact.any(axis=1)[:, None], exact.astype(np.float64), weights)
+    weights /= weights.sum(axis=1, keepdims=True)
+    return PointWeights(indices, weights, points), inside
+
+class PointSet:
+    """
+    Zestaw stacji zapisywany do gfs_point_forecast - cel zapisu obok regionów (gfs_regions),
+    z tym samym interfejsem (bounds, table, schema, derived, accumulator).
+    """
+
+    def __init__(self, stations, method='bilinear', neighbours=4, power=2.0, table=POINT_TABLE,
+                 only=False, lapse_rate=None, orography_column=None, temperature_columns=('t2m', 'd2m')):
+        if method not in METHODS:
+            raise ValueError(f"Nieznana metoda interpolacji '{method}' (dostępne: {', '.join(METHODS)})")
+        self.name = POINT_REGION
+        self.stations = stations
+        self.method = method
+        self.neighbours = int(neighbours)
+        self.power = float(power)
+        self.table = table
+        self.region_id = None
+        self.only = only
+        self.lapse_rate = lapse_rate
+        self.orography_column = orography_column
+        self.temperature_columns = list(temperature_columns)
+        self.derived = None
+        self.schema = None
+        self.accumulator = None
+        self.interpolator = None
+        self._weights = {}
+        self._lock = threading.Lock()
+        if method == 'idw' and self.neighbours != 4 and cKDTree is None:
+            module_logger.warning("Brak scipy - idw liczone z 4 narożników oczka siatki")
+
+    @property
+    def bounds(self):
+        lon = self.stations['lon']
+        lon = np.where(lon < 0, lon + 360, lon)
+        return (float(self.stations['lat'].min()) - BOUNDS_MARGIN, float(self.stations['lat'].max()) + BOUNDS_MARGIN,
+                float(lon.min()) - BOUNDS_MARGIN, float(lon.max()) + BOUNDS_MARGIN)
+
+    def __len__(self):
+        return len(self.stations['ids'])
+
+    def prepare(self, params_config, engine=None, config_file='config.ini'):
+        """Pola pochodne ([derived_fields] i [derived_fields.points]) i schemat tabeli punktów"""
+        self.derived = gfs_derived.load_derived_fields(config_file, params_config, region=POINT_REGION)
+        derived_columns = self.derived.outputs + gfs_precip.output_columns(params_config) + gfs_interpolate.output_columns(config_file)
+        storage = gfs_storage.load_storage(config_file, params_config)
+        writer = gfs_arrow.load_batch_writer(config_file)
+        if engine is not None:
+            self.schema = ForecastSchema.from_database(engine, params_config, self.table, derived_columns, POINT_BASE_COLUMNS, storage, writer)
+        else:
+            self.schema = ForecastSchema(params_config, table=self.table, derived_columns=derived_columns, base_columns=POINT_BASE_COLUMNS,
+                                         storage=storage, writer=writer)
+        return self
+
+    def create_accumulator(self, run_time, params_config, forecast_hours):
+        """Opady w oknach dla stacji (interpolacja jest liniowa - różnice sum interpolowanych = interpolowane różnice)"""
+        self.accumulator = gfs_precip.create_accumulator(run_time, params_config, forecast_hours,
+                                                         gfs_precip.target_state_dir(POINT_REGION))
+        return self.accumulator
+
+    def weights(self, latitudes, longitudes):
+        """Wagi dla definicji siatki (cache - liczone raz dla danej siatki/wycinka)"""
+        key = (latitudes.size, float(latitudes[0]), float(latitudes[-1]),
+               longitudes.size, float(longitudes[0]), float(longitudes[-1]))
+        cached = self._weights.get(key)
+        if cached is None:
+            weights, inside = build_weights(latitudes, longitudes, self.stations['lat'], self.stations['lon'],
+                                            self.method, self.neighbours, self.power)
+            if not inside.all():
+                outside = self.stations['ids'][~inside]
+                module_logger.warning(f"Stacje poza siatką ({len(outside)}) - pominięte: {', '.join(map(str, outside[:10]))}")
+            cached = (weights, inside)
+            with self._lock:
+                cached = self._weights.setdefault(key, cached)
+        return cached
+
+    def interpolate(self, grid):
+        """
+        Wartości w stacjach ze wszystkich kolumn siatki (wynik _grid_arrays) - jedno mnożenie na zmienną.
+        Zwraca ({kolumna: wektor}, maska stacji wewnątrz siatki).
+        """
+        weights, inside = self.weights(grid['latitudes'], grid['longitudes'])
+        columns = {column: weights.apply(values) for column, values in grid['columns'].items()}
+        if self.lapse_rate and self.orography_column in columns:
+            # Korekta do wysokości stacji: T_stacji = T_siatki - gradient * (h_stacji - h_siatki)
+            dz_km = (self.stations['elevation'] - columns[self.orography_column]) / 1000.0
+            dz_km = np.where(np.isfinite(dz_km), dz_km, 0.0)
+            for column in self.temperature_columns:
+                if column in columns:
+                    columns[column] = columns[column] - self.lapse_rate * dz_km
+        return columns, inside
+
+    def frame(self, columns, inside):
+        """DataFrame stacji (indeks = pozycja stacji na liście, jak punkty siatki dla akumulatora opadów)"""
+        df = pd.DataFrame(columns)
+        df.insert(0, 'station_id', self.stations['ids'])
+        return df[inside]
+
+    def label(self, fh_str, regions_count=1):
+        return fh_str if regions_count <= 1 else f"{fh_str} {self.name}"
+
+    def describe(self):
+        return f"{self.name}: {len(self)} stacji ({self.method}) -> {self.table}"
+
+    def __repr__(self):
+        return f"PointSet({self.describe()})"
+
+def load_point_set(config_file='config.ini'):
+    """Zestaw stacji z sekcji [points]; None gdy sekcji nie ma lub lista stacji jest pusta"""
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    if POINTS_SECTION not in config:
+        return None
+    section = config[POINTS_SECTION]
+    path = section.get('stations', '').strip()
+    if not path or not os.path.exists(path):
+        module_logger.warning(f"[points] stations: brak pliku stacji '{path}' - tryb punktów wyłączony")
+        return None
+    stations = load_stations(path)
+    if len(stations['ids']) == 0:
+        module_logger.warning(f"[points] {path}: brak poprawnych stacji - tryb punktów wyłączony")
+        return None
+    lapse_rate = section.getfloat('lapse_rate', fallback=None)
+    return PointSet(
+        stations,
+        method=section.get('method', 'bilinear').strip().lower(),
+        neighbours=section.getint('neighbours', fallback=4),
+        power=section.getfloat('power', fallback=2.0),
+        table=section.get('table', POINT_TABLE).strip() or POINT_TABLE,
+        only=section.getboolean('only', fallback=False),
+        lapse_rate=lapse_rate,
+        orography_column=section.get('orography_column', '').strip() or None,
+        temperature_columns=[c.strip() for c in section.get('temperature_columns', 't2m, d2m').split(',') if c.strip()],
+    )
@@ -0,0 +1,275 @@
+"""
+GFS Weather Data Downloader - OPADY W OKNACH GODZINOWYCH (DEAKUMULACJA)
+APCP/tp w GFS jest akumulacją od startStep do endStep (od początku prognozy albo od początku
+kubełka zerowanego co kilka godzin). Zamiast liczyć różnice kolejnych godzin w bazie (self-join
+na gfs_forecast), opady w oknach 1 h i 3 h są liczone przy pobieraniu:
+- każda wiadomość (start, end) jest sprowadzana do sumy od początku prognozy: T(end) = T(start) + wartości,
+- opad w oknie to T(h) - T(h - okno) (ujemne różnice z pakowania GRIB są obcinane do zera),
+- sumy T są trzymane w pamięci (kilka godzin wstecz) i zapisywane na dysk dla danego runu,
+  więc restart daemona nie gubi poprzedników,
+- godziny przychodzą w dowolnej kolejności - wiersze godziny, której poprzednik jeszcze nie dotarł,
+  czekają w pamięci i są oddawane do zapisu, gdy poprzednik się pojawi (albo przy flush()).
+
+Godzina przetwarzana pasami (gfs_grib_decode.latitude_bands): begin() z akumulacją całego regionu,
+place() dla każdego pasa (okna dopisane od razu albo pas wstrzymany), finish() na końcu godziny.
+"""
+
+import os
+import re
+import glob
+import shutil
+import logging
+import threading
+
+import numpy as np
+
+module_logger = logging.getLogger(__name__)
+
+PRECIP_COLUMN = 'tp'
+
+# Kolumna wynikowa -> długość okna w godzinach
+AMOUNT_WINDOWS = {'tp_1h': 1, 'tp_3h': 3}
+
+# Kubełki akumulacji GFS mają najwyżej 6 h - tyle godzin wstecz sumy są potrzebne w pamięci
+BUCKET_HOURS = 6
+
+DEFAULT_STATE_DIR = os.path.join('temp', 'precip_state')
+# Katalogi runów (YYYYMMDDHH) - inne wpisy w katalogu stanu to stany innych celów (regiony, stacje, obszary)
+RUN_DIR_PATTERN = re.compile(r'\d{10}')
+
+class PrecipAccumulator:
+    """
+    Stan deakumulacji opadów dla jednego runu (wspólny dla wszystkich wątków).
+    submit() / place() / finish() zwracają listy (forecast_hour, batch) gotowych do zapisu - z kolumnami AMOUNT_WINDOWS.
+    """
+
+    def __init__(self, run_time, forecast_hours, column=PRECIP_COLUMN, windows=None,
+                 state_dir=DEFAULT_STATE_DIR, decimals=2):
+        self.run_time = run_time
+        self.forecast_hours = frozenset(forecast_hours)
+        self.column = column
+        self.windows = dict(windows or AMOUNT_WINDOWS)
+        self.decimals = decimals
+        self._totals = {}        # end -> suma od początku prognozy (1D, punkty siatki)
+        self._raw = {}           # end -> (start, wartości) czekające na T(start)
+        self._pending = {}       # forecast_hour -> lista pasów (batch) czekających na poprzedników
+        self._without_accum = set()
+        self._resample = {}      # forecast_hour -> funkcja zmiany rozdzielczości okien (gfs_resample)
+        self._active = set()     # godziny w trakcie (begin() bez finish())
+        self._done = set()       # godziny zakończone (finish())
+        self._lock = threading.Lock()
+        self.state_dir = None
+        if state_dir:
+            self.state_dir = os.path.join(state_dir, run_time.strftime('%Y%m%d%H'))
+            self._prepare_state(state_dir)
+
+    def _prepare_state(self, state_root):
+        """
+        Katalog stanu bieżącego runu; stany innych runów są usuwane. Usuwane są tylko katalogi runów -
+        stany celów zapisane w podkatalogach (np. temp/precip_state/points) zostają.
+        """
+        os.makedirs(self.state_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(glob.escape(state_root), '*')):
+            if not RUN_DIR_PATTERN.fullmatch(os.path.basename(path)) or not os.path.isdir(path):
+                continue
+            if os.path.abspath(path) != os.path.abspath(self.state_dir):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _state_path(self, end):
+        return os.path.join(self.state_dir, f'f{end:03d}.npy')
+
+    def _total(self, end):
+        """Suma od początku prognozy do godziny end (pamięć, potem dysk); None gdy nieznana"""
+        if end == 0:
+            return 0.0
+        total = self._totals.get(end)
+        if total is None and self.state_dir:
+            path = self._state_path(end)
+            if os.path.exists(path):
+                total = self._totals[end] = np.load(path)
+        return total
+
+    def _store_total(self, end, total):
+        self._totals[end] = total
+        if self.state_dir:
+            tmp_path = self._state_path(end) + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                np.save(f, total)
+            os.replace(tmp_path, self._state_path(end))
+
+    def _add_accumulation(self, start, end, values):
+        """Sprowadza akumulację (start, end) do sumy od początku prognozy"""
+        self._raw[end] = (start, values)
+        # Rozwiąż wszystkie akumulacje, których początek jest już znany (także łańcuchy kubełków)
+        resolved = True
+        while resolved:
+            resolved = False
+            for raw_end, (raw_start, raw_values) in list(self._raw.items()):
+                base = self._total(raw_start)
+                if base is not None:
+                    self._store_total(raw_end, base + raw_values)
+                    del self._raw[raw_end]
+                    resolved = True
+
+    def _missing(self, forecast_hour):
+        """Godziny, na które czeka dana godzina prognozy (pusta lista = można liczyć okna)"""
+        if forecast_hour in self._without_accum:
+            return []
+        missing = []
+        if self._total(forecast_hour) is None:
+            start = self._raw.get(forecast_hour, (None,))[0]
+            missing.append(start if start is not None else forecast_hour)
+        for window in self.windows.values():
+            previous = forecast_hour - window
+            if previous < 0 or (previous not in self.forecast_hours and previous != 0):
+                continue
+            if previous != 0 and previous in self._without_accum:
+                continue
+            if self._total(previous) is None:
+                missing.append(previous)
+        return sorted(set(missing))
+
+    def _attach(self, forecast_hour, batch):
+        """Dopisuje kolumny opadów w oknach (NaN gdy okno nie ma sensu lub brak danych)"""
+        total = None if forecast_hour in self._without_accum else self._total(forecast_hour)
+        rows = batch.index.to_numpy()
+        for column, window in self.windows.items():
+            previous = forecast_hour - window
+            amount = None
+            if total is not None and previous >= 0 and (previous in self.forecast_hours or previous == 0):
+                # T(0) = 0 także wtedy, gdy plik f000 nie ma tp
+                previous_total = None if previous != 0 and previous in self._without_accum else self._total(previous)
+                if previous_total is not None:
+                    amount = np.broadcast_to(np.maximum(total - previous_total, 0.0), total.shape)
+                    if forecast_hour in self._resample:
+                        amount = self._resample[forecast_hour](amount)
+            if amount is None:
+                batch[column] = np.nan
+            else:
+                batch[column] = np.round(amount[rows], self.decimals)
+        return batch
+
+    def _release(self, force=False):
+        ready = []
+        for forecast_hour in sorted(self._pending):
+            if forecast_hour in self._active:
+                continue
+            if force or not self._missing(forecast_hour):
+                for batch in self._pending.pop(forecast_hour):
+                    ready.append((forecast_hour, self._attach(forecast_hour, batch)))
+        self._prune()
+        return ready
+
+    def _prune(self):
+        """Usuwa z pamięci sumy, których żadna oczekująca ani przyszła godzina już nie potrzebuje"""
+        waiting = set(self._pending) | set(self._raw) | self._active
+        for end in list(self._totals):
+            horizon = range(end + 1, end + BUCKET_HOURS + 1)
+            if end in waiting or any(h in waiting for h in horizon):
+                continue
+            if all(h in self._done or h not in self.forecast_hours for h in horizon):
+                del self._totals[end]
+
+    def begin(self, forecast_hour, accumulation=None, resample=None):
+        """
+        Początek godziny prognozy.
+        accumulation - (wartości 1D na całej siatce regionu, startStep, endStep) lub None, gdy brak tp w pliku.
+        resample - funkcja wektor siatki regionu -> wektor siatki zapisu, gdy godzina jest zapisywana
+        w innej rozdzielczości (sumy zostają w pełnej rozdzielczości, zmniejszane są okna).
+        Zwraca listę (forecast_hour, batch) innych godzin, które dzięki tej akumulacji są gotowe do zapisu.
+        """
+        with self._lock:
+            self._active.add(forecast_hour)
+            self._done.discard(forecast_hour)
+            self._pending.pop(forecast_hour, None)  # ponowne pobranie godziny zastępuje wstrzymane pasy
+            if resample is None:
+                self._resample.pop(forecast_hour, None)
+            else:
+                self._resample[forecast_hour] = resample
+            if accumulation is None:
+                self._without_accum.add(forecast_hour)
+            else:
+                values, start, end = accumulation
+                self._without_accum.discard(forecast_hour)
+                self._add_accumulation(int(start), int(end), np.asarray(values, dtype=np.float64))
+            return self._release()
+
+    def place(self, forecast_hour, batch):
+        """
+        Pas godziny prognozy (indeks = pozycje punktów w siatce regionu, jak z assemble_wide_frame).
+        Zwraca [(forecast_hour, batch z oknami)] gdy poprzednicy są znani, inaczej [] (pas wstrzymany).
+        """
+        with self._lock:
+            if forecast_hour not in self._pending and not self._missing(forecast_hour):
+                return [(forecast_hour, self._attach(forecast_hour, batch))]
+            self._pending.setdefault(forecast_hour, []).append(batch)
+            return []
+
+    def finish(self, forecast_hour):
+        """Koniec godziny prognozy - zwraca pasy (także innych godzin) gotowe do zapisu"""
+        with self._lock:
+            self._active.discard(forecast_hour)
+            self._done.add(forecast_hour)
+            return self._release()
+
+    def submit(self, forecast_hour, batch, accumulation=None):
+        """
+        Cała godzina prognozy naraz (begin + place + finish).
+        Zwraca listę (forecast_hour, batch) gotowych do zapisu (może zawierać wcześniejsze godziny).
+        """
+        ready = self.begin(forecast_hour, accumulation)
+        ready.extend(self.place(forecast_hour, batch))
+        ready.extend(self.finish(forecast_hour))
+        return ready
+
+    def discard(self, forecast_hour):
+        """Porzuca godzinę przerwaną błędem (wstrzymane pasy) - godzina zostanie pobrana ponownie"""
+        with self._lock:
+            self._pending.pop(forecast_hour, None)
+            self._resample.pop(forecast_hour, None)
+            self._active.discard(forecast_hour)
+
+    def is_held(self, forecast_hour):
+        """Czy godzina ma pasy wstrzymane do zapisu"""
+        with self._lock:
+            return forecast_hour in self._pending
+
+    def missing(self, forecast_hour):
+        """Poprzednicy, na których czeka godzina prognozy"""
+        with self._lock:
+            return self._missing(forecast_hour)
+
+    def flush(self):
+        """Oddaje wszystkie czekające godziny (okna bez poprzednika zostają puste)"""
+        with self._lock:
+            ready = self._release(force=True)
+        if ready:
+            hours = sorted({fh for fh, _ in ready})
+            module_logger.info(f"Opady: zapis {len(hours)} godzin bez kompletu poprzedników: {hours}")
+        return ready
+
+    @property
+    def pending(self):
+        with self._lock:
+            return sorted(self._pending)
+
+    def __repr__(self):
+        return f"PrecipAccumulator(run={self.run_time:%Y-%m-%d %H}, pending={len(self._pending)}, totals={len(self._totals)})"
+
+def is_configured(params_config):
+    """Czy tp jest pobierane (w [gfs_parameters] lub [derived_inputs]); None = konfiguracja domyślna (tak)"""
+    return params_config is None or any(p.get('db_column') == PRECIP_COLUMN for p in params_config.values())
+
+def output_columns(params_config):
+    """Kolumny opadów w oknach zapisywane do bazy (pusta lista, gdy tp nie jest pobierane)"""
+    return list(AMOUNT_WINDOWS) if is_configured(params_config) else []
+
+def target_state_dir(name):
+    """Katalog stanu celu (region nazwany, stacje, obszary) - podkatalog DEFAULT_STATE_DIR"""
+    return os.path.join(DEFAULT_STATE_DIR, name)
+
+def create_accumulator(run_time, params_config, forecast_hours, state_dir=DEFAULT_STATE_DIR):
+    """Akumulator dla runu, jeśli tp jest pobierane; inaczej None"""
+    if not is_configured(params_config):
+        return None
+    return PrecipAccumulator(run_time, forecast_hours, state_dir=state_dir)
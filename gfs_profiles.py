@@ -0,0 +1,289 @@
+"""
+GFS Weather Data Downloader - PROFILE PIONOWE (POZIOMY IZOBARYCZNE)
+Zamiast kolumny na każdą parę (zmienna, poziom) w [gfs_parameters] (16 poziomów x 5 zmiennych = 80
+kolumn DOUBLE) profile są osobnym celem zapisu obok regionów siatki (gfs_regions):
+- zmienne z [profiles] na wszystkich poziomach są dekodowane w tym samym przebiegu ecCodes co reszta
+  parametrów (wejścia tylko do profili, stored=False - jak [derived_inputs]); poziom, który już jest
+  w [gfs_parameters] (np. t_t850), jest brany z tej samej kolumny - wiadomość dekodowana raz,
+- dla każdej zmiennej poziomy są składane w tablicę (poziomy x punkty) i transformowane raz,
+- tabela gfs_profile ma jeden wiersz na punkt / czas / zmienną, a profil to spakowana tablica
+  float32 (little-endian, kolejność poziomów z gfs_profile_levels) - Skew-T dla punktu to jeden
+  odczyt po kluczu głównym (lat, lon, run_time, forecast_time, variable).
+
+    [profiles]
+    lat_min = 49.0
+    lat_max = 55.0
+    lon_min = 14.0
+    lon_max = 24.5
+    # Zmienne (nazwy cfgrib): t, r, u, v, gh, w, q, clwmr, icmr, tcc
+    variables = t, r, u, v, gh
+    # Poziomy w hPa (domyślnie 16 poziomów jak GRIB_FILTER_CONFIG['levels'])
+    # levels = 1000, 925, 850, 700, 500, 300, 250, 200
+    # Transformacje zmiennych (domyślnie t: kelvin_to_celsius)
+    # transformations = t: none
+    # Zmiana rozdzielczości jak w regionach (gfs_resample)
+    # resample = coarsen 2
+    table = gfs_profile
+    # only = yes - tylko profile (bez regionów siatki)
+"""
+
+import threading
+import logging
+import configparser
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+import gfs_grib_decode
+import gfs_resample
+from gfs_db_schema import ForecastSchema
+
+module_logger = logging.getLogger(__name__)
+
+PROFILES_SECTION = 'profiles'
+PROFILE_REGION = 'profiles'
+PROFILE_TABLE = 'gfs_profile'
+LEVELS_TABLE_SUFFIX = '_levels'
+PROFILE_COLUMNS = ['lat', 'lon', 'variable', 'forecast_time', 'run_time', 'profile', 'created_at']
+
+# Parametry dodawane do konfiguracji (load_parameters_config) - nazwa = PARAMETER_PREFIX + zmienna_poziom
+PARAMETER_PREFIX = 'profile_'
+LEVEL_TYPE = 'isobaricInhPa'
+
+# Poziomy z GRIB_FILTER_CONFIG['levels'] (gfs_downloader_filtered_fixed)
+DEFAULT_LEVELS = (1000, 975, 950, 925, 900, 850, 800, 700, 500, 400, 300, 250, 200, 150, 100, 50)
+DEFAULT_VARIABLES = ('t', 'r', 'u', 'v', 'gh')
+
+# Zmienna cfgrib -> (zmienna NOMADS, domyślna transformacja)
+PROFILE_VARIABLES = {
+    't': ('TMP', 'kelvin_to_celsius'),
+    'r': ('RH', 'none'),
+    'u': ('UGRD', 'none'),
+    'v': ('VGRD', 'none'),
+    'gh': ('HGT', 'none'),
+    'w': ('VVEL', 'none'),
+    'q': ('SPFH', 'none'),
+    'clwmr': ('CLWMR', 'none'),
+    'icmr': ('ICMR', 'none'),
+    'tcc': ('TCDC', 'none'),
+}
+
+def parameter_name(variable, level):
+    return f"{PARAMETER_PREFIX}{variable}_{level}"
+
+def _read_settings(config):
+    """(zmienne, poziomy) z sekcji [profiles]; None gdy sekcji nie ma"""
+    if PROFILES_SECTION not in config:
+        return None
+    section = config[PROFILES_SECTION]
+    variables = [v.strip().lower() for v in section.get('variables', ', '.join(DEFAULT_VARIABLES)).split(',') if v.strip()]
+    unknown = [v for v in variables if v not in PROFILE_VARIABLES]
+    if unknown:
+        module_logger.warning(f"[profiles] nieznane zmienne pominięte: {', '.join(unknown)} (dostępne: {', '.join(PROFILE_VARIABLES)})")
+    variables = [v for v in variables if v in PROFILE_VARIABLES]
+    levels = section.get('levels', '').strip()
+    levels = [int(float(level)) for level in levels.split(',') if level.strip()] if levels else list(DEFAULT_LEVELS)
+    # Od powierzchni w górę (malejące ciśnienie) - kolejność wartości w tablicy profilu
+    return variables, sorted(set(levels), reverse=True)
+
+def profile_parameters(config):
+    """
+    Parametry wejściowe profili dla load_parameters_config: [(klucz cfgrib, nazwa, opis parametru)].
+    Parametry nie są zapisywane w tabelach regionów (stored=False) - tylko składane w profile.
+    """
+    settings = _read_settings(config)
+    if settings is None:
+        return []
+    variables, levels = settings
+    parameters = []
+    for variable in variables:
+        nomads = PROFILE_VARIABLES[variable][0]
+        for level in levels:
+            name = parameter_name(variable, level)
+            parameters.append(((variable, LEVEL_TYPE, level), name, {
+                'db_column': name,
+                'level_type': LEVEL_TYPE,
+                'level_value': level,
+                'transformation': 'none',
+                'stored': False,
+                'precision': None,
+                'cfgrib_name': variable,
+                'nomads': nomads,
+                'profile': True,
+            }))
+    return parameters
+
+def profile_only_columns(params_config):
+    """Kolumny dekodowane tylko dla profili - usuwane z siatki przed regionami"""
+    return {info['db_column'] for info in (params_config or {}).values() if info.get('profile')}
+
+def _parse_transformations(value):
+    """'t: kelvin_to_celsius; gh: none' -> {zmienna: transformacja}"""
+    result = {}
+    for item in (value or '').split(';'):
+        variable, sep, name = item.partition(':')
+        if sep and variable.strip():
+            result[variable.strip().lower()] = name.strip() or 'none'
+    return result
+
+class ProfileSet:
+    """
+    Profile pionowe w prostokącie - cel zapisu obok regionów (gfs_regions), z tym samym interfejsem
+    (bounds, table, region_id, schema, derived, accumulator).
+    """
+
+    def __init__(self, bounds, variables, levels, table=PROFILE_TABLE, transformations=None, resample=None, only=False):
+        self.name = PROFILE_REGION
+        self.bounds = tuple(float(b) for b in bounds)
+        self.variables = list(variables)
+        self.levels = list(levels)
+        self.table = table
+        self.levels_table = table + LEVELS_TABLE_SUFFIX
+        self.transformations = {variable: PROFILE_VARIABLES[variable][1] for variable in self.variables}
+        self.transformations.update({k: v for k, v in (transformations or {}).items() if k in self.transformations})
+        self.resample = resample if resample else None
+        self.only = only
+        self.region_id = None
+        self.derived = None
+        self.schema = None
+        self.accumulator = None
+        self.interpolator = None
+        self.columns = {}
+        self._levels_written = set()
+        self._lock = threading.Lock()
+
+    def prepare(self, params_config, engine=None, config_file='config.ini'):
+        """Kolumny siatki dla każdej (zmienna, poziom) - także istniejące kolumny [gfs_parameters] - i schemat tabeli"""
+        by_key = {}
+        for info in params_config.values():
+            cfgrib_name = info.get('cfgrib_name')
+            if cfgrib_name and info.get('level_type') == LEVEL_TYPE:
+                key = (cfgrib_name, info.get('level_value'))
+                # Kolumna z [gfs_parameters] ma pierwszeństwo (ta sama wiadomość jest routowana tylko raz)
+                if key not in by_key or not info.get('profile'):
+                    by_key[key] = info['db_column']
+        self.columns = {variable: [by_key.get((variable, level)) for level in self.levels] for variable in self.variables}
+        missing = [f"{variable}{level}" for variable in self.variables for level, column in zip(self.levels, self.columns[variable]) if column is None]
+        if missing:
+            module_logger.warning(f"[profiles] brak parametrów dla poziomów (wartości NaN): {', '.join(missing)}")
+        if engine is not None:
+            self.schema = ForecastSchema.from_database(engine, {}, self.table, [], PROFILE_COLUMNS)
+        else:
+            self.schema = ForecastSchema({}, table=self.table, derived_columns=[], base_columns=PROFILE_COLUMNS)
+        return self
+
+    def create_accumulator(self, run_time, params_config, forecast_hours):
+        """Profile nie mają opadów w oknach"""
+        self.accumulator = None
+        return None
+
+    def resample_for(self, forecast_hour):
+        return self.resample.for_hour(forecast_hour) if self.resample else None
+
+    def extract(self, grid, transforms, units=None):
+        """
+        Tablice profili z prostokąta (wynik _grid_arrays, PRZED transformacjami regionów - te są wykonywane
+        w miejscu): {zmienna: tablica (poziomy x wiersze x kolumny) float32} oraz współrzędne wycinka.
+        units - {kolumna: jednostki GRIB} do rozstrzygnięcia transformacji.
+        """
+        rows, cols = gfs_grib_decode.region_slices(grid['latitudes'], grid['longitudes'], *self.bounds)
+        latitudes = grid['latitudes'][rows]
+        longitudes = grid['longitudes'][cols]
+        stacks = {}
+        for variable in self.variables:
+            stack = np.full((len(self.levels), latitudes.size, longitudes.size), np.nan, dtype=np.float32)
+            column_units = None
+            for i, column in enumerate(self.columns[variable]):
+                values = grid['columns'].get(column) if column else None
+                if values is not None:
+                    stack[i] = values[rows, cols]
+                    column_units = column_units or (units or {}).get(column)
+            transforms.resolve(self.transformations[variable], column_units).apply(stack)
+            stacks[variable] = stack
+        return {'latitudes': latitudes, 'longitudes': longitudes, 'stacks': stacks}
+
+    def apply_resample(self, profiles, forecast_hour):
+        """Zmiana rozdzielczości wg reguł (każdy poziom tym samym planem)"""
+        operation = self.resample_for(forecast_hour)
+        if operation is None:
+            return profiles
+        plan = operation.plan(profiles['latitudes'], profiles['longitudes'])
+        return {
+            'latitudes': plan.latitudes,
+            'longitudes': plan.longitudes,
+            'stacks': {variable: np.stack([plan.apply(level) for level in stack]).astype(np.float32)
+                       for variable, stack in profiles['stacks'].items()}
+        }
+
+    def frame(self, profiles):
+        """
+        DataFrame do zapisu: wiersz na punkt i zmienną, profil jako bajty float32 little-endian
+        (punkty bez żadnej wartości są pomijane).
+        """
+        latitudes, longitudes = profiles['latitudes'], profiles['longitudes']
+        n_points = latitudes.size * longitudes.size
+        n_levels = len(self.levels)
+        lat_column = np.repeat(latitudes, longitudes.size)
+        lon_column = np.tile(longitudes, latitudes.size)
+        blob = np.dtype((np.void, 4 * n_levels))
+        frames = []
+        for variable, stack in profiles['stacks'].items():
+            values = np.ascontiguousarray(stack.reshape(n_levels, n_points).T, dtype='<f4')
+            keep = np.isfinite(values).any(axis=1)
+            frames.append(pd.DataFrame({
+                'latitude': lat_column[keep],
+                'longitude': lon_column[keep],
+                'variable': variable,
+                'profile': np.ascontiguousarray(values[keep]).view(blob).ravel().tolist(),
+            }))
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['latitude', 'longitude', 'variable', 'profile'])
+
+    def write_levels(self, engine, run_time):
+        """Lista poziomów runu w <tabela>_levels (raz na run) - kolejność wartości w profilach"""
+        if engine is None or run_time in self._levels_written:
+            return
+        levels = ','.join(str(level) for level in self.levels)
+        with engine.begin() as conn:
+            conn.execute(text(f"DELETE FROM {self.levels_table} WHERE run_time = :run_time"), {'run_time': run_time})
+            conn.execute(text(f"INSERT INTO {self.levels_table} (run_time, levels) VALUES (:run_time, :levels)"),
+                         {'run_time': run_time, 'levels': levels})
+        with self._lock:
+            self._levels_written.add(run_time)
+
+    def label(self, fh_str, regions_count=1):
+        return fh_str if regions_count <= 1 else f"{fh_str} {self.name}"
+
+    def describe(self):
+        lat_min, lat_max, lon_min, lon_max = self.bounds
+        resample = f" [{self.resample}]" if self.resample else ''
+        return (f"{self.name}: {', '.join(self.variables)} na {len(self.levels)} poziomach, "
+                f"{lat_min}°-{lat_max}°N, {lon_min}°-{lon_max}°E -> {self.table}{resample}")
+
+    def __repr__(self):
+        return f"ProfileSet({self.describe()})"
+
+def load_profile_set(config_file='config.ini'):
+    """Profile z sekcji [profiles]; None gdy sekcji nie ma lub nie ma zmiennych"""
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    settings = _read_settings(config)
+    if settings is None:
+        return None
+    variables, levels = settings
+    if not variables or not levels:
+        module_logger.warning("[profiles] brak zmiennych lub poziomów - profile wyłączone")
+        return None
+    section = config[PROFILES_SECTION]
+    try:
+        bounds = tuple(float(section[key]) for key in ('lat_min', 'lat_max', 'lon_min', 'lon_max'))
+    except (KeyError, ValueError) as e:
+        module_logger.warning(f"[profiles] niepoprawne granice ({e}) - profile wyłączone")
+        return None
+    return ProfileSet(
+        bounds, variables, levels,
+        table=section.get('table', PROFILE_TABLE).strip() or PROFILE_TABLE,
+        transformations=_parse_transformations(section.get('transformations')),
+        resample=gfs_resample.parse_rules(section.get('resample')),
+        only=section.getboolean('only', fallback=False),
+    )
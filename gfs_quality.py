@@ -0,0 +1,463 @@
+"""
+GFS Weather Data Downloader - KONTROLA JAKOŚCI DANYCH (QC) Z KWARANTANNĄ
+Zdekodowane pola są sprawdzane przed zapisem (po transformacjach jednostek - w jednostkach bazy),
+raz na prostokąt obejmujący wszystkie regiony, samymi operacjami numpy na tablicach:
+- udział NaN / wartości wypełnienia (missingValue GRIB, 9.999e20) - puste albo uszkodzone pole,
+- zakres fizyczny kolumny (np. t2m -90..60 °C) - także podwójna lub pominięta transformacja jednostek,
+- pojedyncze skoki przestrzenne - różnica komórki od średniej 4 sąsiadów ponad próg (co spike_stride wierszy),
+- skok względem poprzedniego runu dla tego samego czasu prognozy (siatka runu zapamiętana
+  na dysku co jump_stride komórek).
+Godzina, która nie przejdzie kontroli, nie jest zapisywana (zwraca 0 rekordów - pobierana ponownie),
+a wyniki trafiają do tabeli kwarantanny. Po max_attempts kwarantannach tej samej godziny runu dane
+są zapisywane mimo błędów (status 'accepted'), żeby jedna zła wiadomość nie zablokowała runu.
+Liczniki (godziny, błędy wg kontroli i kolumn, czas) - metrics(), summary() i opcjonalnie plik
+w formacie tekstowym Prometheus (node_exporter textfile collector).
+Kontrola jest domyślnie wyłączona - włącza ją enabled = yes (tabela kwarantanny: fix_database_structure.sql).
+
+    [quality]
+    enabled = yes
+    max_nan_ratio = 0.5
+    # Udział komórek poza zakresem / skoków przestrzennych / skoków względem runu, od którego pole jest złe
+    max_range_ratio = 0.01
+    max_spike_ratio = 0.001
+    max_jump_ratio = 0.25
+    max_attempts = 3
+    quarantine_table = gfs_quality_quarantine
+    # Kopia złego pliku GRIB do analizy (domyślnie brak)
+    # quarantine_dir = temp/quarantine
+    # metrics_file = /var/lib/node_exporter/textfile/gfs_quality.prom
+
+    [quality_checks]
+    # kolumna = min, max[, próg skoku przestrzennego[, próg skoku względem runu]] (puste pole = bez kontroli)
+    t2m = -90, 60, 25, 20
+"""
+
+import os
+import time
+import shutil
+import logging
+import threading
+import configparser
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import text
+
+module_logger = logging.getLogger(__name__)
+
+QUALITY_SECTION = 'quality'
+CHECKS_SECTION = 'quality_checks'
+QUARANTINE_TABLE = 'gfs_quality_quarantine'
+DEFAULT_STATE_DIR = os.path.join('temp', 'quality_state')
+
+DEFAULT_MAX_NAN_RATIO = 0.5
+DEFAULT_MAX_RANGE_RATIO = 0.01
+DEFAULT_MAX_SPIKE_RATIO = 0.001
+DEFAULT_MAX_JUMP_RATIO = 0.25
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_JUMP_STRIDE = 4
+# Skoki przestrzenne liczone co tyle wierszy (zła wiadomość ma ich wiele - próbka wystarcza)
+DEFAULT_SPIKE_STRIDE = 4
+# Odstęp runów GFS - poprzedni run dla skoku względem runu
+RUN_INTERVAL = timedelta(hours=6)
+# Wartości wypełnienia (missingValue ecCodes bez bitmapy, _FillValue netCDF)
+FILL_THRESHOLD = 1e20
+
+CHECKS = ('nan', 'fill', 'range', 'spike', 'jump')
+
+# Kontrole parametrów z katalogu (gfs_catalog) wg transformacji:
+# nazwa w konfiguracji -> {transformacja: (min, max, skok przestrzenny, skok względem runu)}
+_KELVIN = {'kelvin_to_celsius': (-90.0, 60.0, 25.0, 20.0), 'none': (183.0, 333.0, 25.0, 20.0)}
+_UPPER_KELVIN = {'kelvin_to_celsius': (-90.0, 50.0, 20.0, 15.0), 'none': (183.0, 323.0, 20.0, 15.0)}
+_WIND = {'none': (-120.0, 120.0, 40.0, None)}
+_PERCENT = {'none': (0.0, 100.5, None, None), 'fraction_to_percent': (0.0, 100.0, None, None)}
+DEFAULT_CHECKS = {
+    't2m': _KELVIN,
+    'd2m': _KELVIN,
+    't80': _KELVIN,
+    't_850': _UPPER_KELVIN,
+    'r2': {'none': (0.0, 105.0, None, None), 'fraction_to_percent': (0.0, 100.0, None, None)},
+    'u10': _WIND,
+    'v10': _WIND,
+    'u80': _WIND,
+    'v80': _WIND,
+    'gust': {'none': (0.0, 150.0, 50.0, None)},
+    'prmsl': {'pa_to_hpa': (850.0, 1100.0, 20.0, 30.0), 'none': (85000.0, 110000.0, 2000.0, 3000.0)},
+    'tp': {'none': (0.0, 2000.0, None, None)},
+    'prate': {'none': (0.0, 0.2, None, None)},
+    'tcc': _PERCENT,
+    'lcc': _PERCENT,
+    'mcc': _PERCENT,
+    'hcc': _PERCENT,
+    'vis': {'none': (0.0, 100000.0, None, None)},
+    'dswrf': {'none': (0.0, 1500.0, None, None)},
+    'cape': {'none': (0.0, 10000.0, None, None)},
+    'cin': {'none': (-2000.0, 10.0, None, None)},
+    'pwat': {'none': (0.0, 150.0, None, None)},
+    'gh_850': {'none': (800.0, 2000.0, 150.0, 200.0)},
+    'gh_500': {'none': (4400.0, 6200.0, 200.0, 300.0)},
+}
+
+def _ratio(count, total):
+    return float(count) / total if total else 0.0
+
+def _spike_count(values, threshold, stride=1):
+    """
+    Komórki wnętrza (co stride wierszy) różniące się od średniej 4 sąsiadów o więcej niż threshold
+    (NaN nie liczą się): |suma sąsiadów - 4 * komórka| > 4 * threshold, w jednym buforze.
+    Zwraca (liczba skoków, liczba sprawdzonych komórek).
+    """
+    rows = values.shape[0]
+    if rows < 3 or values.shape[1] < 3:
+        return 0, 0
+    center = values[1:rows - 1:stride, 1:-1]
+    neighbours = values[0:rows - 2:stride, 1:-1] + values[2:rows:stride, 1:-1]
+    neighbours += values[1:rows - 1:stride, :-2]
+    neighbours += values[1:rows - 1:stride, 2:]
+    neighbours -= 4 * center
+    with np.errstate(invalid='ignore'):
+        return int(np.count_nonzero(np.abs(neighbours, out=neighbours) > 4 * threshold)), center.size
+
+class QualityGate:
+    """Kontrola jakości godziny prognozy (wspólna dla wątków runu) z licznikami i stanem poprzedniego runu"""
+
+    def __init__(self, checks=None, max_nan_ratio=DEFAULT_MAX_NAN_RATIO, max_range_ratio=DEFAULT_MAX_RANGE_RATIO,
+                 max_spike_ratio=DEFAULT_MAX_SPIKE_RATIO, max_jump_ratio=DEFAULT_MAX_JUMP_RATIO,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS, jump_stride=DEFAULT_JUMP_STRIDE, spike_stride=DEFAULT_SPIKE_STRIDE,
+                 state_dir=DEFAULT_STATE_DIR,
+                 quarantine_table=QUARANTINE_TABLE, quarantine_dir=None, metrics_file=None):
+        """
+        checks - {kolumna bazy: (min, max, skok przestrzenny, skok względem runu)}; None w krotce = bez kontroli.
+        Bez state_dir kontrola skoku względem runu jest wyłączona.
+        """
+        self.checks = dict(checks or {})
+        self.max_nan_ratio = max_nan_ratio
+        self.max_range_ratio = max_range_ratio
+        self.max_spike_ratio = max_spike_ratio
+        self.max_jump_ratio = max_jump_ratio
+        self.max_attempts = max_attempts
+        self.jump_stride = max(1, int(jump_stride))
+        self.spike_stride = max(1, int(spike_stride))
+        self.state_dir = state_dir
+        self.quarantine_table = quarantine_table
+        self.quarantine_dir = quarantine_dir
+        self.metrics_file = metrics_file
+        self._lock = threading.Lock()
+        self._attempts = {}          # (run_time, forecast_hour) -> liczba kwarantann
+        self._pruned = set()
+        self.hours_checked = 0
+        self.hours_passed = 0
+        self.hours_quarantined = 0
+        self.hours_accepted = 0
+        self.failures = {check: 0 for check in CHECKS}
+        self.failed_columns = {}
+        self.seconds = 0.0
+
+    def prepare(self, params_config):
+        """Domyślne kontrole parametrów z katalogu (wg transformacji), o ile kolumna nie ma własnych"""
+        for config_name, info in (params_config or {}).items():
+            column = info.get('db_column')
+            defaults = DEFAULT_CHECKS.get(config_name, {}).get(info.get('transformation'))
+            if column and defaults is not None and column not in self.checks:
+                self.checks[column] = defaults
+        return self
+
+    # --- stan poprzedniego runu (skok względem runu) ---
+
+    def _state_path(self, run_time, forecast_time):
+        return os.path.join(self.state_dir, run_time.strftime('%Y%m%d%H'), forecast_time.strftime('%Y%m%d%H') + '.npz')
+
+    def _sample(self, grid):
+        stride = self.jump_stride
+        return grid['latitudes'][::stride], grid['longitudes'][::stride]
+
+    def _load_previous(self, run_time, forecast_time, grid):
+        """Próbka pól poprzedniego runu dla czasu prognozy - tylko przy tej samej siatce"""
+        path = self._state_path(run_time - RUN_INTERVAL, forecast_time)
+        if not os.path.exists(path):
+            return {}
+        try:
+            with np.load(path) as state:
+                latitudes, longitudes = self._sample(grid)
+                if not (np.array_equal(state['__lat__'], latitudes) and np.array_equal(state['__lon__'], longitudes)):
+                    return {}
+                return {name: state[name] for name in state.files if not name.startswith('__')}
+        except (OSError, ValueError, KeyError) as e:
+            module_logger.warning(f"QC: nie udało się wczytać stanu poprzedniego runu {path}: {e}")
+            return {}
+
+    def _remember(self, run_time, forecast_time, grid):
+        """Zapisuje próbkę pól z progiem skoku względem runu (porównanie z następnym runem)"""
+        stride = self.jump_stride
+        columns = {column: np.asarray(grid['columns'][column][::stride, ::stride], dtype=np.float32)
+                   for column, check in self.checks.items() if check[3] is not None and column in grid['columns']}
+        if not columns:
+            return
+        path = self._state_path(run_time, forecast_time)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            latitudes, longitudes = self._sample(grid)
+            tmp_path = path + f'.{os.getpid()}.{threading.get_ident()}.tmp.npz'
+            np.savez(tmp_path, __lat__=latitudes, __lon__=longitudes, **columns)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            module_logger.warning(f"QC: nie udało się zapisać stanu runu {path}: {e}")
+        self._prune(run_time)
+
+    def _prune(self, run_time):
+        """Usuwa stan runów starszych niż poprzedni (raz na run)"""
+        with self._lock:
+            if run_time in self._pruned:
+                return
+            self._pruned.add(run_time)
+        keep = {run_time.strftime('%Y%m%d%H'), (run_time - RUN_INTERVAL).strftime('%Y%m%d%H')}
+        try:
+            for name in os.listdir(self.state_dir):
+                if name not in keep and name.isdigit() and name < min(keep):
+                    shutil.rmtree(os.path.join(self.state_dir, name), ignore_errors=True)
+        except OSError:
+            pass
+
+    # --- kontrola ---
+
+    def _check_column(self, column, values, previous, failures, stats):
+        values = np.asarray(values)
+        total = values.size
+        # Szybka ścieżka: skończona suma = brak NaN/inf (jedna redukcja zamiast maski)
+        with np.errstate(invalid='ignore', over='ignore'):
+            all_finite = bool(np.isfinite(values.sum()))
+        finite_count = total if all_finite else int(np.count_nonzero(np.isfinite(values)))
+        nan_ratio = 1.0 - _ratio(finite_count, total)
+        stats['nan_ratio'] = round(nan_ratio, 4)
+        if nan_ratio > self.max_nan_ratio:
+            failures.append({'column': column, 'check': 'nan', 'value': nan_ratio, 'limit': self.max_nan_ratio})
+            return
+        if finite_count == 0:
+            return
+        low, high = np.nanmin(values), np.nanmax(values)
+        check = self.checks.get(column)
+        if check is None:
+            # Bez zakresu - tylko wartości wypełnienia (missingValue / _FillValue)
+            if max(abs(low), abs(high)) >= FILL_THRESHOLD:
+                with np.errstate(invalid='ignore'):
+                    fill_ratio = _ratio(np.count_nonzero(np.abs(values) >= FILL_THRESHOLD), total)
+                stats['fill_ratio'] = round(fill_ratio, 4)
+                if fill_ratio + nan_ratio > self.max_nan_ratio:
+                    failures.append({'column': column, 'check': 'fill', 'value': fill_ratio, 'limit': self.max_nan_ratio})
+            return
+        range_low, range_high, spike, jump = check
+        # Zakres: maska tylko gdy minimum lub maksimum pola wychodzi poza zakres
+        below = range_low is not None and low < range_low
+        above = range_high is not None and high > range_high
+        if below or above:
+            with np.errstate(invalid='ignore'):
+                outside = 0
+                if below:
+                    outside += np.count_nonzero(values < range_low)
+                if above:
+                    outside += np.count_nonzero(values > range_high)
+            range_ratio = _ratio(outside, finite_count)
+            stats['range_ratio'] = round(range_ratio, 4)
+            if range_ratio > self.max_range_ratio:
+                failures.append({'column': column, 'check': 'range', 'value': range_ratio, 'limit': self.max_range_ratio})
+                return
+        # Skok przestrzenny niemożliwy, gdy całe pole mieści się w progu
+        if spike is not None and high - low > spike:
+            spikes, interior = _spike_count(values, spike, self.spike_stride)
+            spike_ratio = _ratio(spikes, interior)
+            stats['spike_ratio'] = round(spike_ratio, 5)
+            if spike_ratio > self.max_spike_ratio:
+                failures.append({'column': column, 'check': 'spike', 'value': spike_ratio, 'limit': self.max_spike_ratio})
+        if jump is not None and column in previous:
+            sample = values[::self.jump_stride, ::self.jump_stride]
+            if sample.shape == previous[column].shape:
+                with np.errstate(invalid='ignore'):
+                    difference = np.abs(sample - previous[column])
+                    compared = int(np.count_nonzero(np.isfinite(difference)))
+                    jump_ratio = _ratio(np.count_nonzero(difference > jump), compared)
+                stats['jump_ratio'] = round(jump_ratio, 4)
+                if jump_ratio > self.max_jump_ratio:
+                    failures.append({'column': column, 'check': 'jump', 'value': jump_ratio, 'limit': self.max_jump_ratio})
+
+    def check(self, grid, run_time, forecast_hour):
+        """
+        Kontrola pól godziny prognozy (siatka z _grid_arrays po transformacjach).
+        Zwraca raport: {'ok', 'accepted', 'attempt', 'failures': [{'column', 'check', 'value', 'limit'}],
+        'stats': {kolumna: {...}}, 'seconds'}. accepted - zapis mimo błędów (wyczerpane max_attempts).
+        Stan runu do kontroli skoku jest zapisywany dla godzin, które przeszły kontrolę.
+        """
+        start = time.perf_counter()
+        forecast_time = run_time + timedelta(hours=int(forecast_hour))
+        previous = self._load_previous(run_time, forecast_time, grid) if self.state_dir else {}
+        failures = []
+        stats = {}
+        for column, values in grid['columns'].items():
+            stats[column] = {}
+            self._check_column(column, values, previous, failures, stats[column])
+
+        report = {'ok': not failures, 'accepted': False, 'attempt': 0, 'failures': failures, 'stats': stats,
+                  'run_time': run_time, 'forecast_time': forecast_time, 'forecast_hour': forecast_hour}
+        with self._lock:
+            self.hours_checked += 1
+            if failures:
+                key = (run_time, forecast_hour)
+                self._attempts[key] = self._attempts.get(key, 0) + 1
+                report['attempt'] = self._attempts[key]
+                report['accepted'] = report['attempt'] >= self.max_attempts
+                if report['accepted']:
+                    self.hours_accepted += 1
+                else:
+                    self.hours_quarantined += 1
+                for failure in failures:
+                    self.failures[failure['check']] += 1
+                    self.failed_columns[failure['column']] = self.failed_columns.get(failure['column'], 0) + 1
+            else:
+                self.hours_passed += 1
+                self._attempts.pop((run_time, forecast_hour), None)
+        # Pola zapisane mimo błędów nie są wzorcem dla następnego runu
+        if self.state_dir and report['ok']:
+            self._remember(run_time, forecast_time, grid)
+        report['seconds'] = time.perf_counter() - start
+        with self._lock:
+            self.seconds += report['seconds']
+        self.write_metrics()
+        return report
+
+    def is_quarantined(self, run_time, forecast_hour):
+        """Czy godzina runu jest w kwarantannie (ostatnia kontrola nieudana, próby jeszcze nie wyczerpane)"""
+        with self._lock:
+            return 0 < self._attempts.get((run_time, forecast_hour), 0) < self.max_attempts
+
+    def quarantine(self, report, engine, grib_path=None):
+        """Wyniki nieudanej kontroli do tabeli kwarantanny (i kopia pliku GRIB do quarantine_dir)"""
+        status = 'accepted' if report['accepted'] else 'quarantined'
+        copied = None
+        if self.quarantine_dir and grib_path and not report['accepted']:
+            try:
+                os.makedirs(self.quarantine_dir, exist_ok=True)
+                copied = os.path.join(self.quarantine_dir, f"gfs_{report['run_time']:%Y%m%d%H}_f{report['forecast_hour']:03d}_{report['attempt']}.grb2")
+                shutil.copyfile(grib_path, copied)
+            except OSError as e:
+                module_logger.warning(f"QC: nie udało się skopiować pliku do kwarantanny: {e}")
+                copied = None
+        if engine is None or not report['failures']:
+            return
+        created_at = datetime.utcnow()
+        rows = [{
+            'run_time': report['run_time'],
+            'forecast_time': report['forecast_time'],
+            'column_name': failure['column'],
+            'check_name': failure['check'],
+            'value': float(failure['value']),
+            'limit_value': float(failure['limit']),
+            'attempt': report['attempt'],
+            'status': status,
+            'grib_file': copied,
+            'created_at': created_at,
+        } for failure in report['failures']]
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(f"""
+                    INSERT INTO {self.quarantine_table}
+                        (run_time, forecast_time, column_name, check_name, value, limit_value, attempt, status, grib_file, created_at)
+                    VALUES (:run_time, :forecast_time, :column_name, :check_name, :value, :limit_value, :attempt, :status, :grib_file, :created_at)
+                """), rows)
+        except Exception as e:
+            module_logger.warning(f"QC: nie udało się zapisać kwarantanny do {self.quarantine_table}: {e}")
+
+    # --- metryki ---
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'hours_checked': self.hours_checked,
+                'hours_passed': self.hours_passed,
+                'hours_quarantined': self.hours_quarantined,
+                'hours_accepted': self.hours_accepted,
+                'failures': dict(self.failures),
+                'failed_columns': dict(self.failed_columns),
+                'seconds': round(self.seconds, 3),
+            }
+
+    def write_metrics(self):
+        """Liczniki w formacie tekstowym Prometheus (zapis atomowy) - gdy ustawiono metrics_file"""
+        if not self.metrics_file:
+            return
+        metrics = self.metrics()
+        lines = [
+            '# HELP gfs_quality_hours_total Forecast hours checked by QC, by result',
+            '# TYPE gfs_quality_hours_total counter',
+        ]
+        for result in ('passed', 'quarantined', 'accepted'):
+            lines.append(f'gfs_quality_hours_total{{result="{result}"}} {metrics["hours_" + result]}')
+        lines += ['# HELP gfs_quality_failures_total Failed QC checks', '# TYPE gfs_quality_failures_total counter']
+        lines += [f'gfs_quality_failures_total{{check="{check}"}} {count}' for check, count in metrics['failures'].items()]
+        lines += ['# HELP gfs_quality_column_failures_total Failed QC checks by column', '# TYPE gfs_quality_column_failures_total counter']
+        lines += [f'gfs_quality_column_failures_total{{column="{column}"}} {count}' for column, count in sorted(metrics['failed_columns'].items())]
+        lines += ['# HELP gfs_quality_seconds_total Time spent in QC', '# TYPE gfs_quality_seconds_total counter',
+                  f'gfs_quality_seconds_total {metrics["seconds"]}']
+        tmp_path = f"{self.metrics_file}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+            os.replace(tmp_path, self.metrics_file)
+        except OSError as e:
+            module_logger.warning(f"QC: nie udało się zapisać metryk do {self.metrics_file}: {e}")
+
+    def summary(self):
+        """Krótki opis liczników do logów"""
+        metrics = self.metrics()
+        failed = ', '.join(f"{check}: {count}" for check, count in metrics['failures'].items() if count)
+        return (f"QC: {metrics['hours_checked']} godzin ({metrics['hours_passed']} OK, {metrics['hours_quarantined']} w kwarantannie, "
+                f"{metrics['hours_accepted']} zapisanych mimo błędów){' - ' + failed if failed else ''}, {metrics['seconds']:.2f} s")
+
+    def describe(self):
+        return (f"{len(self.checks)} kolumn z zakresami, NaN <= {self.max_nan_ratio:.0%}, kwarantanna: {self.quarantine_table}"
+                f"{'' if self.state_dir else ', bez porównania z poprzednim runem'}")
+
+    def __repr__(self):
+        return f"QualityGate({self.describe()})"
+
+def format_report(report):
+    """Błędy z raportu jako jedna linia do logów"""
+    return '; '.join(f"{f['column']} {f['check']} {f['value']:.4g} > {f['limit']:.4g}" for f in report['failures'])
+
+def _parse_check(value):
+    """'min, max[, skok[, skok runu]]' -> krotka (puste pole = None)"""
+    parts = [p.strip() for p in value.split(',')]
+    parts += [''] * (4 - len(parts))
+    return tuple(float(p) if p else None for p in parts[:4])
+
+def load_quality_gate(config_file='config.ini', params_config=None):
+    """Kontrola jakości z [quality] i [quality_checks]; None gdy wyłączona (domyślnie - bez enabled = yes)"""
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    section = config[QUALITY_SECTION] if QUALITY_SECTION in config else {}
+    if str(section.get('enabled', 'no')).strip().lower() not in ('yes', 'true', '1', 'on'):
+        return None
+    checks = {}
+    if CHECKS_SECTION in config:
+        for column, value in config[CHECKS_SECTION].items():
+            try:
+                checks[column] = _parse_check(value)
+            except ValueError as e:
+                module_logger.warning(f"[{CHECKS_SECTION}] {column}: niepoprawna wartość ({e}) - pominięta")
+    try:
+        gate = QualityGate(
+            checks,
+            max_nan_ratio=float(section.get('max_nan_ratio', DEFAULT_MAX_NAN_RATIO)),
+            max_range_ratio=float(section.get('max_range_ratio', DEFAULT_MAX_RANGE_RATIO)),
+            max_spike_ratio=float(section.get('max_spike_ratio', DEFAULT_MAX_SPIKE_RATIO)),
+            max_jump_ratio=float(section.get('max_jump_ratio', DEFAULT_MAX_JUMP_RATIO)),
+            max_attempts=int(section.get('max_attempts', DEFAULT_MAX_ATTEMPTS)),
+            jump_stride=int(section.get('jump_stride', DEFAULT_JUMP_STRIDE)),
+            spike_stride=int(section.get('spike_stride', DEFAULT_SPIKE_STRIDE)),
+            state_dir=section.get('state_dir', DEFAULT_STATE_DIR).strip() or None,
+            quarantine_table=section.get('quarantine_table', QUARANTINE_TABLE).strip() or QUARANTINE_TABLE,
+            quarantine_dir=section.get('quarantine_dir', '').strip() or None,
+            metrics_file=section.get('metrics_file', '').strip() or None,
+        )
+    except ValueError as e:
+        module_logger.warning(f"[{QUALITY_SECTION}] niepoprawna konfiguracja ({e}) - wartości domyślne")
+        gate = QualityGate(checks)
+    return gate.prepare(params_config)
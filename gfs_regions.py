@@ -0,0 +1,203 @@
+"""
+GFS Weather Data Downloader - WIELE REGIONÓW Z JEDNEGO POBRANIA
+Zamiast osobnych instalacji (osobne pobieranie i dekodowanie) dla każdego obszaru, jedna godzina
+prognozy jest pobierana i dekodowana RAZ, a wycięcia regionów powstają z tych samych tablic:
+- dekodowanie i wycięcie obejmuje prostokąt otaczający wszystkie regiony (union_bounds),
+- transformacje jednostek są wykonywane raz na tablicach tego prostokąta (wspólne komórki raz),
+- każdy region jest widokiem na te tablice, z własną tabelą lub region_id, podzbiorem parametrów
+  i polami pochodnymi.
+
+Bez sekcji [region.<nazwa>] działa jak dotychczas - jeden region z sekcji [region]:
+
+    [region.baltic]
+    lat_min = 53.5
+    lat_max = 56.0
+    lon_min = 12.0
+    lon_max = 22.0
+    # Tabela docelowa (domyślnie gfs_forecast) i/lub identyfikator w kolumnie region_id
+    table = gfs_forecast_baltic
+    region_id = baltic
+    # Kolumny z [gfs_parameters] zapisywane dla regionu (domyślnie wszystkie)
+    parameters = u_wind80, v_wind80, t2m
+    # Mniejsza rozdzielczość dla zakresów godzin (gfs_resample; także w sekcji [region])
+    resample = 123-384: coarsen 2
+
+    [derived_fields.baltic]
+    # Pola pochodne regionu (uzupełniają lub nadpisują [derived_fields])
+    wind_speed80 = speed(u_wind80, v_wind80)
+"""
+
+import logging
+import configparser
+
+import numpy as np
+
+import gfs_areas
+import gfs_arrow
+import gfs_derived
+import gfs_grib_decode
+import gfs_interpolate
+import gfs_points
+import gfs_precip
+import gfs_profiles
+import gfs_resample
+import gfs_storage
+from gfs_db_schema import ForecastSchema, FORECAST_TABLE, BASE_COLUMNS
+
+module_logger = logging.getLogger(__name__)
+
+DEFAULT_REGION = 'default'
+REGION_SECTION_PREFIX = 'region.'
+REGION_ID_COLUMN = 'region_id'
+
+class Region:
+    """Jeden region: granice, tabela docelowa, podzbiór parametrów oraz schemat/pola pochodne/opady"""
+
+    def __init__(self, name, bounds, table=FORECAST_TABLE, region_id=None, parameters=None, resample=None):
+        """
+        bounds - (lat_min, lat_max, lon_min, lon_max).
+        parameters - db_column z [gfs_parameters] zapisywane dla regionu (None = wszystkie).
+        resample - gfs_resample.ResampleRules (None = zawsze pełna rozdzielczość).
+        """
+        self.name = name
+        self.bounds = tuple(float(b) for b in bounds)
+        self.table = table
+        self.region_id = region_id
+        self.parameters = list(parameters) if parameters else None
+        self.resample = resample if resample else None
+        self.derived = None
+        self.schema = None
+        self.accumulator = None
+        self.interpolator = None
+
+    def params_config(self, params_config):
+        """Konfiguracja parametrów regionu - kolumny spoza podzbioru są tylko wejściem pól pochodnych"""
+        if self.parameters is None:
+            return params_config
+        return {
+            config_name: {**info, 'stored': info.get('stored', True) and info['db_column'] in self.parameters}
+            for config_name, info in params_config.items()
+        }
+
+    def prepare(self, params_config, engine=None, config_file='config.ini'):
+        """Pola pochodne i schemat tabeli regionu (raz przy starcie / na run)"""
+        region_params = self.params_config(params_config)
+        section = None if self.name == DEFAULT_REGION else self.name
+        self.derived = gfs_derived.load_derived_fields(config_file, region_params, region=section)
+        base_columns = BASE_COLUMNS + ([REGION_ID_COLUMN] if self.region_id else [])
+        derived_columns = self.derived.outputs + gfs_precip.output_columns(region_params) + gfs_interpolate.output_columns(config_file)
+        storage = gfs_storage.load_storage(config_file, region_params)
+        writer = gfs_arrow.load_batch_writer(config_file)
+        if engine is not None:
+            self.schema = ForecastSchema.from_database(engine, region_params, self.table, derived_columns, base_columns, storage, writer)
+        else:
+            self.schema = ForecastSchema(region_params, table=self.table, derived_columns=derived_columns, base_columns=base_columns,
+                                         storage=storage, writer=writer)
+        return self
+
+    def create_accumulator(self, run_time, params_config, forecast_hours):
+        """Akumulator opadów regionu (stan na dysku w osobnym katalogu dla każdego regionu)"""
+        state_dir = gfs_precip.DEFAULT_STATE_DIR
+        if self.name != DEFAULT_REGION:
+            state_dir = gfs_precip.target_state_dir(self.name)
+        self.accumulator = gfs_precip.create_accumulator(run_time, self.params_config(params_config), forecast_hours, state_dir)
+        return self.accumulator
+
+    def resample_for(self, forecast_hour):
+        """Zmiana rozdzielczości dla godziny prognozy (gfs_resample.Resample) lub None"""
+        return self.resample.for_hour(forecast_hour) if self.resample else None
+
+    def label(self, fh_str, regions_count=1):
+        """Etykieta w logach - przy wielu regionach z nazwą regionu"""
+        return fh_str if regions_count <= 1 else f"{fh_str} {self.name}"
+
+    def describe(self):
+        lat_min, lat_max, lon_min, lon_max = self.bounds
+        target = self.table + (f" ({REGION_ID_COLUMN}={self.region_id})" if self.region_id else '')
+        resample = f" [{self.resample}]" if self.resample else ''
+        return f"{self.name}: {lat_min}°-{lat_max}°N, {lon_min}°-{lon_max}°E -> {target}{resample}"
+
+    def __repr__(self):
+        return f"Region({self.describe()})"
+
+def union_bounds(regions):
+    """Prostokąt obejmujący wszystkie regiony (lat_min, lat_max, lon_min, lon_max)"""
+    bounds = np.array([region.bounds for region in regions])
+    return (float(bounds[:, 0].min()), float(bounds[:, 1].max()), float(bounds[:, 2].min()), float(bounds[:, 3].max()))
+
+def crop_grid(grid, bounds):
+    """
+    Region z tablic prostokąta (wynik _grid_arrays) - widoki numpy, bez kopii.
+    Gdy region pokrywa cały prostokąt, zwracany jest ten sam słownik (z gotowymi kolumnami współrzędnych).
+    """
+    rows, cols = gfs_grib_decode.region_slices(grid['latitudes'], grid['longitudes'], *bounds)
+    latitudes = grid['latitudes'][rows]
+    longitudes = grid['longitudes'][cols]
+    if latitudes.size == grid['latitudes'].size and longitudes.size == grid['longitudes'].size:
+        return grid
+    return {
+        'latitudes': latitudes,
+        'longitudes': longitudes,
+        'lat_column': None,
+        'lon_column': None,
+        'columns': {column: values[rows, cols] for column, values in grid['columns'].items()}
+    }
+
+def _read_bounds(section):
+    return tuple(float(section[key]) for key in ('lat_min', 'lat_max', 'lon_min', 'lon_max'))
+
+def _split_list(value):
+    return [item.strip() for item in (value or '').split(',') if item.strip()]
+
+def load_regions(config_file='config.ini', params_config=None, engine=None):
+    """
+    Regiony z sekcji [region.<nazwa>] (a bez nich - jeden region z [region]) oraz stacje z [points],
+    obszary z [areas] i profile pionowe z [profiles] (gfs_points.PointSet, gfs_areas.AreaSet,
+    gfs_profiles.ProfileSet - dopisane na końcu, a przy only = yes zamiast regionów siatki).
+    Z params_config regiony są od razu przygotowane (prepare): pola pochodne i schemat tabeli.
+    """
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+
+    regions = []
+    for section_name in config.sections():
+        if not section_name.startswith(REGION_SECTION_PREFIX):
+            continue
+        name = section_name[len(REGION_SECTION_PREFIX):].strip()
+        section = config[section_name]
+        try:
+            regions.append(Region(
+                name, _read_bounds(section),
+                table=section.get('table', FORECAST_TABLE).strip() or FORECAST_TABLE,
+                region_id=section.get('region_id', '').strip() or None,
+                parameters=_split_list(section.get('parameters')),
+                resample=gfs_resample.parse_rules(section.get('resample'))
+            ))
+        except (KeyError, ValueError) as e:
+            module_logger.warning(f"Region {name}: niepoprawna konfiguracja ({e}) - region pominięty")
+
+    if not regions:
+        regions = [Region(DEFAULT_REGION, _read_bounds(config['region']),
+                          resample=gfs_resample.parse_rules(config['region'].get('resample')))]
+
+    extra = [target for target in (gfs_points.load_point_set(config_file), gfs_areas.load_area_set(config_file),
+                                   gfs_profiles.load_profile_set(config_file)) if target is not None]
+    if extra:
+        regions = extra if any(target.only for target in extra) else regions + extra
+
+    if params_config is not None:
+        known_columns = {info['db_column'] for info in params_config.values()}
+        for region in regions:
+            unknown = [c for c in getattr(region, 'parameters', None) or () if c not in known_columns]
+            if unknown:
+                module_logger.warning(f"Region {region.name}: kolumny spoza [gfs_parameters] pominięte: {', '.join(unknown)}")
+            region.prepare(params_config, engine, config_file)
+    return regions
+
+def create_accumulators(regions, run_time, params_config, forecast_hours, config_file='config.ini'):
+    """Akumulatory opadów i interpolacja czasowa ([interpolation]) wszystkich regionów dla runu"""
+    for region in regions:
+        region.create_accumulator(run_time, params_config, forecast_hours)
+        region.interpolator = None
+        if not isinstance(region, gfs_profiles.ProfileSet):
+            region.interpolator = gfs_interpolate.create_interpolator(region, run_time, forecast_hours, config_file)
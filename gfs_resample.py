@@ -0,0 +1,218 @@
+"""
+GFS Weather Data Downloader - ZMIANA ROZDZIELCZOŚCI (LŻEJSZE WARSTWY WYJŚCIOWE)
+Nie każdy odbiorca potrzebuje komórek 0.25° (mapy przeglądowe, prognoza długoterminowa f123-f384).
+Po wycięciu regionu siatka może być zmniejszona przed złożeniem tabeli i zapisem:
+- coarsen N - średnia z bloków N x N komórek (N² razy mniej wierszy; brzegowe bloki niepełne),
+- regrid KROK - interpolacja dwuliniowa na regularną siatkę o kroku KROK° (lub KROK_LATxKROK_LON).
+Mapy indeksów (początki bloków, indeksy i wagi sąsiadów) są liczone raz dla siatki regionu -
+każda zmienna to kilka operacji wektorowych numpy.
+
+Reguły dla zakresów godzin prognozy, osobno dla każdego regionu (czyli tabeli docelowej):
+
+    [region.overview]
+    lat_min = 35.0
+    lat_max = 72.0
+    lon_min = -25.0
+    lon_max = 45.0
+    table = gfs_forecast_overview
+    # zakres godzin: operacja; kolejne reguły po ';' (godziny spoza reguł - pełna rozdzielczość)
+    resample = 0-120: coarsen 2; 123-384: regrid 1.0
+
+Opady w oknach (tp_1h, tp_3h) są liczone w pełnej rozdzielczości i dopiero potem zmniejszane
+(obie operacje są liniowe), więc okna przechodzące przez granicę reguł są poprawne.
+"""
+
+import threading
+import logging
+
+import numpy as np
+
+module_logger = logging.getLogger(__name__)
+
+class ResamplePlan:
+    """Mapy indeksów dla konkretnej siatki źródłowej - zastosowanie do tablic 2D i wektorów"""
+
+    def __init__(self, latitudes, longitudes, apply):
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self._apply = apply
+
+    def apply(self, values):
+        return self._apply(np.asarray(values))
+
+    def apply_vector(self, values, shape):
+        """Wektor 1D siatki źródłowej (np. suma opadów) -> wektor 1D siatki docelowej"""
+        return self._apply(np.asarray(values).reshape(shape)).reshape(-1)
+
+    def apply_grid(self, grid):
+        """Siatka regionu (wynik _grid_arrays / crop_grid) w nowej rozdzielczości"""
+        return {
+            'latitudes': self.latitudes,
+            'longitudes': self.longitudes,
+            'lat_column': None,
+            'lon_column': None,
+            'columns': {column: self.apply(values) for column, values in grid['columns'].items()}
+        }
+
+class Resample:
+    """
+    Operacja zmiany rozdzielczości z cache planów dla siatek źródłowych.
+    build - funkcja (latitudes, longitudes) -> ResamplePlan dla siatki źródłowej.
+    """
+
+    def __init__(self, build):
+        self._build = build
+        self._plans = {}
+        self._lock = threading.Lock()
+
+    def plan(self, latitudes, longitudes):
+        key = (latitudes.size, float(latitudes[0]), float(latitudes[-1]),
+               longitudes.size, float(longitudes[0]), float(longitudes[-1]))
+        plan = self._plans.get(key)
+        if plan is None:
+            plan = self._build(np.asarray(latitudes, dtype=np.float64), np.asarray(longitudes, dtype=np.float64))
+            with self._lock:
+                plan = self._plans.setdefault(key, plan)
+        return plan
+
+class Coarsen(Resample):
+    """Średnia z bloków factor x factor komórek (NaN pomijane, niepełne bloki na brzegach)"""
+
+    def __init__(self, factor):
+        super().__init__(self._block_plan)
+        self.factor = int(factor)
+        if self.factor < 1:
+            raise ValueError(f"coarsen: współczynnik musi być >= 1 (jest {factor})")
+
+    def _block_plan(self, latitudes, longitudes):
+        row_starts = np.arange(0, latitudes.size, self.factor)
+        col_starts = np.arange(0, longitudes.size, self.factor)
+        row_counts = np.diff(np.append(row_starts, latitudes.size))
+        col_counts = np.diff(np.append(col_starts, longitudes.size))
+        target_lat = np.add.reduceat(latitudes, row_starts) / row_counts
+        target_lon = np.add.reduceat(longitudes, col_starts) / col_counts
+        block_size = np.outer(row_counts, col_counts)
+
+        def apply(values):
+            values = np.asarray(values, dtype=np.float64)
+            finite = np.isfinite(values)
+            if finite.all():
+                sums = np.add.reduceat(np.add.reduceat(values, row_starts, axis=0), col_starts, axis=1)
+                return sums / block_size
+            sums = np.add.reduceat(np.add.reduceat(np.where(finite, values, 0.0), row_starts, axis=0), col_starts, axis=1)
+            counts = np.add.reduceat(np.add.reduceat(finite.astype(np.float64), row_starts, axis=0), col_starts, axis=1)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return np.where(counts > 0, sums / counts, np.nan)
+
+        return ResamplePlan(target_lat, target_lon, apply)
+
+    def __repr__(self):
+        return f"coarsen {self.factor}"
+
+def _axis_weights(source, target):
+    """Indeksy sąsiadów i wagi interpolacji liniowej wzdłuż jednej osi (źródło rosnące lub malejące)"""
+    positions = np.arange(source.size, dtype=np.float64)
+    if source.size > 1 and source[0] > source[-1]:
+        index = np.interp(target, source[::-1], positions[::-1])
+    else:
+        index = np.interp(target, source, positions)
+    lower = np.clip(np.floor(index).astype(np.int64), 0, max(source.size - 2, 0))
+    upper = np.minimum(lower + 1, source.size - 1)
+    return lower, upper, index - lower
+
+def _target_axis(source, step):
+    """Oś docelowa od pierwszej do ostatniej współrzędnej źródła z krokiem step (kierunek jak w źródle)"""
+    step = abs(step) if source[-1] >= source[0] else -abs(step)
+    count = int(np.floor((source[-1] - source[0]) / step + 1e-9)) + 1
+    return source[0] + step * np.arange(max(count, 1))
+
+def point_sampler(latitudes, longitudes, point_latitudes, point_longitudes):
+    """Interpolacja dwuliniowa tablic 2D siatki (latitudes x longitudes) w dowolnych punktach -> funkcja tablica -> wektor"""
+    i0, i1, wy = _axis_weights(latitudes, np.asarray(point_latitudes, dtype=np.float64))
+    j0, j1, wx = _axis_weights(longitudes, np.asarray(point_longitudes, dtype=np.float64))
+
+    def sample(values):
+        values = np.asarray(values, dtype=np.float64)
+        return ((values[i0, j0] * (1 - wx) + values[i0, j1] * wx) * (1 - wy)
+                + (values[i1, j0] * (1 - wx) + values[i1, j1] * wx) * wy)
+
+    return sample
+
+class Regrid(Resample):
+    """Interpolacja dwuliniowa na regularną siatkę o kroku (lat_step, lon_step) w granicach regionu"""
+
+    def __init__(self, lat_step, lon_step=None):
+        super().__init__(self._bilinear_plan)
+        self.lat_step = float(lat_step)
+        self.lon_step = float(lon_step if lon_step is not None else lat_step)
+        if self.lat_step <= 0 or self.lon_step <= 0:
+            raise ValueError(f"regrid: krok musi być dodatni ({lat_step}, {lon_step})")
+
+    def _bilinear_plan(self, latitudes, longitudes):
+        target_lat = _target_axis(latitudes, self.lat_step)
+        target_lon = _target_axis(longitudes, self.lon_step)
+        i0, i1, wy = _axis_weights(latitudes, target_lat)
+        j0, j1, wx = _axis_weights(longitudes, target_lon)
+        wy = wy[:, None]
+
+        def apply(values):
+            values = np.asarray(values, dtype=np.float64)
+            rows = values[i0] * (1 - wy) + values[i1] * wy
+            return rows[:, j0] * (1 - wx) + rows[:, j1] * wx
+
+        return ResamplePlan(target_lat, target_lon, apply)
+
+    def __repr__(self):
+        return f"regrid {self.lat_step}x{self.lon_step}"
+
+def parse_operation(text):
+    """'none' / 'coarsen N' / 'regrid KROK' / 'regrid KROK_LATxKROK_LON' -> Resample lub None"""
+    parts = text.split()
+    if not parts or parts[0].lower() == 'none':
+        return None
+    name = parts[0].lower()
+    if name == 'coarsen' and len(parts) == 2:
+        return Coarsen(int(parts[1]))
+    if name == 'regrid' and len(parts) == 2:
+        return Regrid(*(float(step) for step in parts[1].lower().split('x', 1)))
+    raise ValueError(f"Nieznana operacja zmiany rozdzielczości '{text}' (none, coarsen N, regrid KROK)")
+
+def _parse_hours(text):
+    """'123-384' / '123-' / '-120' / '6' / 'all' -> (od, do)"""
+    text = text.strip().lower()
+    if text in ('', 'all', '*'):
+        return 0, None
+    if '-' not in text:
+        return int(text), int(text)
+    start, end = text.split('-', 1)
+    return int(start) if start.strip() else 0, int(end) if end.strip() else None
+
+class ResampleRules:
+    """Reguły regionu: [(od, do, Resample lub None)] - pierwsza pasująca do godziny prognozy"""
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+
+    def for_hour(self, forecast_hour):
+        for start, end, operation in self.rules:
+            if forecast_hour >= start and (end is None or forecast_hour <= end):
+                return operation
+        return None
+
+    def __bool__(self):
+        return any(operation is not None for _, _, operation in self.rules)
+
+    def __repr__(self):
+        return '; '.join(f"{start}-{'' if end is None else end}: {operation or 'none'}" for start, end, operation in self.rules)
+
+def parse_rules(value):
+    """Reguły z wartości klucza resample: 'zakres: operacja; zakres: operacja' (samo 'operacja' = wszystkie godziny)"""
+    rules = []
+    for item in (value or '').split(';'):
+        item = item.strip()
+        if not item:
+            continue
+        hours, _, operation = item.rpartition(':')
+        start, end = _parse_hours(hours)
+        rules.append((start, end, parse_operation(operation.strip())))
+    return ResampleRules(rules)
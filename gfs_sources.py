@@ -0,0 +1,590 @@
+"""
+GFS Weather Data Downloader - ŹRÓDŁA DANYCH
+Wspólna warstwa dostępu do plików GFS (zamiast adresów NOMADS wpisanych na sztywno w kodzie)
+
+Dostępne źródła:
+- nomads_filter - NOMADS GRIB Filter CGI (filtrowanie na serwerze, limit 120 zapytań/min)
+- nomads_raw    - pełne pliki z NOMADS (/pub/data/nccf/com/gfs/prod)
+- bucket        - otwarte dane NOAA w S3 (ten sam układ kluczy, pobieranie fragmentów przez Range + .idx)
+- local         - lokalny katalog z tym samym układem kluczy (testy, mirror, archiwum)
+
+Źródła można łączyć w łańcuch (SourceChain) - jeśli pierwsze zawiedzie, próbowane jest następne.
+"""
+
+import os
+import re
+import abc
+import shutil
+import threading
+import time
+import logging
+import configparser
+from collections import deque
+from urllib.parse import urlencode
+
+import requests
+
+module_logger = logging.getLogger(__name__)
+
+# Układ kluczy jest identyczny na NOMADS, w buckecie S3 i w lokalnym mirrorze
+GFS_KEY_TEMPLATE = 'gfs.{date_str}/{hour_str}/atmos/gfs.t{hour_str}z.pgrb2.{resolution}.f{forecast_hour:03d}'
+
+# Uwaga: filter_gfs.pl (nie filter_gfs_0p25.pl) - rozdzielczość jest w nazwie pliku
+NOMADS_FILTER_URL = 'https://nomads.ncep.noaa.gov/cgi-bin/filter_gfs.pl'
+NOMADS_RAW_URL = 'https://nomads.ncep.noaa.gov/pub/data/nccf/com/gfs/prod'
+NCEP_FTP_RAW_URL = 'https://ftp.ncep.noaa.gov/pub/data/nccf/com/gfs/prod'
+BUCKET_URL = 'https://noaa-gfs-bdp-pds.s3.amazonaws.com'
+
+DEFAULT_SOURCE_ORDER = ['nomads_filter', 'nomads_raw']
+
+# Margines wycinka po stronie serwera (stopnie) - krawędzie regionów zostają w pliku niezależnie od zaokrągleń
+SUBREGION_MARGIN = 0.5
+
+def gfs_file_key(date_str, hour_str, forecast_hour, resolution='0p25'):
+    """Zwraca klucz (ścieżkę względną) pliku GFS, np. gfs.20251120/12/atmos/gfs.t12z.pgrb2.0p25.f003"""
+    return GFS_KEY_TEMPLATE.format(date_str=date_str, hour_str=hour_str,
+                                   forecast_hour=int(forecast_hour), resolution=resolution)
+
+# === RATE LIMITING ===
+
+class RateLimiter:
+    """
+    Limit zapytań w oknie czasowym (domyślnie 120 zapytań/minutę jak na NOMADS).
+    Thread-safe.
+    """
+    def __init__(self, max_requests=120, period=60, min_interval=0.5):
+        self.max_requests = max_requests
+        self.period = period
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._timestamps = deque(maxlen=max_requests)
+
+    def wait(self):
+        with self._lock:
+            now = time.time()
+
+            # Usuń stare timestampy (starsze niż okno)
+            while self._timestamps and (now - self._timestamps[0]) > self.period:
+                self._timestamps.popleft()
+
+            # Jeśli limit jest wyczerpany, poczekaj na zwolnienie najstarszego miejsca
+            if len(self._timestamps) >= self.max_requests:
+                wait_time = self.period - (now - self._timestamps[0]) + 0.1
+                if wait_time > 0:
+                    module_logger.debug(f"Rate limit: czekam {wait_time:.2f}s ({self.max_requests} zapytań/{self.period}s)")
+                    time.sleep(wait_time)
+                    now = time.time()
+                    while self._timestamps and (now - self._timestamps[0]) > self.period:
+                        self._timestamps.popleft()
+
+            self._timestamps.append(time.time())
+
+            # Minimalne opóźnienie między zapytaniami
+            if self.min_interval:
+                time.sleep(self.min_interval)
+
+# Wspólny limiter dla wszystkich zapytań do NOMADS (filter i raw to ten sam serwer)
+NOMADS_RATE_LIMITER = RateLimiter(max_requests=120, period=60, min_interval=0.5)
+
+# === PLIKI .idx ===
+
+def idx_level_from_key(level_key):
+    """Zamienia klucz poziomu NOMADS (lev_2_m_above_ground) na opis poziomu z .idx (2 m above ground)"""
+    name = level_key[4:] if level_key.startswith('lev_') else level_key
+    return name.replace('_', ' ')
+
+def parse_idx(idx_text):
+    """
+    Parsuje plik .idx (inwentarz GRIB) do listy słowników:
+    {'num', 'start', 'end', 'var', 'level', 'forecast'}.
+    'end' jest ostatnim bajtem włącznie (None dla ostatniej wiadomości = do końca pliku).
+    """
+    entries = []
+    for line in idx_text.splitlines():
+        parts = line.strip().split(':')
+        if len(parts) < 6:
+            continue
+        try:
+            entries.append({
+                'num': parts[0],
+                'start': int(parts[1]),
+                'end': None,
+                'var': parts[3],
+                'level': parts[4],
+                'forecast': parts[5],
+            })
+        except ValueError:
+            continue
+
+    # Koniec wiadomości = początek następnej (inna wiadomość o tym samym offsecie to podwiadomość, np. 1.1/1.2)
+    starts = sorted({e['start'] for e in entries})
+    next_start = {s: starts[i + 1] for i, s in enumerate(starts[:-1])}
+    for entry in entries:
+        if entry['start'] in next_start:
+            entry['end'] = next_start[entry['start']] - 1
+    return entries
+
+def idx_entry_matches(entry, plan):
+    """Sprawdza czy wpis .idx pasuje do planu pobierania (zbiór par (zmienna NOMADS, klucz poziomu))"""
+    for nomads_var, level_key in plan:
+        if entry['var'] != nomads_var:
+            continue
+        # "entire atmosphere" pasuje też do "entire atmosphere (considered as a single layer)"
+        if entry['level'].startswith(idx_level_from_key(level_key)):
+            return True
+    return False
+
+def select_idx_ranges(entries, plan):
+    """
+    Wybiera zakresy bajtów wiadomości pasujących do planu.
+    Sąsiadujące zakresy są łączone, żeby ograniczyć liczbę zapytań Range.
+    Zwraca listę (start, end) - end włącznie lub None (do końca pliku).
+    """
+    ranges = []
+    seen = set()
+    for entry in sorted(entries, key=lambda e: e['start']):
+        if entry['start'] in seen or not idx_entry_matches(entry, plan):
+            continue
+        seen.add(entry['start'])
+        start, end = entry['start'], entry['end']
+        if ranges and ranges[-1][1] is not None and ranges[-1][1] + 1 == start:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+    return ranges
+
+# === ŹRÓDŁA ===
+
+class GfsSource(abc.ABC):
+    """
+    Bazowa klasa źródła danych GFS - podklasy implementują is_available() i fetch().
+    fetch() zapisuje plik GRIB do output_path i zwraca (success, file_size_bytes).
+    plan - zbiór par (zmienna NOMADS, klucz poziomu), np. {('TMP', 'lev_2_m_above_ground')};
+    None oznacza cały plik.
+    """
+    name = 'base'
+
+    def __init__(self, resolution='0p25'):
+        self.resolution = resolution
+
+    def key_for(self, date_str, hour_str, forecast_hour):
+        return gfs_file_key(date_str, hour_str, forecast_hour, self.resolution)
+
+    @property
+    def availability_key(self):
+        """Identyfikator miejsca sprawdzania dostępności (źródła o tym samym kluczu nie są pytane dwa razy)"""
+        return self.name
+
+    @abc.abstractmethod
+    def is_available(self, date_str, hour_str, forecast_hour, verbose=False):
+        """Czy plik prognozy jest dostępny w źródle"""
+
+    def fetch_index(self, date_str, hour_str, forecast_hour):
+        """Zwraca treść pliku .idx lub None"""
+        return None
+
+    def cached_index(self, date_str, hour_str, forecast_hour):
+        """Treść pliku .idx, jeśli jest już dostępna bez zapytania do serwera (np. po pobraniu przez Range); inaczej None"""
+        return None
+
+    @abc.abstractmethod
+    def fetch(self, date_str, hour_str, forecast_hour, output_path, plan=None, fh_str=None):
+        """Zapisuje plik GRIB (lub wycinek wg planu) do output_path; zwraca (success, file_size_bytes)"""
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} {self.name}>"
+
+class _HttpSource(GfsSource):
+    """Wspólna obsługa HTTP: rate limiting, HTTP 429, strumieniowy zapis, zapytania Range"""
+
+    def __init__(self, base_urls, resolution='0p25', rate_limiter=None, timeout=300, check_timeout=10):
+        super().__init__(resolution)
+        if isinstance(base_urls, str):
+            base_urls = [base_urls]
+        self.base_urls = [u.rstrip('/') for u in base_urls]
+        self.rate_limiter = rate_limiter
+        self.timeout = timeout
+        self.check_timeout = check_timeout
+        # Pliki .idx są potrzebne kilka razy (zapytania Range, weryfikacja) - trzymamy ostatnie w pamięci
+        self._idx_cache = {}
+        self._idx_cache_lock = threading.Lock()
+
+    @property
+    def availability_key(self):
+        return tuple(self.base_urls)
+
+    def url_for(self, date_str, hour_str, forecast_hour, base_url=None):
+        return f"{base_url or self.base_urls[0]}/{self.key_for(date_str, hour_str, forecast_hour)}"
+
+    def _wait(self):
+        if self.rate_limiter is not None:
+            self.rate_limiter.wait()
+
+    def _request(self, method, url, **kwargs):
+        """Wykonuje zapytanie z rate limitingiem; przy HTTP 429 czeka Retry-After i ponawia raz"""
+        self._wait()
+        response = requests.request(method, url, **kwargs)
+        if response.status_code == 429:
+            retry_after = int(response.headers.get('Retry-After', 60))
+            module_logger.warning(f"[{self.name}] HTTP 429 - czekam {retry_after}s")
+            response.close()
+            time.sleep(retry_after)
+            self._wait()
+            response = requests.request(method, url, **kwargs)
+        return response
+
+    def _url_exists(self, url):
+        try:
+            response = self._request('HEAD', url, timeout=self.check_timeout, allow_redirects=True)
+            if response.status_code in (403, 405):
+                # Niektóre serwery nie obsługują HEAD poprawnie - sprawdź przez GET (tylko nagłówki)
+                response = self._request('GET', url, timeout=self.check_timeout, stream=True)
+                response.close()
+            if response.status_code != 200:
+                return False
+            # Strona błędu jako HTML to nie jest plik
+            return 'text/html' not in response.headers.get('content-type', '').lower()
+        except requests.exceptions.RequestException as e:
+            module_logger.debug(f"[{self.name}] Błąd sprawdzania {url}: {e}")
+            return False
+
+    def is_available(self, date_str, hour_str, forecast_hour, verbose=False):
+        # Najpierw plik .idx (mały i publikowany razem z plikiem GRIB), potem sam plik
+        for base_url in self.base_urls:
+            url = self.url_for(date_str, hour_str, forecast_hour, base_url)
+            if self._url_exists(f"{url}.idx") or self._url_exists(url):
+                if verbose:
+                    module_logger.debug(f"✓ Dane dostępne (f{forecast_hour:03d}) na {base_url}")
+                return True
+        return False
+
+    def fetch_index(self, date_str, hour_str, forecast_hour):
+        cache_key = (date_str, hour_str, int(forecast_hour))
+        with self._idx_cache_lock:
+            if cache_key in self._idx_cache:
+                return self._idx_cache[cache_key]
+
+        for base_url in self.base_urls:
+            url = f"{self.url_for(date_str, hour_str, forecast_hour, base_url)}.idx"
+            try:
+                response = self._request('GET', url, timeout=self.check_timeout)
+                if response.status_code == 200:
+                    with self._idx_cache_lock:
+                        if len(self._idx_cache) >= 512:
+                            self._idx_cache.pop(next(iter(self._idx_cache)))
+                        self._idx_cache[cache_key] = response.text
+                    return response.text
+            except requests.exceptions.RequestException as e:
+                module_logger.debug(f"[{self.name}] Błąd pobierania .idx {url}: {e}")
+        return None
+
+    def cached_index(self, date_str, hour_str, forecast_hour):
+        with self._idx_cache_lock:
+            return self._idx_cache.get((date_str, hour_str, int(forecast_hour)))
+
+    def _stream_to_file(self, response, f):
+        size = 0
+        for chunk in response.iter_content(chunk_size=1024 * 1024):
+            if chunk:
+                f.write(chunk)
+                size += len(chunk)
+        return size
+
+    def download_url(self, url, output_path, fh_str='?'):
+        """Pobiera cały plik spod adresu URL. Zwraca (success, file_size_bytes)."""
+        try:
+            response = self._request('GET', url, timeout=self.timeout, stream=True)
+        except requests.exceptions.RequestException as e:
+            module_logger.warning(f"[{fh_str}] [{self.name}] Błąd pobierania: {e}")
+            return False, 0
+
+        try:
+            if response.status_code != 200:
+                module_logger.info(f"[{fh_str}] [{self.name}] HTTP {response.status_code}")
+                return False, 0
+            if 'text/html' in response.headers.get('content-type', '').lower():
+                module_logger.info(f"[{fh_str}] [{self.name}] Serwer zwrócił stronę HTML zamiast pliku")
+                return False, 0
+            with open(output_path, 'wb') as f:
+                size = self._stream_to_file(response, f)
+            return True, size
+        except requests.exceptions.RequestException as e:
+            module_logger.warning(f"[{fh_str}] [{self.name}] Przerwane pobieranie: {e}")
+            return False, 0
+        finally:
+            response.close()
+
+    def download_ranges(self, url, ranges, output_path, fh_str='?'):
+        """
+        Pobiera wybrane zakresy bajtów (Range) i skleja je w jeden plik GRIB.
+        Zwraca (success, file_size_bytes).
+        """
+        size = 0
+        with open(output_path, 'wb') as f:
+            for start, end in ranges:
+                byte_range = f"bytes={start}-{'' if end is None else end}"
+                try:
+                    response = self._request('GET', url, timeout=self.timeout, stream=True,
+                                             headers={'Range': byte_range})
+                except requests.exceptions.RequestException as e:
+                    module_logger.warning(f"[{fh_str}] [{self.name}] Błąd zapytania Range {byte_range}: {e}")
+                    return False, 0
+                try:
+                    if response.status_code == 200:
+                        # Serwer zignorował Range - to jest cały plik, zapisz go i zakończ
+                        f.seek(0)
+                        f.truncate()
+                        return True, self._stream_to_file(response, f)
+                    if response.status_code != 206:
+                        module_logger.info(f"[{fh_str}] [{self.name}] HTTP {response.status_code} dla Range {byte_range}")
+                        return False, 0
+                    size += self._stream_to_file(response, f)
+                finally:
+                    response.close()
+        return True, size
+
+    def fetch(self, date_str, hour_str, forecast_hour, output_path, plan=None, fh_str=None):
+        fh_str = fh_str or f"f{forecast_hour:03d}"
+        for base_url in self.base_urls:
+            url = self.url_for(date_str, hour_str, forecast_hour, base_url)
+            success, size = self.download_url(url, output_path, fh_str)
+            if success:
+                return True, size
+        return False, 0
+
+class NomadsFilterSource(_HttpSource):
+    """NOMADS GRIB Filter CGI - serwer wycina wybrane zmienne i poziomy"""
+    name = 'nomads_filter'
+
+    def __init__(self, filter_url=NOMADS_FILTER_URL, raw_url=NOMADS_RAW_URL, resolution='0p25',
+                 rate_limiter=NOMADS_RATE_LIMITER, timeout=300, subregion=None):
+        """subregion - (lat_min, lat_max, lon_min, lon_max) wycinany przez serwer; None = cały glob"""
+        # Dostępność sprawdzamy na surowych plikach - Filter API potrafi zwracać 404 dla istniejących plików
+        super().__init__(raw_url, resolution, rate_limiter, timeout)
+        self.filter_url = filter_url
+        self.subregion = subregion
+
+    def build_url(self, date_str, hour_str, forecast_hour, plan):
+        """Buduje URL Filter API; NOMADS wymaga osobnych parametrów var_ i lev_"""
+        params = {
+            'file': f'gfs.t{hour_str}z.pgrb2.{self.resolution}.f{forecast_hour:03d}',
+            'dir': f'/gfs.{date_str}/{hour_str}/atmos',
+        }
+        for nomads_var, level_key in sorted(plan or ()):
+            params[f'var_{nomads_var}'] = 'on'
+            params[level_key] = 'on'
+        if self.subregion is not None:
+            lat_min, lat_max, lon_min, lon_max = self.subregion
+            params.update({
+                'subregion': '',
+                'toplat': min(lat_max + SUBREGION_MARGIN, 90), 'bottomlat': max(lat_min - SUBREGION_MARGIN, -90),
+                'leftlon': lon_min - SUBREGION_MARGIN, 'rightlon': lon_max + SUBREGION_MARGIN,
+            })
+        return f"{self.filter_url}?{urlencode(params)}"
+
+    def fetch(self, date_str, hour_str, forecast_hour, output_path, plan=None, fh_str=None):
+        fh_str = fh_str or f"f{forecast_hour:03d}"
+        if not plan:
+            # Bez planu filtr nie ma sensu - pobierz cały plik
+            return super().fetch(date_str, hour_str, forecast_hour, output_path, plan, fh_str)
+        return self.download_url(self.build_url(date_str, hour_str, forecast_hour, plan), output_path, fh_str)
+
+class NomadsRawSource(_HttpSource):
+    """Pełne pliki GRIB z NOMADS (opcjonalnie z kolejnymi serwerami, np. ftp.ncep.noaa.gov)"""
+    name = 'nomads_raw'
+
+    def __init__(self, base_urls=(NOMADS_RAW_URL,), resolution='0p25', rate_limiter=NOMADS_RATE_LIMITER, timeout=300):
+        super().__init__(list(base_urls), resolution, rate_limiter, timeout)
+
+class BucketSource(_HttpSource):
+    """
+    Bucket S3 z otwartymi danymi NOAA (lub lokalny zamiennik zgodny z S3, np. MinIO).
+    Ten sam układ kluczy co NOMADS; z planem pobiera tylko potrzebne wiadomości przez Range + .idx.
+    Brak limitu CGI.
+    """
+    name = 'bucket'
+
+    def __init__(self, base_url=BUCKET_URL, resolution='0p25', rate_limiter=None, timeout=300):
+        super().__init__(base_url, resolution, rate_limiter, timeout)
+
+    def fetch(self, date_str, hour_str, forecast_hour, output_path, plan=None, fh_str=None):
+        fh_str = fh_str or f"f{forecast_hour:03d}"
+        url = self.url_for(date_str, hour_str, forecast_hour)
+        if plan:
+            idx_text = self.fetch_index(date_str, hour_str, forecast_hour)
+            if idx_text:
+                ranges = select_idx_ranges(parse_idx(idx_text), plan)
+                if not ranges:
+                    module_logger.warning(f"[{fh_str}] [{self.name}] Żadna wiadomość z .idx nie pasuje do planu")
+                    return False, 0
+                return self.download_ranges(url, ranges, output_path, fh_str)
+            module_logger.info(f"[{fh_str}] [{self.name}] Brak pliku .idx - pobieram cały plik")
+        return self.download_url(url, output_path, fh_str)
+
+class LocalDirSource(GfsSource):
+    """Lokalny katalog z układem kluczy jak w buckecie (gfs.YYYYMMDD/HH/atmos/...)"""
+    name = 'local'
+
+    def __init__(self, root_dir, resolution='0p25'):
+        super().__init__(resolution)
+        self.root_dir = root_dir
+
+    @property
+    def availability_key(self):
+        return os.path.abspath(self.root_dir)
+
+    def path_for(self, date_str, hour_str, forecast_hour):
+        return os.path.join(self.root_dir, *self.key_for(date_str, hour_str, forecast_hour).split('/'))
+
+    def is_available(self, date_str, hour_str, forecast_hour, verbose=False):
+        return os.path.exists(self.path_for(date_str, hour_str, forecast_hour))
+
+    def fetch_index(self, date_str, hour_str, forecast_hour):
+        idx_path = self.path_for(date_str, hour_str, forecast_hour) + '.idx'
+        if not os.path.exists(idx_path):
+            return None
+        with open(idx_path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def cached_index(self, date_str, hour_str, forecast_hour):
+        return self.fetch_index(date_str, hour_str, forecast_hour)  # Plik lokalny - bez zapytań sieciowych
+
+    def fetch(self, date_str, hour_str, forecast_hour, output_path, plan=None, fh_str=None):
+        src_path = self.path_for(date_str, hour_str, forecast_hour)
+        if not os.path.exists(src_path):
+            return False, 0
+
+        idx_text = self.fetch_index(date_str, hour_str, forecast_hour) if plan else None
+        if not idx_text:
+            shutil.copyfile(src_path, output_path)
+            return True, os.path.getsize(output_path)
+
+        ranges = select_idx_ranges(parse_idx(idx_text), plan)
+        if not ranges:
+            return False, 0
+        size = 0
+        with open(src_path, 'rb') as src, open(output_path, 'wb') as dst:
+            for start, end in ranges:
+                src.seek(start)
+                data = src.read() if end is None else src.read(end - start + 1)
+                dst.write(data)
+                size += len(data)
+        return True, size
+
+class SourceChain(GfsSource):
+    """Łańcuch źródeł z przełączaniem awaryjnym - próbuje kolejnych źródeł aż któreś zadziała"""
+    name = 'chain'
+
+    def __init__(self, sources):
+        super().__init__(sources[0].resolution if sources else '0p25')
+        self.sources = list(sources)
+
+    def is_available(self, date_str, hour_str, forecast_hour, verbose=False):
+        checked = set()
+        for source in self.sources:
+            if source.availability_key in checked:
+                continue
+            checked.add(source.availability_key)
+            if source.is_available(date_str, hour_str, forecast_hour, verbose):
+                return True
+        return False
+
+    def fetch_index(self, date_str, hour_str, forecast_hour):
+        for source in self.sources:
+            idx_text = source.fetch_index(date_str, hour_str, forecast_hour)
+            if idx_text:
+                return idx_text
+        return None
+
+    def cached_index(self, date_str, hour_str, forecast_hour):
+        for source in self.sources:
+            idx_text = source.cached_index(date_str, hour_str, forecast_hour)
+            if idx_text:
+                return idx_text
+        return None
+
+    def fetch(self, date_str, hour_str, forecast_hour, output_path, plan=None, fh_str=None):
+        fh_str = fh_str or f"f{forecast_hour:03d}"
+        for i, source in enumerate(self.sources):
+            try:
+                success, size = source.fetch(date_str, hour_str, forecast_hour, output_path, plan, fh_str)
+            except Exception as e:
+                module_logger.warning(f"[{fh_str}] Źródło {source.name} zgłosiło błąd: {e}")
+                success, size = False, 0
+            if success:
+                if i > 0:
+                    module_logger.info(f"[{fh_str}] Pobrano ze źródła zapasowego: {source.name}")
+                return True, size
+            module_logger.info(f"[{fh_str}] Źródło {source.name} nie zadziałało")
+        return False, 0
+
+    def __repr__(self):
+        return f"<SourceChain {' -> '.join(s.name for s in self.sources)}>"
+
+def create_source(name, options=None, resolution='0p25', subregion=None):
+    """
+    Tworzy źródło po nazwie (nomads_filter, nomads_raw, bucket, local).
+    subregion - prostokąt wycinany po stronie serwera (tylko nomads_filter, gdy [source] subregion = yes).
+    """
+    options = options or {}
+    if name == 'nomads_filter':
+        use_subregion = str(options.get('subregion', 'no')).strip().lower() in ('yes', 'true', '1', 'on')
+        return NomadsFilterSource(filter_url=options.get('nomads_filter_url', NOMADS_FILTER_URL),
+                                  raw_url=options.get('nomads_raw_url', NOMADS_RAW_URL),
+                                  resolution=resolution,
+                                  subregion=subregion if use_subregion else None)
+    if name == 'nomads_raw':
+        return NomadsRawSource(base_urls=[options.get('nomads_raw_url', NOMADS_RAW_URL)], resolution=resolution)
+    if name == 'ncep_ftp':
+        return NomadsRawSource(base_urls=[options.get('ncep_ftp_url', NCEP_FTP_RAW_URL)], resolution=resolution)
+    if name == 'bucket':
+        return BucketSource(base_url=options.get('bucket_url', BUCKET_URL), resolution=resolution)
+    if name == 'local':
+        return LocalDirSource(options.get('local_dir', 'gfs_mirror'), resolution=resolution)
+    raise ValueError(f"Nieznane źródło danych: {name}")
+
+def load_source_chain(config_file='config.ini', order=None, resolution='0p25', subregion=None):
+    """
+    Buduje łańcuch źródeł z sekcji [source] w config.ini.
+    order (lista nazw lub string "bucket, nomads_filter") nadpisuje kolejność z konfiguracji -
+    w ten sposób można wybrać źródło dla pojedynczego uruchomienia.
+    subregion - prostokąt obejmujący wszystkie regiony (gfs_regions.union_bounds) dla wycinka po stronie serwera.
+    """
+    options = {}
+    try:
+        config = configparser.ConfigParser()
+        config.read(config_file, encoding='utf-8')
+        if 'source' in config:
+            options = dict(config['source'])
+    except Exception as e:
+        module_logger.warning(f"Nie udało się wczytać sekcji [source] z {config_file}: {e}")
+
+    if order is None:
+        order = options.get('order') or DEFAULT_SOURCE_ORDER
+    if isinstance(order, str):
+        order = [name.strip() for name in order.split(',') if name.strip()]
+
+    sources = []
+    for name in order:
+        try:
+            sources.append(create_source(name, options, resolution, subregion))
+        except ValueError as e:
+            module_logger.warning(str(e))
+    if not sources:
+        sources = [create_source(name, options, resolution, subregion) for name in DEFAULT_SOURCE_ORDER]
+    return SourceChain(sources)
+
+def parse_run_from_url(url):
+    """Wyciąga (date_str, hour_str) z adresu NOMADS (Filter API lub bezpośredniego); (None, None) jeśli się nie da"""
+    from urllib.parse import urlparse, parse_qs, unquote
+    parsed = urlparse(url)
+    query_params = parse_qs(parsed.query)
+    candidates = []
+    if 'dir' in query_params:
+        candidates.append(unquote(query_params['dir'][0]))
+    candidates.append(url)
+    for candidate in candidates:
+        match = re.search(r'/gfs\.(\d{8})/(\d{2})/atmos', candidate)
+        if match:
+            return match.group(1), match.group(2)
+    return None, None
@@ -0,0 +1,287 @@
+"""
+GFS Weather Data Downloader - MAGAZYN PLIKÓW TYMCZASOWYCH GRIB (STAGING)
+Pobrany plik jest czytany kilka razy (weryfikacja ramek, dekodowanie, ewentualnie cfgrib), a katalog
+roboczy bywa dyskiem sieciowym. Pliki tymczasowe trafiają więc najpierw do pamięci RAM (tmpfs,
+domyślnie /dev/shm) z limitem rozmiaru, a po jego przekroczeniu - na dysk:
+- rezerwacja miejsca w RAM przy rozpoczęciu pobierania (szacunek: największy dotychczasowy plik),
+  po pobraniu rozliczenie rzeczywistego rozmiaru - plik ponad limit jest przenoszony na dysk,
+- nazwy zawierają run, godzinę prognozy, hosta i PID (dwa runy ani dwa procesy nie kolidują),
+- sprzątanie: StagedFile jako context manager usuwa plik (i indeksy cfgrib obok) także przy wyjątku,
+  atexit usuwa pliki procesu przy wyjściu, a sweep() przy starcie - pliki procesów, które padły
+  (PID nie istnieje na tym hoście albo plik starszy niż ORPHAN_AGE).
+Czytelnicy dostają plik przez map_file() - mmap tylko do odczytu zamiast kolejnych open/seek/read.
+
+    [staging]
+    ram_dir = /dev/shm/gfs_staging
+    # Limit plików w RAM (MB); 0 = tylko dysk
+    ram_budget_mb = 1024
+    # Katalog na dysku (przepełnienie / brak tmpfs); domyślnie katalog tymczasowy programu
+    # disk_dir = temp_grib_filtered
+"""
+
+import os
+import mmap
+import glob
+import time
+import shutil
+import atexit
+import socket
+import weakref
+import logging
+import threading
+import contextlib
+import configparser
+
+module_logger = logging.getLogger(__name__)
+
+DEFAULT_RAM_DIR = '/dev/shm/gfs_staging'
+DEFAULT_RAM_BUDGET_MB = 1024
+# Szacunek rozmiaru pliku zanim cokolwiek zostało pobrane (pełny plik 0.25° ma ~500 MB)
+DEFAULT_EXPECTED_SIZE = 64 * 1024 * 1024
+# Pliki, których właściciela nie da się sprawdzić (inny host, Windows), są usuwane po tym czasie
+ORPHAN_AGE = 6 * 3600
+
+FILE_PREFIX = 'gfs_'
+FILE_SUFFIX = '.grb2'
+
+# Magazyny procesu - pliki wszystkich są usuwane przy wyjściu (daemon tworzy magazyn na każdy run)
+_STORES = weakref.WeakSet()
+
+@atexit.register
+def _cleanup_stores():
+    for store in list(_STORES):
+        store.cleanup()
+
+def _host():
+    return socket.gethostname().split('.')[0].replace('_', '-') or 'host'
+
+def _pid_alive(pid):
+    """Czy proces o danym PID istnieje; None gdy nie da się sprawdzić (Windows - os.kill(pid, 0) wysyła CTRL_C)"""
+    if os.name == 'nt':
+        return None
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return None
+    return True
+
+def remove_staged(path):
+    """Usuwa plik razem z plikami pomocniczymi obok (indeksy cfgrib '<plik>.*.cfgrib.idx')"""
+    for candidate in [path] + glob.glob(glob.escape(path) + '.*'):
+        try:
+            os.remove(candidate)
+        except OSError:
+            pass
+
+@contextlib.contextmanager
+def map_file(path):
+    """
+    Plik jako mmap tylko do odczytu (obsługuje read/seek/tell, find i wycinki jak plik w pamięci).
+    Pusty plik - b'' (mmap nie obsługuje plików o rozmiarze 0).
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b''
+            return
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        yield mapped
+    finally:
+        try:
+            mapped.close()
+        except BufferError:
+            pass  # Widok na bufor jeszcze żyje (wyjątek w trakcie) - mmap zamknie GC
+
+class StagedFile:
+    """Plik tymczasowy jednej godziny prognozy - ścieżka do pobrania, usuwany przy wyjściu z bloku with"""
+
+    def __init__(self, store, path, in_ram, reserved):
+        self.store = store
+        self.path = path
+        self.in_ram = in_ram
+        self.reserved = reserved
+
+    def settle(self):
+        """
+        Po pobraniu: rozlicza rzeczywisty rozmiar pliku w limicie RAM. Plik, który się nie mieści,
+        jest przenoszony na dysk (ścieżka się zmienia - używać self.path po wywołaniu).
+        """
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        self.store._settle(self, size)
+        return self.path
+
+    def release(self):
+        self.store._release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+    def __repr__(self):
+        return f"StagedFile({self.path!r}, {'RAM' if self.in_ram else 'dysk'})"
+
+class StagingStore:
+    """Pliki tymczasowe GRIB w RAM (tmpfs) z limitem rozmiaru i przepełnieniem na dysk"""
+
+    def __init__(self, disk_dir, ram_dir=DEFAULT_RAM_DIR, ram_budget=DEFAULT_RAM_BUDGET_MB * 1024 * 1024,
+                 expected_size=DEFAULT_EXPECTED_SIZE):
+        self.disk_dir = disk_dir
+        self.ram_dir = ram_dir if ram_budget > 0 else None
+        self.ram_budget = ram_budget if self.ram_dir else 0
+        self.expected_size = expected_size
+        self.owner = f"{_host()}.{os.getpid()}"
+        self._lock = threading.Lock()
+        self._ram_used = 0
+        self._active = {}
+        self.staged_ram = 0
+        self.staged_disk = 0
+        self.overflowed = 0
+
+        os.makedirs(disk_dir, exist_ok=True)
+        if self.ram_dir:
+            try:
+                # Sam tmpfs (np. /dev/shm) musi istnieć - nie tworzymy go na dysku (Windows)
+                if not os.path.isdir(os.path.dirname(os.path.abspath(self.ram_dir))):
+                    raise OSError(f"brak katalogu {os.path.dirname(self.ram_dir)}")
+                os.makedirs(self.ram_dir, exist_ok=True)
+                if not os.access(self.ram_dir, os.W_OK):
+                    raise OSError(f"brak prawa zapisu do {self.ram_dir}")
+            except OSError as e:
+                module_logger.warning(f"Staging w RAM niedostępny ({e}) - pliki tymczasowe na dysku ({disk_dir})")
+                self.ram_dir = None
+                self.ram_budget = 0
+        _STORES.add(self)
+
+    def _name(self, run, forecast_hour, kind):
+        return f"{FILE_PREFIX}{run}_f{forecast_hour:03d}_{kind}.{self.owner}{FILE_SUFFIX}"
+
+    def _ram_fits(self, size):
+        """Czy plik o rozmiarze size zmieści się w limicie i w wolnym miejscu tmpfs (wywołanie pod blokadą)"""
+        if not self.ram_dir or self._ram_used + size > self.ram_budget:
+            return False
+        try:
+            return shutil.disk_usage(self.ram_dir).free > size
+        except OSError:
+            return False
+
+    def stage(self, run, forecast_hour, kind='filtered'):
+        """
+        Rezerwuje plik tymczasowy dla godziny prognozy runu (run - np. '2025112012').
+        Zwraca StagedFile: path - gdzie pobrać plik; po pobraniu settle(); usuwany przy wyjściu z with.
+        """
+        name = self._name(run, forecast_hour, kind)
+        with self._lock:
+            estimate = self.expected_size
+            in_ram = self._ram_fits(estimate)
+            if in_ram:
+                self._ram_used += estimate
+                self.staged_ram += 1
+            else:
+                self.staged_disk += 1
+            staged = StagedFile(self, os.path.join(self.ram_dir if in_ram else self.disk_dir, name),
+                                in_ram, estimate if in_ram else 0)
+            self._active[id(staged)] = staged
+        # Pozostałość po poprzedniej próbie tej samej godziny
+        remove_staged(staged.path)
+        return staged
+
+    def _settle(self, staged, size):
+        with self._lock:
+            # Kolejne rezerwacje szacujemy największym dotychczasowym plikiem
+            self.expected_size = max(self.expected_size, size)
+            if not staged.in_ram:
+                return
+            self._ram_used += size - staged.reserved
+            staged.reserved = size
+            if self._ram_used <= self.ram_budget:
+                return
+            self._ram_used -= size
+            staged.reserved = 0
+            staged.in_ram = False
+            self.overflowed += 1
+        target = os.path.join(self.disk_dir, os.path.basename(staged.path))
+        module_logger.info(f"Staging: limit RAM przekroczony - {os.path.basename(staged.path)} ({size / (1024*1024):.1f} MB) na dysk")
+        shutil.move(staged.path, target)
+        remove_staged(staged.path)  # Indeksy utworzone przed przeniesieniem
+        staged.path = target
+
+    def _release(self, staged):
+        remove_staged(staged.path)
+        with self._lock:
+            if self._active.pop(id(staged), None) is None:
+                return
+            self._ram_used -= staged.reserved
+            staged.reserved = 0
+
+    def cleanup(self):
+        """Usuwa wszystkie aktywne pliki procesu (atexit / zamknięcie programu)"""
+        with self._lock:
+            active = list(self._active.values())
+        for staged in active:
+            self._release(staged)
+
+    def sweep(self):
+        """
+        Usuwa osierocone pliki z katalogów staging: procesów tego hosta, które już nie działają,
+        oraz (gdy właściciela nie da się sprawdzić) starszych niż ORPHAN_AGE. Zwraca liczbę plików.
+        """
+        host = _host()
+        removed = 0
+        now = time.time()
+        for directory in filter(None, {self.ram_dir, self.disk_dir}):
+            for path in glob.glob(os.path.join(glob.escape(directory), f"{FILE_PREFIX}*{FILE_SUFFIX}*")):
+                # gfs_<run>_f<NNN>_<rodzaj>.<host>.<pid>.grb2[.*] - starsze nazwy bez właściciela: wg wieku
+                owner = os.path.basename(path).split(FILE_SUFFIX, 1)[0].partition('.')[2]
+                owner_host, _, pid = owner.rpartition('.')
+                if owner == self.owner:
+                    continue
+                alive = _pid_alive(int(pid)) if owner_host == host and pid.isdigit() else None
+                if alive is None:
+                    try:
+                        alive = now - os.path.getmtime(path) < ORPHAN_AGE
+                    except OSError:
+                        continue
+                if not alive:
+                    try:
+                        os.remove(path)
+                        removed += 1
+                    except OSError:
+                        pass
+        if removed:
+            module_logger.info(f"Staging: usunięto {removed} osieroconych plików tymczasowych")
+        return removed
+
+    def describe(self):
+        if not self.ram_dir:
+            return f"dysk ({self.disk_dir})"
+        return f"RAM {self.ram_dir} (limit {self.ram_budget / (1024*1024):.0f} MB), przepełnienie: {self.disk_dir}"
+
+    def summary(self):
+        """Krótki opis statystyk do logów"""
+        return (f"staging: {self.staged_ram} plików w RAM, {self.staged_disk} na dysku, "
+                f"{self.overflowed} przeniesionych na dysk")
+
+    def __repr__(self):
+        return f"StagingStore({self.describe()})"
+
+def load_staging_store(config_file='config.ini', disk_dir='temp_grib_filtered'):
+    """
+    Magazyn z sekcji [staging] (ram_dir, ram_budget_mb, disk_dir); disk_dir - domyślny katalog programu.
+    Przy tworzeniu sprząta pliki po procesach, które padły.
+    """
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    ram_budget_mb = config.getfloat('staging', 'ram_budget_mb', fallback=DEFAULT_RAM_BUDGET_MB)
+    store = StagingStore(
+        config.get('staging', 'disk_dir', fallback=disk_dir),
+        ram_dir=config.get('staging', 'ram_dir', fallback=DEFAULT_RAM_DIR),
+        ram_budget=int(ram_budget_mb * 1024 * 1024),
+    )
+    store.sweep()
+    return store
@@ -0,0 +1,261 @@
+"""
+GFS Weather Data Downloader - ZWARTY ZAPIS WARTOŚCI (FLOAT / KWANTYZACJA)
+Domyślnie wszystkie kolumny są DOUBLE, a wartości float64 zaokrąglone do 2 miejsc. Tryb zwarty
+zmniejsza tabelę, obciążenie buffer pool i ilość danych przy INSERT:
+- float32   - tablice float32 w całym przetwarzaniu, kolumny FLOAT (4 bajty zamiast 8),
+              wartości zaokrąglone do kroku kolumny (krótsze liczby w zapytaniu INSERT),
+- quantized - liczby całkowite round((wartość - offset) / krok) w kolumnach SMALLINT/MEDIUMINT
+              (2-3 bajty); widok <tabela>_values odtwarza wartości fizyczne.
+
+    [storage]
+    mode = float32
+    # Krok dla kolumn bez własnej dokładności
+    precision = 0.01
+
+    [storage_precision]
+    # kolumna = krok[, offset[, typ całkowity]] - nadpisuje piąte/szóste pole w [gfs_parameters]
+    mslp = 0.01, 1000, SMALLINT
+    tp_1h = 0.01
+
+Dokładność parametru można też podać w [gfs_parameters] jako piąte (krok) i szóste (offset) pole:
+    t2m = t2m, heightAboveGround, 2, kelvin_to_celsius, 0.01
+
+Migracja istniejącej tabeli (ALTER TABLE wg konfiguracji, dla quantized także widok):
+    python gfs_storage.py migracja --table gfs_forecast
+"""
+
+import math
+import logging
+import argparse
+import configparser
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+module_logger = logging.getLogger(__name__)
+
+MODES = ('double', 'float32', 'quantized')
+DEFAULT_MODE = 'double'
+DEFAULT_SCALE = 0.01
+# Zaokrąglenie trybu double (round_frame, assemble_wide_frame)
+DEFAULT_DECIMALS = 2
+
+# Kolumny współrzędnych - w trybach zwartych FLOAT, bez kwantyzacji
+COORDINATE_COLUMNS = ('lat', 'lon')
+COORDINATE_DECIMALS = 4
+
+INTEGER_RANGES = {
+    'TINYINT': (-128, 127),
+    'SMALLINT': (-32768, 32767),
+    'MEDIUMINT': (-8388608, 8388607),
+    'INT': (-2147483648, 2147483647),
+}
+
+ColumnPrecision = namedtuple('ColumnPrecision', ['scale', 'offset', 'int_type'])
+
+# Domyślna dokładność znanych kolumn (jednostki po transformacjach: °C, hPa, %, m/s, mm, m)
+DEFAULT_PRECISION = {
+    **{c: ColumnPrecision(0.01, 0.0, 'SMALLINT') for c in ('t2m', 'd2m', 't_t850', 't_wind80', 'u10', 'v10', 'gust',
+                                                           'u_wind80', 'v_wind80', 'wind_speed', 'wind_speed80')},
+    **{c: ColumnPrecision(0.1, 0.0, 'SMALLINT') for c in ('rh', 'tcc', 'lcc', 'mcc', 'hcc', 'wind_dir', 'wind_dir80')},
+    'mslp': ColumnPrecision(0.01, 1000.0, 'SMALLINT'),
+    **{c: ColumnPrecision(0.01, 0.0, 'MEDIUMINT') for c in ('tp', 'tp_1h', 'tp_3h', 'pwat')},
+    'prate': ColumnPrecision(1e-6, 0.0, 'MEDIUMINT'),
+    'vis': ColumnPrecision(1.0, 0.0, 'MEDIUMINT'),
+    'dswrf': ColumnPrecision(0.1, 0.0, 'MEDIUMINT'),
+    'cape': ColumnPrecision(1.0, 0.0, 'MEDIUMINT'),
+    'cin': ColumnPrecision(1.0, 0.0, 'MEDIUMINT'),
+    'gh_gh500': ColumnPrecision(0.1, 0.0, 'MEDIUMINT'),
+    'gh_t850': ColumnPrecision(0.1, 0.0, 'MEDIUMINT'),
+}
+
+def _decimals(scale):
+    """Miejsca po przecinku dla kroku (krok 0.01 -> 2; krok niebędący potęgą 10 - o 3 więcej)"""
+    exponent = -math.log10(scale)
+    decimals = max(0, math.ceil(exponent - 1e-9))
+    return decimals if abs(exponent - round(exponent)) < 1e-9 else decimals + 3
+
+def parse_precision(value, default_type='MEDIUMINT'):
+    """'krok[, offset[, typ]]' -> ColumnPrecision"""
+    parts = [p.strip() for p in str(value).split(',') if p.strip()]
+    scale = float(parts[0])
+    if scale <= 0:
+        raise ValueError(f"krok musi być dodatni ({value})")
+    offset = float(parts[1]) if len(parts) > 1 else 0.0
+    int_type = parts[2].upper() if len(parts) > 2 else default_type
+    if int_type not in INTEGER_RANGES:
+        raise ValueError(f"nieznany typ całkowity '{int_type}' (dostępne: {', '.join(INTEGER_RANGES)})")
+    return ColumnPrecision(scale, offset, int_type)
+
+class StorageFormat:
+    """Sposób zapisu wartości: zaokrąglenie/kwantyzacja DataFrame przed to_sql i typy kolumn SQL"""
+
+    def __init__(self, mode=DEFAULT_MODE, precision=None, default_scale=DEFAULT_SCALE):
+        if mode not in MODES:
+            raise ValueError(f"Nieznany tryb zapisu '{mode}' (dostępne: {', '.join(MODES)})")
+        self.mode = mode
+        self.precision = dict(precision or {})
+        self.default = ColumnPrecision(default_scale, 0.0, 'MEDIUMINT')
+        self._clipped = set()
+
+    @property
+    def compact(self):
+        return self.mode != 'double'
+
+    @property
+    def dtype(self):
+        """Typ tablic w przetwarzaniu (macierz DataFrame, siatka po dekodowaniu)"""
+        return np.float32 if self.compact else np.float64
+
+    def column_precision(self, column):
+        return self.precision.get(column) or DEFAULT_PRECISION.get(column) or self.default
+
+    @property
+    def decimals(self):
+        """Miejsca po przecinku przy składaniu macierzy (assemble_wide_frame) - tylko tryb double"""
+        return None if self.compact else DEFAULT_DECIMALS
+
+    def round(self, df):
+        """Zaokrąglenie w _finalize_frame - tylko tryb double (2 miejsca, jak dotychczas); tryby zwarte w encode()"""
+        if self.compact:
+            return df
+        return round_frame(df)
+
+    def _value_columns(self, df):
+        return [c for c in df.columns if c not in COORDINATE_COLUMNS and df[c].dtype.kind == 'f']
+
+    def encode(self, df):
+        """DataFrame do to_sql: double - bez zmian, float32 - wartości zaokrąglone do kroku, quantized - liczby całkowite"""
+        if not self.compact:
+            return df
+        encoded = {}
+        for column in COORDINATE_COLUMNS:
+            if column in df.columns:
+                encoded[column] = np.round(df[column].to_numpy(dtype=np.float64), COORDINATE_DECIMALS)
+        for column in self._value_columns(df):
+            spec = self.column_precision(column)
+            steps = np.round((df[column].to_numpy(dtype=np.float64) - spec.offset) / spec.scale)
+            if self.mode == 'float32':
+                encoded[column] = np.round(steps * spec.scale + spec.offset, _decimals(spec.scale))
+                continue
+            low, high = INTEGER_RANGES[spec.int_type]
+            finite = np.isfinite(steps)
+            outside = finite & ((steps < low) | (steps > high))
+            if outside.any() and column not in self._clipped:
+                self._clipped.add(column)
+                module_logger.warning(f"Kolumna {column}: {int(outside.sum())} wartości poza zakresem {spec.int_type} "
+                                      f"(krok {spec.scale}, offset {spec.offset}) - obcięte; popraw [storage_precision]")
+            steps = np.clip(np.where(finite, steps, 0), low, high).astype(np.int64)
+            encoded[column] = pd.arrays.IntegerArray(steps, ~finite)  # NaN -> NULL
+        result = df.copy(deep=False)
+        for column, values in encoded.items():
+            result[column] = values
+        return result
+
+    def sql_type(self, column):
+        """Typ kolumny SQL w danym trybie"""
+        if self.mode == 'double':
+            return 'DOUBLE'
+        if self.mode == 'float32' or column in COORDINATE_COLUMNS:
+            return 'FLOAT'
+        return self.column_precision(column).int_type
+
+    def migration_sql(self, table, value_columns, base_columns=('id', 'lat', 'lon', 'forecast_time', 'run_time', 'created_at')):
+        """Instrukcje ALTER TABLE (i widok wartości fizycznych dla quantized) dla istniejącej tabeli"""
+        coordinates = [c for c in COORDINATE_COLUMNS if c in base_columns]
+        modify = [f"    MODIFY COLUMN {c} {self.sql_type(c)}{' NOT NULL' if c in COORDINATE_COLUMNS else ''}"
+                  for c in coordinates + list(value_columns)]
+        statements = []
+        if self.mode == 'quantized':
+            # Istniejące wartości fizyczne -> liczby całkowite przed zmianą typu (inaczej MODIFY obciąłby wartości)
+            scaled = []
+            for column in value_columns:
+                spec = self.column_precision(column)
+                shifted = f"{column} - {spec.offset!r}" if spec.offset else column
+                scaled.append(f"    {column} = ROUND(({shifted}) / {spec.scale!r})")
+            statements.append(f"UPDATE {table} SET\n" + ',\n'.join(scaled) + ';')
+        statements.append(f"ALTER TABLE {table}\n" + ',\n'.join(modify) + ';')
+        if self.mode == 'quantized':
+            decoded = [f"    {c}" for c in base_columns]
+            for column in value_columns:
+                spec = self.column_precision(column)
+                expression = f"{column} * {spec.scale!r}" + (f" + {spec.offset!r}" if spec.offset else '')
+                decoded.append(f"    {expression} AS {column}")
+            statements.append(f"CREATE OR REPLACE VIEW {table}_values AS\nSELECT\n" + ',\n'.join(decoded) + f"\nFROM {table};")
+        return statements
+
+    def __repr__(self):
+        return f"StorageFormat(mode={self.mode}, columns={len(self.precision)})"
+
+def round_frame(df, decimals=DEFAULT_DECIMALS):
+    """Zaokrąglenie wszystkich kolumn liczbowych jednym przebiegiem (tryb double)"""
+    numeric_cols = df.select_dtypes(include=[np.number]).columns
+    numeric_cols = [c for c in numeric_cols if c != 'id']  # Nie zaokrąglaj ID jeśli istnieje
+    if numeric_cols:
+        df[numeric_cols] = df[numeric_cols].round(decimals)
+    return df
+
+def load_storage(config_file='config.ini', params_config=None):
+    """
+    Sposób zapisu z [storage] i [storage_precision]; dokładność parametrów także z params_config
+    (piąte/szóste pole w [gfs_parameters]). Błędna konfiguracja - tryb double z ostrzeżeniem.
+    """
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    section = config['storage'] if 'storage' in config else {}
+    mode = section.get('mode', DEFAULT_MODE).strip().lower()
+    try:
+        default_scale = float(section.get('precision', DEFAULT_SCALE))
+        precision = {}
+        for param_info in (params_config or {}).values():
+            if param_info.get('precision') is not None:
+                scale, offset = param_info['precision']
+                known = DEFAULT_PRECISION.get(param_info['db_column'])
+                precision[param_info['db_column']] = ColumnPrecision(scale, offset, known.int_type if known else 'MEDIUMINT')
+        if 'storage_precision' in config:
+            for column, value in config['storage_precision'].items():
+                known = precision.get(column) or DEFAULT_PRECISION.get(column)
+                precision[column] = parse_precision(value, known.int_type if known else 'MEDIUMINT')
+        return StorageFormat(mode, precision, default_scale)
+    except ValueError as e:
+        module_logger.warning(f"[storage] {e} - zapis jako DOUBLE")
+        return StorageFormat()
+
+def main():
+    parser = argparse.ArgumentParser(description='Zwarty zapis wartości GFS - migracja tabel')
+    sub = parser.add_subparsers(dest='polecenie', required=True)
+    p = sub.add_parser('migracja', help='Instrukcje SQL zmiany typów kolumn istniejącej tabeli wg [storage]')
+    p.add_argument('--config', default='config.ini')
+    p.add_argument('--table', default='gfs_forecast')
+    p.add_argument('--mode', choices=MODES, help='Tryb (domyślnie [storage] mode)')
+    args = parser.parse_args()
+
+    # Kolumny wartości wg konfiguracji (jak ForecastSchema.expected - bez kolumn bazowych)
+    import builtins
+    builtins.__imported_by_daemon__ = True
+    from gfs_downloader_filtered_fixed import load_parameters_config
+    import gfs_derived
+    import gfs_precip
+    params_config, _ = load_parameters_config(args.config)
+    storage = load_storage(args.config, params_config)
+    if args.mode:
+        storage = StorageFormat(args.mode, storage.precision, storage.default.scale)
+    columns = [info['db_column'] for info in params_config.values() if info.get('stored', True)]
+    columns += gfs_derived.load_derived_fields(args.config, params_config).outputs + gfs_precip.output_columns(params_config)
+    columns = list(dict.fromkeys(c for c in columns if c not in COORDINATE_COLUMNS))
+    import gfs_points
+    import gfs_areas
+    base_columns = {
+        gfs_points.POINT_TABLE: ['id'] + gfs_points.POINT_BASE_COLUMNS,
+        gfs_areas.AREA_TABLE: ['id'] + gfs_areas.AREA_BASE_COLUMNS,
+    }.get(args.table, ['id', 'lat', 'lon', 'forecast_time', 'run_time', 'created_at', 'region_id'])
+
+    print(f"-- Zwarty zapis {args.table}: tryb {storage.mode} ({len(columns)} kolumn wartości)")
+    print("-- UWAGA: ALTER TABLE przebudowuje tabelę - uruchom poza godzinami pobierania, najlepiej po kopii zapasowej")
+    for statement in storage.migration_sql(args.table, columns, base_columns):
+        print(statement)
+        print()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+GFS Weather Data Downloader - TRANSFORMACJE JEDNOSTEK
+Rejestr transformacji (nazwy z czwartej kolumny [gfs_parameters], np. kelvin_to_celsius):
+- każda transformacja to złożenie operacji: scale (mnożenie), offset (dodanie), clip (przycięcie),
+- operacje wykonywane są w miejscu na tablicy numpy wyciętego regionu (bez kopii i bez xarray),
+- warunek "units" jest sprawdzany na jednostkach z GRIB (metadane), a nie na wartościach -
+  np. fraction_to_percent mnoży przez 100 tylko pole w ułamku (0 - 1), a pole w % zostawia.
+
+Decyzja jest podejmowana raz na (transformacja, jednostki) i pamiętana w rejestrze.
+Nowe transformacje można dodać w config.ini bez zmian w kodzie:
+
+    [transformations]
+    # nazwa = operacje oddzielone ';'
+    #   scale=X, offset=Y, clip=min:max, units=u1|u2 (tylko dla tych jednostek GRIB)
+    kelvin_to_fahrenheit = scale=1.8; offset=-459.67; units=K
+"""
+
+import threading
+import logging
+import configparser
+
+import numpy as np
+
+module_logger = logging.getLogger(__name__)
+
+# Jednostki ułamka w tablicach GRIB (ecCodes / cfgrib)
+FRACTION_UNITS = '(0 - 1)|proportion|fraction|1|0-1'
+
+DEFAULT_TRANSFORMATIONS = {
+    'none': '',
+    'kelvin_to_celsius': 'offset=-273.15; units=K',
+    'pa_to_hpa': 'scale=0.01; units=Pa',
+    'fraction_to_percent': f'scale=100; clip=0:100; units={FRACTION_UNITS}',
+}
+
+def _normalize_units(units):
+    return str(units).strip().lower()
+
+def data_units(data):
+    """Jednostki z atrybutów DataArray (cfgrib: GRIB_units, ecCodes: units); None gdy brak"""
+    attrs = getattr(data, 'attrs', None) or {}
+    return attrs.get('GRIB_units') or attrs.get('units')
+
+class Transformation:
+    """Złożenie operacji scale -> offset -> clip, wykonywane w miejscu na tablicy numpy"""
+
+    def __init__(self, name, scale=1.0, offset=0.0, clip=None, units=None):
+        self.name = name
+        self.scale = float(scale)
+        self.offset = float(offset)
+        self.clip = clip
+        self.units = frozenset(_normalize_units(u) for u in units) if units else None
+
+    @classmethod
+    def parse(cls, name, spec):
+        """Transformacja z opisu 'scale=100; clip=0:100; units=%' (pusty opis = bez zmian)"""
+        options = {}
+        for part in spec.split(';'):
+            part = part.strip()
+            if not part:
+                continue
+            key, sep, value = part.partition('=')
+            if not sep:
+                raise ValueError(f"Transformacja {name}: niepoprawna operacja '{part}' (oczekiwano klucz=wartość)")
+            key, value = key.strip().lower(), value.strip()
+            if key in ('scale', 'offset'):
+                options[key] = float(value)
+            elif key == 'clip':
+                low, _, high = value.partition(':')
+                options['clip'] = (float(low) if low.strip() else None, float(high) if high.strip() else None)
+            elif key == 'units':
+                options['units'] = [u for u in value.split('|') if u.strip()]
+            else:
+                raise ValueError(f"Transformacja {name}: nieznana operacja '{key}'")
+        return cls(name, **options)
+
+    @property
+    def is_identity(self):
+        return self.scale == 1.0 and self.offset == 0.0 and self.clip is None
+
+    def applies_to(self, units):
+        """Czy operacje dotyczą pola o danych jednostkach (nieznane jednostki - tak)"""
+        if self.units is None or units is None:
+            return True
+        return _normalize_units(units) in self.units
+
+    def apply(self, values):
+        """Wykonuje operacje w miejscu; zwraca tablicę (kopię tylko gdy wejście było tylko do odczytu)"""
+        if self.is_identity:
+            return values
+        if values.dtype.kind != 'f':
+            values = values.astype(np.float64)
+        elif not values.flags.writeable:
+            values = values.copy()
+        if self.scale != 1.0:
+            np.multiply(values, self.scale, out=values)
+        if self.offset != 0.0:
+            np.add(values, self.offset, out=values)
+        if self.clip is not None:
+            low, high = self.clip
+            np.clip(values, -np.inf if low is None else low, np.inf if high is None else high, out=values)
+        return values
+
+    def __repr__(self):
+        return f"Transformation({self.name}, scale={self.scale}, offset={self.offset}, clip={self.clip})"
+
+IDENTITY = Transformation('none')
+
+class TransformRegistry:
+    """Transformacje wg nazwy; resolve() pamięta decyzję dla (nazwa, jednostki GRIB)"""
+
+    def __init__(self, specs=None):
+        self.transformations = {}
+        for name, spec in {**DEFAULT_TRANSFORMATIONS, **(specs or {})}.items():
+            self.transformations[name] = Transformation.parse(name, spec)
+        self._resolved = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, name, units=None):
+        """Transformacja do wykonania dla pola o danych jednostkach (IDENTITY gdy nic do zrobienia)"""
+        key = (name, units)
+        resolved = self._resolved.get(key)
+        if resolved is not None:
+            return resolved
+        transformation = self.transformations.get(name)
+        if transformation is None:
+            module_logger.warning(f"Nieznana transformacja '{name}' - dane bez zmian")
+            resolved = IDENTITY
+        elif not transformation.applies_to(units):
+            module_logger.info(f"Transformacja '{name}' pominięta - jednostki GRIB '{units}'")
+            resolved = IDENTITY
+        else:
+            resolved = transformation
+        with self._lock:
+            self._resolved.setdefault(key, resolved)
+        return resolved
+
+    def apply(self, name, values, units=None):
+        return self.resolve(name, units).apply(values)
+
+def load_registry(config_file='config.ini'):
+    """Rejestr z transformacjami domyślnymi i sekcją [transformations] z config.ini"""
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    specs = dict(config['transformations']) if 'transformations' in config else {}
+    try:
+        return TransformRegistry(specs)
+    except ValueError as e:
+        module_logger.warning(f"{e} - używam transformacji domyślnych")
+        return TransformRegistry()
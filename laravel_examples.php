@@ -249,6 +249,52 @@ class WeatherController extends Controller
             'alerts' => $alerts
         ]);
     }
+    
+    /**
+     * Prognoza dla stacji ([points] w config.ini - tabela gfs_point_forecast)
+     * Wartości są już interpolowane do współrzędnych stacji - bez szukania najbliższego punktu siatki
+     * 
+     * @param string $stationId - identyfikator stacji z pliku stacji (np. WAW)
+     */
+    public function getStationForecast($stationId, $hours = 24)
+    {
+        $latestRun = DB::table('gfs_point_forecast')
+            ->where('station_id', $stationId)
+            ->max('run_time');
+        
+        $forecast = DB::table('gfs_point_forecast')
+            ->where('station_id', $stationId)
+            ->where('run_time', $latestRun)
+            ->whereBetween('forecast_time', [now(), now()->addHours($hours)])
+            ->orderBy('forecast_time', 'asc')
+            ->get();
+        
+        return response()->json($forecast);
+    }
+    
+    /**
+     * Prognoza dla obszaru ([areas] w config.ini - tabela gfs_area_forecast)
+     * Statystyki są liczone przy pobieraniu - bez uśredniania punktów siatki w PHP
+     * 
+     * @param string $areaId - identyfikator obszaru z pliku wielokątów (np. kod TERYT gminy)
+     * @param string $stat - mean, min, max lub sum
+     */
+    public function getAreaForecast($areaId, $stat = 'mean', $hours = 24)
+    {
+        $latestRun = DB::table('gfs_area_forecast')
+            ->where('area_id', $areaId)
+            ->max('run_time');
+        
+        $forecast = DB::table('gfs_area_forecast')
+            ->where('area_id', $areaId)
+            ->where('stat', $stat)
+            ->where('run_time', $latestRun)
+            ->whereBetween('forecast_time', [now(), now()->addHours($hours)])
+            ->orderBy('forecast_time', 'asc')
+            ->get();
+        
+        return response()->json($forecast);
+    }
 }
 
 /**
@@ -261,6 +307,8 @@ class WeatherController extends Controller
  * Route::get('/weather/map', [WeatherController::class, 'getTemperatureMap']);
  * Route::get('/weather/stats/{lat}/{lon}', [WeatherController::class, 'getWeatherStats']);
  * Route::get('/weather/alerts/{lat}/{lon}', [WeatherController::class, 'getWeatherAlerts']);
+ * Route::get('/weather/station/{stationId}', [WeatherController::class, 'getStationForecast']);
+ * Route::get('/weather/area/{areaId}/{stat?}', [WeatherController::class, 'getAreaForecast']);
  */
 
 /**